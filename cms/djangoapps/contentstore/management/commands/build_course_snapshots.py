@@ -0,0 +1,76 @@
+"""
+Management command to build the snapshots of the published branch of split modulestore
+courses, from which the LMS can serve them with the SnapshotModuleStore.
+"""
+import logging
+from textwrap import dedent
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.locator import CourseLocator
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.split_mongo.course_snapshot import build_snapshot
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Builds the snapshots of the published branch of the given split modulestore courses,
+    or of all of them, in --snapshot-root, which defaults to COURSE_SNAPSHOT_ROOT.  Studio
+    rebuilds the snapshot of a course when it is published, so this is only needed to
+    build the snapshots of courses that were published before that was configured.
+
+    Examples:
+
+        ./manage.py cms build_course_snapshots course-v1:org+course+run
+        ./manage.py cms build_course_snapshots --all --snapshot-root /edx/var/edxapp/course_snapshots
+    """
+    help = dedent(__doc__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_keys', nargs='*', help='IDs of the courses to build snapshots of')
+        parser.add_argument('--all', action='store_true', help='Build snapshots of all courses')
+        parser.add_argument(
+            '--snapshot-root',
+            default=None,
+            help='Directory to write the snapshots to; defaults to COURSE_SNAPSHOT_ROOT',
+        )
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['course_keys']):
+            raise CommandError(u'build_course_snapshots requires either one or more course keys or --all')
+        snapshot_root = options['snapshot_root'] or settings.COURSE_SNAPSHOT_ROOT
+        if not snapshot_root:
+            raise CommandError(u'Either --snapshot-root or COURSE_SNAPSHOT_ROOT is required')
+
+        # pylint: disable=protected-access
+        split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)
+        if split_store is None:
+            raise CommandError(u'The split modulestore is not configured')
+
+        if options['all']:
+            course_keys = [
+                CourseLocator(course_index['org'], course_index['course'], course_index['run'])
+                for course_index in split_store.db_connection.find_matching_course_indexes(
+                    branch=ModuleStoreEnum.BranchName.published
+                )
+            ]
+        else:
+            course_keys = []
+            for raw_course_key in options['course_keys']:
+                try:
+                    course_keys.append(CourseKey.from_string(raw_course_key))
+                except InvalidKeyError:
+                    raise CommandError(u'Invalid course key: {}'.format(raw_course_key))
+
+        for course_key in course_keys:
+            snapshot_path = build_snapshot(split_store.db_connection, course_key, snapshot_root)
+            if snapshot_path is None:
+                log.warning(u'%s has no published branch in the split modulestore', course_key)
+            else:
+                log.info(u'Built the snapshot %s of %s', snapshot_path, course_key)
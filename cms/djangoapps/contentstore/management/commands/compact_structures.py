@@ -0,0 +1,84 @@
+"""
+Management command to re-encode the stored structures of split modulestore courses
+as deltas against their previous versions, with periodic full snapshots.
+"""
+import logging
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Re-encodes the structures of the given split modulestore courses and libraries, or
+    of all of them, as deltas against their previous versions, with a full snapshot
+    every --snapshot-interval versions.  An interval of 1 stores all structures in full,
+    which undoes the compaction.
+
+    Examples:
+
+        ./manage.py cms compact_structures course-v1:org+course+run --snapshot-interval 20
+        ./manage.py cms compact_structures --all
+        ./manage.py cms compact_structures --all --snapshot-interval 1
+    """
+    help = dedent(__doc__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_keys', nargs='*', help='IDs of the courses or libraries to compact')
+        parser.add_argument('--all', action='store_true', help='Compact all courses and libraries')
+        parser.add_argument(
+            '--snapshot-interval',
+            type=int,
+            default=None,
+            help='Number of versions between full snapshots; defaults to the structure_snapshot_interval '
+                 'of the split modulestore, or 1 if it is not configured',
+        )
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['course_keys']):
+            raise CommandError(u'compact_structures requires either one or more course keys or --all')
+        if options['snapshot_interval'] is not None and options['snapshot_interval'] < 1:
+            raise CommandError(u'--snapshot-interval must be at least 1')
+
+        # pylint: disable=protected-access
+        split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)
+        if split_store is None:
+            raise CommandError(u'The split modulestore is not configured')
+        db_connection = split_store.db_connection
+
+        if options['all']:
+            course_indexes = db_connection.find_matching_course_indexes()
+        else:
+            course_indexes = []
+            for raw_course_key in options['course_keys']:
+                try:
+                    course_key = CourseKey.from_string(raw_course_key)
+                except InvalidKeyError:
+                    raise CommandError(u'Invalid course key: {}'.format(raw_course_key))
+                course_index = db_connection.get_course_index(course_key)
+                if course_index is None:
+                    raise CommandError(u'Course not found in the split modulestore: {}'.format(course_key))
+                course_indexes.append(course_index)
+
+        compacted_versions = set()
+        for course_index in course_indexes:
+            course_context = u'{}/{}/{}'.format(course_index['org'], course_index['course'], course_index['run'])
+            for version in course_index['versions'].itervalues():
+                structure = db_connection.get_structure(version, course_context)
+                if structure is None or structure['original_version'] in compacted_versions:
+                    continue
+                compacted_versions.add(structure['original_version'])
+                compacted = db_connection.compact_structures(
+                    structure['original_version'], options['snapshot_interval'], course_context,
+                )
+                log.info(
+                    u'Re-encoded %d structures of %s originating from %s',
+                    compacted, course_context, structure['original_version'],
+                )
@@ -0,0 +1,94 @@
+"""
+Tests for the compact_structures management command
+"""
+from django.core.management import CommandError, call_command
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.split_mongo import structure_delta
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+
+class TestCompactStructures(ModuleStoreTestCase):
+    """
+    Tests for the compact_structures management command
+    """
+    def setUp(self):
+        super(TestCompactStructures, self).setUp()
+        self.course = CourseFactory.create(default_store=ModuleStoreEnum.Type.split)
+        for index in range(5):
+            ItemFactory.create(
+                parent_location=self.course.location,
+                category='html',
+                display_name='Html {}'.format(index),
+                user_id=self.user.id,
+            )
+
+        # pylint: disable=protected-access
+        self.db_connection = self.store._get_modulestore_by_type(ModuleStoreEnum.Type.split).db_connection
+        course_index = self.db_connection.get_course_index(self.course.id)
+        original_version = self.db_connection.get_structure(
+            course_index['versions'][ModuleStoreEnum.BranchName.draft]
+        )['original_version']
+        self.structure_ids = [
+            structure['_id']
+            for structure in self.db_connection.structures.find({'original_version': original_version}, {'_id': 1})
+        ]
+        self.structures = self._read_structures()
+
+    def _read_structures(self):
+        """
+        Returns the storable blocks of the course's structures, by structure id.
+        """
+        return {
+            structure['_id']: {key: block.to_storable() for key, block in structure['blocks'].iteritems()}
+            for structure in self.db_connection.find_structures_by_id(self.structure_ids)
+        }
+
+    def _stored_docs(self):
+        """
+        Returns the stored documents of the course's structures, by structure id.
+        """
+        return {doc['_id']: doc for doc in self.db_connection.structures.find({'_id': {'$in': self.structure_ids}})}
+
+    def test_no_args(self):
+        with self.assertRaisesRegexp(CommandError, 'requires either one or more course keys or --all'):
+            call_command('compact_structures')
+
+    def test_course_keys_and_all(self):
+        with self.assertRaisesRegexp(CommandError, 'requires either one or more course keys or --all'):
+            call_command('compact_structures', unicode(self.course.id), '--all')
+
+    def test_invalid_course_key(self):
+        with self.assertRaisesRegexp(CommandError, 'Invalid course key'):
+            call_command('compact_structures', 'not/a/course/key')
+
+    def test_invalid_snapshot_interval(self):
+        with self.assertRaisesRegexp(CommandError, 'must be at least 1'):
+            call_command('compact_structures', unicode(self.course.id), '--snapshot-interval', '0')
+
+    def test_compact_structures(self):
+        self.assertGreater(len(self.structure_ids), 3)
+        call_command('compact_structures', unicode(self.course.id), '--snapshot-interval', '3')
+
+        stored_docs = self._stored_docs()
+        self.assertTrue(any(structure_delta.is_delta(doc) for doc in stored_docs.itervalues()))
+        self.assertTrue(all(structure_delta.delta_depth(doc) < 3 for doc in stored_docs.itervalues()))
+        self.assertEqual(self._read_structures(), self.structures)
+        for structure_id, blocks in self.structures.iteritems():
+            structure = self.db_connection.get_structure(structure_id)
+            self.assertEqual({key: block.to_storable() for key, block in structure['blocks'].iteritems()}, blocks)
+
+        # an interval of 1 stores them all in full again
+        call_command('compact_structures', '--all', '--snapshot-interval', '1')
+        self.assertFalse(any(structure_delta.is_delta(doc) for doc in self._stored_docs().itervalues()))
+        self.assertEqual(self._read_structures(), self.structures)
+
+    def test_already_compacted(self):
+        call_command('compact_structures', unicode(self.course.id), '--snapshot-interval', '3')
+        stored_docs = self._stored_docs()
+
+        # compacting them again with the same interval leaves them as they are
+        call_command('compact_structures', unicode(self.course.id), '--snapshot-interval', '3')
+        self.assertEqual(self._stored_docs(), stored_docs)
+        self.assertEqual(self._read_structures(), self.structures)
@@ -3,6 +3,7 @@
 import logging
 from datetime import datetime
 
+from django.conf import settings
 from django.dispatch import receiver
 from pytz import UTC
 
@@ -24,8 +25,8 @@ log = logging.getLogger(__name__)
 def listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
     """
     Receives publishing signal and performs publishing related workflows, such as
-    registering proctored exams, building up credit requirements, and performing
-    search indexing
+    registering proctored exams, building up credit requirements, performing
+    search indexing and building course snapshots
     """
 
     # first is to registered exams, the credit subsystem will assume that
@@ -48,6 +49,13 @@ def listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=
 
         update_search_index.delay(unicode(course_key), datetime.now(UTC).isoformat())
 
+    # Rebuild the snapshot of the published course, from which the LMS may serve it
+    if settings.COURSE_SNAPSHOT_ROOT:
+        # import here, because signal is registered at startup, but items in tasks are not yet able to be loaded
+        from contentstore.tasks import build_course_snapshot
+
+        build_course_snapshot.delay(unicode(course_key))
+
 
 @receiver(SignalHandler.library_updated)
 def listen_for_library_update(sender, library_key, **kwargs):  # pylint: disable=unused-argument
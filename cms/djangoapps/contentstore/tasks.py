@@ -42,9 +42,10 @@ from student.auth import has_course_author_access
 from xmodule.contentstore.django import contentstore
 from xmodule.course_module import CourseFields
 from xmodule.exceptions import SerializationError
-from xmodule.modulestore import COURSE_ROOT, LIBRARY_ROOT
+from xmodule.modulestore import COURSE_ROOT, LIBRARY_ROOT, ModuleStoreEnum
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import DuplicateCourseError, ItemNotFoundError
+from xmodule.modulestore.split_mongo.course_snapshot import build_snapshot
 from xmodule.modulestore.xml_exporter import export_course_to_xml, export_library_to_xml
 from xmodule.modulestore.xml_importer import import_course_from_xml, import_library_from_xml
 
@@ -185,6 +186,18 @@ def update_library_index(library_id, triggered_time_isoformat):
         LOGGER.debug(u'Search indexing successful for library %s', library_id)
 
 
+@task()
+def build_course_snapshot(course_id):
+    """ Rebuilds the snapshot of the published branch of a split course. """
+    course_key = CourseKey.from_string(course_id)
+    split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)  # pylint: disable=protected-access
+    if split_store is None:
+        return
+    snapshot_path = build_snapshot(split_store.db_connection, course_key, settings.COURSE_SNAPSHOT_ROOT)
+    if snapshot_path is not None:
+        LOGGER.debug(u'Built the snapshot %s of course %s', snapshot_path, course_id)
+
+
 @task()
 def push_course_update_task(course_key_string, course_subscription_id, course_display_name):
     """
@@ -275,10 +288,16 @@ def create_export_tarball(course_module, course_key, context, status=None):
     root_dir = path(mkdtemp())
 
     try:
+        asset_export_workers = settings.COURSE_EXPORT_ASSET_WORKERS
         if isinstance(course_key, LibraryLocator):
-            export_library_to_xml(modulestore(), contentstore(), course_key, root_dir, name)
+            export_library_to_xml(
+                modulestore(), contentstore(), course_key, root_dir, name, asset_export_workers=asset_export_workers,
+            )
         else:
-            export_course_to_xml(modulestore(), contentstore(), course_module.id, root_dir, name)
+            export_course_to_xml(
+                modulestore(), contentstore(), course_module.id, root_dir, name,
+                asset_export_workers=asset_export_workers,
+            )
 
         if status:
             status.set_state(u'Compressing')
@@ -508,7 +527,8 @@ def import_olx(self, user_id, course_key_string, archive_path, archive_name, lan
                 settings.GITHUB_REPO_ROOT, [dirpath],
                 load_error_modules=False,
                 static_content_store=contentstore(),
-                target_id=courselike_key
+                target_id=courselike_key,
+                asset_upload_workers=settings.COURSE_IMPORT_ASSET_UPLOAD_WORKERS,
             )
 
         new_location = courselike_items[0].location
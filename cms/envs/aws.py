@@ -152,6 +152,21 @@ if 'loc_cache' not in CACHES:
         'LOCATION': 'edx_location_mem_cache',
     }
 
+COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES', COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES
+)
+COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED', COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED
+)
+COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES = ENV_TOKENS.get(
+    'COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES', COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES
+)
+COURSE_SNAPSHOT_ROOT = ENV_TOKENS.get('COURSE_SNAPSHOT_ROOT', COURSE_SNAPSHOT_ROOT)
+COURSE_IMPORT_ASSET_UPLOAD_WORKERS = ENV_TOKENS.get(
+    'COURSE_IMPORT_ASSET_UPLOAD_WORKERS', COURSE_IMPORT_ASSET_UPLOAD_WORKERS
+)
+COURSE_EXPORT_ASSET_WORKERS = ENV_TOKENS.get('COURSE_EXPORT_ASSET_WORKERS', COURSE_EXPORT_ASSET_WORKERS)
+
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 SESSION_COOKIE_HTTPONLY = ENV_TOKENS.get('SESSION_COOKIE_HTTPONLY', True)
 SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
@@ -198,6 +213,8 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
     else:
         CODE_JAIL[name] = value
 
+CODE_JAIL_POOL.update(ENV_TOKENS.get('CODE_JAIL_POOL', {}))
+
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
 
 ASSET_IGNORE_REGEX = ENV_TOKENS.get('ASSET_IGNORE_REGEX', ASSET_IGNORE_REGEX)
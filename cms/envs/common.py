@@ -517,6 +517,20 @@ MODULESTORE = {
     }
 }
 
+# Size, in bytes of pickled data, of the process-local cache of split
+# course structures in front of the 'course_structure_cache'.  0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES = 0
+# Whether the process-local cache shares decoded course structures
+# across callers instead of unpickling them for each caller.
+COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED = False
+# Size, in bytes of pickled data, of the process-local cache of split
+# definitions, which are immutable.  0 disables it.
+COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES = 0
+# Directory to which the snapshots of the published branch of split courses
+# are written when they are published, for the LMS to serve them with the
+# SnapshotModuleStore.  None disables building them.
+COURSE_SNAPSHOT_ROOT = None
+
 # Modulestore-level field override providers. These field override providers don't
 # require student context.
 MODULESTORE_FIELD_OVERRIDE_PROVIDERS = ()
@@ -536,6 +550,20 @@ CODE_JAIL = {
     },
 }
 
+# A pool of warm sandboxed Pythons which execute the code of problems, instead
+# of starting a new one for each execution (see capa/safe_exec/pool.py).  It
+# uses the python_bin, user and limits of CODE_JAIL.
+CODE_JAIL_POOL = {
+    # How many workers can each process start?  0 disables the pool.
+    'size': 0,
+    # How many executions does a worker run before it is replaced?
+    'max_runs': 1000,
+    # How many MB can an execution in a worker use before the worker is replaced?
+    'max_rss_mb': 512,
+    # How many seconds to wait for a busy worker, before starting a new sandbox instead?
+    'wait_timeout': 1,
+}
+
 ############################ DJANGO_BUILTINS ################################
 # Change DEBUG in your environment settings files, not here
 DEBUG = False
@@ -607,6 +635,12 @@ MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
 COURSE_IMPORT_EXPORT_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
+# Number of threads which upload the static files of an imported course or library to the contentstore.
+COURSE_IMPORT_ASSET_UPLOAD_WORKERS = 4
+# Number of threads which export the static assets of an exported course or library, while its
+# blocks are serialized.  1 exports them after the blocks, in the exporting thread.
+COURSE_EXPORT_ASSET_WORKERS = 4
+
 ##### EMBARGO #####
 EMBARGO_SITE_REDIRECT_URL = None
 
@@ -7,6 +7,7 @@ from django.conf import settings
 
 import cms.lib.xblock.runtime
 import xmodule.x_module
+from capa.safe_exec import pool as safe_exec_pool
 from openedx.core.djangoapps.monkey_patch import django_db_models_options
 from openedx.core.djangoapps.theming.core import enable_theming
 from openedx.core.djangoapps.theming.helpers import is_comprehensive_theming_enabled
@@ -37,6 +38,8 @@ def run():
 
     add_mimetypes()
 
+    configure_safe_exec_pool()
+
     # In order to allow descriptors to use a handler url, we need to
     # monkey-patch the x_module library.
     # TODO: Remove this code when Runtimes are no longer created by modulestores
@@ -52,6 +55,21 @@ def run():
     validate_cms_config(settings)
 
 
+def configure_safe_exec_pool():
+    """
+    Configure the pool of warm sandboxes which execute the code of problems.
+
+    If you change this, be sure to also change it in lms/startup.py.
+    """
+    if settings.CODE_JAIL['python_bin']:
+        safe_exec_pool.configure(
+            python_bin=settings.CODE_JAIL['python_bin'],
+            user=settings.CODE_JAIL['user'],
+            limits=settings.CODE_JAIL['limits'],
+            **settings.CODE_JAIL_POOL
+        )
+
+
 def add_mimetypes():
     """
     Add extra mimetypes. Used in xblock_resource.
@@ -2,11 +2,18 @@
 Parser and evaluator for FormulaResponse and NumericalResponse
 
 Uses pyparsing to parse. Main function as of now is evaluator().
+
+Expressions are compiled (see compile_expression) into Python closures, which
+are cached, so that evaluating the same expression again doesn't parse it
+again.  Compiled expressions can also evaluate many sets of variables at once
+over numpy arrays (see CompiledExpression.evaluate_samples).
 """
 
 import math
 import numbers
 import operator
+import threading
+from collections import OrderedDict
 
 import numpy
 import scipy.constants
@@ -87,6 +94,13 @@ SUFFIXES = {
 }
 
 
+# Number of compiled expressions cached per process.
+COMPILED_EXPRESSION_CACHE_SIZE = 1000
+
+_COMPILED_EXPRESSIONS = OrderedDict()
+_COMPILED_EXPRESSIONS_LOCK = threading.Lock()
+
+
 class UndefinedVariable(Exception):
     """
     Indicate when a student inputs a variable which was not expected.
@@ -242,34 +256,189 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    return compile_expression(math_expr, case_sensitive).evaluate(variables, functions)
 
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
+def compile_expression(math_expr, case_sensitive=False):
+    """
+    Return the CompiledExpression of an expression, parsing it unless it is cached.
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
-
-    return math_interpreter.reduce_tree(evaluate_actions)
+    Raise the pyparsing ParseException if the expression can't be parsed.
+    """
+    key = (math_expr, case_sensitive)
+    with _COMPILED_EXPRESSIONS_LOCK:
+        compiled = _COMPILED_EXPRESSIONS.pop(key, None)
+        if compiled is not None:
+            _COMPILED_EXPRESSIONS[key] = compiled
+            return compiled
+
+    compiled = CompiledExpression(math_expr, case_sensitive)
+    with _COMPILED_EXPRESSIONS_LOCK:
+        _COMPILED_EXPRESSIONS[key] = compiled
+        while len(_COMPILED_EXPRESSIONS) > COMPILED_EXPRESSION_CACHE_SIZE:
+            _COMPILED_EXPRESSIONS.popitem(last=False)
+    return compiled
+
+
+class CompiledExpression(object):
+    """
+    A parsed expression, compiled into a function of the variables and
+    functions, which evaluates it exactly as `evaluator` would.
+
+    Compiled expressions don't depend on the variables and functions they
+    are evaluated with, so they can be shared.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+        self._parse = ParseAugmenter(math_expr, case_sensitive)
+        self._parse.parse_algebra()
+        if case_sensitive:
+            casify = lambda x: x
+        else:
+            casify = lambda x: x.lower()  # Lowercase for case insens.
+        self._variable_names = set(casify(variable) for variable in self._parse.variables_used)
+        self._evaluate = _compile_node(self._parse.tree, casify)
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression with the given variables and functions, in
+        addition to the default ones.
+        """
+        all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
+        self._parse.check_variables(all_variables, all_functions)
+        return self._evaluate(all_variables, all_functions)
+
+    def evaluate_samples(self, variables_list, functions):
+        """
+        Evaluate the expression with each of the given dicts of variables,
+        and return the list of the results.
+
+        The expression is evaluated once for all the samples, over numpy
+        arrays of the values of their variables.  If that fails, or if any
+        result isn't finite, it is evaluated for each sample, so that the
+        results and errors are those of `evaluate`.
+        """
+        results = self._evaluate_vectorized(variables_list, functions)
+        if results is None:
+            results = [self.evaluate(variables, functions) for variables in variables_list]
+        return results
+
+    def _evaluate_vectorized(self, variables_list, functions):
+        """
+        Evaluate the expression for all the given samples at once, and return
+        the list of the results, or None if they may differ from those of
+        `evaluate`.
+        """
+        if len(variables_list) < 2:
+            return None
+
+        all_variables_list = []
+        for variables in variables_list:
+            all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
+            self._parse.check_variables(all_variables, all_functions)
+            all_variables_list.append(all_variables)
+
+        vectorized_variables = {}
+        for name in self._variable_names:
+            values = [all_variables[name] for all_variables in all_variables_list]
+            if not all(isinstance(value, numbers.Number) for value in values):
+                return None
+            vectorized_variables[name] = numpy.array(values)
+
+        try:
+            with numpy.errstate(all='ignore'):
+                result = numpy.asarray(self._evaluate(vectorized_variables, all_functions))
+                if result.shape not in ((), (len(variables_list),)) or not numpy.all(numpy.isfinite(result)):
+                    return None
+        except Exception:  # pylint: disable=broad-except
+            # e.g. functions which only accept scalars, like factorial
+            return None
+        if result.shape == ():
+            return [result.item()] * len(variables_list)
+        return result.tolist()
+
+
+def _compile_node(node, casify):
+    """
+    Compile a node of the parse tree of an expression into a function of the
+    dicts of variables and of functions which returns its value.
+
+    The functions perform the same operations as the eval_* actions, in the
+    same order, but on numpy arrays as well as on numbers.
+    """
+    node_name = node.getName()
+    if node_name == 'number':
+        value = eval_number(node)
+        return lambda variables, functions: value
+
+    if node_name == 'variable':
+        variable_name = casify(node[0])
+        return lambda variables, functions: variables[variable_name]
+
+    if node_name == 'function':
+        function_name = casify(node[0])
+        argument = _compile_node(node[1], casify)
+        return lambda variables, functions: functions[function_name](argument(variables, functions))
+
+    # Operators and parentheses are terminal nodes.
+    operands = [_compile_node(child, casify) for child in node if isinstance(child, ParseResults)]
+
+    if node_name == 'atom':
+        return operands[0]
+
+    if node_name == 'power':
+        if len(operands) == 1:
+            return operands[0]
+
+        def power(variables, functions):
+            """
+            Exponentiate the operands, right to left (see eval_power).
+            """
+            values = reversed([operand(variables, functions) for operand in operands])
+            return reduce(lambda a, b: b ** a, values)
+        return power
+
+    if node_name == 'parallel':
+        if len(operands) == 1:
+            return operands[0]
+
+        def parallel(variables, functions):
+            """
+            Compute the parallel resistors operator (see eval_parallel).
+            """
+            values = [operand(variables, functions) for operand in operands]
+            if any(numpy.any(numpy.equal(value, 0)) for value in values):
+                return float('nan')
+            return 1. / sum(1. / value for value in values)
+        return parallel
+
+    if node_name in ('product', 'sum'):
+        if node_name == 'product':
+            total, operators = 1.0, {'*': operator.mul, '/': operator.truediv}
+            current_op = operator.mul
+        else:
+            total, operators = 0.0, {'+': operator.add, '-': operator.sub}
+            current_op = operator.add
+
+        terms = []
+        for child in node:
+            if isinstance(child, ParseResults):
+                terms.append((current_op, _compile_node(child, casify)))
+            else:
+                current_op = operators[child]
+
+        def combine(variables, functions):
+            """
+            Combine the terms from left to right (see eval_product and eval_sum).
+            """
+            result = total
+            for term_op, term in terms:
+                result = term_op(result, term(variables, functions))
+            return result
+        return combine
+
+    raise Exception(u"Unknown branch name '{}'".format(node_name))  # pragma: no cover
 
 
 class ParseAugmenter(object):
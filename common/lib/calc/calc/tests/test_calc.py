@@ -559,3 +559,46 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Run tests for calc.compile_expression and the evaluation of compiled
+    expressions, one sample at a time or all samples at once.
+    """
+
+    def test_compiled_expressions_are_cached(self):
+        compiled = calc.compile_expression('x^2+y')
+        self.assertIs(calc.compile_expression('x^2+y'), compiled)
+        self.assertIsNot(calc.compile_expression('x^2+y', case_sensitive=True), compiled)
+        self.assertEqual(compiled.evaluate({'x': 3.0, 'y': 1.0}, {}), 10.0)
+        self.assertEqual(compiled.evaluate({'x': 2.0, 'y': 1.0}, {}), 5.0)
+
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            compiled.evaluate({'x': 2.0}, {})
+
+    def test_evaluate_samples(self):
+        samples = [{'x': float(x), 'y': x / 2.0} for x in range(1, 10)]
+        for expression in ('x^2+y', '-x*y/3', 'sin(x)+cos(y)^2', 'x||y', '2^x^0.5', 'x*i+y', '3k*x+2%', 'X-y-pi'):
+            compiled = calc.compile_expression(expression)
+            results = compiled.evaluate_samples(samples, {})
+            self.assertEqual(len(results), len(samples))
+            for sample, result in zip(samples, results):
+                self.assertAlmostEqual(result, calc.evaluator(sample, {}, expression), delta=1e-12 * abs(result))
+
+    def test_evaluate_samples_falls_back(self):
+        """
+        Samples which numpy would evaluate differently, or can't evaluate at
+        once, are evaluated one at a time.
+        """
+        samples = [{'x': float(x)} for x in range(0, 5)]
+        results = calc.compile_expression('x||1').evaluate_samples(samples, {})
+        self.assertTrue(numpy.isnan(results[0]))
+        self.assertEqual(results[1], 0.5)
+
+        self.assertEqual(calc.compile_expression('fact(x)').evaluate_samples(samples, {}), [1, 1, 2, 6, 24])
+
+        with self.assertRaises(ZeroDivisionError):
+            calc.compile_expression('1/x').evaluate_samples(samples, {})
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.compile_expression('x+y').evaluate_samples(samples, {})
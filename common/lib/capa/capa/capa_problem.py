@@ -13,6 +13,7 @@ Main module which shows problems (of "capa" type).
 This is used by capa_module.
 """
 
+import hashlib
 import logging
 import os.path
 import re
@@ -29,6 +30,7 @@ import capa.inputtypes as inputtypes
 import capa.responsetypes as responsetypes
 import capa.xqueue_interface as xqueue_interface
 from capa.correctmap import CorrectMap
+from capa.problem_cache import template_cache
 from capa.safe_exec import safe_exec
 from capa.util import contextualize_text, convert_files_to_filenames
 from openedx.core.djangolib.markup import HTML
@@ -87,6 +89,10 @@ class LoncapaSystem(object):
         i18n: an object implementing the `gettext.Translations` interface so
             that we can use `.ugettext` to localize strings.
 
+        context_cache: an optional `capa.problem_cache.ProblemCache` of the
+            contexts of problems, which are shared by the learners who have
+            the same seed.
+
     See :class:`ModuleSystem` for documentation of other attributes.
 
     """
@@ -105,7 +111,8 @@ class LoncapaSystem(object):
         seed,      # Why do we do this if we have self.seed?
         STATIC_URL,                                     # pylint: disable=invalid-name
         xqueue,
-        matlab_api_key=None
+        matlab_api_key=None,
+        context_cache=None,
     ):
         self.ajax_url = ajax_url
         self.anonymous_student_id = anonymous_student_id
@@ -121,6 +128,7 @@ class LoncapaSystem(object):
         self.STATIC_URL = STATIC_URL                    # pylint: disable=invalid-name
         self.xqueue = xqueue
         self.matlab_api_key = matlab_api_key
+        self.context_cache = context_cache
 
 
 class LoncapaProblem(object):
@@ -176,13 +184,23 @@ class LoncapaProblem(object):
         problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
         self.problem_text = problem_text
 
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
+        # parse problem XML file into an element tree, or copy the tree parsed
+        # from the same text.  The tree is changed in place below.
+        cached_tree = template_cache.get(problem_text, self.problem_id)
+        if cached_tree is not None:
+            self.tree = deepcopy(cached_tree)
+        else:
+            self.tree = etree.XML(problem_text)
+
+            self.make_xml_compatible(self.tree)
 
-        self.make_xml_compatible(self.tree)
+            # Included files are read from the course's filestore, so trees
+            # which include them are parsed for each problem.
+            if self.tree.find('.//include') is None:
+                template_cache.set(problem_text, deepcopy(self.tree))
 
-        # handle any <include file="foo"> tags
-        self._process_includes()
+            # handle any <include file="foo"> tags
+            self._process_includes()
 
         # construct script processor context (eg for customresponse problems)
         if minimal_init:
@@ -729,6 +747,17 @@ class LoncapaProblem(object):
                 extra_files.append(("python_lib.zip", zip_lib))
                 python_path.append("python_lib.zip")
 
+            unsafely = self.capa_system.can_execute_unsafe_code()
+            context_cache = self.capa_system.context_cache
+            if context_cache is not None:
+                cache_key = self._context_cache_key(all_code, python_path, zip_lib, unsafely)
+                cached_context = context_cache.get(cache_key, self.problem_id)
+                if cached_context is not None:
+                    context = deepcopy(cached_context)
+                    context['anonymous_student_id'] = self.capa_system.anonymous_student_id
+                    context['extra_files'] = extra_files or None
+                    return context
+
             try:
                 safe_exec(
                     all_code,
@@ -738,7 +767,7 @@ class LoncapaProblem(object):
                     extra_files=extra_files,
                     cache=self.capa_system.cache,
                     slug=self.problem_id,
-                    unsafely=self.capa_system.can_execute_unsafe_code(),
+                    unsafely=unsafely,
                 )
             except Exception as err:
                 log.exception("Error while execing script code: " + all_code)
@@ -749,8 +778,29 @@ class LoncapaProblem(object):
         context['script_code'] = all_code
         context['python_path'] = python_path
         context['extra_files'] = extra_files or None
+
+        if all_code and context_cache is not None:
+            cached_context = dict(context, extra_files=None)
+            context_cache.set(cache_key, deepcopy(cached_context))
         return context
 
+    def _context_cache_key(self, all_code, python_path, zip_lib, unsafely):
+        """
+        Return the key of the context of this problem in the context cache.
+
+        The context depends on everything which is passed to the scripts: their
+        code and Python path, the seed, and the learner's anonymous id, which is
+        only part of the key if the scripts use it, so that learners who have the
+        same seed can share the context.
+        """
+        anonymous_student_id = None
+        if 'anonymous_student_id' in all_code:
+            anonymous_student_id = self.capa_system.anonymous_student_id
+        zip_lib_digest = hashlib.md5(zip_lib).hexdigest() if zip_lib is not None else None
+        return (
+            self.problem_id, all_code, tuple(python_path), zip_lib_digest, self.seed, anonymous_student_id, unsafely,
+        )
+
     def _extract_html(self, problemtree):  # private
         """
         Main (private) function which converts Problem XML tree to HTML.
@@ -0,0 +1,81 @@
+"""
+Process-local caches of the parts of LoncapaProblems which many learners share.
+
+Constructing a LoncapaProblem parses its XML, and executes its scripts to get
+its context.  The parsed XML doesn't depend on the learner, and the context
+only depends on the seed (and on the learner's anonymous id, if the scripts
+use it), so they are cached here, and copied for each LoncapaProblem.
+
+The caches count their hits and misses per problem, so that their hit rates
+can be checked with `hit_rates`.
+"""
+import threading
+from collections import OrderedDict
+
+# Number of parsed problem trees cached per process.
+TEMPLATE_CACHE_SIZE = 500
+
+# Number of problems for which the hits and misses of each cache are counted.
+MAX_COUNTED_PROBLEMS = 10000
+
+
+class ProblemCache(object):
+    """
+    A thread-safe LRU cache, which counts its hits and misses per problem.
+
+    The cached values are shared, so callers must copy them before changing them.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, problem_id):
+        """
+        Return the value cached under key, or None, counting the lookup for problem_id.
+        """
+        with self._lock:
+            value = self._values.pop(key, None)
+            if value is not None:
+                self._values[key] = value
+
+            counts = self._counts.pop(problem_id, None) or [0, 0]
+            counts[0 if value is not None else 1] += 1
+            self._counts[problem_id] = counts
+            while len(self._counts) > MAX_COUNTED_PROBLEMS:
+                self._counts.popitem(last=False)
+        return value
+
+    def set(self, key, value):
+        """
+        Cache value under key, evicting the least recently used values beyond max_size.
+        """
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = value
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def hit_rates(self):
+        """
+        Return a dict of the ids of the problems looked up most recently to a tuple
+        of the number of hits, the number of lookups, and the hit rate of their lookups.
+        """
+        with self._lock:
+            return {
+                problem_id: (hits, hits + misses, float(hits) / (hits + misses))
+                for problem_id, (hits, misses) in self._counts.iteritems()
+            }
+
+    def clear(self):
+        """
+        Remove all the cached values and counts.
+        """
+        with self._lock:
+            self._values.clear()
+            self._counts.clear()
+
+
+# The parsed trees of problems, keyed by their text.
+template_cache = ProblemCache(TEMPLATE_CACHE_SIZE)
@@ -0,0 +1,352 @@
+"""
+A pool of warm sandbox workers for capa's safe_exec.
+
+codejail starts a new sandboxed Python for each execution, which then has to
+import numpy, scipy and the other modules that problem code assumes.  That
+dominates the latency of most executions, so when a pool is configured, code
+is sent to one of a few long-lived sandboxed Pythons instead, which import
+those modules once and fork a child for each execution (see `pool_worker`).
+
+Workers are started on demand, in each process which uses the pool, up to the
+size of the pool.  A worker is replaced after it has run `max_runs`
+executions, or once one of them used more than `max_rss_mb` of memory.
+Executions which the pool can't serve (code which needs files from the host,
+or which waited too long for a worker, or whose worker failed) fall back to
+codejail.
+
+The pool reports these metrics:
+
+    capa.safe_exec.pool.queue_depth: executions waiting for a worker.
+    capa.safe_exec.pool.wait_time: time spent waiting for a worker.
+    capa.safe_exec.pool.exec_time: time spent executing code in a worker.
+    capa.safe_exec.pool.recycled: workers replaced, tagged with the reason.
+    capa.safe_exec.pool.fallback: executions which fell back to codejail.
+"""
+import atexit
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from Queue import Empty, Queue
+
+from codejail.safe_exec import safe_exec as codejail_safe_exec
+from codejail.safe_exec import json_safe, SafeExecException
+from dogapi import dog_stats_api
+
+from . import pool_worker
+
+log = logging.getLogger(__name__)
+
+# The default resource limits of executions, as in codejail.
+DEFAULT_LIMITS = {
+    'CPU': 1,
+    'VMEM': 0,
+    'FSIZE': 0,
+    'REALTIME': 3,
+}
+
+# Seconds a worker may take to start, or to respond beyond the REALTIME limit.
+WORKER_TIMEOUT = 30
+
+_POOL = None
+
+
+class WorkerError(Exception):
+    """
+    A worker couldn't be started, or failed to respond.
+    """
+    pass
+
+
+class PoolBusy(Exception):
+    """
+    No worker became available in time.
+    """
+    pass
+
+
+class SandboxWorker(object):
+    """
+    A running `pool_worker` process.
+    """
+    def __init__(self, command, tmp_root, preimports):
+        self.runs = 0
+        self.maxrss = 0
+        self.process = subprocess.Popen(
+            command + [_worker_script(tmp_root), os.path.join(tmp_root, 'tmp'), ','.join(preimports)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            close_fds=True,
+        )
+        try:
+            self._receive(time.time() + WORKER_TIMEOUT)
+        except WorkerError:
+            self.stop()
+            raise
+
+    def execute(self, request):
+        """
+        Sends the given request to the worker, and returns its response.
+        """
+        self.runs += 1
+        try:
+            pool_worker.write_message(self.process.stdin.fileno(), request)
+        except (IOError, OSError) as error:
+            raise WorkerError(error)
+        realtime = request['limits'].get('REALTIME') or 0
+        response = self._receive(time.time() + realtime + WORKER_TIMEOUT)
+        self.maxrss = response.pop('maxrss', self.maxrss)
+        return response
+
+    def _receive(self, deadline):
+        """
+        Returns the next message from the worker.
+        """
+        try:
+            message = pool_worker.read_message(self.process.stdout.fileno(), deadline)
+        except (IOError, OSError, ValueError) as error:
+            raise WorkerError(error)
+        if message is None:
+            raise WorkerError("Worker exited with status {}".format(self.process.poll()))
+        return message
+
+    def stop(self):
+        """
+        Stops the worker.
+        """
+        try:
+            self.process.stdin.close()
+            self.process.kill()
+        except OSError:
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+
+
+class SandboxPool(object):
+    """
+    A pool of up to `size` warm sandbox workers, run with `command`.
+    """
+    def __init__(
+            self, command, size, limits=None, max_runs=1000, max_rss_mb=None, wait_timeout=1, preimports=(),
+    ):
+        self.command = command
+        self.size = size
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.wait_timeout = wait_timeout
+        self.preimports = list(preimports)
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """
+        Forgets the workers, which belong to the process that started them.
+        """
+        self._pid = os.getpid()
+        self._idle = Queue()
+        self._num_workers = 0
+        self._num_waiting = 0
+        self._tmp_root = None
+
+    def can_execute(self, python_path, extra_files):
+        """
+        Returns whether the pool can execute code with the given python_path
+        and extra_files, which it can if the python_path only needs extra_files.
+        """
+        extra_names = set(name for name, _ in extra_files or ())
+        return all(name in extra_names for name in python_path or ())
+
+    def execute(self, code, globals_dict, python_path=None, extra_files=None):
+        """
+        Executes code in a worker, updating globals_dict with the globals it
+        sets, and returns the message of the exception it raised, if any.
+        """
+        request = {
+            'code': code,
+            'globals': json_safe(globals_dict),
+            'python_path': list(python_path or ()),
+            'extra_files': [(name, base64.b64encode(content)) for name, content in extra_files or ()],
+            'limits': self.limits,
+        }
+        worker = self._acquire()
+        start = time.time()
+        try:
+            response = worker.execute(request)
+        except WorkerError:
+            self._discard(worker, 'error')
+            raise
+        dog_stats_api.histogram('capa.safe_exec.pool.exec_time', time.time() - start)
+        self._release(worker)
+
+        if 'emsg' in response:
+            return response['emsg']
+        globals_dict.update(response['globals'])
+        return None
+
+    def _acquire(self):
+        """
+        Returns an idle worker, starting one if the pool isn't full.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._num_waiting += 1
+            dog_stats_api.gauge('capa.safe_exec.pool.queue_depth', self._num_waiting)
+            start_worker = self._idle.empty() and self._num_workers < self.size
+            if start_worker:
+                self._num_workers += 1
+
+        start = time.time()
+        try:
+            if start_worker:
+                return self._start_worker()
+            try:
+                return self._idle.get(timeout=self.wait_timeout)
+            except Empty:
+                raise PoolBusy()
+        finally:
+            with self._lock:
+                self._num_waiting -= 1
+            dog_stats_api.histogram('capa.safe_exec.pool.wait_time', time.time() - start)
+
+    def _start_worker(self):
+        """
+        Starts a new worker, which has already been counted in the size of the pool.
+        """
+        try:
+            with self._lock:
+                if self._tmp_root is None:
+                    self._tmp_root = _make_tmp_root()
+                tmp_root = self._tmp_root
+            return SandboxWorker(self.command, tmp_root, self.preimports)
+        except (WorkerError, OSError) as error:
+            with self._lock:
+                self._num_workers -= 1
+            raise WorkerError(error)
+
+    def _release(self, worker):
+        """
+        Returns the worker to the pool, unless it should be replaced.
+        """
+        if worker.runs >= self.max_runs:
+            self._discard(worker, 'max_runs')
+        elif self.max_rss_mb and worker.maxrss > self.max_rss_mb * 1024:
+            self._discard(worker, 'max_rss')
+        else:
+            self._idle.put(worker)
+
+    def _discard(self, worker, reason):
+        """
+        Stops the worker, making room for a new one.
+        """
+        dog_stats_api.increment('capa.safe_exec.pool.recycled', tags=['reason:{}'.format(reason)])
+        worker.stop()
+        with self._lock:
+            self._num_workers -= 1
+
+    def stop(self):
+        """
+        Stops the idle workers of this process.
+        """
+        if self._pid != os.getpid():
+            return
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(worker, 'stopped')
+        if self._tmp_root:
+            shutil.rmtree(self._tmp_root, ignore_errors=True)
+
+
+def _make_tmp_root():
+    """
+    Returns a new directory for a copy of the worker script, and for the
+    directories of executions, which sandboxed users can use.
+    """
+    tmp_root = tempfile.mkdtemp(prefix='codejail-pool-')
+    os.chmod(tmp_root, 0o755)
+    os.mkdir(os.path.join(tmp_root, 'tmp'))
+    os.chmod(os.path.join(tmp_root, 'tmp'), 0o777)
+    return tmp_root
+
+
+def _worker_script(tmp_root):
+    """
+    Returns the path of the copy of the worker script in tmp_root.
+    """
+    script = os.path.join(tmp_root, 'pool_worker.py')
+    if not os.path.exists(script):
+        source = pool_worker.__file__
+        if source.endswith('c'):
+            source = source[:-1]
+        shutil.copy(source, script)
+        os.chmod(script, 0o644)
+    return script
+
+
+def configure(python_bin, user=None, size=0, **kwargs):
+    """
+    Configures the pool of workers, run as `user` with `python_bin`.  The pool
+    is disabled if `size` is 0.  Other arguments are passed to SandboxPool, and
+    the workers import the modules that problem code assumes by default.
+    """
+    from .safe_exec import ASSUMED_IMPORTS
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is not None:
+        _POOL.stop()
+        _POOL = None
+    if not size:
+        return
+
+    command = ['sudo', '-u', user] if user else []
+    command.extend([python_bin, '-E', '-B'])
+    kwargs.setdefault('preimports', [module_name for _, module_name in ASSUMED_IMPORTS])
+    _POOL = SandboxPool(command, size, **kwargs)
+
+
+def is_configured():
+    """
+    Returns whether a pool of workers is configured.
+    """
+    return _POOL is not None
+
+
+def pooled_safe_exec(code, globals_dict, python_path=None, extra_files=None, slug=None):
+    """
+    Executes code like codejail's safe_exec, in a worker of the pool if
+    possible, else with codejail.
+    """
+    pool = _POOL
+    if pool is not None and pool.can_execute(python_path, extra_files):
+        try:
+            emsg = pool.execute(code, globals_dict, python_path=python_path, extra_files=extra_files)
+        except (WorkerError, PoolBusy) as error:
+            log.warning("Falling back to codejail for %s: %r", slug, error)
+        else:
+            if emsg:
+                raise SafeExecException(emsg)
+            return
+    elif pool is not None:
+        log.debug("Falling back to codejail for %s: it needs files from %r", slug, python_path)
+
+    if pool is not None:
+        dog_stats_api.increment('capa.safe_exec.pool.fallback')
+    codejail_safe_exec(code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug)
+
+
+@atexit.register
+def _stop_pool():
+    """
+    Stops the workers of this process when it exits.
+    """
+    if _POOL is not None:
+        _POOL.stop()
@@ -0,0 +1,232 @@
+"""
+A warm sandbox worker, run by `capa.safe_exec.pool` in the sandboxed Python.
+
+The worker imports the modules that problem code assumes once, then reads
+execution requests from its stdin and writes their results to its stdout.
+Each request is executed in a child forked from the worker, so the code
+starts with the modules already imported, and whatever it changes (or
+breaks) in them is thrown away with the child.  The child applies the
+resource limits of the request before running the code, and the worker kills
+it if it runs for longer than the REALTIME limit.
+
+Messages are JSON objects, each preceded by its length as a 4-byte unsigned
+big-endian integer.  This module must only use the standard library, since it
+is also run by the sandboxed Python.
+"""
+import base64
+import errno
+import json
+import os
+import resource
+import select
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+HEADER = struct.Struct('!I')
+
+# The resource limits which can be set on executions, and the rlimits they set.
+RLIMITS = {
+    'CPU': resource.RLIMIT_CPU,
+    'VMEM': resource.RLIMIT_AS,
+    'FSIZE': resource.RLIMIT_FSIZE,
+}
+
+# Globals which aren't returned from executions.
+BAD_GLOBALS = ('__builtins__',)
+
+
+def read_message(fd, deadline=None):
+    """
+    Returns the next message read from the given file descriptor, or None at
+    the end of the file.  Raises IOError if `deadline` (a `time.time()`)
+    passes first.
+    """
+    header = _read_exact(fd, HEADER.size, deadline)
+    if header is None:
+        return None
+    body = _read_exact(fd, HEADER.unpack(header)[0], deadline)
+    if body is None:
+        raise IOError("Unexpected end of message")
+    return json.loads(body.decode('utf8'))
+
+
+def write_message(fd, message):
+    """
+    Writes the given message to the given file descriptor.
+    """
+    body = json.dumps(message).encode('utf8')
+    data = HEADER.pack(len(body)) + body
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _read_exact(fd, size, deadline=None):
+    """
+    Returns exactly `size` bytes read from the given file descriptor, or None
+    if it is at the end of the file.
+    """
+    chunks = []
+    remaining = size
+    while remaining:
+        if not _wait_readable(fd, deadline):
+            raise IOError("Timed out reading a message")
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise IOError("Unexpected end of message")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _wait_readable(fd, deadline):
+    """
+    Waits until the given file descriptor can be read, returning False if
+    `deadline` passes first.
+    """
+    while True:
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        try:
+            readable, _, _ = select.select([fd], [], [], timeout)
+        except (select.error, OSError) as error:
+            if error.args[0] == errno.EINTR:
+                continue
+            raise
+        return bool(readable)
+
+
+def jsonable(value):
+    """
+    Returns whether the given value can be returned as JSON.
+    """
+    try:
+        json.dumps(value)
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return True
+
+
+def set_limits(limits):
+    """
+    Applies the given resource limits to this process.  Limits of 0 (other
+    than FSIZE, which is the largest file the code may write) aren't applied.
+    """
+    for name, rlimit in RLIMITS.items():
+        value = limits.get(name)
+        if value is None or (value == 0 and name != 'FSIZE'):
+            continue
+        # Leave some time to get SIGXCPU before SIGKILL.
+        hard = value + 1 if name == 'CPU' else value
+        resource.setrlimit(rlimit, (value, hard))
+    # No subprocesses.
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def execute(request, run_dir):
+    """
+    Executes the code of the given request in `run_dir`, in this process, and
+    returns the result message.
+    """
+    os.chdir(run_dir)
+    for name, content in request['extra_files']:
+        with open(name, 'wb') as extra_file:
+            extra_file.write(base64.b64decode(content))
+    for name in request['python_path']:
+        sys.path.append(os.path.join(run_dir, name))
+
+    set_limits(request['limits'])
+    globals_dict = request['globals']
+    try:
+        exec(compile(request['code'], '<jailed code>', 'exec'), globals_dict)  # pylint: disable=exec-used
+    except BaseException:  # pylint: disable=broad-except
+        return {'emsg': "Couldn't execute jailed code: {}".format(traceback.format_exc())}
+
+    return {
+        'globals': {
+            name: value for name, value in globals_dict.items()
+            if name not in BAD_GLOBALS and jsonable(value)
+        },
+    }
+
+
+def run(request, tmp_root, worker_fds):
+    """
+    Executes the given request in a forked child, and returns the result message.
+    The child closes `worker_fds`, so that the code can't write messages itself.
+    """
+    run_dir = tempfile.mkdtemp(dir=tmp_root)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for fd in [read_fd] + list(worker_fds):
+                os.close(fd)
+            os.dup2(os.open(os.devnull, os.O_WRONLY), 2)
+            try:
+                result = execute(request, run_dir)
+            except BaseException:  # pylint: disable=broad-except
+                result = {'emsg': "Couldn't execute jailed code: {}".format(traceback.format_exc())}
+            write_message(write_fd, result)
+        finally:
+            os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_fd)
+    realtime = request['limits'].get('REALTIME')
+    deadline = time.time() + realtime if realtime else None
+    try:
+        result = read_message(read_fd, deadline)
+    except IOError:
+        result = None
+        os.kill(pid, signal.SIGKILL)
+    finally:
+        os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    if result is None:
+        if os.WIFSIGNALED(status):
+            reason = "killed by signal {}".format(os.WTERMSIG(status))
+        else:
+            reason = "exited with status {}".format(os.WEXITSTATUS(status))
+        result = {'emsg': "Couldn't execute jailed code: {}".format(reason)}
+    return result
+
+
+def main(tmp_root, preimports):
+    """
+    Serves execution requests read from stdin until it is closed.
+    """
+    # Keep stdin and stdout for the messages, so that nothing else writes to them.
+    in_fd = os.dup(0)
+    out_fd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1):
+        os.dup2(devnull, fd)
+
+    # See TNL-6456: the threads of OpenBLAS wouldn't survive the forks anyway.
+    os.environ["OPENBLAS_NUM_THREADS"] = "1"
+    for module_name in preimports:
+        try:
+            __import__(module_name)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    write_message(out_fd, {'ready': True})
+    while True:
+        request = read_message(in_fd)
+        if request is None:
+            break
+        response = run(request, tmp_root, (in_fd, out_fd))
+        # The code runs in the children, whose memory the worker's own rusage doesn't count.
+        response['maxrss'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        write_message(out_fd, response)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], [name for name in sys.argv[2].split(',') if name])
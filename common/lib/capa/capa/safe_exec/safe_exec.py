@@ -1,9 +1,9 @@
 """Capa's specialized use of codejail.safe_exec."""
 
-from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from .pool import pooled_safe_exec
 from dogapi import dog_stats_api
 
 import hashlib
@@ -108,6 +108,8 @@ def safe_exec(
     caller, that will be used in log messages.
 
     If `unsafely` is true, then the code will actually be executed without sandboxing.
+    Otherwise, it is executed by a warm sandbox worker if a pool of them is
+    configured (see `pool`), else by a new sandbox.
 
     """
     # Check the cache for a previous result.
@@ -134,7 +136,7 @@ def safe_exec(
     if unsafely:
         exec_fn = codejail_not_safe_exec
     else:
-        exec_fn = codejail_safe_exec
+        exec_fn = pooled_safe_exec
 
     # Run the code!  Results are side effects in globals_dict.
     try:
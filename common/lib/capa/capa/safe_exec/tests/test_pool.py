@@ -0,0 +1,143 @@
+"""
+Tests for the pool of warm sandbox workers.
+
+The workers run with this Python, without sandboxing, so that the pool can be
+tested wherever codejail isn't configured.
+"""
+import os
+import random
+import sys
+import unittest
+import zipfile
+from cStringIO import StringIO
+
+from codejail.safe_exec import SafeExecException
+from mock import patch
+
+from capa.safe_exec import pool, safe_exec
+from capa.safe_exec.pool import PoolBusy, SandboxPool
+
+UNSAFE_COMMAND = [sys.executable, '-E', '-B']
+
+
+def python_lib_zip():
+    """
+    Returns the contents of a zip file of the test python lib.
+    """
+    pylib = os.path.join(os.path.dirname(__file__), 'test_files', 'pylib')
+    zip_file = StringIO()
+    with zipfile.ZipFile(zip_file, 'w') as python_lib:
+        python_lib.write(os.path.join(pylib, 'constant.py'), 'constant.py')
+    return zip_file.getvalue()
+
+
+class SandboxPoolTest(unittest.TestCase):
+    """
+    Tests for executing code in a SandboxPool.
+    """
+    def make_pool(self, **kwargs):
+        """
+        Returns a pool of unsandboxed workers, which is stopped after the test.
+        """
+        kwargs.setdefault('size', 1)
+        sandbox_pool = SandboxPool(UNSAFE_COMMAND, preimports=['math'], **kwargs)
+        self.addCleanup(sandbox_pool.stop)
+        return sandbox_pool
+
+    def test_execute(self):
+        sandbox_pool = self.make_pool()
+        globals_dict = {'b': 2}
+        self.assertIsNone(sandbox_pool.execute('a = b + 1\nc = object()', globals_dict))
+        self.assertEqual(globals_dict['a'], 3)
+        self.assertNotIn('c', globals_dict)
+
+    def test_raising_exceptions(self):
+        emsg = self.make_pool().execute('1/0', {})
+        self.assertIn('ZeroDivisionError', emsg)
+
+    def test_extra_files(self):
+        globals_dict = {}
+        emsg = self.make_pool().execute(
+            'import constant; a = constant.THE_CONST',
+            globals_dict,
+            python_path=['python_lib.zip'],
+            extra_files=[('python_lib.zip', python_lib_zip())],
+        )
+        self.assertIsNone(emsg)
+        self.assertEqual(globals_dict['a'], 23)
+
+    def test_executions_are_isolated(self):
+        sandbox_pool = self.make_pool()
+        globals_dict = {}
+        sandbox_pool.execute('import math; math.pi = 3', globals_dict)
+        sandbox_pool.execute('import math; pi = math.pi', globals_dict)
+        self.assertNotEqual(globals_dict['pi'], 3)
+
+    def test_realtime_limit(self):
+        sandbox_pool = self.make_pool(limits={'CPU': 10, 'REALTIME': 0.5})
+        emsg = sandbox_pool.execute('while True: pass', {})
+        self.assertIn('killed by signal 9', emsg)
+
+        # the worker survives its child
+        globals_dict = {}
+        self.assertIsNone(sandbox_pool.execute('a = 1', globals_dict))
+        self.assertEqual(globals_dict['a'], 1)
+
+    def test_recycling(self):
+        sandbox_pool = self.make_pool(max_runs=2)
+        worker_pids = []
+        for _ in range(3):
+            globals_dict = {}
+            sandbox_pool.execute('import os; worker_pid = os.getppid()', globals_dict)
+            worker_pids.append(globals_dict['worker_pid'])
+        self.assertEqual(worker_pids[0], worker_pids[1])
+        self.assertNotEqual(worker_pids[1], worker_pids[2])
+
+    def test_recycling_after_max_rss(self):
+        sandbox_pool = self.make_pool(max_rss_mb=48)
+        worker_pids = []
+        for code in ('a = 1', 'a = len(" " * (64 * 1024 * 1024))', 'a = 1'):
+            globals_dict = {}
+            sandbox_pool.execute(code + '\nimport os; worker_pid = os.getppid()', globals_dict)
+            worker_pids.append(globals_dict['worker_pid'])
+        self.assertEqual(worker_pids[0], worker_pids[1])
+        self.assertNotEqual(worker_pids[1], worker_pids[2])
+
+    def test_busy(self):
+        sandbox_pool = self.make_pool(wait_timeout=0.01)
+        worker = sandbox_pool._acquire()  # pylint: disable=protected-access
+        with self.assertRaises(PoolBusy):
+            sandbox_pool.execute('a = 1', {})
+        sandbox_pool._release(worker)  # pylint: disable=protected-access
+        self.assertIsNone(sandbox_pool.execute('a = 1', {}))
+
+
+class PooledSafeExecTest(unittest.TestCase):
+    """
+    Tests for capa's safe_exec with a pool of workers.
+    """
+    def setUp(self):
+        super(PooledSafeExecTest, self).setUp()
+        pool.configure(sys.executable, size=2, preimports=['math'])
+        self.addCleanup(pool.configure, None)
+
+    def test_safe_exec(self):
+        globals_dict = {}
+        r = random.Random(17)
+        rnums = [r.randint(0, 999) for _ in xrange(100)]
+
+        with patch('capa.safe_exec.pool.codejail_safe_exec') as mock_codejail_safe_exec:
+            safe_exec("rnums = [random.randint(0, 999) for _ in xrange(100)]\na = 1/2", globals_dict, random_seed=17)
+            with self.assertRaises(SafeExecException) as cm:
+                safe_exec("1/0", globals_dict)
+        self.assertFalse(mock_codejail_safe_exec.called)
+        self.assertEqual(globals_dict['rnums'], rnums)
+        self.assertEqual(globals_dict['a'], 0.5)
+        self.assertIn('ZeroDivisionError', cm.exception.message)
+
+    def test_fallback(self):
+        # code which needs files from the host is executed by codejail
+        pylib = os.path.join(os.path.dirname(__file__), 'test_files', 'pylib')
+        with patch('capa.safe_exec.pool.codejail_safe_exec') as mock_codejail_safe_exec:
+            safe_exec("import constant", {}, python_path=[pylib])
+        self.assertTrue(mock_codejail_safe_exec.called)
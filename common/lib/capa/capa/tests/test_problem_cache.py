@@ -0,0 +1,107 @@
+"""
+Tests for the caches of parsed problems and of their contexts.
+"""
+import textwrap
+import unittest
+
+from lxml import etree
+from mock import patch
+
+from capa.problem_cache import ProblemCache, template_cache
+from capa.safe_exec import safe_exec
+from capa.tests.helpers import new_loncapa_problem, test_capa_system
+
+
+class ProblemCacheTest(unittest.TestCase):
+    """
+    Tests for the LRU cache itself.
+    """
+    def test_lru_and_hit_rates(self):
+        cache = ProblemCache(max_size=2)
+        self.assertIsNone(cache.get('a', 'problem_a'))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a', 'problem_a'), 1)
+        cache.set('c', 3)
+
+        # 'b' was the least recently used
+        self.assertIsNone(cache.get('b', 'problem_b'))
+        self.assertEqual(cache.get('a', 'problem_a'), 1)
+        self.assertEqual(cache.get('c', 'problem_c'), 3)
+        self.assertEqual(
+            cache.hit_rates(),
+            {'problem_a': (2, 3, 2 / 3.0), 'problem_b': (0, 1, 0.0), 'problem_c': (1, 1, 1.0)},
+        )
+
+
+class LoncapaProblemCacheTest(unittest.TestCase):
+    """
+    Tests for the caching of the trees and contexts of LoncapaProblems.
+    """
+    xml = textwrap.dedent("""
+        <problem>
+            <script type="loncapa/python">
+        answer = random.randint(0, 1000)
+            </script>
+            <p>What is $answer?</p>
+            <numericalresponse answer="$answer">
+                <formulaequationinput/>
+            </numericalresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        super(LoncapaProblemCacheTest, self).setUp()
+        template_cache.clear()
+        self.addCleanup(template_cache.clear)
+
+    def test_template_cache(self):
+        problem = new_loncapa_problem(self.xml, problem_id='cached')
+        other_problem = new_loncapa_problem(self.xml, problem_id='cached')
+        self.assertEqual(template_cache.hit_rates()['cached'], (1, 2, 0.5))
+
+        # each problem changes its own copy of the tree
+        self.assertIsNot(problem.tree, other_problem.tree)
+        self.assertEqual(etree.tostring(problem.tree), etree.tostring(other_problem.tree))
+        self.assertEqual(problem.get_html(), other_problem.get_html())
+
+    def test_includes_are_not_cached(self):
+        # the test capa system is in DEBUG mode, so missing included files are skipped
+        xml = '<problem><include file="missing.xml"/></problem>'
+        new_loncapa_problem(xml, problem_id='includes')
+        new_loncapa_problem(xml, problem_id='includes')
+        self.assertEqual(template_cache.hit_rates()['includes'], (0, 2, 0.0))
+
+    def test_context_cache(self):
+        capa_system = test_capa_system()
+        capa_system.context_cache = ProblemCache(max_size=10)
+
+        with patch('capa.capa_problem.safe_exec', side_effect=safe_exec) as mock_safe_exec:
+            problem = new_loncapa_problem(self.xml, capa_system=capa_system, seed=1)
+            same_seed_problem = new_loncapa_problem(self.xml, capa_system=capa_system, seed=1)
+            other_seed_problem = new_loncapa_problem(self.xml, capa_system=capa_system, seed=2)
+
+        # the scripts are executed once per seed
+        self.assertEqual(mock_safe_exec.call_count, 2)
+        self.assertEqual(problem.context, same_seed_problem.context)
+        self.assertIsNot(problem.context, same_seed_problem.context)
+        self.assertEqual(other_seed_problem.context['seed'], 2)
+        self.assertEqual(capa_system.context_cache.hit_rates()['1'], (1, 3, 1 / 3.0))
+
+    def test_context_cache_anonymous_student_id(self):
+        xml = textwrap.dedent("""
+            <problem>
+                <script type="loncapa/python">
+            student = anonymous_student_id
+                </script>
+            </problem>
+        """)
+        capa_system = test_capa_system()
+        capa_system.context_cache = ProblemCache(max_size=10)
+        problem = new_loncapa_problem(xml, capa_system=capa_system)
+        capa_system.anonymous_student_id = 'other student'
+        other_student_problem = new_loncapa_problem(xml, capa_system=capa_system)
+
+        self.assertEqual(problem.context['student'], 'student')
+        self.assertEqual(other_student_problem.context['student'], 'other student')
+        self.assertEqual(other_student_problem.context['anonymous_student_id'], 'other student')
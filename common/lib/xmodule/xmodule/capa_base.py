@@ -21,6 +21,7 @@ from pytz import utc
 
 from capa.capa_problem import LoncapaProblem, LoncapaSystem
 from capa.inputtypes import Status
+from capa.problem_cache import ProblemCache
 from capa.responsetypes import StudentInputError, ResponseError, LoncapaProblemError
 from capa.util import convert_files_to_filenames, get_inner_html_from_xpath
 from xblock.fields import Boolean, Dict, Float, Integer, Scope, String, XMLString
@@ -46,6 +47,10 @@ MAX_RANDOMIZATION_BINS = 1000
 
 FEATURES = getattr(settings, 'FEATURES', {})
 
+# Process-local cache of the contexts of problems, shared by the learners who have the same seed.
+CAPA_PROBLEM_CONTEXT_CACHE_SIZE = getattr(settings, 'CAPA_PROBLEM_CONTEXT_CACHE_SIZE', 0)
+PROBLEM_CONTEXT_CACHE = ProblemCache(CAPA_PROBLEM_CONTEXT_CACHE_SIZE) if CAPA_PROBLEM_CONTEXT_CACHE_SIZE else None
+
 
 def randomization_bin(seed, problem_id):
     """
@@ -338,7 +343,8 @@ class CapaMixin(ScorableXBlockMixin, CapaFields):
             seed=self.runtime.seed,      # Why do we do this if we have self.seed?
             STATIC_URL=self.runtime.STATIC_URL,
             xqueue=self.runtime.xqueue,
-            matlab_api_key=self.matlab_api_key
+            matlab_api_key=self.matlab_api_key,
+            context_cache=PROBLEM_CONTEXT_CACHE,
         )
 
         return LoncapaProblem(
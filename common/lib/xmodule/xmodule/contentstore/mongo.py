@@ -1,6 +1,7 @@
 """
 MongoDB/GridFS-level code for the contentstore.
 """
+import errno
 import os
 import json
 import pymongo
@@ -14,7 +15,7 @@ from opaque_keys.edx.keys import AssetKey
 from xmodule.contentstore.content import XASSET_LOCATION_TAG
 from xmodule.exceptions import NotFoundError
 from xmodule.modulestore.django import ASSET_IGNORE_REGEX
-from xmodule.util.misc import escape_invalid_characters
+from xmodule.util.misc import escape_invalid_characters, map_bounded
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
 from .content import StaticContent, ContentStore, StaticContentStream
 
@@ -153,24 +154,36 @@ class MongoContentStore(ContentStore):
                 return None
 
     def export(self, location, output_directory):
-        content = self.find(location)
+        """
+        Export the asset to output_directory, streaming it from GridFS so that
+        large assets aren't read into memory.
+        """
+        content = self.find(location, as_stream=True)
 
         filename = content.name
         if content.import_path is not None:
             output_directory = output_directory + '/' + os.path.dirname(content.import_path)
 
-        if not os.path.exists(output_directory):
+        try:
             os.makedirs(output_directory)
+        except OSError as err:
+            # assets may be exported concurrently into the same directory
+            if err.errno != errno.EEXIST:
+                raise
 
         # Escape invalid char from filename.
         export_name = escape_invalid_characters(name=filename, invalid_char_list=['/', '\\'])
 
         disk_fs = OSFS(output_directory)
 
-        with disk_fs.open(export_name, 'wb') as asset_file:
-            asset_file.write(content.data)
+        try:
+            with disk_fs.open(export_name, 'wb') as asset_file:
+                for chunk in content.stream_data():
+                    asset_file.write(chunk)
+        finally:
+            content.close()
 
-    def export_all_for_course(self, course_key, output_directory, assets_policy_file):
+    def export_all_for_course(self, course_key, output_directory, assets_policy_file, num_workers=1):
         """
         Export all of this course's assets to the output_directory. Export all of the assets'
         attributes to the policy file.
@@ -180,20 +193,30 @@ class MongoContentStore(ContentStore):
             output_directory: the directory under which to put all the asset files
             assets_policy_file: the filename for the policy file which should be in the same
                 directory as the other policy files.
+            num_workers (int): the number of threads which read the assets from GridFS
+                and write them to output_directory.
         """
         policy = {}
         assets, __ = self.get_all_content_for_course(course_key)
 
+        # TODO: On 6/19/14, I had to put a try/except around this
+        # to export a course. The course failed on JSON files in
+        # the /static/ directory placed in it with an import.
+        #
+        # If this hasn't been looked at in a while, remove this comment.
+        #
+        # When debugging course exports, this might be a good place
+        # to look. -- pmitros
+        if num_workers > 1:
+            map_bounded(
+                lambda asset: self.export(asset['asset_key'], output_directory),
+                assets, num_workers, max_pending=num_workers,
+            )
+        else:
+            for asset in assets:
+                self.export(asset['asset_key'], output_directory)
+
         for asset in assets:
-            # TODO: On 6/19/14, I had to put a try/except around this
-            # to export a course. The course failed on JSON files in
-            # the /static/ directory placed in it with an import.
-            #
-            # If this hasn't been looked at in a while, remove this comment.
-            #
-            # When debugging course exports, this might be a good place
-            # to look. -- pmitros
-            self.export(asset['asset_key'], output_directory)
             for attr, value in asset.iteritems():
                 if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize', 'asset_key']:
                     policy.setdefault(asset['asset_key'].name, {})[attr] = value
@@ -54,6 +54,7 @@ class ModuleStoreEnum(object):
         """
         split = 'split'
         mongo = 'mongo'
+        snapshot = 'snapshot'
 
     class RevisionOption(object):
         """
@@ -589,6 +589,17 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         except NotImplementedError:
             return None, None
 
+    def prefetch_definitions(self, usage_key, depth=None, **kwargs):
+        """
+        Fetches the definitions of the subtree identified by usage_key in a
+        single query, if the store of its course supports it.
+        """
+        try:
+            store = self._verify_modulestore_support(usage_key.course_key, 'prefetch_definitions')
+        except NotImplementedError:
+            return
+        store.prefetch_definitions(usage_key, depth=depth, **kwargs)
+
     def get_modulestore_type(self, course_id):
         """
         Returns a type which identifies which modulestore is servicing the given course_id.
@@ -0,0 +1,99 @@
+"""
+Performance test of split modulestore get_items queries, with and without the
+secondary indexes of structures.
+"""
+import logging
+import unittest
+from time import time
+
+import ddt
+from mock import patch
+from path import Path as path
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.tests.utils import (
+    MongoContentstoreBuilder,
+    TEST_DATA_DIR,
+    VersioningModulestoreBuilder,
+)
+from xmodule.modulestore.xml_importer import import_course_from_xml
+
+log = logging.getLogger(__name__)
+
+# The largest course fixtures.
+COURSE_NAMES = ('manual-testing-complete', 'toy')
+
+# get_items queries of typical callers.
+QUERIES = (
+    {'qualifiers': {'category': 'problem'}},
+    {'qualifiers': {'category': 'sequential'}},
+    {'qualifiers': {'category': {'$in': ['chapter', 'sequential', 'vertical']}}},
+    {'qualifiers': {'category': 'course'}},
+    {'qualifiers': {'name': 'nonexistent'}},
+    {'settings': {'graded': True}},
+)
+
+# Number of times each query is timed.
+NUM_QUERIES = 20
+
+# pylint: disable=invalid-name
+TEST_DIR = path(__file__).dirname()
+PLATFORM_ROOT = TEST_DIR.parent.parent.parent.parent.parent.parent
+TEST_DATA_ROOT = PLATFORM_ROOT / TEST_DATA_DIR
+
+
+@ddt.ddt
+# Eventually, exclude this attribute from regular unittests while running *only* tests
+# with this attribute during regular performance tests.
+# @attr("perf_test")
+@unittest.skip
+class GetItemsTest(unittest.TestCase):
+    """
+    This class exists to compare the latency of get_items queries that scan
+    every block of a structure to that of queries that use its secondary indexes.
+    """
+
+    # Use this attr to skip this test on regular unittest CI runs.
+    perf_test = True
+
+    def _time_queries(self, store, course_key):
+        """
+        Returns the mean duration of each query, and the number of items it found.
+        """
+        timings = []
+        for query in QUERIES:
+            start = time()
+            for _ in range(NUM_QUERIES):
+                with store.bulk_operations(course_key):
+                    items = store.get_items(course_key, **query)
+            timings.append(((time() - start) / NUM_QUERIES, len(items)))
+        return timings
+
+    @ddt.data(*COURSE_NAMES)
+    def test_get_items_timings(self, course_name):
+        with MongoContentstoreBuilder().build() as contentstore:
+            with VersioningModulestoreBuilder().build_with_contentstore(contentstore) as store:
+                course_key = store.make_course_key('a', 'course', 'course')
+                import_course_from_xml(
+                    store,
+                    ModuleStoreEnum.UserID.test,
+                    TEST_DATA_ROOT,
+                    source_dirs=[course_name],
+                    static_content_store=contentstore,
+                    target_id=course_key,
+                    create_if_not_present=True,
+                    raise_on_failure=True,
+                )
+                course_key = course_key.for_branch(ModuleStoreEnum.BranchName.published)
+
+                with patch.object(SplitMongoModuleStore, '_get_structure_index', return_value=None):
+                    scanned = self._time_queries(store, course_key)
+                indexed = self._time_queries(store, course_key)
+
+                for query, (scan_time, scan_count), (index_time, index_count) in zip(QUERIES, scanned, indexed):
+                    self.assertEqual(index_count, scan_count)
+                    log.info(
+                        "GetItems:%s:%s: %s items, scan=%.4fs, indexed=%.4fs",
+                        course_name, query, scan_count, scan_time, index_time,
+                    )
@@ -0,0 +1,94 @@
+"""
+Performance test of the storage size and read latency of split modulestore
+structures, stored in full or as deltas with different snapshot intervals.
+"""
+import copy
+import logging
+import random
+import unittest
+import uuid
+from time import time
+
+import ddt
+from bson import BSON
+
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
+from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
+from xmodule.modulestore.tests.test_split_structure_delta import make_structure
+
+log = logging.getLogger(__name__)
+
+# Snapshot intervals to compare; 1 stores every structure in full.
+SNAPSHOT_INTERVALS = (1, 5, 20, 50)
+
+# Number of versions in the history of the course.
+NUM_VERSIONS = 200
+
+# Number of blocks in the course.
+NUM_BLOCKS = 2000
+
+# Number of blocks changed by each version.
+BLOCKS_CHANGED_PER_VERSION = 3
+
+# Number of reads timed per version read.
+NUM_READS = 50
+
+
+@ddt.ddt
+# Eventually, exclude this attribute from regular unittests while running *only* tests
+# with this attribute during regular performance tests.
+# @attr("perf_test")
+@unittest.skip
+class StructureStorageTest(unittest.TestCase):
+    """
+    This class exists to compare the storage size of a course's history of
+    structures and the latency of reading its structures for different
+    snapshot intervals.
+    """
+
+    # Use this attr to skip this test on regular unittest CI runs.
+    perf_test = True
+
+    @ddt.data(*SNAPSHOT_INTERVALS)
+    def test_storage_size_and_read_latency(self, snapshot_interval):
+        connection = MongoConnection(
+            db='test_xmodule',
+            collection='modulestore{0}'.format(uuid.uuid4().hex[:5]),
+            host=MONGO_HOST,
+            port=MONGO_PORT_NUM,
+            structure_snapshot_interval=snapshot_interval,
+        )
+        self.addCleanup(connection._drop_database, database=False)  # pylint: disable=protected-access
+
+        structure = make_structure(num_blocks=NUM_BLOCKS)
+        structure_ids = []
+        insert_duration = 0
+        for _ in range(NUM_VERSIONS):
+            start = time()
+            connection.insert_structure(copy.deepcopy(structure))
+            insert_duration += time() - start
+            structure_ids.append(structure['_id'])
+            structure = make_structure(
+                structure, changed=random.sample(range(NUM_BLOCKS), BLOCKS_CHANGED_PER_VERSION),
+            )
+
+        storage_size = sum(len(BSON.encode(doc)) for doc in connection.structures.find())
+
+        read_durations = []
+        for _ in range(NUM_READS):
+            structure_id = random.choice(structure_ids)
+            start = time()
+            read_structure = connection.find_structures_by_id([structure_id])[0]
+            read_durations.append(time() - start)
+            self.assertIn(BlockKey('course', 'course'), read_structure['blocks'])
+
+        log.info(
+            "StructureStorage:interval=%s: storage=%s bytes, "
+            "mean insert=%.4fs, mean read=%.4fs, max read=%.4fs",
+            snapshot_interval,
+            storage_size,
+            insert_duration / NUM_VERSIONS,
+            sum(read_durations) / NUM_READS,
+            max(read_durations),
+        )
@@ -18,6 +18,7 @@ from xmodule.modulestore.edit_info import EditInfoRuntimeMixin
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.inheritance import inheriting_field_data, InheritanceMixin
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
+from xmodule.modulestore.split_mongo.course_snapshot import SnapshotBlocks
 from xmodule.modulestore.split_mongo.id_manager import SplitMongoIdManager
 from xmodule.modulestore.split_mongo.definition_lazy_loader import DefinitionLazyLoader
 from xmodule.modulestore.split_mongo.split_mongo_kvs import SplitMongoKVS
@@ -87,8 +88,13 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
     @lazy
     @contract(returns="dict(BlockKey: BlockKey)")
     def _parent_map(self):
+        blocks = self.course_entry.structure['blocks']
+        if isinstance(blocks, SnapshotBlocks):
+            # the parents of snapshotted blocks are indexed, so there's no need to decode them all
+            return blocks.parent_map()
+
         parent_map = {}
-        for block_key, block in self.course_entry.structure['blocks'].iteritems():
+        for block_key, block in blocks.iteritems():
             for child in block.fields.get('children', []):
                 parent_map[child] = block_key
         return parent_map
@@ -0,0 +1,504 @@
+"""
+Read-only, memory-mapped snapshots of the published branch of split modulestore courses.
+
+A snapshot is a single file holding the published structure of a course and
+the definitions of its blocks, from which the course can be served without
+querying mongo or unpickling the whole structure.  The file is laid out as:
+
+    * a preamble: the magic bytes, the format version and the length of the
+      header,
+    * the header, a BSON document with the course index, the top-level fields
+      of the structure, and an index of the offset and length of each block
+      and definition record in the data section, along with the parents of
+      each block,
+    * the data section, the BSON encoded block and definition records.
+
+Readers memory-map the file, so that the pages of a snapshot are shared by
+all the processes on a host through the OS page cache, and decode only the
+header up front and each block and definition record when it is first
+accessed.  Snapshots are replaced atomically when they are rebuilt, so that
+readers that already mapped the previous snapshot keep reading it, and the
+structure of the previous snapshot of a course stays readable by version
+while requests that read its course index may still ask for it.
+"""
+import copy
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+from collections import Mapping
+
+from bson import BSON
+from bson.codec_options import CodecOptions
+from lazy import lazy
+
+from xmodule.exceptions import HeartbeatFailure
+from xmodule.modulestore import BlockData, ModuleStoreEnum
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import structure_to_mongo
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = 'SPLITSNP'
+SNAPSHOT_FORMAT_VERSION = 1
+
+# magic, format version, header length
+_PREAMBLE = struct.Struct('<8sII')
+
+_CODEC_OPTIONS = CodecOptions(tz_aware=True)
+
+# Seconds for which a snapshot is read without checking whether it was rebuilt.
+DEFAULT_STAT_INTERVAL = 1
+
+
+def snapshot_path(snapshot_root, course_key):
+    """
+    Returns the path of the snapshot of the given course under snapshot_root.
+    """
+    course_key = course_key.for_branch(None).version_agnostic()
+    return os.path.join(snapshot_root, u'{}.snapshot'.format(unicode(course_key).replace('/', '+')))
+
+
+def build_snapshot(db_connection, course_key, snapshot_root):
+    """
+    Builds the snapshot of the published branch of the given course from the
+    given split MongoConnection, replacing any previous snapshot of the course.
+
+    Returns the path of the snapshot, or None if the course has no published
+    branch.
+    """
+    published = ModuleStoreEnum.BranchName.published
+    course_index = db_connection.get_course_index(course_key)
+    if course_index is None or published not in course_index['versions']:
+        return None
+
+    version_guid = course_index['versions'][published]
+    structure = db_connection.get_structure(version_guid, course_key)
+    definition_ids = {
+        block.definition for block in structure['blocks'].itervalues() if block.definition is not None
+    }
+    definitions = db_connection.get_definitions(list(definition_ids), course_key)
+
+    course_index = dict(course_index, versions={published: version_guid})
+    path = snapshot_path(snapshot_root, course_key)
+    write_snapshot(path, course_index, structure, definitions)
+    return path
+
+
+def write_snapshot(path, course_index, structure, definitions):
+    """
+    Writes a snapshot of the given course index, structure and definitions
+    to path, replacing any existing file atomically.
+    """
+    structure_doc = structure_to_mongo(structure)
+
+    parents = {}
+    for block_key, block in structure['blocks'].iteritems():
+        for child in block.fields.get('children', []):
+            parents.setdefault(child, []).append(list(block_key))
+
+    records = []
+    offset = 0
+    block_index = []
+    for block in structure_doc['blocks']:
+        record = BSON.encode(block)
+        block_key = BlockKey(block['block_type'], block['block_id'])
+        block_index.append([block_key.type, block_key.id, offset, len(record), parents.get(block_key, [])])
+        records.append(record)
+        offset += len(record)
+
+    definition_index = []
+    for definition in definitions:
+        record = BSON.encode(definition)
+        definition_index.append([definition['_id'], offset, len(record)])
+        records.append(record)
+        offset += len(record)
+
+    header = BSON.encode({
+        'course_index': course_index,
+        'structure': {key: value for key, value in structure_doc.iteritems() if key != 'blocks'},
+        'blocks': block_index,
+        'definitions': definition_index,
+    })
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp_path = u'{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header)))
+        snapshot_file.write(header)
+        for record in records:
+            snapshot_file.write(record)
+    os.rename(temp_path, path)
+
+
+class CourseSnapshot(object):
+    """
+    A memory-mapped course snapshot.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        # identifies the file, which is replaced rather than rewritten when rebuilt
+        self.file_id = (stat.st_dev, stat.st_ino, stat.st_mtime)
+
+        magic, format_version, header_length = _PREAMBLE.unpack_from(self._mmap)
+        if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(u'{} is not a course snapshot of format version {}'.format(path, SNAPSHOT_FORMAT_VERSION))
+        data_start = _PREAMBLE.size + header_length
+        header = self._decode(_PREAMBLE.size, header_length)
+
+        self.course_index = header['course_index']
+        self._structure_fields = header['structure']
+        self._structure_fields['root'] = BlockKey(*self._structure_fields['root'])
+
+        self._block_index = {}
+        self._parents = {}
+        for block_type, block_id, offset, length, parents in header['blocks']:
+            block_key = BlockKey(block_type, block_id)
+            self._block_index[block_key] = (data_start + offset, length)
+            if parents:
+                self._parents[block_key] = [BlockKey(*parent) for parent in parents]
+        self._definition_index = {
+            definition_id: (data_start + offset, length)
+            for definition_id, offset, length in header['definitions']
+        }
+
+    @property
+    def structure_id(self):
+        """
+        The id of the snapshotted structure.
+        """
+        return self._structure_fields['_id']
+
+    def structure(self):
+        """
+        Returns the snapshotted structure, whose blocks are decoded when first
+        accessed.  Each call returns a new structure, so that the blocks decoded
+        for one caller aren't shared with others.
+        """
+        structure = dict(self._structure_fields)
+        structure['blocks'] = SnapshotBlocks(self)
+        return structure
+
+    def block_keys(self):
+        """
+        Returns the keys of the blocks in the snapshot.
+        """
+        return self._block_index.viewkeys()
+
+    def parents(self, block_key):
+        """
+        Returns the list of the keys of the parents of the given block.
+        """
+        return self._parents.get(block_key, [])
+
+    @lazy
+    def parent_map(self):
+        """
+        A dict of the key of each block that has a parent to the key of one of
+        its parents.
+        """
+        return {block_key: parents[-1] for block_key, parents in self._parents.iteritems()}
+
+    def read_block(self, block_key):
+        """
+        Returns the BlockData of the given block, with the fields of its
+        definition loaded.
+
+        Raises:
+            KeyError: if the block isn't in the snapshot.
+        """
+        block = self._decode(*self._block_index[block_key])
+        del block['block_id']
+        if 'children' in block['fields']:
+            block['fields']['children'] = [BlockKey(*child) for child in block['fields']['children']]
+        block = BlockData(**block)
+
+        definition = self.get_definition(block.definition)
+        if definition is not None:
+            block.fields.update(definition.get('fields', {}))
+            block.definition_loaded = True
+        return block
+
+    def get_definition(self, definition_id):
+        """
+        Returns the definition with the given id, or None if it isn't in the
+        snapshot.
+        """
+        if definition_id not in self._definition_index:
+            return None
+        return self._decode(*self._definition_index[definition_id])
+
+    def _decode(self, offset, length):
+        """
+        Decodes the BSON document at the given offset in the file.
+        """
+        return BSON(self._mmap[offset:offset + length]).decode(codec_options=_CODEC_OPTIONS)
+
+
+class SnapshotBlocks(Mapping):
+    """
+    The blocks of a snapshotted structure, as a read-only mapping of BlockKey
+    to BlockData which decodes each block when it is first accessed.
+    """
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._blocks = {}
+
+    def __getitem__(self, block_key):
+        block = self._blocks.get(block_key)
+        if block is None:
+            block = self._blocks[block_key] = self._snapshot.read_block(block_key)
+        return block
+
+    def __contains__(self, block_key):
+        return block_key in self._snapshot.block_keys()
+
+    def __iter__(self):
+        return iter(self._snapshot.block_keys())
+
+    def __len__(self):
+        return len(self._snapshot.block_keys())
+
+    def parents(self, block_key):
+        """
+        Returns the list of the keys of the parents of the given block,
+        without decoding any blocks.
+        """
+        return self._snapshot.parents(block_key)
+
+    def parent_map(self):
+        """
+        Returns a dict of the key of each block that has a parent to the key of
+        one of its parents, without decoding any blocks.
+        """
+        return self._snapshot.parent_map
+
+
+class SnapshotConnection(object):
+    """
+    A read-only stand-in for the split MongoConnection which reads the course
+    indexes, structures and definitions of the published branch of courses
+    from their snapshots under snapshot_root.
+
+    Snapshots hold no history and aren't enumerated, so queries for the
+    history of structures and for all course indexes return nothing.
+
+    Whether a snapshot was rebuilt is checked at most every ``stat_interval``
+    seconds.  When it was, the previous snapshot stays readable by version
+    until it is replaced in turn, and for as long as structures read from it
+    are in use.
+    """
+    def __init__(
+            self, snapshot_root, stat_interval=DEFAULT_STAT_INTERVAL, **kwargs
+    ):  # pylint: disable=unused-argument
+        self.snapshot_root = snapshot_root
+        self.stat_interval = stat_interval
+        self._lock = threading.Lock()
+        # path -> current CourseSnapshot
+        self._snapshots = {}
+        # path -> CourseSnapshot replaced by the current one
+        self._previous_snapshots = {}
+        # path -> time at which the snapshot was last checked
+        self._stat_times = {}
+        # structure id -> CourseSnapshot, for the snapshots still referenced
+        self._snapshots_by_version = weakref.WeakValueDictionary()
+
+    def heartbeat(self):
+        """
+        Check that the snapshots are readable.
+        """
+        if os.access(self.snapshot_root, os.R_OK | os.X_OK):
+            return True
+        else:
+            raise HeartbeatFailure("Can't read course snapshots from {}".format(self.snapshot_root), 'snapshot')
+
+    def get_course_index(self, key, ignore_case=False):  # pylint: disable=unused-argument
+        """
+        Get the course_index from the snapshot of the course, if it exists.
+        """
+        snapshot = self._get_snapshot(key)
+        if snapshot is None:
+            return None
+        return copy.deepcopy(snapshot.course_index)
+
+    def find_matching_course_indexes(
+            self, branch=None, search_targets=None, org_target=None, course_context=None
+    ):  # pylint: disable=unused-argument
+        """
+        Snapshots are only served for the courses they are mapped to, and are
+        listed by the modulestore they were built from.
+        """
+        return []
+
+    def get_structure(self, key, course_context=None):
+        """
+        Get the structure with the given id from the snapshot of the course
+        context, or from any snapshot loaded by this process.
+        """
+        if course_context is not None:
+            self._get_snapshot(course_context)
+        snapshot = self._snapshots_by_version.get(key)
+        if snapshot is None:
+            return None
+        return snapshot.structure()
+
+    def find_structures_by_id(self, ids, course_context=None):
+        """
+        Return all structures that specified in ``ids``.
+        """
+        structures = (self.get_structure(structure_id, course_context) for structure_id in ids)
+        return [structure for structure in structures if structure is not None]
+
+    def find_course_blocks_by_id(self, ids, course_context=None):
+        """
+        Return the structures with the given ids, with only their course blocks.
+        """
+        structures = self.find_structures_by_id(ids, course_context)
+        for structure in structures:
+            blocks = structure['blocks']
+            structure['blocks'] = {
+                block_key: blocks[block_key] for block_key in blocks if block_key.type == 'course'
+            }
+        return structures
+
+    def find_structures_derived_from(self, ids, course_context=None):  # pylint: disable=unused-argument
+        """
+        Snapshots don't hold the history of structures.
+        """
+        return []
+
+    def find_ancestor_structures(
+            self, original_version, block_key, course_context=None
+    ):  # pylint: disable=unused-argument
+        """
+        Snapshots don't hold the history of structures.
+        """
+        return []
+
+    def get_definition(self, key, course_context=None):
+        """
+        Get the definition with the given id from the snapshot of the course
+        context, or from any snapshot loaded by this process.
+        """
+        snapshot = self._get_snapshot(course_context) if course_context is not None else None
+        snapshots = [snapshot] if snapshot is not None else self._snapshots.values()
+        for snapshot in snapshots:
+            definition = snapshot.get_definition(key)
+            if definition is not None:
+                return definition
+        return None
+
+    def get_definitions(self, definitions, course_context=None):
+        """
+        Retrieve all definitions listed in `definitions`.
+        """
+        definitions = (self.get_definition(key, course_context) for key in definitions)
+        return [definition for definition in definitions if definition is not None]
+
+    def insert_structure(self, structure, course_context=None):
+        """
+        Snapshots are read-only.
+        """
+        raise NotImplementedError(u'Course snapshots are read-only')
+
+    def insert_course_index(self, course_index, course_context=None):
+        """
+        Snapshots are read-only.
+        """
+        raise NotImplementedError(u'Course snapshots are read-only')
+
+    def update_course_index(self, course_index, from_index=None, course_context=None):
+        """
+        Snapshots are read-only.
+        """
+        raise NotImplementedError(u'Course snapshots are read-only')
+
+    def delete_course_index(self, course_key):
+        """
+        Snapshots are read-only.
+        """
+        raise NotImplementedError(u'Course snapshots are read-only')
+
+    def insert_definition(self, definition, course_context=None):
+        """
+        Snapshots are read-only.
+        """
+        raise NotImplementedError(u'Course snapshots are read-only')
+
+    def ensure_indexes(self):
+        """
+        Snapshots are indexed when they are built.
+        """
+        pass
+
+    def close_connections(self):
+        """
+        Unmaps the snapshots loaded by this process; they are mapped again when
+        next read.
+        """
+        with self._lock:
+            self._snapshots.clear()
+            self._previous_snapshots.clear()
+            self._stat_times.clear()
+            self._snapshots_by_version.clear()
+
+    def _drop_database(self, database=True, collections=True, connections=True):  # pylint: disable=unused-argument
+        """
+        Snapshots are rebuilt rather than dropped, so this only unmaps them.
+        """
+        self.close_connections()
+
+    def _get_snapshot(self, course_key):
+        """
+        Returns the CourseSnapshot of the given course, mapping it again if it
+        was rebuilt since it was last read, or None if it doesn't exist.
+        """
+        if not hasattr(course_key, 'for_branch') or getattr(course_key, 'deprecated', False):
+            return None
+        path = snapshot_path(self.snapshot_root, course_key)
+        now = time.time()
+        if now - self._stat_times.get(path, 0) < self.stat_interval:
+            return self._snapshots.get(path)
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+
+        with self._lock:
+            self._stat_times[path] = now
+            snapshot = self._snapshots.get(path)
+            if stat is None:
+                self._replace_snapshot(path, None)
+                return None
+            if snapshot is not None and snapshot.file_id == (stat.st_dev, stat.st_ino, stat.st_mtime):
+                return snapshot
+            try:
+                new_snapshot = CourseSnapshot(path)
+            except (IOError, ValueError):
+                log.exception(u'Unable to read the course snapshot %s', path)
+                return snapshot
+
+            self._replace_snapshot(path, new_snapshot)
+            return new_snapshot
+
+    def _replace_snapshot(self, path, new_snapshot):
+        """
+        Makes new_snapshot, or None if there is none, the current snapshot at
+        path, keeping the one it replaces readable by version.  Must be called
+        with the lock held.
+        """
+        snapshot = self._snapshots.pop(path, None)
+        if snapshot is not None:
+            # requests which read the course index before the snapshot was rebuilt can still read its structure
+            self._previous_snapshots[path] = snapshot
+        if new_snapshot is not None:
+            self._snapshots[path] = new_snapshot
+            self._snapshots_by_version[new_snapshot.structure_id] = new_snapshot
@@ -1,6 +1,7 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
+import copy
 import datetime
 import cPickle as pickle
 import math
@@ -8,6 +9,8 @@ import zlib
 import pymongo
 import pytz
 import re
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -15,6 +18,7 @@ from time import time
 from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
 try:
+    from django.conf import settings
     from django.core.cache import caches, InvalidCacheBackendError
     DJANGO_AVAILABLE = True
 except ImportError:
@@ -28,6 +32,7 @@ from mongodb_proxy import autoretry_read
 from xmodule.exceptions import HeartbeatFailure
 from xmodule.modulestore import BlockData
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo import structure_delta
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
 
 
@@ -225,6 +230,131 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+def copy_structure(structure):
+    """
+    Returns a copy of the given structure, as returned by structure_from_mongo,
+    which can be modified as split does when it reads it (updating the fields,
+    definition_loaded and edit_info of its blocks) without modifying the given
+    structure.  Unlike a deep copy, the field values themselves are shared.
+    """
+    new_structure = dict(structure)
+    new_structure['blocks'] = {}
+    for block_key, block in structure['blocks'].iteritems():
+        new_block = copy.copy(block)
+        new_block.fields = dict(block.fields)
+        new_block.edit_info = copy.copy(block.edit_info)
+        new_structure['blocks'][block_key] = new_block
+    return new_structure
+
+
+class LocalDocumentCache(object):
+    """
+    A bounded, process-local, least-recently-used cache of documents
+    that are immutable by id, such as course structures and definitions.
+
+    Since the documents are immutable, entries never go stale.  The
+    cache evicts least recently used entries once the total size of its
+    entries exceeds max_bytes, where the size of an entry is the size of
+    the document's pickled data.
+
+    If share_decoded is False, the pickled data is kept, and each get
+    unpickles it, so callers get their own copy of the document.  If
+    share_decoded is True, the unpickled document is kept and returned
+    to all callers, in all threads, which must then copy it before
+    modifying it (see copy_structure).
+    """
+    def __init__(self, max_bytes, share_decoded=False):
+        self.max_bytes = max_bytes
+        self.share_decoded = share_decoded
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the document with the given id, or None if not cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            # Reinsert the entry, to mark it as the most recently used.
+            self._entries[key] = entry
+        value, _ = entry
+        return value if self.share_decoded else pickle.loads(value)
+
+    def set(self, key, pickled_data, document=None):
+        """
+        Caches the document with the given id and pickled data.  If
+        share_decoded is True, the given document, which must not have
+        been handed to any caller yet, is cached as the decoded
+        document, or the pickled data is unpickled if it isn't given.
+        """
+        size = len(pickled_data)
+        if size > self.max_bytes:
+            return
+
+        if self.share_decoded:
+            value = document if document is not None else pickle.loads(pickled_data)
+        else:
+            value = pickled_data
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+
+_LOCAL_CACHES = {}
+_LOCAL_CACHES_LOCK = threading.Lock()
+
+
+def get_local_cache():
+    """
+    Returns the process-local LocalDocumentCache of course structures
+    that is configured by the COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES and
+    COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED settings, or None if it
+    is disabled.
+    """
+    return _get_local_cache('COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES', 'COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED')
+
+
+def get_local_definition_cache():
+    """
+    Returns the process-local LocalDocumentCache of definitions that is
+    configured by the COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES setting,
+    or None if it is disabled.
+    """
+    return _get_local_cache('COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES')
+
+
+def _get_local_cache(max_bytes_setting, share_decoded_setting=None):
+    """
+    Returns the process-local LocalDocumentCache configured by the given
+    settings, or None if it is disabled.
+    """
+    if not DJANGO_AVAILABLE:
+        return None
+
+    max_bytes = getattr(settings, max_bytes_setting, 0)
+    share_decoded = getattr(settings, share_decoded_setting, False) if share_decoded_setting else False
+    if not max_bytes:
+        return None
+
+    with _LOCAL_CACHES_LOCK:
+        local_cache = _LOCAL_CACHES.get(max_bytes_setting)
+        if local_cache is None or (local_cache.max_bytes, local_cache.share_decoded) != (max_bytes, share_decoded):
+            local_cache = _LOCAL_CACHES[max_bytes_setting] = LocalDocumentCache(max_bytes, share_decoded)
+        return local_cache
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
@@ -232,14 +362,22 @@ class CourseStructureCache(object):
 
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
+
+    If a process-local cache is configured (see get_local_cache), it is
+    checked before the django cache, which saves fetching, decompressing
+    and, if it shares decoded structures, unpickling the structure.  Each
+    caller then gets its own copy of the shared structure's blocks.
     """
     def __init__(self):
         self.cache = None
+        self.local_cache = None
         if DJANGO_AVAILABLE:
             try:
                 self.cache = get_cache('course_structure_cache')
             except InvalidCacheBackendError:
                 pass
+            else:
+                self.local_cache = get_local_cache()
 
     def get(self, key, course_context=None):
         """Pull the compressed, pickled struct data from cache and deserialize."""
@@ -247,6 +385,15 @@ class CourseStructureCache(object):
             return None
 
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
+            if self.local_cache is not None:
+                structure = self.local_cache.get(key)
+                tagger.tag(from_local_cache=str(structure is not None).lower())
+                tagger.measure('local_cache_size', self.local_cache.size)
+                tagger.measure('local_cache_entries', len(self.local_cache))
+                if structure is not None:
+                    tagger.tag(from_cache='true')
+                    return copy_structure(structure) if self.local_cache.share_decoded else structure
+
             compressed_pickled_data = self.cache.get(key)
             tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
 
@@ -260,7 +407,12 @@ class CourseStructureCache(object):
             pickled_data = zlib.decompress(compressed_pickled_data)
             tagger.measure('uncompressed_size', len(pickled_data))
 
-            return pickle.loads(pickled_data)
+            structure = pickle.loads(pickled_data)
+            if self.local_cache is not None:
+                self.local_cache.set(key, pickled_data, structure)
+                if self.local_cache.share_decoded:
+                    structure = copy_structure(structure)
+            return structure
 
     def set(self, key, structure, course_context=None):
         """Given a structure, will pickle, compress, and write to cache."""
@@ -278,6 +430,19 @@ class CourseStructureCache(object):
             # Stuctures are immutable, so we set a timeout of "never"
             self.cache.set(key, compressed_pickled_data, None)
 
+            if self.local_cache is not None:
+                self.local_cache.set(key, pickled_data)
+
+
+def _cache_definitions(local_cache, definitions):
+    """
+    Adds the given definitions, as read from the database, to the given
+    LocalDocumentCache.
+    """
+    for definition in definitions:
+        if definition is not None:
+            local_cache.set(definition['_id'], pickle.dumps(definition, pickle.HIGHEST_PROTOCOL))
+
 
 class MongoConnection(object):
     """
@@ -285,11 +450,17 @@ class MongoConnection(object):
     """
     def __init__(
         self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
-        asset_collection=None, retry_wait_time=0.1, **kwargs
+        asset_collection=None, retry_wait_time=0.1, structure_snapshot_interval=None, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        If structure_snapshot_interval is greater than 1, new structures are stored as deltas
+        against their previous_version, with a full snapshot at least every
+        structure_snapshot_interval versions (see structure_delta).
         """
+        self.structure_snapshot_interval = structure_snapshot_interval or 1
+
         # Set a write concern of 1, which makes writes complete successfully to the primary
         # only before returning. Also makes pymongo report write errors.
         kwargs['w'] = 1
@@ -330,6 +501,9 @@ class MongoConnection(object):
 
                 with TIMER.timer("get_structure.find_one", course_context) as tagger_find_one:
                     doc = self.structures.find_one({'_id': key})
+                    if doc is not None and structure_delta.is_delta(doc):
+                        tagger_find_one.measure("delta_depth", structure_delta.delta_depth(doc))
+                        doc = next(iter(self._reconstruct_structures([doc], course_context)), None)
                     if doc is None:
                         log.warning(
                             "doc was None when attempting to retrieve structure for item with key %s",
@@ -356,7 +530,9 @@ class MongoConnection(object):
             tagger.measure("requested_ids", len(ids))
             docs = [
                 structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({'_id': {'$in': ids}})
+                for structure in self._reconstruct_structures(
+                    self.structures.find({'_id': {'$in': ids}}), course_context,
+                )
             ]
             tagger.measure("structures", len(docs))
             return docs
@@ -371,13 +547,27 @@ class MongoConnection(object):
         """
         with TIMER.timer("find_course_blocks_by_id", course_context) as tagger:
             tagger.measure("requested_ids", len(ids))
-            docs = [
-                structure_from_mongo(structure, course_context)
-                for structure in self.structures.find(
-                    {'_id': {'$in': ids}},
-                    {'blocks': {'$elemMatch': {'block_type': 'course'}}, 'root': 1}
-                )
-            ]
+            structures = list(self.structures.find(
+                {'_id': {'$in': ids}},
+                {'blocks': {'$elemMatch': {'block_type': 'course'}}, 'root': 1, 'delta_base': 1}
+            ))
+
+            # The course blocks of delta encoded structures may be in any of their bases.
+            delta_ids = [structure['_id'] for structure in structures if structure_delta.is_delta(structure)]
+            if delta_ids:
+                reconstructed = {
+                    structure['_id']: {
+                        '_id': structure['_id'],
+                        'root': structure['root'],
+                        'blocks': [block for block in structure['blocks'] if block['block_type'] == 'course'][:1],
+                    }
+                    for structure in self._reconstruct_structures(
+                        self.structures.find({'_id': {'$in': delta_ids}}), course_context,
+                    )
+                }
+                structures = [reconstructed.get(structure['_id'], structure) for structure in structures]
+
+            docs = [structure_from_mongo(structure, course_context) for structure in structures]
             tagger.measure("structures", len(docs))
             return docs
 
@@ -393,7 +583,9 @@ class MongoConnection(object):
             tagger.measure("base_ids", len(ids))
             docs = [
                 structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({'previous_version': {'$in': ids}})
+                for structure in self._reconstruct_structures(
+                    self.structures.find({'previous_version': {'$in': ids}}), course_context,
+                )
             ]
             tagger.measure("structures", len(docs))
             return docs
@@ -403,25 +595,43 @@ class MongoConnection(object):
         """
         Find all structures that originated from ``original_version`` that contain ``block_key``.
 
+        Delta encoded structures are only found if they changed ``block_key``, as finding
+        those that inherit it unchanged would mean reconstructing the whole history.  Those
+        are the structures ``get_block_generations`` uses.
+
         Arguments:
             original_version (str or ObjectID): The id of a structure
             block_key (BlockKey): The id of the block in question
         """
         with TIMER.timer("find_ancestor_structures", course_context) as tagger:
+            block_match = {
+                '$elemMatch': {
+                    'block_id': block_key.id,
+                    'block_type': block_key.type,
+                    'edit_info.update_version': {
+                        '$exists': True,
+                    },
+                },
+            }
+            # Only the delta encoded structures whose diff has the block are reconstructed.
+            structures = self._reconstruct_structures(
+                self.structures.find({
+                    'original_version': original_version,
+                    '$or': [
+                        {'blocks': block_match},
+                        {'changed_blocks': block_match},
+                    ],
+                }),
+                course_context,
+            )
             docs = [
                 structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({
-                    'original_version': original_version,
-                    'blocks': {
-                        '$elemMatch': {
-                            'block_id': block_key.id,
-                            'block_type': block_key.type,
-                            'edit_info.update_version': {
-                                '$exists': True,
-                            },
-                        },
-                    },
-                })
+                for structure in structures
+                if any(
+                    block['block_id'] == block_key.id and block['block_type'] == block_key.type and
+                    'update_version' in block.get('edit_info', {})
+                    for block in structure['blocks']
+                )
             ]
             tagger.measure("structures", len(docs))
             return docs
@@ -432,7 +642,126 @@ class MongoConnection(object):
         """
         with TIMER.timer("insert_structure", course_context) as tagger:
             tagger.measure("blocks", len(structure["blocks"]))
-            self.structures.insert(structure_to_mongo(structure, course_context))
+            doc = structure_to_mongo(structure, course_context)
+            if self.structure_snapshot_interval > 1:
+                doc = self._delta_encode_structure(doc, course_context)
+                tagger.measure("delta_depth", structure_delta.delta_depth(doc))
+            self.structures.insert(doc)
+
+    def compact_structures(self, original_version, snapshot_interval=None, course_context=None):
+        """
+        Re-encodes the stored structures that originated from ``original_version``, so that
+        each one is stored as a delta against its previous_version, with a full snapshot
+        every ``snapshot_interval`` versions along each line of history.  A
+        ``snapshot_interval`` of 1 stores all of them in full.
+
+        Structures are re-encoded from the oldest to the newest, and re-encoding a structure
+        doesn't change its content, so readers are unaffected.
+
+        Returns the number of re-encoded structures.
+        """
+        snapshot_interval = snapshot_interval or self.structure_snapshot_interval
+        with TIMER.timer("compact_structures", course_context) as tagger:
+            versions = {
+                structure['_id']: structure
+                for structure in self.structures.find(
+                    {'original_version': original_version},
+                    {'previous_version': 1, 'delta_base': 1, 'delta_depth': 1},
+                )
+            }
+            derived_ids = {}
+            for structure in versions.itervalues():
+                derived_ids.setdefault(structure.get('previous_version'), []).append(structure['_id'])
+
+            # Walk each line of history from its oldest structure, keeping the full documents
+            # of the structures whose derived structures are yet to be re-encoded.
+            pending = [
+                (structure_id, None, 0)
+                for structure_id, structure in versions.iteritems()
+                if structure.get('previous_version') not in versions
+            ]
+            full_docs = {}
+            compacted = 0
+            while pending:
+                structure_id, base_id, depth = pending.pop()
+                doc = self.structures.find_one({'_id': structure_id})
+                base_doc = full_docs.get(base_id)
+                if structure_delta.is_delta(doc) and doc['delta_base'] == base_id and base_doc is not None:
+                    full_doc = structure_delta.apply_delta(doc, base_doc)
+                else:
+                    full_doc = next(iter(self._reconstruct_structures([doc], course_context)), None)
+                    if full_doc is None:
+                        # Leave this structure and those derived from it as they are.
+                        continue
+
+                new_doc = full_doc
+                if base_doc is not None and depth > 0:
+                    new_doc = structure_delta.encode_delta(full_doc, base_doc, depth) or full_doc
+                new_depth = structure_delta.delta_depth(new_doc)
+                if (doc.get('delta_base'), structure_delta.delta_depth(doc)) != (new_doc.get('delta_base'), new_depth):
+                    self.structures.update({'_id': structure_id}, new_doc)
+                    compacted += 1
+
+                derived = derived_ids.get(structure_id, [])
+                if derived:
+                    full_docs[structure_id] = full_doc
+                    next_depth = (new_depth + 1) % snapshot_interval
+                    pending.extend((derived_id, structure_id, next_depth) for derived_id in derived)
+                # Drop the full documents that no pending structure is derived from.
+                pending_base_ids = {pending_base_id for _, pending_base_id, _ in pending}
+                for full_doc_id in full_docs.keys():
+                    if full_doc_id not in pending_base_ids:
+                        del full_docs[full_doc_id]
+
+            tagger.measure("structures", len(versions))
+            tagger.measure("compacted", compacted)
+            return compacted
+
+    def _delta_encode_structure(self, doc, course_context=None):
+        """
+        Returns the given structure document delta encoded against its previous_version,
+        or as is if it's due for a snapshot or its previous_version isn't stored.
+        """
+        base_doc = None
+        if doc.get('previous_version') is not None:
+            base_doc = self.structures.find_one({'_id': doc['previous_version']})
+        if base_doc is None:
+            return doc
+
+        depth = structure_delta.delta_depth(base_doc) + 1
+        if depth >= self.structure_snapshot_interval:
+            return doc
+
+        base_doc = next(iter(self._reconstruct_structures([base_doc], course_context)), None)
+        if base_doc is None:
+            return doc
+        return structure_delta.encode_delta(doc, base_doc, depth) or doc
+
+    def _reconstruct_structures(self, docs, course_context=None):
+        """
+        Returns the full documents of the given structure documents, fetching the
+        bases of the delta encoded ones.  Structures whose bases are missing are
+        logged and left out.
+        """
+        docs = list(docs)
+        if not any(structure_delta.is_delta(doc) for doc in docs):
+            return docs
+
+        with TIMER.timer("reconstruct_structures", course_context) as tagger:
+            tagger.measure("structures", len(docs))
+            tagger.measure("max_delta_depth", max(structure_delta.delta_depth(doc) for doc in docs))
+            fetch_docs = lambda ids: self.structures.find({'_id': {'$in': ids}})
+            try:
+                return structure_delta.reconstruct(docs, fetch_docs)
+            except KeyError as error:
+                log.error(u"Missing base structures %s of delta encoded structures", error)
+                full_docs = []
+                for doc in docs:
+                    try:
+                        full_docs.extend(structure_delta.reconstruct([doc], fetch_docs))
+                    except KeyError:
+                        pass
+                return full_docs
 
     def get_course_index(self, key, ignore_case=False):
         """
@@ -521,9 +850,18 @@ class MongoConnection(object):
     def get_definition(self, key, course_context=None):
         """
         Get the definition from the persistence mechanism whose id is the given key
+
+        Definitions are immutable, so this method will use a process-local cached version
+        of the definition if one is configured (see get_local_definition_cache).
         """
         with TIMER.timer("get_definition", course_context) as tagger:
-            definition = self.definitions.find_one({'_id': key})
+            local_cache = get_local_definition_cache()
+            definition = local_cache.get(key) if local_cache is not None else None
+            tagger.tag(from_local_cache=str(definition is not None).lower())
+            if definition is None:
+                definition = self.definitions.find_one({'_id': key})
+                if local_cache is not None:
+                    _cache_definitions(local_cache, [definition])
             tagger.measure("fields", len(definition['fields']))
             tagger.tag(block_type=definition['block_type'])
             return definition
@@ -534,8 +872,25 @@ class MongoConnection(object):
         """
         with TIMER.timer("get_definitions", course_context) as tagger:
             tagger.measure('definitions', len(definitions))
-            definitions = self.definitions.find({'_id': {'$in': definitions}})
-            return definitions
+            local_cache = get_local_definition_cache()
+            if local_cache is None:
+                return self.definitions.find({'_id': {'$in': definitions}})
+
+            cached_definitions = []
+            uncached_ids = []
+            for definition_id in definitions:
+                definition = local_cache.get(definition_id)
+                if definition is None:
+                    uncached_ids.append(definition_id)
+                else:
+                    cached_definitions.append(definition)
+            tagger.measure('from_local_cache', len(cached_definitions))
+
+            if uncached_ids:
+                fetched_definitions = list(self.definitions.find({'_id': {'$in': uncached_ids}}))
+                _cache_definitions(local_cache, fetched_definitions)
+                cached_definitions.extend(fetched_definitions)
+            return cached_definitions
 
     def insert_definition(self, definition, course_context=None):
         """
@@ -86,6 +86,7 @@ from .caching_descriptor_system import CachingDescriptorSystem
 from xmodule.partitions.partitions_service import PartitionService
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, DuplicateKeyError
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
+from xmodule.modulestore.split_mongo.structure_index import get_structure_index
 from xmodule.modulestore.store_utilities import DETACHED_XBLOCK_TYPES
 from xmodule.error_module import ErrorDescriptor
 from collections import defaultdict
@@ -426,9 +427,9 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
         bulk_write_record = self._get_bulk_ops_record(course_key)
         if bulk_write_record.active:
             # Only query for the definitions that aren't already cached.
-            for definition in bulk_write_record.definitions.values():
-                definition_id = definition.get('_id')
-                if definition_id in ids:
+            for definition_id in list(ids):
+                definition = bulk_write_record.definitions.get(definition_id)
+                if definition is not None:
                     ids.remove(definition_id)
                     definitions.append(definition)
 
@@ -654,6 +655,9 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
     # It won't recompute the value on operations such as update_course_index (e.g., to revert to a prev
     # version) but those functions will have an optional arg for setting these.
     SEARCH_TARGET_DICT = ['wiki_slug']
+    # the class of the connection to the storage of the course indexes, structures and definitions,
+    # which is constructed with doc_store_config
+    db_connection_class = MongoConnection
 
     def __init__(self, contentstore, doc_store_config, fs_root, render_template,
                  default_class=None,
@@ -666,7 +670,7 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         super(SplitMongoModuleStore, self).__init__(contentstore, **kwargs)
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = self.db_connection_class(**doc_store_config)
 
         if default_class is not None:
             module_path, __, class_name = default_class.rpartition('.')
@@ -768,6 +772,29 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             system.module_data.update(new_module_data)
             return system.module_data
 
+    def prefetch_definitions(self, usage_key, depth=None):
+        """
+        Fetches the definitions of the block identified by usage_key and of its
+        descendants out to depth in a single query, so that loading them lazily,
+        e.g. when rendering the blocks, doesn't query them one by one.
+
+        The definitions are cached in the active bulk operation on the course,
+        so this should be called within one.  Outside a bulk operation, they
+        are only cached in the process-local definition cache, if configured.
+
+        Arguments:
+            usage_key: the block at the root of the subtree
+            depth: how deep below the block to prefetch (None for all descendants)
+        """
+        course_entry = self._lookup_course(usage_key.course_key)
+        blocks = self.descendants(course_entry.structure['blocks'], BlockKey.from_usage_key(usage_key), depth, {})
+        definition_ids = {
+            block.definition for block in blocks.itervalues()
+            if block.definition is not None and not block.definition_loaded
+        }
+        if definition_ids:
+            self.get_definitions(usage_key.course_key, list(definition_ids))
+
     @contract(course_entry=CourseEnvelope, block_keys="list(BlockKey)", depth="int | None")
     def _load_items(self, course_entry, block_keys, depth=0, **kwargs):
         """
@@ -1198,13 +1225,34 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 else:
                     return True
 
+        def _blocks_to_match(block_keys):
+            """
+            Returns the (block key, block) pairs of the given keys of blocks
+            which may match, or of all the blocks if block_keys is None
+            """
+            blocks = course.structure['blocks']
+            if block_keys is None:
+                return blocks.iteritems()
+            return ((block_key, blocks[block_key]) for block_key in block_keys)
+
         if settings is None:
             settings = {}
+        structure_index = self._get_structure_index(course_locator, course.structure)
         if 'name' in qualifiers:
             # odd case where we don't search just confirm
             block_name = qualifiers.pop('name')
             block_ids = []
-            for block_id, block in course.structure['blocks'].iteritems():
+            named_keys = None
+            if structure_index is not None:
+                if isinstance(block_name, six.string_types):
+                    named_keys = structure_index.keys_by_id.get(block_name, [])
+                elif isinstance(block_name, (list, tuple, set, frozenset)):
+                    named_keys = [
+                        block_key
+                        for name in set(block_name) if isinstance(name, six.string_types)
+                        for block_key in structure_index.keys_by_id.get(name, [])
+                    ]
+            for block_id, block in _blocks_to_match(named_keys):
                 # Don't do an in comparison blindly; first check to make sure
                 # that the name qualifier we're looking at isn't a plain string;
                 # if it is a string, then it should match exactly. If it's other
@@ -1235,7 +1283,11 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             path_cache = {}
             parents_cache = self.build_block_key_to_parents_mapping(course.structure)
 
-        for block_id, value in course.structure['blocks'].iteritems():
+        candidate_keys = None
+        if structure_index is not None:
+            candidate_keys = structure_index.candidate_keys(course.structure['blocks'], qualifiers, settings)
+
+        for block_id, value in _blocks_to_match(candidate_keys):
             if _block_matches_all(value):
                 if not include_orphans:
                     if (  # pylint: disable=bad-continuation
@@ -1251,6 +1303,16 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         else:
             return []
 
+    def _get_structure_index(self, course_key, structure):
+        """
+        Returns the StructureIndex of the given structure, or None if the structure
+        isn't stored yet and may still change in the active bulk operation on the course.
+        """
+        bulk_write_record = self._get_bulk_ops_record(course_key)
+        if bulk_write_record.active and structure['_id'] not in bulk_write_record.structures_in_db:
+            return None
+        return get_structure_index(structure)
+
     def build_block_key_to_parents_mapping(self, structure):
         """
         Given a structure, builds block_key to parents mapping for all block keys in structure
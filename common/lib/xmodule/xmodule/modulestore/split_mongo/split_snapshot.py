@@ -0,0 +1,74 @@
+"""
+A read-only modulestore which serves the published branch of split courses from
+their memory-mapped snapshots (see course_snapshot).
+
+It is meant to be configured in the LMS as one of the stores of the
+MixedModuleStore, with the courses it serves mapped to it, e.g.:
+
+    'stores': [
+        {
+            'NAME': 'snapshot',
+            'ENGINE': 'xmodule.modulestore.split_mongo.split_snapshot.SnapshotModuleStore',
+            'DOC_STORE_CONFIG': {'snapshot_root': '/edx/var/edxapp/course_snapshots'},
+            'OPTIONS': {...the OPTIONS of the split store...},
+        },
+        ...
+    ],
+    'mappings': {'course-v1:org+course+run': 'snapshot'},
+
+Courses without a snapshot, or whose snapshot can't be read, aren't found by
+this store, and the snapshots of courses are rebuilt by Studio when they are
+published (see COURSE_SNAPSHOT_ROOT).
+"""
+from collections import defaultdict
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.split_mongo.course_snapshot import SnapshotBlocks, SnapshotConnection
+from xmodule.modulestore.split_mongo.split_draft import DraftVersioningModuleStore
+
+
+class SnapshotModuleStore(DraftVersioningModuleStore):
+    """
+    A read-only split modulestore backed by course snapshots, which only have
+    a published branch and no history.
+    """
+    db_connection_class = SnapshotConnection
+
+    def get_modulestore_type(self, course_key=None):
+        """
+        Returns an enumeration-like type reflecting the type of this modulestore, per ModuleStoreEnum.Type.
+
+        Args:
+            course_key: just for signature compatibility
+        """
+        return ModuleStoreEnum.Type.snapshot
+
+    def heartbeat(self):
+        """
+        Check that the snapshots are readable.
+        """
+        return {ModuleStoreEnum.Type.snapshot: self.db_connection.heartbeat()}
+
+    def build_block_key_to_parents_mapping(self, structure):
+        """
+        Given a structure, builds block_key to parents mapping for all block keys in structure
+        and returns it, using the parents indexed in snapshots.
+        """
+        blocks = structure['blocks']
+        if not isinstance(blocks, SnapshotBlocks):
+            return super(SnapshotModuleStore, self).build_block_key_to_parents_mapping(structure)
+
+        children_to_parents = defaultdict(list)
+        for block_key in blocks:
+            children_to_parents[block_key].extend(blocks.parents(block_key))
+        return children_to_parents
+
+    def _get_parents_from_structure(self, block_key, structure):
+        """
+        Given a structure, find block_key's parent in that structure, using the
+        parents indexed in snapshots.
+        """
+        blocks = structure['blocks']
+        if not isinstance(blocks, SnapshotBlocks):
+            return super(SnapshotModuleStore, self)._get_parents_from_structure(block_key, structure)
+        return list(blocks.parents(block_key))
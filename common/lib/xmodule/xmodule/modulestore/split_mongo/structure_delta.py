@@ -0,0 +1,177 @@
+"""
+Delta encoding of split modulestore structure documents.
+
+A structure document may be stored either in full, as a snapshot, or
+as a delta against the structure it was derived from (its
+previous_version).  A delta document has all the top-level fields of
+the structure except 'blocks', and instead:
+
+    * delta_base: the id of the structure the delta is against,
+    * delta_depth: the number of deltas, including this one, that must
+      be applied to the nearest snapshot to reconstruct the structure,
+    * changed_blocks: the blocks that were added or changed,
+    * removed_blocks: the [block_type, block_id] of removed blocks.
+
+The functions in this module operate on documents in the format in
+which they are stored in mongo (see structure_to_mongo).
+"""
+import copy
+
+from bson import BSON
+
+DELTA_FIELDS = ('delta_base', 'delta_depth', 'changed_blocks', 'removed_blocks')
+
+
+def is_delta(doc):
+    """
+    Returns whether the given structure document is delta encoded.
+    """
+    return 'delta_base' in doc
+
+
+def delta_depth(doc):
+    """
+    Returns the delta depth of the given structure document, which is 0
+    for snapshots.
+    """
+    return doc.get('delta_depth', 0)
+
+
+def encode_delta(doc, base_doc, depth):
+    """
+    Returns the delta document of the given full structure document
+    against the given full base document, with the given delta depth,
+    or None if the delta isn't smaller than the full document.
+    """
+    base_blocks = _blocks_by_key(base_doc['blocks'])
+    blocks = _blocks_by_key(doc['blocks'])
+
+    changed_blocks = [
+        block for block_key, block in blocks.iteritems()
+        if block_key not in base_blocks or _as_stored(base_blocks[block_key]) != _as_stored(block)
+    ]
+    removed_blocks = [list(block_key) for block_key in base_blocks.viewkeys() - blocks.viewkeys()]
+    if len(changed_blocks) + len(removed_blocks) >= len(blocks):
+        return None
+
+    delta_doc = {key: value for key, value in doc.iteritems() if key != 'blocks'}
+    delta_doc.update({
+        'delta_base': base_doc['_id'],
+        'delta_depth': depth,
+        'changed_blocks': changed_blocks,
+        'removed_blocks': removed_blocks,
+    })
+    return delta_doc
+
+
+def reconstruct(docs, fetch_docs):
+    """
+    Returns the full structure documents of the given structure
+    documents, in the same order, reconstructing the delta encoded ones.
+
+    Arguments:
+        docs (list): Structure documents, each either full or delta
+            encoded.
+        fetch_docs (function): Returns the structure documents with the
+            given list of ids, and is called with the ids of the base
+            documents that are needed, one level of deltas at a time.
+
+    Raises:
+        KeyError: If the base of a delta encoded document doesn't exist.
+    """
+    known_docs = {doc['_id']: doc for doc in docs}
+    missing_ids = _missing_base_ids(known_docs.itervalues(), known_docs)
+    while missing_ids:
+        fetched_docs = list(fetch_docs(list(missing_ids)))
+        known_docs.update((doc['_id'], doc) for doc in fetched_docs)
+        if missing_ids - known_docs.viewkeys():
+            raise KeyError(missing_ids - known_docs.viewkeys())
+        missing_ids = _missing_base_ids(fetched_docs, known_docs)
+
+    blocks_by_id = {}
+    return [
+        _full_doc(doc, _resolve_blocks(doc, known_docs, blocks_by_id)) if is_delta(doc) else doc
+        for doc in docs
+    ]
+
+
+def apply_delta(delta_doc, base_doc):
+    """
+    Returns the full structure document of the given delta document,
+    whose base is the given full document.
+    """
+    blocks = _blocks_by_key(base_doc['blocks'])
+    _apply_block_changes(blocks, delta_doc)
+    return _full_doc(delta_doc, blocks)
+
+
+def _missing_base_ids(docs, known_docs):
+    """
+    Returns the set of the ids of the bases of the given delta
+    documents that aren't known yet.
+    """
+    return {
+        doc['delta_base'] for doc in docs
+        if is_delta(doc) and doc['delta_base'] not in known_docs
+    }
+
+
+def _resolve_blocks(doc, known_docs, blocks_by_id):
+    """
+    Returns a dict of block key to block of the full structure of the
+    given document, memoizing those of the documents along its chain of
+    deltas in blocks_by_id.
+    """
+    chain = []
+    while is_delta(doc) and doc['_id'] not in blocks_by_id:
+        chain.append(doc)
+        doc = known_docs[doc['delta_base']]
+    if doc['_id'] not in blocks_by_id:
+        blocks_by_id[doc['_id']] = _blocks_by_key(doc['blocks'])
+
+    blocks = blocks_by_id[doc['_id']]
+    for delta_doc in reversed(chain):
+        blocks = dict(blocks)
+        _apply_block_changes(blocks, delta_doc)
+        blocks_by_id[delta_doc['_id']] = blocks
+    return blocks
+
+
+def _apply_block_changes(blocks, delta_doc):
+    """
+    Applies the changed and removed blocks of the given delta document
+    to the given dict of block key to block.
+    """
+    for block_type, block_id in delta_doc['removed_blocks']:
+        blocks.pop((block_type, block_id), None)
+    blocks.update(_blocks_by_key(delta_doc['changed_blocks']))
+
+
+def _full_doc(delta_doc, blocks):
+    """
+    Returns the full structure document of the given delta document,
+    with the given dict of block key to block.
+
+    The blocks are copied, since they are shared with other documents
+    and structure_from_mongo converts them in place.
+    """
+    doc = {key: value for key, value in delta_doc.iteritems() if key not in DELTA_FIELDS}
+    doc['blocks'] = copy.deepcopy(blocks.values())
+    return doc
+
+
+def _as_stored(block):
+    """
+    Returns the given block as it reads back from mongo, so that blocks
+    read from mongo compare equal to those about to be written, which
+    may have tuples instead of lists and finer-grained datetimes.
+    """
+    return BSON(BSON.encode(block)).decode()
+
+
+def _blocks_by_key(blocks):
+    """
+    Returns a dict of (block_type, block_id) to block for the given
+    list of blocks.
+    """
+    return {(block['block_type'], block['block_id']): block for block in blocks}
@@ -0,0 +1,148 @@
+"""
+Secondary indexes of the blocks of split modulestore structures.
+
+get_items matches its qualifiers against every block of a structure.  A
+StructureIndex maps block types and ids, and the values of the settings
+fields that are queried, to the keys of the blocks which have them, so that
+get_items only has to match the qualifiers against those blocks.
+
+Structures stored in the db never change, so the index of a structure is
+computed once per process and cached by structure id.  The index only narrows
+down the blocks to match, so queries it can't serve (regexes, functions,
+$exists, $nin...) fall back to matching every block.
+"""
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+# Number of structure indexes cached per process.
+INDEX_CACHE_SIZE = 100
+
+_INDEX_CACHE = OrderedDict()
+_INDEX_CACHE_LOCK = threading.Lock()
+
+
+class StructureIndex(object):
+    """
+    The secondary indexes of the blocks of a structure.
+
+    The indexes of settings fields are built when the field is first queried,
+    from the blocks of the structure passed to the query, since the index
+    doesn't keep the structure in memory.
+    """
+    def __init__(self, blocks):
+        self.keys_by_type = defaultdict(list)
+        self.keys_by_id = defaultdict(list)
+        for block_key in blocks:
+            self.keys_by_type[block_key.type].append(block_key)
+            self.keys_by_id[block_key.id].append(block_key)
+        self._keys_by_field_value = {}
+
+    def keys_by_field_value(self, field_name, blocks):
+        """
+        Returns a dict of each hashable value of the given settings field, or
+        of the elements of its list values, to the set of the keys of the
+        blocks which have it.
+        """
+        index = self._keys_by_field_value.get(field_name)
+        if index is None:
+            index = defaultdict(set)
+            for block_key, block in blocks.iteritems():
+                if field_name in block.fields:
+                    _index_value(index, block.fields[field_name], block_key)
+            self._keys_by_field_value[field_name] = index
+        return index
+
+    def candidate_keys(self, blocks, qualifiers, settings):
+        """
+        Returns the set of the keys of the blocks which may match the given
+        get_items qualifiers and settings, or None if the index can't narrow
+        them down.  The qualifiers must still be matched against the blocks.
+        """
+        candidates = None
+        if 'block_type' in qualifiers:
+            candidates = _lookup(self.keys_by_type, qualifiers['block_type'])
+
+        for field_name, criteria in settings.iteritems():
+            if _lookup_values(criteria) is None:
+                continue
+            keys = _lookup(self.keys_by_field_value(field_name, blocks), criteria)
+            candidates = keys if candidates is None else candidates & keys
+        return candidates
+
+
+def get_structure_index(structure):
+    """
+    Returns the StructureIndex of the given structure, which must be stored in
+    the db, computing it if it isn't cached.
+    """
+    structure_id = structure['_id']
+    with _INDEX_CACHE_LOCK:
+        structure_index = _INDEX_CACHE.pop(structure_id, None)
+        if structure_index is not None:
+            _INDEX_CACHE[structure_id] = structure_index
+            return structure_index
+
+    structure_index = StructureIndex(structure['blocks'])
+    with _INDEX_CACHE_LOCK:
+        _INDEX_CACHE[structure_id] = structure_index
+        while len(_INDEX_CACHE) > INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+    return structure_index
+
+
+def _index_value(index, value, block_key):
+    """
+    Adds the given block key to the index under the given field value, or
+    under each of its elements if it is a list.
+    """
+    if isinstance(value, list):
+        for element in value:
+            _index_value(index, element, block_key)
+    elif _is_hashable(value):
+        index[value].add(block_key)
+
+
+def _lookup(index, criteria):
+    """
+    Returns the set of the keys in the given index under the values which
+    match the given criteria, or None if they can't be looked up.
+    """
+    values = _lookup_values(criteria)
+    if values is None:
+        return None
+    keys = set()
+    for value in values:
+        keys.update(index.get(value, ()))
+    return keys
+
+
+def _lookup_values(criteria):
+    """
+    Returns the list of the values which a field must have, or have an element
+    equal to, to match the given get_items criteria, or None if the criteria
+    isn't an equality or $in test of hashable values.
+    """
+    if isinstance(criteria, dict):
+        if criteria.keys() != ['$in']:
+            return None
+        values = list(criteria['$in'])
+    else:
+        values = [criteria]
+
+    for value in values:
+        is_pattern = isinstance(value, re._pattern_type)  # pylint: disable=protected-access
+        if is_pattern or callable(value) or not _is_hashable(value):
+            return None
+    return values
+
+
+def _is_hashable(value):
+    """
+    Returns whether the given value can be a dict key.
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
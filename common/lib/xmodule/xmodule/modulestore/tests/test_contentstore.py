@@ -1,6 +1,7 @@
 """
  Test contentstore.mongo functionality
 """
+import itertools
 import logging
 from uuid import uuid4
 import unittest
@@ -123,8 +124,9 @@ class TestContentstore(unittest.TestCase):
             "Found unknown asset {}".format(unknown_asset)
         )
 
-    @ddt.data(True, False)
-    def test_export_for_course(self, deprecated):
+    @ddt.data(*itertools.product((True, False), (1, 4)))
+    @ddt.unpack
+    def test_export_for_course(self, deprecated, num_workers):
         """
         Test export
         """
@@ -134,6 +136,7 @@ class TestContentstore(unittest.TestCase):
             self.contentstore.export_all_for_course(
                 self.course1_key, root_dir,
                 path.Path(root_dir / "policy.json"),
+                num_workers=num_workers,
             )
             for filename in self.course1_files:
                 filepath = path.Path(root_dir / filename)
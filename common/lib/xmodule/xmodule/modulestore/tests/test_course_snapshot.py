@@ -0,0 +1,218 @@
+"""
+Tests for the memory-mapped snapshots of split modulestore courses.
+"""
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+from bson.objectid import ObjectId
+from mock import patch
+from opaque_keys.edx.locator import CourseLocator
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.mixed import MixedModuleStore
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.course_snapshot import (
+    CourseSnapshot,
+    SnapshotConnection,
+    build_snapshot,
+    snapshot_path,
+    write_snapshot,
+)
+from xmodule.modulestore.split_mongo.split_snapshot import SnapshotModuleStore
+from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.tests.test_split_structure_delta import make_structure
+from xmodule.modulestore.tests.utils import MixedSplitTestCase, create_modulestore_instance
+
+
+class TestCourseSnapshot(unittest.TestCase):
+    """
+    Tests for writing and reading course snapshots.
+    """
+    def setUp(self):
+        super(TestCourseSnapshot, self).setUp()
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root)
+
+        self.course_key = CourseLocator('org', 'course', 'run')
+        self.structure = make_structure(num_blocks=3)
+        self.definitions = [
+            {'_id': block.definition, 'block_type': 'html', 'fields': {'data': u'<p>{}</p>'.format(block_key.id)}}
+            for block_key, block in self.structure['blocks'].iteritems()
+            if block.definition is not None
+        ]
+        self._write_snapshot(self.structure)
+
+    def _write_snapshot(self, structure):
+        """
+        Writes the snapshot of the given structure as the published branch of the course.
+        """
+        course_index = {
+            '_id': ObjectId(),
+            'org': 'org',
+            'course': 'course',
+            'run': 'run',
+            'versions': {ModuleStoreEnum.BranchName.published: structure['_id']},
+        }
+        write_snapshot(snapshot_path(self.snapshot_root, self.course_key), course_index, structure, self.definitions)
+
+    def test_read_snapshot(self):
+        snapshot = CourseSnapshot(snapshot_path(self.snapshot_root, self.course_key))
+        self.assertEqual(snapshot.structure_id, self.structure['_id'])
+        self.assertEqual(
+            snapshot.course_index['versions'], {ModuleStoreEnum.BranchName.published: self.structure['_id']},
+        )
+
+        structure = snapshot.structure()
+        self.assertEqual(structure['root'], BlockKey('course', 'course'))
+        self.assertEqual(set(structure['blocks']), set(self.structure['blocks']))
+
+        course_block = structure['blocks'][BlockKey('course', 'course')]
+        html_keys = sorted(block_key for block_key in self.structure['blocks'] if block_key.type == 'html')
+        self.assertEqual(course_block.fields['children'], html_keys)
+        self.assertFalse(course_block.definition_loaded)
+
+        # the fields of the definitions of blocks are loaded with them
+        html_block = structure['blocks'][BlockKey('html', 'html1')]
+        self.assertTrue(html_block.definition_loaded)
+        self.assertEqual(html_block.fields, {'display_name': 'Html 1', 'data': u'<p>html1</p>'})
+        self.assertEqual(html_block.edit_info.update_version, self.structure['_id'])
+
+        self.assertEqual(structure['blocks'].parents(BlockKey('html', 'html1')), [BlockKey('course', 'course')])
+        self.assertEqual(structure['blocks'].parents(BlockKey('course', 'course')), [])
+        self.assertNotIn(BlockKey('html', 'html3'), structure['blocks'])
+        with self.assertRaises(KeyError):
+            structure['blocks'][BlockKey('html', 'html3')]  # pylint: disable=pointless-statement
+
+    def test_connection(self):
+        connection = SnapshotConnection(snapshot_root=self.snapshot_root, stat_interval=0)
+        self.assertTrue(connection.heartbeat())
+        self.assertIsNone(connection.get_course_index(CourseLocator('org', 'other', 'run')))
+
+        course_index = connection.get_course_index(self.course_key.for_branch(ModuleStoreEnum.BranchName.published))
+        version_guid = course_index['versions'][ModuleStoreEnum.BranchName.published]
+        structure = connection.get_structure(version_guid, self.course_key)
+        self.assertEqual(structure['_id'], self.structure['_id'])
+        self.assertEqual(
+            connection.find_course_blocks_by_id([version_guid])[0]['blocks'].keys(), [BlockKey('course', 'course')],
+        )
+        self.assertEqual(connection.get_definitions([self.definitions[0]['_id'], ObjectId()]), self.definitions[:1])
+
+        with self.assertRaises(NotImplementedError):
+            connection.insert_structure(structure)
+
+        # a rebuilt snapshot replaces the previous one, which stays readable
+        new_structure = make_structure(self.structure, changed=[0])
+        self._write_snapshot(new_structure)
+        course_index = connection.get_course_index(self.course_key)
+        self.assertEqual(course_index['versions'][ModuleStoreEnum.BranchName.published], new_structure['_id'])
+        self.assertEqual(connection.get_structure(version_guid, self.course_key)['_id'], version_guid)
+        self.assertEqual(
+            structure['blocks'][BlockKey('html', 'html0')].fields['display_name'], 'Html 0',
+        )
+        self.assertEqual(
+            connection.get_structure(new_structure['_id'])['blocks'][BlockKey('html', 'html0')].fields['display_name'],
+            'Html 0 in {}'.format(new_structure['_id']),
+        )
+
+        # until it is replaced in turn, and its structures are no longer used
+        self._write_snapshot(make_structure(new_structure, changed=[1]))
+        connection.get_course_index(self.course_key)
+        self.assertEqual(connection.get_structure(version_guid)['_id'], version_guid)
+        del structure
+        gc.collect()
+        self.assertIsNone(connection.get_structure(version_guid))
+
+    def test_stat_interval(self):
+        connection = SnapshotConnection(snapshot_root=self.snapshot_root, stat_interval=60)
+        connection.get_course_index(self.course_key)
+        self._write_snapshot(make_structure(self.structure, changed=[0]))
+        with patch.object(os, 'stat', wraps=os.stat) as mock_stat:
+            course_index = connection.get_course_index(self.course_key)
+        self.assertFalse(mock_stat.called)
+        self.assertEqual(course_index['versions'][ModuleStoreEnum.BranchName.published], self.structure['_id'])
+
+
+class TestSnapshotModuleStore(MixedSplitTestCase):
+    """
+    Tests that courses read through a SnapshotModuleStore, on its own or mapped
+    in a MixedModuleStore, match their published branch read from split.
+    """
+    def setUp(self):
+        super(TestSnapshotModuleStore, self).setUp()
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root)
+
+        self.course = CourseFactory.create(modulestore=self.store)
+        chapter = self.make_block('chapter', self.course)
+        sequential = self.make_block('sequential', chapter)
+        self.html = self.make_block('html', sequential, data=u'<p>Original</p>')
+        self.store.publish(self.course.location, self.user_id)
+        self._build_snapshot()
+
+        snapshot_config = {'snapshot_root': self.snapshot_root, 'stat_interval': 0}
+        self.snapshot_store = SnapshotModuleStore(
+            None,
+            snapshot_config,
+            branch_setting_func=lambda: ModuleStoreEnum.Branch.published_only,
+            **self.modulestore_options
+        )
+        self.mixed_store = MixedModuleStore(
+            None,
+            create_modulestore_instance=create_modulestore_instance,
+            mappings={unicode(self.course.id): 'snapshot'},
+            stores=self.MIXED_OPTIONS['stores'] + [{
+                'NAME': 'snapshot',
+                'ENGINE': 'xmodule.modulestore.split_mongo.split_snapshot.SnapshotModuleStore',
+                'DOC_STORE_CONFIG': snapshot_config,
+                'OPTIONS': dict(self.modulestore_options),
+            }],
+        )
+
+    def _build_snapshot(self):
+        """
+        Builds the snapshot of the published branch of the course.
+        """
+        # pylint: disable=protected-access
+        split_store = self.store._get_modulestore_by_type(ModuleStoreEnum.Type.split)
+        build_snapshot(split_store.db_connection, self.course.id, self.snapshot_root)
+
+    def _published_course(self, store):
+        """
+        Returns what the given store reads of the published branch of the course.
+        """
+        with store.branch_setting(ModuleStoreEnum.Branch.published_only, self.course.id):
+            course = store.get_course(self.course.id)
+            html = store.get_item(self.html.location)
+            return {
+                'course': (course.display_name, [child.block_id for child in course.children]),
+                'html': (html.display_name, html.data),
+                'parent': store.get_parent_location(self.html.location).block_id,
+            }
+
+    def _assert_courses_match(self):
+        """
+        Asserts that the snapshot and mixed stores read the course as split does.
+        """
+        published_course = self._published_course(self.store)
+        self.assertEqual(self._published_course(self.snapshot_store), published_course)
+        self.assertEqual(self._published_course(self.mixed_store), published_course)
+        return published_course
+
+    def test_read_course(self):
+        self.assertEqual(
+            self.mixed_store.get_modulestore_type(self.course.id), ModuleStoreEnum.Type.snapshot,
+        )
+        self.assertEqual(self._assert_courses_match()['html'][1], u'<p>Original</p>')
+
+    def test_read_course_after_publish(self):
+        self._assert_courses_match()
+
+        self.html.data = u'<p>Changed</p>'
+        self.store.update_item(self.html, self.user_id)
+        self.store.publish(self.html.location, self.user_id)
+        self._build_snapshot()
+
+        self.assertEqual(self._assert_courses_match()['html'][1], u'<p>Changed</p>')
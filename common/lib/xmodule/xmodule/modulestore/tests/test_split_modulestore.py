@@ -2,6 +2,7 @@
     Test split modulestore w/o using any django stuff.
 """
 from mock import patch
+import cPickle as pickle
 import datetime
 from importlib import import_module
 from path import Path as path
@@ -20,9 +21,10 @@ from django.conf import settings
 if not settings.configured:
     settings.configure()
 from django.core.cache import caches, InvalidCacheBackendError
+from django.test.utils import override_settings
 
 from openedx.core.lib import tempdir
-from xblock.fields import Reference, ReferenceList, ReferenceValueDict
+from xblock.fields import Reference, ReferenceList, ReferenceValueDict, Scope
 from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.exceptions import (
@@ -35,7 +37,9 @@ from ccx_keys.locator import CCXBlockUsageLocator
 from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
+from xmodule.modulestore.split_mongo.mongo_connection import LocalDocumentCache
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.split_mongo.structure_index import get_structure_index
 from xmodule.modulestore.tests.test_modulestore import check_has_course_method
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.modulestore.tests.factories import check_mongo_calls
@@ -1005,6 +1009,82 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(cached_structure, not_cached_structure)
 
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_local_cache(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        for share_decoded in (False, True):
+            with override_settings(
+                COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES=10 ** 7,
+                COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED=share_decoded,
+            ):
+                with check_mongo_calls(1):
+                    not_cached_structure = self._get_structure(self.new_course)
+
+                # the structure is now served from the process-local cache,
+                # without going to the django cache
+                self.cache.clear()
+                with check_mongo_calls(0):
+                    cached_structure = self._get_structure(self.new_course)
+                self.assertEqual(cached_structure, not_cached_structure)
+                self.assertIsNot(cached_structure, self._get_structure(self.new_course))
+            self.cache.clear()
+
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_local_cache_shared_structure_unchanged(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        with override_settings(
+            COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES=10 ** 7,
+            COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED=True,
+        ):
+            not_cached_structure = self._get_structure(self.new_course)
+            for _ in range(2):
+                # modify the structure as split does when it loads its blocks
+                structure = self._get_structure(self.new_course)
+                root = structure['blocks'][structure['root']]
+                root.fields.update({'display_name': 'Modified'})
+                root.definition_loaded = True
+                root.edit_info._subtree_edited_on = datetime.datetime.now()  # pylint: disable=protected-access
+                del structure['blocks'][structure['root']]
+
+            structure = self._get_structure(self.new_course)
+            self.assertEqual(structure, not_cached_structure)
+            self.assertFalse(structure['blocks'][structure['root']].definition_loaded)
+        self.cache.clear()
+
+    def test_local_definition_cache(self):
+        structure = self._get_structure(self.new_course)
+        definition_id = structure['blocks'][structure['root']].definition
+        db_connection = modulestore().db_connection
+
+        with override_settings(COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES=10 ** 6):
+            with check_mongo_calls(1):
+                definition = db_connection.get_definition(definition_id)
+
+            # definitions are immutable, so they are served from the process-local cache
+            with check_mongo_calls(0):
+                self.assertEqual(db_connection.get_definition(definition_id), definition)
+                self.assertEqual(db_connection.get_definitions([definition_id]), [definition])
+
+    def test_local_cache_eviction(self):
+        local_cache = LocalDocumentCache(max_bytes=15)
+        local_cache.set('a', pickle.dumps('a'), 'a')
+        self.assertEqual(local_cache.get('a'), 'a')
+
+        # structures larger than the cache are not cached
+        local_cache.set('large', pickle.dumps('x' * 20))
+        self.assertIsNone(local_cache.get('large'))
+
+        # the least recently used structures are evicted first
+        local_cache.set('b', pickle.dumps('b'))
+        self.assertEqual(local_cache.get('a'), 'a')
+        local_cache.set('c', pickle.dumps('c'))
+        self.assertIsNone(local_cache.get('b'))
+        self.assertEqual(local_cache.get('a'), 'a')
+        self.assertEqual(local_cache.get('c'), 'c')
+        self.assertLessEqual(local_cache.size, 15)
+
     def _get_structure(self, course):
         """
         Helper function to get a structure from a course.
@@ -1084,6 +1164,26 @@ class SplitModuleItemTests(SplitModuleTest):
         )
         self.assertFalse(modulestore().has_item(locator))
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_prefetch_definitions(self, _from_json):
+        store = modulestore()
+        course_key = CourseLocator(org='testx', course='GreekHero', run='run', branch=BRANCH_NAME_DRAFT)
+        with store.bulk_operations(course_key):
+            get_definitions = store.db_connection.get_definitions
+            with patch.object(store.db_connection, 'get_definitions', wraps=get_definitions) as mock:
+                store.prefetch_definitions(BlockUsageLocator(course_key, 'course', 'head12345'))
+            self.assertEqual(mock.call_count, 1)
+
+            # loading the definitions of the blocks doesn't query them one by one
+            with patch.object(store.db_connection, 'get_definition') as mock_get_definition:
+                chapter = store.get_item(BlockUsageLocator(course_key, 'chapter', 'chapter3'), depth=None)
+                blocks = [chapter]
+                while blocks:
+                    block = blocks.pop()
+                    block.get_explicitly_set_fields_by_scope(Scope.content)
+                    blocks.extend(block.get_children())
+            self.assertFalse(mock_get_definition.called)
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_get_item(self, _from_json):
         '''
@@ -1227,6 +1327,31 @@ class SplitModuleItemTests(SplitModuleTest):
         matches = modulestore().get_items(locator, settings={'group_access': {'$exists': False}})
         self.assertEqual(len(matches), 7)
 
+    def test_get_items_with_structure_index(self):
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        queries = [
+            {'qualifiers': {'category': 'chapter'}},
+            {'qualifiers': {'category': {'$in': ['chapter', 'problem']}}},
+            {'qualifiers': {'category': 'garbage'}},
+            {'qualifiers': {'name': 'chapter1'}},
+            {'qualifiers': {'name': ['chapter1', 'chapter2', 'garbage']}},
+            {'qualifiers': {'category': 'chapter'}, 'settings': {'display_name': 'Hera heckles Hercules'}},
+            {'qualifiers': {'category': 'chapter'}, 'settings': {'display_name': re.compile(r'Hera')}},
+            {'settings': {'display_name': {'$in': ['Hera heckles Hercules', 'Hera cuckolds Zeus']}}},
+            {'qualifiers': {'children': BlockKey('chapter', 'chapter1')}},
+            {'settings': {'group_access': {'$exists': False}}},
+        ]
+        for query in queries:
+            with patch.object(SplitMongoModuleStore, '_get_structure_index', return_value=None):
+                scanned = {item.location for item in modulestore().get_items(locator, **query)}
+            with patch(
+                'xmodule.modulestore.split_mongo.split.get_structure_index',
+                wraps=get_structure_index,
+            ) as mock_get_structure_index:
+                indexed = {item.location for item in modulestore().get_items(locator, **query)}
+            self.assertEqual(indexed, scanned, query)
+            self.assertEqual(mock_get_structure_index.call_count, 1)
+
     def test_get_parents(self):
         '''
         get_parent_location(locator): BlockUsageLocator
@@ -0,0 +1,205 @@
+"""
+Tests for the delta encoded storage of split modulestore structures.
+"""
+import copy
+import datetime
+import unittest
+import uuid
+
+from bson.objectid import ObjectId
+from mock import patch
+from nose.plugins.attrib import attr
+
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey, structure_delta
+from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, structure_to_mongo
+from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
+
+
+def make_structure(previous_structure=None, num_blocks=10, changed=(), removed=()):
+    """
+    Returns a new structure with num_blocks html blocks under a course
+    block, derived from previous_structure if given, with the html
+    blocks at the given indexes changed or removed.
+    """
+    structure_id = ObjectId()
+    if previous_structure is None:
+        blocks = {
+            BlockKey('html', 'html{}'.format(index)): BlockData(
+                block_type='html',
+                definition=ObjectId(),
+                fields={'display_name': 'Html {}'.format(index)},
+                edit_info={'update_version': structure_id},
+            )
+            for index in range(num_blocks)
+        }
+        blocks[BlockKey('course', 'course')] = BlockData(
+            block_type='course', fields={'children': sorted(blocks.keys())}, edit_info={},
+        )
+        return {
+            '_id': structure_id,
+            'root': BlockKey('course', 'course'),
+            'previous_version': None,
+            'original_version': structure_id,
+            'edited_by': 1,
+            'edited_on': datetime.datetime(2017, 1, 1),
+            'blocks': blocks,
+            'schema_version': 1,
+        }
+
+    structure = copy.deepcopy(previous_structure)
+    structure['_id'] = structure_id
+    structure['previous_version'] = previous_structure['_id']
+    for index in changed:
+        block = structure['blocks'][BlockKey('html', 'html{}'.format(index))]
+        block.fields['display_name'] = 'Html {} in {}'.format(index, structure_id)
+        block.edit_info.update_version = structure_id
+    for index in removed:
+        del structure['blocks'][BlockKey('html', 'html{}'.format(index))]
+    return structure
+
+
+class TestStructureDelta(unittest.TestCase):
+    """
+    Tests for encoding and reconstructing delta encoded structure documents.
+    """
+    def setUp(self):
+        super(TestStructureDelta, self).setUp()
+        structures = [make_structure()]
+        structures.append(make_structure(structures[-1], changed=[1]))
+        structures.append(make_structure(structures[-1], changed=[1, 2], removed=[3]))
+        self.docs = [structure_to_mongo(structure) for structure in structures]
+
+    def _sorted_blocks(self, doc):
+        """
+        Returns the given structure document with its blocks sorted.
+        """
+        doc = dict(doc)
+        doc['blocks'] = sorted(
+            structure_delta._as_stored(block)  # pylint: disable=protected-access
+            for block in doc['blocks']
+        )
+        return doc
+
+    def test_encode_delta(self):
+        delta_doc = structure_delta.encode_delta(self.docs[2], self.docs[1], 2)
+        self.assertTrue(structure_delta.is_delta(delta_doc))
+        self.assertEqual(structure_delta.delta_depth(delta_doc), 2)
+        self.assertEqual(delta_doc['delta_base'], self.docs[1]['_id'])
+        self.assertEqual(len(delta_doc['changed_blocks']), 2)
+        self.assertEqual(delta_doc['removed_blocks'], [['html', 'html3']])
+        self.assertNotIn('blocks', delta_doc)
+
+    def test_encode_delta_not_smaller(self):
+        structure = make_structure(num_blocks=2)
+        changed = structure_to_mongo(make_structure(structure, changed=[0], removed=[1]))
+        self.assertIsNone(structure_delta.encode_delta(changed, structure_to_mongo(structure), 1))
+
+    def test_reconstruct(self):
+        stored_docs = {
+            self.docs[0]['_id']: self.docs[0],
+            self.docs[1]['_id']: structure_delta.encode_delta(self.docs[1], self.docs[0], 1),
+            self.docs[2]['_id']: structure_delta.encode_delta(self.docs[2], self.docs[1], 2),
+        }
+        fetched_ids = []
+
+        def _fetch_docs(ids):
+            """
+            Returns the stored documents with the given ids.
+            """
+            fetched_ids.append(sorted(ids))
+            return [stored_docs[structure_id] for structure_id in ids]
+
+        full_docs = structure_delta.reconstruct([stored_docs[self.docs[2]['_id']]], _fetch_docs)
+        self.assertEqual(self._sorted_blocks(full_docs[0]), self._sorted_blocks(self.docs[2]))
+        self.assertEqual(fetched_ids, [[self.docs[1]['_id']], [self.docs[0]['_id']]])
+
+        with self.assertRaises(KeyError):
+            structure_delta.reconstruct([stored_docs[self.docs[2]['_id']]], lambda ids: [])
+
+
+@attr('mongo')
+class TestDeltaEncodedStorage(unittest.TestCase):
+    """
+    Tests that structures stored by a MongoConnection with a snapshot
+    interval read back the same.
+    """
+    def setUp(self):
+        super(TestDeltaEncodedStorage, self).setUp()
+        self.connection = MongoConnection(
+            db='test_xmodule',
+            collection='modulestore{0}'.format(uuid.uuid4().hex[:5]),
+            host=MONGO_HOST,
+            port=MONGO_PORT_NUM,
+            structure_snapshot_interval=3,
+        )
+        self.addCleanup(self.connection._drop_database, database=False)  # pylint: disable=protected-access
+
+        self.structures = [make_structure()]
+        for index in range(5):
+            self.structures.append(make_structure(self.structures[-1], changed=[index], removed=[index + 5]))
+        for structure in self.structures:
+            self.connection.insert_structure(copy.deepcopy(structure))
+
+    def _stored_depths(self):
+        """
+        Returns the delta depths of the stored structures, in order.
+        """
+        stored_docs = {doc['_id']: doc for doc in self.connection.structures.find()}
+        return [structure_delta.delta_depth(stored_docs[structure['_id']]) for structure in self.structures]
+
+    def _assert_structures_read_back(self):
+        """
+        Asserts that the structures read back as they were inserted.
+        """
+        ids = [structure['_id'] for structure in self.structures]
+        read_structures = {
+            structure['_id']: structure
+            for structure in self.connection.find_structures_by_id(ids)
+        }
+        for structure in self.structures:
+            self.assertEqual(
+                {key: block.to_storable() for key, block in read_structures[structure['_id']]['blocks'].iteritems()},
+                {key: block.to_storable() for key, block in structure['blocks'].iteritems()},
+            )
+
+        course_blocks = self.connection.find_course_blocks_by_id(ids)
+        self.assertEqual(len(course_blocks), len(ids))
+        for structure in course_blocks:
+            self.assertEqual(structure['blocks'].keys(), [BlockKey('course', 'course')])
+
+    def test_insert_structure(self):
+        self.assertEqual(self._stored_depths(), [0, 1, 2, 0, 1, 2])
+        self._assert_structures_read_back()
+
+        ancestors = self.connection.find_ancestor_structures(
+            self.structures[0]['_id'], BlockKey('html', 'html5'),
+        )
+        # html5 is removed from the second structure onwards.
+        self.assertEqual([structure['_id'] for structure in ancestors], [self.structures[0]['_id']])
+
+    def test_find_ancestor_structures_reconstructs_changes(self):
+        with patch.object(structure_delta, 'reconstruct', wraps=structure_delta.reconstruct) as mock_reconstruct:
+            ancestors = self.connection.find_ancestor_structures(
+                self.structures[0]['_id'], BlockKey('html', 'html1'),
+            )
+        # html1 is in the snapshots, and changed by the delta of the third structure.
+        self.assertItemsEqual(
+            [structure['_id'] for structure in ancestors],
+            [self.structures[index]['_id'] for index in (0, 2, 3)],
+        )
+        self.assertEqual(
+            [doc['_id'] for doc in mock_reconstruct.call_args[0][0] if structure_delta.is_delta(doc)],
+            [self.structures[2]['_id']],
+        )
+
+    def test_compact_structures(self):
+        original_version = self.structures[0]['_id']
+
+        self.assertEqual(self.connection.compact_structures(original_version, snapshot_interval=1), 4)
+        self.assertEqual(self._stored_depths(), [0] * 6)
+        self._assert_structures_read_back()
+
+        self.assertEqual(self.connection.compact_structures(original_version, snapshot_interval=6), 5)
+        self.assertEqual(self._stored_depths(), [0, 1, 2, 3, 4, 5])
+        self._assert_structures_read_back()
@@ -0,0 +1,61 @@
+"""
+Tests for the secondary indexes of split modulestore structures.
+"""
+import re
+import unittest
+
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_index import StructureIndex, get_structure_index
+from xmodule.modulestore.tests.test_split_structure_delta import make_structure
+
+
+class TestStructureIndex(unittest.TestCase):
+    """
+    Tests for looking up the blocks of a structure which may match get_items qualifiers.
+    """
+    def setUp(self):
+        super(TestStructureIndex, self).setUp()
+        self.structure = make_structure(num_blocks=4)
+        self.blocks = self.structure['blocks']
+        self.blocks[BlockKey('html', 'html0')].fields['tags'] = ['a', ['b']]
+        self.blocks[BlockKey('html', 'html1')].fields['tags'] = ['b', {'c': 1}]
+        self.structure_index = StructureIndex(self.blocks)
+
+    def _candidate_keys(self, qualifiers=None, settings=None):
+        """
+        Returns the candidate keys of the given qualifiers and settings.
+        """
+        return self.structure_index.candidate_keys(self.blocks, qualifiers or {}, settings or {})
+
+    def test_block_type(self):
+        self.assertEqual(self._candidate_keys({'block_type': 'course'}), {BlockKey('course', 'course')})
+        self.assertEqual(
+            self._candidate_keys({'block_type': {'$in': ['course', 'problem']}}), {BlockKey('course', 'course')},
+        )
+        self.assertEqual(len(self._candidate_keys({'block_type': 'html'})), 4)
+        self.assertEqual(self._candidate_keys({'block_type': 'garbage'}), set())
+        self.assertIsNone(self._candidate_keys({'block_type': re.compile('ht')}))
+        self.assertIsNone(self._candidate_keys({'block_type': {'$nin': ['course']}}))
+
+    def test_settings(self):
+        self.assertEqual(
+            self._candidate_keys(settings={'display_name': 'Html 2'}), {BlockKey('html', 'html2')},
+        )
+        # list values are matched by any of their elements, as by get_items
+        self.assertEqual(
+            self._candidate_keys(settings={'tags': 'b'}), {BlockKey('html', 'html0'), BlockKey('html', 'html1')},
+        )
+        self.assertEqual(
+            self._candidate_keys({'block_type': 'html'}, {'tags': 'a', 'display_name': 'Html 0'}),
+            {BlockKey('html', 'html0')},
+        )
+        self.assertEqual(self._candidate_keys({'block_type': 'course'}, {'tags': 'a'}), set())
+        # criteria which can't be looked up don't narrow down the blocks
+        self.assertIsNone(self._candidate_keys(settings={'tags': lambda tag: tag == 'a'}))
+        self.assertIsNone(self._candidate_keys(settings={'tags': {'$exists': True}}))
+        self.assertIsNone(self._candidate_keys(settings={'tags': ['a', ['b']]}))
+
+    def test_cache(self):
+        structure_index = get_structure_index(self.structure)
+        self.assertIs(get_structure_index(self.structure), structure_index)
+        self.assertIsNot(get_structure_index(make_structure()), structure_index)
@@ -1,15 +1,25 @@
 """
 Tests for XML importer.
 """
+import shutil
+import tempfile
+
+import ddt
 import mock
+from path import Path as path
 from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
 from xblock.fields import String, Scope, ScopeIds, List
 from xblock.runtime import Runtime, KvsFieldData, DictKeyValueStore
 from xmodule.x_module import XModuleMixin
 from opaque_keys.edx.locations import Location
+from xmodule.contentstore.content import StaticContent
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.inheritance import InheritanceMixin
-from xmodule.modulestore.xml_importer import _update_and_import_module, _update_module_location
+from xmodule.modulestore.xml_importer import (
+    _update_and_import_module,
+    _update_module_location,
+    import_static_content,
+)
 from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
 from opaque_keys.edx.keys import CourseKey
 from xmodule.tests import DATA_DIR
@@ -333,3 +343,47 @@ class UpdateLocationTest(ModuleStoreNoSettings):
         # Expect these fields pass "is_set_on" test
         for field in self.CONTENT_FIELDS + self.SETTINGS_FIELDS + self.CHILDREN_FIELDS:
             self.assertTrue(new_version.fields[field].is_set_on(new_version))
+
+
+@ddt.ddt
+class ImportStaticContentTest(unittest.TestCase):
+    """
+    Tests for importing static files, serially and by a pool of threads.
+    """
+    def setUp(self):
+        super(ImportStaticContentTest, self).setUp()
+        self.course_data_path = path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.course_data_path)
+        (self.course_data_path / 'static' / 'subs').makedirs_p()
+        self.filenames = ['image{}.png'.format(index) for index in range(10)] + ['subs/subs_en.srt']
+        for filename in self.filenames:
+            (self.course_data_path / 'static' / filename).write_bytes(filename)
+        # ignored files
+        (self.course_data_path / 'static' / '.DS_Store').write_bytes('')
+        (self.course_data_path / 'static' / 'image0.png~').write_bytes('')
+
+        self.content_store = mock.Mock()
+        self.content_store.generate_thumbnail.return_value = (None, None)
+        self.course_key = CourseLocator('org', 'course', 'run')
+
+    @ddt.data(1, 4)
+    def test_import_static_content(self, num_workers):
+        remap_dict = import_static_content(
+            self.course_data_path, self.content_store, self.course_key, num_workers=num_workers,
+        )
+        self.assertEqual(sorted(remap_dict), sorted(self.filenames))
+        self.assertEqual(
+            remap_dict['subs/subs_en.srt'], StaticContent.compute_location(self.course_key, 'subs/subs_en.srt'),
+        )
+        saved = {call[0][0].import_path: call[0][0].data for call in self.content_store.save.call_args_list}
+        self.assertEqual(saved, {filename: filename for filename in self.filenames})
+
+    def test_upload_error(self):
+        self.content_store.save.side_effect = Exception('upload failed')
+        with mock.patch('xmodule.modulestore.xml_importer.log') as mock_log:
+            remap_dict = import_static_content(
+                self.course_data_path, self.content_store, self.course_key, num_workers=4,
+            )
+        # failed uploads are logged, and don't interrupt the import
+        self.assertEqual(mock_log.exception.call_count, len(self.filenames))
+        self.assertEqual(sorted(remap_dict), sorted(self.filenames))
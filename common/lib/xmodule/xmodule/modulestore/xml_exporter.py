@@ -2,8 +2,10 @@
 Methods for exporting course data to XML
 """
 
+import errno
 import logging
 from abc import abstractmethod
+from multiprocessing.pool import ThreadPool
 import lxml.etree
 from xblock.fields import Scope, Reference, ReferenceList, ReferenceValueDict
 from xmodule.contentstore.content import StaticContent
@@ -104,7 +106,7 @@ class ExportManager(object):
     """
     Manages XML exporting for courselike objects.
     """
-    def __init__(self, modulestore, contentstore, courselike_key, root_dir, target_dir):
+    def __init__(self, modulestore, contentstore, courselike_key, root_dir, target_dir, asset_export_workers=1):
         """
         Export all modules from `modulestore` and content from `contentstore` as xml to `root_dir`.
 
@@ -113,12 +115,16 @@ class ExportManager(object):
         `courselike_key`: The Locator of the Descriptor to export
         `root_dir`: The directory to write the exported xml to
         `target_dir`: The name of the directory inside `root_dir` to write the content to
+        `asset_export_workers`: The number of threads which export the static assets.  If it is
+            greater than 1, the assets are exported while the modules are serialized.
         """
         self.modulestore = modulestore
         self.contentstore = contentstore
         self.courselike_key = courselike_key
         self.root_dir = root_dir
         self.target_dir = target_dir
+        self.asset_export_workers = asset_export_workers
+        self._asset_export = None
 
     @abstractmethod
     def get_key(self):
@@ -148,10 +154,57 @@ class ExportManager(object):
         Get the target courselike object for this export.
         """
 
+    def export_assets(self, root_courselike_dir):
+        """
+        Export the static assets and their policy file, or wait for them to be exported
+        if they are exported concurrently.
+        """
+        if self._asset_export is not None:
+            # re-raises any error raised while exporting the assets
+            self._asset_export.get()
+        elif self.contentstore:
+            self._export_all_assets(root_courselike_dir)
+
+    def _export_all_assets(self, root_courselike_dir):
+        """
+        Export the static assets and their policy file from the contentstore.
+        """
+        policies_dir = root_courselike_dir + '/policies/'
+        try:
+            os.makedirs(policies_dir)
+        except OSError as err:
+            # the modules' export may have created it concurrently
+            if err.errno != errno.EEXIST:
+                raise
+        self.contentstore.export_all_for_course(
+            self.courselike_key,
+            root_courselike_dir + '/static/',
+            policies_dir + 'assets.json',
+            num_workers=self.asset_export_workers,
+        )
+
     def export(self):
         """
         Perform the export given the parameters handed to this class at init.
         """
+        root_courselike_dir = self.root_dir + '/' + self.target_dir
+        if self.asset_export_workers > 1 and self.contentstore:
+            # Read the assets from the contentstore while the modules are serialized.
+            pool = ThreadPool(1)
+            self._asset_export = pool.apply_async(self._export_all_assets, (root_courselike_dir,))
+            pool.close()
+            try:
+                self._export()
+            finally:
+                pool.join()
+                self._asset_export = None
+        else:
+            self._export()
+
+    def _export(self):
+        """
+        Export the modules, and the assets unless they are exported concurrently.
+        """
         with self.modulestore.bulk_operations(self.courselike_key):
 
             fsm = OSFS(self.root_dir)
@@ -215,13 +268,8 @@ class CourseExportManager(ExportManager):
 
         # export the static assets
         policies_dir = export_fs.makeopendir('policies')
+        self.export_assets(root_courselike_dir)
         if self.contentstore:
-            self.contentstore.export_all_for_course(
-                self.courselike_key,
-                root_courselike_dir + '/static/',
-                root_courselike_dir + '/policies/assets.json',
-            )
-
             # If we are using the default course image, export it to the
             # legacy location to support backwards compatibility.
             if courselike.course_image == courselike.fields['course_image'].default:
@@ -316,13 +364,7 @@ class LibraryExportManager(ExportManager):
         """
         # export the static assets
         export_fs.makeopendir('policies')
-
-        if self.contentstore:
-            self.contentstore.export_all_for_course(
-                self.courselike_key,
-                self.root_dir + '/' + self.target_dir + '/static/',
-                self.root_dir + '/' + self.target_dir + '/policies/assets.json',
-            )
+        self.export_assets(root_courselike_dir)
 
     def post_process(self, root, export_fs):
         """
@@ -337,18 +379,22 @@ class LibraryExportManager(ExportManager):
         xml_file.close()
 
 
-def export_course_to_xml(modulestore, contentstore, course_key, root_dir, course_dir):
+def export_course_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, asset_export_workers=1):
     """
     Thin wrapper for the Course Export Manager. See ExportManager for details.
     """
-    CourseExportManager(modulestore, contentstore, course_key, root_dir, course_dir).export()
+    CourseExportManager(
+        modulestore, contentstore, course_key, root_dir, course_dir, asset_export_workers=asset_export_workers,
+    ).export()
 
 
-def export_library_to_xml(modulestore, contentstore, library_key, root_dir, library_dir):
+def export_library_to_xml(modulestore, contentstore, library_key, root_dir, library_dir, asset_export_workers=1):
     """
     Thin wrapper for the Library Export Manager. See ExportManager for details.
     """
-    LibraryExportManager(modulestore, contentstore, library_key, root_dir, library_dir).export()
+    LibraryExportManager(
+        modulestore, contentstore, library_key, root_dir, library_dir, asset_export_workers=asset_export_workers,
+    ).export()
 
 
 def adapt_references(subtree, destination_course_key, export_fs):
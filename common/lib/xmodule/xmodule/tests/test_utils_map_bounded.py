@@ -0,0 +1,52 @@
+"""Tests for map_bounded in util/misc.py"""
+import threading
+import time
+from unittest import TestCase
+
+from xmodule.util.misc import map_bounded
+
+
+class MapBoundedTests(TestCase):
+    """
+    Tests for applying a function to items on a bounded pool of threads.
+    """
+    def test_results_in_order(self):
+        self.assertEqual(map_bounded(lambda item: item * 2, xrange(20), 4, max_pending=2), range(0, 40, 2))
+
+    def test_max_pending(self):
+        lock = threading.Lock()
+        counts = {'pulled': 0, 'done': 0, 'max_pending': 0}
+
+        def items():
+            """
+            Yields the items, recording how many of them are pending.
+            """
+            for item in range(20):
+                with lock:
+                    counts['pulled'] += 1
+                    counts['max_pending'] = max(counts['max_pending'], counts['pulled'] - counts['done'])
+                yield item
+
+        def func(item):
+            """
+            Processes an item slowly.
+            """
+            time.sleep(0.001)
+            with lock:
+                counts['done'] += 1
+            return item
+
+        self.assertEqual(map_bounded(func, items(), 4, max_pending=3), range(20))
+        self.assertLessEqual(counts['max_pending'], 3)
+
+    def test_error(self):
+        def func(item):
+            """
+            Fails on one of the items.
+            """
+            if item == 5:
+                raise ValueError(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            map_bounded(func, range(10), 4, max_pending=4)
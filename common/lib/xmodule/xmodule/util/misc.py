@@ -2,6 +2,8 @@
 Miscellaneous utility functions.
 """
 import re
+import threading
+from multiprocessing.pool import ThreadPool
 
 from xmodule.annotator_mixin import html_to_text
 
@@ -58,3 +60,51 @@ def escape_html_characters(content):
             )
         )
     )
+
+
+def map_bounded(func, items, num_workers, max_pending):
+    """
+    Apply func to each of the given items on a pool of threads, pulling at most
+    max_pending items from the items iterator ahead of the threads, so that
+    items which are expensive to hold (e.g. file contents) can be streamed.
+
+    Args:
+        func: the function to apply to each item
+        items: an iterable of the items
+        num_workers (int): the number of threads
+        max_pending (int): the maximum number of items pulled but not processed yet
+
+    Returns:
+        the list of the results, in the order of the items.  If func raised, the
+        first error is raised once all the items pulled have been processed.
+    """
+    pending = threading.BoundedSemaphore(max_pending)
+
+    def call(item):
+        """
+        Applies func to item, and releases its slot once done.
+        """
+        try:
+            return func(item)
+        finally:
+            pending.release()
+
+    pool = ThreadPool(num_workers)
+    try:
+        async_results = []
+        items = iter(items)
+        while True:
+            # wait for a slot before pulling the next item
+            pending.acquire()
+            try:
+                item = next(items)
+            except StopIteration:
+                pending.release()
+                break
+            async_results.append(pool.apply_async(call, (item,)))
+        pool.close()
+        pool.join()
+    except BaseException:
+        pool.terminate()
+        raise
+    return [async_result.get() for async_result in async_results]
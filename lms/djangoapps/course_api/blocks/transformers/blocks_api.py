@@ -38,6 +38,20 @@ class BlocksAPITransformer(BlockStructureTransformer):
     def name(cls):
         return "blocks_api"
 
+    @classmethod
+    def collected_data_dependencies(cls):
+        """
+        Returns the names of the contained transformers, whose
+        collected data is accessed by this transformer.
+        """
+        return [
+            cls.name(),
+            StudentViewTransformer.name(),
+            BlockCountsTransformer.name(),
+            BlockDepthTransformer.name(),
+            BlockNavigationTransformer.name(),
+        ]
+
     @classmethod
     def collect(cls, block_structure):
         """
@@ -5,6 +5,7 @@ get_course_blocks function.
 from openedx.core.djangoapps.content.block_structure.api import get_block_structure_manager
 from openedx.core.djangoapps.content.block_structure.transformers import BlockStructureTransformers
 
+from . import transformed_cache
 from .transformers import library_content, start_date, user_partitions, visibility
 from .usage_info import CourseUsageInfo
 
@@ -54,11 +55,21 @@ def get_course_blocks(
             exactly equivalent to the blocks that the given user has
             access.
     """
+    use_transformed_cache = False
     if not transformers:
         transformers = BlockStructureTransformers(COURSE_BLOCK_ACCESS_TRANSFORMERS)
+        use_transformed_cache = transformed_cache.is_enabled()
     transformers.usage_info = CourseUsageInfo(starting_block_usage_key.course_key, user)
 
-    return get_block_structure_manager(starting_block_usage_key.course_key).get_transformed(
+    manager = get_block_structure_manager(starting_block_usage_key.course_key)
+    if use_transformed_cache:
+        return transformed_cache.get_transformed(
+            manager,
+            transformers,
+            starting_block_usage_key,
+            collected_block_structure,
+        )
+    return manager.get_transformed(
         transformers,
         starting_block_usage_key,
         collected_block_structure,
@@ -0,0 +1,20 @@
+"""
+Course Blocks Application Configuration
+
+Signal handlers are connected here.
+"""
+
+from django.apps import AppConfig
+
+
+class CourseBlocksConfig(AppConfig):
+    """
+    Application Configuration for Course Blocks.
+    """
+    name = u'lms.djangoapps.course_blocks'
+
+    def ready(self):
+        """
+        Connect handlers to invalidate cached block structures.
+        """
+        from . import signals  # pylint: disable=unused-variable
@@ -0,0 +1,18 @@
+"""
+This module contains various configuration settings via
+waffle switches for the Course Blocks app.
+"""
+from openedx.core.djangoapps.waffle_utils import WaffleSwitchNamespace
+
+# Namespace
+WAFFLE_NAMESPACE = u'course_blocks'
+
+# Switches
+CACHE_TRANSFORMED_BLOCKS = u'cache_transformed_blocks'
+
+
+def waffle():
+    """
+    Returns the namespaced, cached, audited Waffle class for Course Blocks.
+    """
+    return WaffleSwitchNamespace(name=WAFFLE_NAMESPACE, log_prefix=u'CourseBlocks: ')
@@ -0,0 +1,21 @@
+"""
+Signal handlers for invalidating cached transformed block structures.
+"""
+from django.dispatch.dispatcher import receiver
+from opaque_keys.edx.locator import LibraryLocator
+from xmodule.modulestore.django import SignalHandler
+
+from .transformed_cache import invalidate_course
+
+
+@receiver(SignalHandler.course_published)
+def _invalidate_transformed_blocks_on_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Catches the signal that a course has been published in the module
+    store and invalidates the course's cached transformed block
+    structures.  Ignores publish signals from content libraries.
+    """
+    if isinstance(course_key, LibraryLocator):
+        return
+
+    invalidate_course(course_key)
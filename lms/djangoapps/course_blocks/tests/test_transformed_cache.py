@@ -0,0 +1,91 @@
+"""
+Tests for the cache of transformed block structures.
+"""
+from datetime import datetime, timedelta
+
+from django.utils.timezone import UTC
+from mock import patch
+from nose.plugins.attrib import attr
+
+from openedx.core.djangoapps.content.block_structure.manager import BlockStructureManager
+from student.roles import CourseBetaTesterRole
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from ..api import get_course_blocks
+from ..config.waffle import CACHE_TRANSFORMED_BLOCKS, waffle
+from ..transformed_cache import invalidate_course
+
+
+@attr(shard=3)
+class TransformedCacheTestCase(SharedModuleStoreTestCase):
+    """
+    Tests for the cache of transformed block structures.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TransformedCacheTestCase, cls).setUpClass()
+        now = datetime.now(UTC())
+        cls.course = CourseFactory.create(start=now - timedelta(days=10))
+        chapter = ItemFactory.create(parent=cls.course, category='chapter')
+        cls.staff_only = ItemFactory.create(parent=chapter, category='sequential', visible_to_staff_only=True)
+        cls.future = ItemFactory.create(
+            parent=chapter, category='sequential', start=now + timedelta(days=2), days_early_for_beta=5,
+        )
+        cls.released = ItemFactory.create(parent=chapter, category='sequential')
+
+    def setUp(self):
+        super(TransformedCacheTestCase, self).setUp()
+        self.learners = [UserFactory.create() for _ in range(2)]
+        for learner in self.learners:
+            CourseEnrollmentFactory.create(user=learner, course_id=self.course.id)
+        self.staff = UserFactory.create(is_staff=True)
+        invalidate_course(self.course.id)
+
+        patcher = patch.object(
+            BlockStructureManager, 'get_transformed', autospec=True, side_effect=BlockStructureManager.get_transformed,
+        )
+        self.mock_get_transformed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_block_keys(self, user):
+        """
+        Returns the set of block keys that are visible to the given user.
+        """
+        with waffle().override(CACHE_TRANSFORMED_BLOCKS, active=True):
+            return set(get_course_blocks(user, self.course.location))
+
+    def test_shared_by_same_signature(self):
+        block_keys = self.get_block_keys(self.learners[0])
+        self.assertIn(self.released.location, block_keys)
+        self.assertNotIn(self.staff_only.location, block_keys)
+        self.assertNotIn(self.future.location, block_keys)
+        self.assertEquals(self.mock_get_transformed.call_count, 1)
+
+        self.assertEquals(self.get_block_keys(self.learners[1]), block_keys)
+        self.assertEquals(self.mock_get_transformed.call_count, 1)
+
+    def test_distinct_signatures(self):
+        learner_block_keys = self.get_block_keys(self.learners[0])
+
+        staff_block_keys = self.get_block_keys(self.staff)
+        self.assertEquals(self.mock_get_transformed.call_count, 2)
+        self.assertIn(self.staff_only.location, staff_block_keys)
+        self.assertIn(self.future.location, staff_block_keys)
+
+        CourseBetaTesterRole(self.course.id).add_users(self.learners[1])
+        beta_block_keys = self.get_block_keys(self.learners[1])
+        self.assertEquals(self.mock_get_transformed.call_count, 3)
+        self.assertEquals(beta_block_keys, learner_block_keys | {self.future.location})
+
+    def test_invalidated_on_publish(self):
+        self.get_block_keys(self.learners[0])
+        invalidate_course(self.course.id)
+        self.get_block_keys(self.learners[1])
+        self.assertEquals(self.mock_get_transformed.call_count, 2)
+
+    def test_disabled(self):
+        get_course_blocks(self.learners[0], self.course.location)
+        get_course_blocks(self.learners[1], self.course.location)
+        self.assertEquals(self.mock_get_transformed.call_count, 2)
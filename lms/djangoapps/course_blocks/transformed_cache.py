@@ -0,0 +1,260 @@
+"""
+Cache of the block structures that get_course_blocks returns for the
+default COURSE_BLOCK_ACCESS_TRANSFORMERS.
+
+The result of transforming a course's collected block structure with
+those transformers depends on the user only through a few facts:
+
+    * whether the user has staff access to the course,
+    * the group the user is in for each of the course's user partitions
+      (cohorts, enrollment tracks, content groups, etc.),
+    * which of the course's start dates have passed for the user, which
+      in turn depends on whether the user is a beta tester.
+
+Together, these facts make up the user's visibility signature.  The
+pruned block structure is cached keyed by the signature, so learners
+with the same signature, such as those in the same cohort, share a
+single transformed result.
+
+Cache entries are also keyed by the version of the collected block
+structure and by a per-course generation that changes whenever the
+course is published.  An entry for a signature that depends on an
+upcoming start date expires when that date passes.
+
+The cache is bypassed for masquerading users and for courses with
+randomized library content, whose selected children are stored per
+user.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta
+from hashlib import sha1
+from logging import getLogger
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils.timezone import UTC
+
+from lms.djangoapps.courseware.access_utils import in_preview_mode
+from lms.djangoapps.courseware.masquerade import get_masquerade_role
+from openedx.core.djangoapps.content.block_structure import config as block_structure_config
+from openedx.core.djangoapps.content.block_structure.api import get_cache
+from openedx.core.djangoapps.content.block_structure.serializer import CompactSerializer
+from openedx.core.djangoapps.content.block_structure.transformer_registry import TransformerRegistry
+from student.roles import CourseBetaTesterRole
+
+from .config.waffle import CACHE_TRANSFORMED_BLOCKS, waffle
+from .transformers.start_date import StartDateTransformer
+from .transformers.user_partitions import UserPartitionTransformer, _get_user_partition_groups
+from .usage_info import CourseUsageInfo
+
+
+log = getLogger(__name__)
+
+# Increment when the format of cached entries or the meaning of the
+# visibility signature changes.
+CACHE_VERSION = 1
+
+# Facts about a collected course that are common to all users and that
+# determine which visibility signatures are possible.
+_CourseProfile = namedtuple('_CourseProfile', [
+    # Whether the course has library_content blocks.
+    'has_library_content',
+    # Sorted distinct start dates of the course's blocks.
+    'start_dates',
+    # Sorted distinct start dates of the course's blocks for beta
+    # testers, or None if no block has days_early_for_beta set.
+    'beta_start_dates',
+])
+
+
+def is_enabled():
+    """
+    Returns whether transformed block structures are cached.
+    """
+    return waffle().is_enabled(CACHE_TRANSFORMED_BLOCKS)
+
+
+def get_transformed(manager, transformers, starting_block_usage_key, collected_block_structure=None):
+    """
+    Returns the block structure transformed by the given transformers
+    for the user in their usage_info, reading it from the cache if a
+    user with the same visibility signature already transformed it.
+
+    Arguments:
+        manager (BlockStructureManager) - The manager of the course's
+            block structures.
+
+        transformers (BlockStructureTransformers) - The collection of
+            COURSE_BLOCK_ACCESS_TRANSFORMERS, with its usage_info set.
+
+        starting_block_usage_key (UsageKey) - Specifies the starting
+            block of the block structure that is to be transformed.
+
+        collected_block_structure (BlockStructureBlockData) - A
+            block structure retrieved from a prior call to
+            BlockStructureManager.get_collected, if already available.
+
+    Returns:
+        BlockStructureBlockData - A transformed block structure,
+            starting at starting_block_usage_key.
+    """
+    if not collected_block_structure:
+        collected_block_structure = manager.get_collected([UserPartitionTransformer.name()])
+
+    version_key = _encode_version_key(transformers.usage_info.course_key, collected_block_structure)
+    course_profile = _get_course_profile(version_key, collected_block_structure)
+    signature, timeout = _get_visibility_signature(transformers.usage_info, collected_block_structure, course_profile)
+    if signature is None:
+        return manager.get_transformed(transformers, starting_block_usage_key, collected_block_structure)
+
+    cache = get_cache()
+    cache_key = u'{}.transformed.{}.{}'.format(
+        version_key, starting_block_usage_key, sha1(repr(signature)).hexdigest(),
+    )
+    serialized_data = cache.get(cache_key)
+    if serialized_data:
+        log.info(u'CourseBlocks: Read transformed blocks from cache; %s', cache_key)
+        return CompactSerializer().deserialize(serialized_data, starting_block_usage_key)
+
+    block_structure = manager.get_transformed(transformers, starting_block_usage_key, collected_block_structure)
+    cache.set(cache_key, CompactSerializer().serialize(block_structure), timeout=timeout)
+    log.info(u'CourseBlocks: Added transformed blocks to cache; %s', cache_key)
+    return block_structure
+
+
+def get_visibility_signature(user, collected_block_structure):
+    """
+    Returns the visibility signature of the given user for the course
+    of the given collected block structure, or None if the user's
+    transformed block structure can't be shared with other users.
+
+    Users with equal signatures get equal block structures from
+    get_course_blocks with the default transformers.
+    """
+    course_key = collected_block_structure.root_block_usage_key.course_key
+    version_key = _encode_version_key(course_key, collected_block_structure)
+    course_profile = _get_course_profile(version_key, collected_block_structure)
+    signature, _ = _get_visibility_signature(
+        CourseUsageInfo(course_key, user), collected_block_structure, course_profile,
+    )
+    return signature
+
+
+def invalidate_course(course_key):
+    """
+    Invalidates all cached transformed block structures of the given
+    course.
+    """
+    get_cache().set(_encode_generation_key(course_key), uuid4().hex, timeout=None)
+
+
+def _get_visibility_signature(usage_info, block_structure, course_profile):
+    """
+    Returns a tuple of the visibility signature of the user in the
+    given usage_info and the number of seconds for which it holds, or
+    (None, None) if the user's transformed block structure is not to be
+    cached.
+    """
+    user, course_key = usage_info.user, usage_info.course_key
+    if course_profile.has_library_content or get_masquerade_role(user, course_key):
+        return None, None
+
+    timeout = block_structure_config.cache_timeout_in_seconds()
+
+    user_partitions = block_structure.get_transformer_data(UserPartitionTransformer, 'user_partitions')
+    partition_groups = tuple(sorted(
+        (partition_id, group.id)
+        for partition_id, group in _get_user_partition_groups(course_key, user_partitions or [], user).iteritems()
+    ))
+
+    # Start dates and staff-only visibility don't apply to staff.
+    if usage_info.has_staff_access:
+        return (True, partition_groups, None), timeout
+
+    if settings.FEATURES['DISABLE_START_DATES'] or in_preview_mode():
+        started = None
+    else:
+        is_beta_tester = (
+            course_profile.beta_start_dates is not None and
+            CourseBetaTesterRole(course_key).has_user(user)
+        )
+        start_dates = course_profile.beta_start_dates if is_beta_tester else course_profile.start_dates
+        now = datetime.now(UTC())
+        num_started = bisect_left(start_dates, now)
+        started = (is_beta_tester, num_started)
+        if num_started < len(start_dates):
+            seconds_to_next_start = int((start_dates[num_started] - now).total_seconds()) + 1
+            timeout = min(timeout, seconds_to_next_start) if timeout else seconds_to_next_start
+
+    return (False, partition_groups, started), timeout
+
+
+def _get_course_profile(version_key, block_structure):
+    """
+    Returns the _CourseProfile of the given collected block_structure,
+    computing and caching it if needed.
+    """
+    cache = get_cache()
+    cache_key = u'{}.profile'.format(version_key)
+    course_profile = cache.get(cache_key)
+    if course_profile is None:
+        course_profile = _compute_course_profile(block_structure)
+        cache.set(cache_key, course_profile, timeout=block_structure_config.cache_timeout_in_seconds())
+    return course_profile
+
+
+def _compute_course_profile(block_structure):
+    """
+    Returns the _CourseProfile of the given collected block_structure.
+    """
+    has_library_content = False
+    start_dates, beta_start_dates = set(), set()
+    has_beta_start_dates = False
+    for block_key in block_structure:
+        if block_key.block_type == 'library_content':
+            has_library_content = True
+
+        start = block_structure.get_transformer_block_field(
+            block_key, StartDateTransformer, StartDateTransformer.MERGED_START_DATE,
+        )
+        if not start:
+            continue
+        start_dates.add(start)
+
+        days_early_for_beta = block_structure.get_xblock_field(block_key, 'days_early_for_beta')
+        if days_early_for_beta is not None:
+            has_beta_start_dates = True
+            beta_start_dates.add(start - timedelta(days_early_for_beta))
+        else:
+            beta_start_dates.add(start)
+
+    return _CourseProfile(
+        has_library_content=has_library_content,
+        start_dates=sorted(start_dates),
+        beta_start_dates=sorted(beta_start_dates) if has_beta_start_dates else None,
+    )
+
+
+def _encode_version_key(course_key, block_structure):
+    """
+    Returns the prefix of the cache keys for the given collected
+    block_structure of the given course.
+    """
+    root_block_usage_key = block_structure.root_block_usage_key
+    return u'course_blocks.v{}.{}.{}.{}.{}.{}'.format(
+        CACHE_VERSION,
+        course_key,
+        get_cache().get(_encode_generation_key(course_key)),
+        block_structure.get_xblock_field(root_block_usage_key, 'course_version'),
+        block_structure.get_xblock_field(root_block_usage_key, 'subtree_edited_on'),
+        TransformerRegistry.get_write_version_hash(),
+    )
+
+
+def _encode_generation_key(course_key):
+    """
+    Returns the cache key of the given course's generation, which
+    changes whenever the course is published.
+    """
+    return u'course_blocks.generation.{}'.format(course_key)
@@ -4,6 +4,7 @@ Middleware for the courseware app
 
 from django.shortcuts import redirect
 
+from courseware.user_state_client import start_write_behind, stop_write_behind
 from lms.djangoapps.courseware.exceptions import Redirect
 
 
@@ -17,3 +18,29 @@ class RedirectMiddleware(object):
         """
         if isinstance(exception, Redirect):
             return redirect(exception.url)
+
+
+class UserStateWriteBehindMiddleware(object):
+    """
+    Buffer the user state updates which can be written behind during each request
+    (see USER_STATE_WRITE_BEHIND_FIELDS), and write the buffered updates when the
+    request ends, failing it if they can't be written.
+    """
+    def process_request(self, _request):
+        """
+        Start buffering the updates.
+        """
+        start_write_behind()
+
+    def process_response(self, _request, response):
+        """
+        Stop buffering the updates, and write them.
+        """
+        stop_write_behind()
+        return response
+
+    def process_exception(self, _request, _exception):
+        """
+        Stop buffering the updates, and write them.
+        """
+        stop_write_behind()
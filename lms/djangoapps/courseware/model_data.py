@@ -25,6 +25,8 @@ import json
 import logging
 from abc import ABCMeta, abstractmethod
 from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from time import time
 
 from contracts import contract, new_contract
 from django.db import DatabaseError
@@ -37,9 +39,16 @@ from xblock.fields import Scope, UserScope
 from xblock.runtime import KeyValueStore
 
 from courseware.user_state_client import DjangoXBlockUserStateClient
+from openedx.core.djangoapps import monitoring_utils
 from xmodule.modulestore.django import modulestore
 
-from .models import StudentModule, XModuleStudentInfoField, XModuleStudentPrefsField, XModuleUserStateSummaryField
+from .models import (
+    ChunkedQueryCounter,
+    StudentModule,
+    XModuleStudentInfoField,
+    XModuleStudentPrefsField,
+    XModuleUserStateSummaryField
+)
 
 log = logging.getLogger(__name__)
 
@@ -653,9 +662,10 @@ class UserInfoCache(DjangoOrmFieldCache):
             aside_types (list of str): Asides to load field for (which annotate the supplied
                 xblocks).
         """
-        return XModuleStudentInfoField.objects.filter(
+        return XModuleStudentInfoField.objects.chunked_filter(
+            'field_name__in',
+            set(field.name for field in fields),
             student=self.user.pk,
-            field_name__in=set(field.name for field in fields),
         )
 
     def _cache_key_for_field_object(self, field_object):
@@ -681,6 +691,13 @@ class FieldDataCache(object):
     """
     A cache of django model objects needed to supply the data
     for a module and its descendants
+
+    The data of each scope is read with one (chunked) query for all the
+    descriptors added at once.  Descriptors added within a `prefetch_plan`
+    are all read together when the plan ends, and descriptors which were
+    already added aren't read again.  The number of queries, the number of
+    descriptors, and the time taken to read each scope are accumulated in
+    `prefetch_stats`, and reported as custom metrics of the request.
     """
     def __init__(self, descriptors, course_id, user, asides=None, read_only=False):
         """
@@ -722,19 +739,78 @@ class FieldDataCache(object):
             ),
         }
         self.scorable_locations = set()
+        self.prefetch_stats = defaultdict(lambda: {'queries': 0, 'blocks': 0, 'time': 0.0})
+        self._added_usage_ids = set()
+        self._planned_descriptors = None
         self.add_descriptors_to_cache(descriptors)
 
     def add_descriptors_to_cache(self, descriptors):
         """
         Add all `descriptors` to this FieldDataCache.
+
+        Descriptors which were already added are skipped.  Within a
+        `prefetch_plan`, the data of the descriptors is read when the plan ends.
         """
         if self.user.is_authenticated():
-            self.scorable_locations.update(desc.location for desc in descriptors if desc.has_score)
-            for scope, fields in self._fields_to_cache(descriptors).items():
-                if scope not in self.cache:
-                    continue
+            new_descriptors = []
+            for descriptor in descriptors:
+                if descriptor.scope_ids.usage_id not in self._added_usage_ids:
+                    self._added_usage_ids.add(descriptor.scope_ids.usage_id)
+                    new_descriptors.append(descriptor)
+
+            self.scorable_locations.update(desc.location for desc in new_descriptors if desc.has_score)
+            if self._planned_descriptors is not None:
+                self._planned_descriptors.extend(new_descriptors)
+            else:
+                self._prefetch(new_descriptors)
+
+    @contextmanager
+    def prefetch_plan(self):
+        """
+        Context manager which defers reading the data of the descriptors added
+        to this FieldDataCache until it exits, so that each scope is read with
+        one query for all of them, rather than one per call to
+        `add_descriptors_to_cache` or `add_descriptor_descendents`.
+
+        Field data must not be accessed within the plan, as it isn't read yet.
+        """
+        if self._planned_descriptors is not None:
+            # Nested plans are read with the outermost plan.
+            yield
+            return
 
+        self._planned_descriptors = []
+        try:
+            yield
+        finally:
+            descriptors, self._planned_descriptors = self._planned_descriptors, None
+        self._prefetch(descriptors)
+
+    def _prefetch(self, descriptors):
+        """
+        Read the data of all the scopes of `descriptors` into this
+        FieldDataCache, recording the queries made for each scope.
+        """
+        for scope, fields in self._fields_to_cache(descriptors).items():
+            if scope not in self.cache:
+                continue
+
+            start = time()
+            with ChunkedQueryCounter() as query_counter:
                 self.cache[scope].cache_fields(fields, descriptors, self.asides)
+            duration = time() - start
+            num_queries = query_counter.count
+
+            stats = self.prefetch_stats[scope.name]
+            stats['queries'] += num_queries
+            stats['blocks'] += len(descriptors)
+            stats['time'] += duration
+            monitoring_utils.accumulate('field_data_cache.{}.queries'.format(scope.name), num_queries)
+            monitoring_utils.accumulate('field_data_cache.{}.time'.format(scope.name), duration)
+            log.debug(
+                u"Prefetched %s for %d blocks with %d queries in %.3fs",
+                scope.name, len(descriptors), num_queries, duration,
+            )
 
     def add_descriptor_descendents(self, descriptor, depth=None, descriptor_filter=lambda descriptor: True):
         """
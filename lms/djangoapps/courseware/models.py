@@ -14,6 +14,7 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 """
 import itertools
 import logging
+import threading
 
 from config_models.models import ConfigurationModel
 from django.conf import settings
@@ -28,6 +29,9 @@ from openedx.core.djangoapps.xmodule_django.models import BlockTypeKeyField, Cou
 
 log = logging.getLogger("edx.courseware")
 
+# The default number of items selected per query by ChunkingManager.chunked_filter.
+CHUNK_SIZE = 500
+
 
 def chunks(items, chunk_size):
     """
@@ -37,6 +41,40 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+class ChunkedQueryCounter(object):
+    """
+    Context manager which counts the queries that :meth:`ChunkingManager.chunked_filter`
+    runs in this thread while it is active, in its ``count``.  The queries
+    counted by a nested counter are also counted by the enclosing one.
+    """
+    _active = threading.local()
+
+    def __init__(self):
+        self.count = 0
+        self._enclosing = None
+
+    def __enter__(self):
+        self._enclosing = getattr(self._active, 'counter', None)
+        self._active.counter = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._active.counter = self._enclosing
+        if self._enclosing is not None:
+            self._enclosing.count += self.count
+
+    @classmethod
+    def counted(cls, queryset):
+        """
+        Returns queryset, counting it as a query of the active counter, if
+        any.  Call it as the queryset is evaluated.
+        """
+        counter = getattr(cls._active, 'counter', None)
+        if counter is not None:
+            counter.count += 1
+        return queryset
+
+
 class ChunkingManager(models.Manager):
     """
     :class:`~Manager` that adds an additional method :meth:`chunked_filter` to provide
@@ -60,11 +98,11 @@ class ChunkingManager(models.Manager):
                 chunks, and passed as the value for the ``chunk_field`` keyword argument to
                 :meth:`~Manager.filter`. This implies that ``chunk_field`` should be an
                 ``__in`` key.
-            chunk_size (int): The size of chunks to pass. Defaults to 500.
+            chunk_size (int): The size of chunks to pass. Defaults to CHUNK_SIZE.
         """
-        chunk_size = kwargs.pop('chunk_size', 500)
+        chunk_size = kwargs.pop('chunk_size', CHUNK_SIZE)
         res = itertools.chain.from_iterable(
-            self.filter(**dict([(chunk_field, chunk)] + kwargs.items()))
+            ChunkedQueryCounter.counted(self.filter(**dict([(chunk_field, chunk)] + kwargs.items())))
             for chunk in chunks(items, chunk_size)
         )
         return res
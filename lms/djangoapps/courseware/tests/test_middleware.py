@@ -2,12 +2,20 @@
 Tests for courseware middleware
 """
 
-from django.http import Http404
+from django.conf.urls import url
+from django.db import DatabaseError
+from django.http import Http404, HttpResponse, HttpResponseServerError
+from django.test import TestCase
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import patch
 from nose.plugins.attrib import attr
 
+from courseware.models import StudentModule
+from courseware.tests.factories import UserFactory, course_id
+from courseware.user_state_client import DjangoXBlockUserStateClient
 from lms.djangoapps.courseware.exceptions import Redirect
-from lms.djangoapps.courseware.middleware import RedirectMiddleware
+from lms.djangoapps.courseware.middleware import RedirectMiddleware, UserStateWriteBehindMiddleware
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
@@ -42,3 +50,109 @@ class CoursewareMiddlewareTestCase(SharedModuleStoreTestCase):
         self.assertEqual(response.status_code, 302)
         target_url = response._headers['location'][1]
         self.assertTrue(target_url.endswith(test_url))
+
+
+def set_position_view(request):
+    """
+    Update the saved position of a video for the user named in the request.
+    """
+    DjangoXBlockUserStateClient().set_many(
+        request.GET['username'], {course_id.make_usage_key('video', 'video'): {'saved_video_position': '00:00:05'}}
+    )
+    return HttpResponse()
+
+
+def server_error_view(_request):
+    """
+    Respond to uncaught exceptions without rendering templates.
+    """
+    return HttpResponseServerError()
+
+
+urlpatterns = [url(r'^set_position$', set_position_view)]
+handler500 = server_error_view
+
+
+class RaisingResponseMiddleware(object):
+    """
+    Raise while processing responses.
+    """
+    def process_response(self, _request, _response):
+        """
+        Raise, so that the middleware which would run after it don't.
+        """
+        raise ValueError("response middleware failure")
+
+
+@attr(shard=1)
+@override_settings(
+    USER_STATE_WRITE_BEHIND_FIELDS={'video': ['saved_video_position']},
+)
+class UserStateWriteBehindMiddlewareTestCase(TestCase):
+    """Tests that user state updates are written behind during requests"""
+
+    def setUp(self):
+        super(UserStateWriteBehindMiddlewareTestCase, self).setUp()
+        self.user = UserFactory.create()
+        self.usage_key = course_id.make_usage_key('video', 'video')
+        self.request = RequestFactory().get("dummy_url")
+        self.middleware = UserStateWriteBehindMiddleware()
+
+    def set_position(self):
+        """
+        Update the saved position of a video, and return whether it was written.
+        """
+        DjangoXBlockUserStateClient(self.user).set_many(
+            self.user.username, {self.usage_key: {'saved_video_position': '00:00:05'}}
+        )
+        return StudentModule.objects.filter(student=self.user, module_state_key=self.usage_key).exists()
+
+    def test_written_at_response(self):
+        self.middleware.process_request(self.request)
+        self.assertFalse(self.set_position())
+        response = HttpResponse()
+        self.assertIs(self.middleware.process_response(self.request, response), response)
+        self.assertTrue(StudentModule.objects.filter(student=self.user).exists())
+
+        # outside of requests, updates are written immediately
+        self.assertTrue(self.set_position())
+
+    def test_written_at_exception(self):
+        self.middleware.process_request(self.request)
+        self.assertFalse(self.set_position())
+        self.assertIsNone(self.middleware.process_exception(self.request, Http404()))
+        self.assertTrue(StudentModule.objects.filter(student=self.user).exists())
+
+    def test_written_one_by_one_after_error(self):
+        self.middleware.process_request(self.request)
+        self.assertFalse(self.set_position())
+        response = HttpResponse()
+        with patch.object(StudentModule.objects, 'bulk_create', side_effect=DatabaseError):
+            self.assertIs(self.middleware.process_response(self.request, response), response)
+        self.assertTrue(StudentModule.objects.filter(student=self.user).exists())
+
+    def test_write_failures_fail_responses(self):
+        self.middleware.process_request(self.request)
+        self.assertFalse(self.set_position())
+        with patch.object(StudentModule.objects, 'bulk_create', side_effect=DatabaseError):
+            with patch.object(StudentModule.objects, 'get_or_create', side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    self.middleware.process_response(self.request, HttpResponse())
+        self.assertFalse(StudentModule.objects.filter(student=self.user).exists())
+
+        # the failed request stopped buffering updates
+        self.assertTrue(self.set_position())
+
+    @override_settings(
+        ROOT_URLCONF='courseware.tests.test_middleware',
+        MIDDLEWARE_CLASSES=(
+            'courseware.middleware.UserStateWriteBehindMiddleware',
+            'courseware.tests.test_middleware.RaisingResponseMiddleware',
+        ),
+    )
+    def test_written_at_request_finished(self):
+        # RaisingResponseMiddleware runs first, and its exception skips
+        # UserStateWriteBehindMiddleware, so request_finished writes the update.
+        with self.assertRaises(ValueError):
+            self.client.get('/set_position', {'username': self.user.username})
+        self.assertTrue(StudentModule.objects.filter(student=self.user, module_state_key=self.usage_key).exists())
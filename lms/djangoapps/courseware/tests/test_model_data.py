@@ -6,7 +6,7 @@ from functools import partial
 
 from django.db import DatabaseError
 from django.test import TestCase
-from mock import Mock, patch
+from mock import ANY, Mock, patch
 from nose.plugins.attrib import attr
 from xblock.core import XBlock
 from xblock.exceptions import KeyValueMultiSaveError
@@ -434,3 +434,40 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+@attr(shard=1)
+class TestPrefetchPlan(TestCase):
+    """Tests for reading the data of many descriptors at once"""
+    def setUp(self):
+        super(TestPrefetchPlan, self).setUp()
+        self.user = UserFactory.create(username='user')
+        fields = [mock_field(Scope.user_state, 'a_field'), mock_field(Scope.user_info, 'b_field')]
+        self.descriptors = [mock_descriptor(fields), mock_descriptor(fields)]
+        self.descriptors[1].scope_ids = ScopeIds('user1', 'mock_problem', location('def_id'), location('other_id'))
+
+    def test_prefetch_plan(self):
+        field_data_cache = FieldDataCache([], course_id, self.user)
+        # One query per scope, rather than one per scope and descriptor
+        with self.assertNumQueries(2):
+            with field_data_cache.prefetch_plan():
+                for descriptor in self.descriptors:
+                    field_data_cache.add_descriptors_to_cache([descriptor])
+
+        self.assertEqual(field_data_cache.prefetch_stats['user_state'], {'queries': 1, 'blocks': 2, 'time': ANY})
+        self.assertEqual(field_data_cache.prefetch_stats['user_info'], {'queries': 1, 'blocks': 2, 'time': ANY})
+
+    @patch('courseware.models.CHUNK_SIZE', 1)
+    def test_chunked_queries_are_counted(self):
+        with self.assertNumQueries(3):
+            field_data_cache = FieldDataCache(self.descriptors, course_id, self.user)
+        self.assertEqual(field_data_cache.prefetch_stats['user_state']['queries'], 2)
+        self.assertEqual(field_data_cache.prefetch_stats['user_info']['queries'], 1)
+
+    def test_added_descriptors_are_skipped(self):
+        field_data_cache = FieldDataCache(self.descriptors[:1], course_id, self.user)
+        with self.assertNumQueries(0):
+            field_data_cache.add_descriptors_to_cache(self.descriptors[:1])
+        with self.assertNumQueries(2):
+            field_data_cache.add_descriptors_to_cache(self.descriptors)
+        self.assertEqual(field_data_cache.prefetch_stats['user_state']['blocks'], 2)
@@ -3,14 +3,24 @@ Black-box tests of the DjangoUserStateClient against the semantics
 defined in edx_user_state_client.
 """
 
+import json
 from collections import defaultdict
 from unittest import skip
 
+from django.db import DatabaseError
 from django.test import TestCase
+from django.test.utils import override_settings
 from edx_user_state_client.tests import UserStateClientTestBase
+from mock import patch
 
-from courseware.tests.factories import UserFactory
-from courseware.user_state_client import DjangoXBlockUserStateClient
+from courseware.models import StudentModule
+from courseware.tests.factories import UserFactory, course_id
+from courseware.user_state_client import (
+    DjangoXBlockUserStateClient,
+    flush_write_behind,
+    start_write_behind,
+    stop_write_behind
+)
 
 
 class TestDjangoUserStateClient(UserStateClientTestBase, TestCase):
@@ -67,3 +77,154 @@ class TestDjangoUserStateClient(UserStateClientTestBase, TestCase):
     @skip("Not supported by DjangoXBlockUserStateClient")
     def test_iter_course_many_users(self):
         pass
+
+
+@override_settings(
+    USER_STATE_WRITE_BEHIND_FIELDS={'video': ['saved_video_position'], 'problem': ['attempts']},
+    USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE=3,
+)
+class TestWriteBehind(TestCase):
+    """
+    Tests of writing user state updates behind.
+    """
+    def setUp(self):
+        super(TestWriteBehind, self).setUp()
+        self.user = UserFactory.create()
+        self.client = DjangoXBlockUserStateClient(self.user)
+        self.video_keys = [course_id.make_usage_key('video', 'video_{}'.format(i)) for i in range(3)]
+        start_write_behind()
+        self.addCleanup(stop_write_behind)
+
+    def set_position(self, usage_key, position):
+        """
+        Update the saved position of the given video.
+        """
+        self.client.set_many(self.user.username, {usage_key: {'saved_video_position': position}})
+
+    def write_elsewhere(self, usage_key, state):
+        """
+        Write the state of the given block, as another process does after the updates are buffered.
+        """
+        StudentModule.objects.update_or_create(
+            student=self.user,
+            course_id=course_id,
+            module_state_key=usage_key,
+            defaults={'module_type': usage_key.block_type, 'state': json.dumps(state)},
+        )
+
+    def stored_state(self, usage_key):
+        """
+        Return the stored state of the given block.
+        """
+        return json.loads(StudentModule.objects.get(student=self.user, module_state_key=usage_key).state)
+
+    def test_buffered_until_flushed(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.set_position(self.video_keys[0], '00:00:10')
+        self.assertFalse(StudentModule.objects.filter(student=self.user).exists())
+        self.assertEqual(
+            self.client.get(self.user.username, self.video_keys[0]).state,
+            {'saved_video_position': '00:00:10'},
+        )
+
+        self.assertEqual(flush_write_behind(), 1)
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'saved_video_position': '00:00:10'})
+        self.assertEqual(flush_write_behind(), 0)
+
+    def test_written_at_request_end(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.set_position(self.video_keys[1], '00:00:05')
+        self.assertFalse(StudentModule.objects.filter(student=self.user).exists())
+        stop_write_behind()
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'saved_video_position': '00:00:05'})
+        self.assertEqual(self.stored_state(self.video_keys[1]), {'saved_video_position': '00:00:05'})
+
+    def test_written_one_by_one_after_error(self):
+        for usage_key in self.video_keys[:2]:
+            self.set_position(usage_key, '00:00:05')
+        with patch.object(StudentModule.objects, 'bulk_create', side_effect=DatabaseError):
+            self.assertEqual(flush_write_behind(), 2)
+        self.assertEqual(StudentModule.objects.filter(student=self.user).count(), 2)
+
+    def test_raised_after_errors(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        with patch.object(StudentModule.objects, 'bulk_create', side_effect=DatabaseError):
+            with patch.object(StudentModule.objects, 'get_or_create', side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    flush_write_behind()
+        self.assertFalse(StudentModule.objects.filter(student=self.user).exists())
+
+    def test_merged_with_stored_state(self):
+        self.client.set_many(self.user.username, {self.video_keys[0]: {'speed': 1.5}})
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'speed': 1.5})
+        self.assertEqual(
+            self.client.get(self.user.username, self.video_keys[0]).state,
+            {'speed': 1.5, 'saved_video_position': '00:00:05'},
+        )
+
+        flush_write_behind()
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'speed': 1.5, 'saved_video_position': '00:00:05'})
+
+    def test_not_written_over_newer_state(self):
+        self.client.set_many(self.user.username, {self.video_keys[0]: {'speed': 1.5}})
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.write_elsewhere(self.video_keys[0], {'speed': 1.5, 'saved_video_position': '00:01:00'})
+
+        self.assertEqual(flush_write_behind(), 0)
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'speed': 1.5, 'saved_video_position': '00:01:00'})
+
+    def test_not_written_over_reset_state(self):
+        self.client.set_many(self.user.username, {self.video_keys[0]: {'speed': 1.5}})
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.write_elsewhere(self.video_keys[0], {})
+
+        self.assertEqual(flush_write_behind(), 0)
+        self.assertEqual(self.stored_state(self.video_keys[0]), {})
+
+    def test_not_written_over_state_created_while_flushing(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.write_elsewhere(self.video_keys[0], {'saved_video_position': '00:01:00'})
+
+        # the StudentModule is created after they are read, so creating it fails
+        with patch.object(StudentModule.objects, 'chunked_filter', return_value=[]):
+            self.assertEqual(flush_write_behind(), 0)
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'saved_video_position': '00:01:00'})
+
+    def test_written_over_older_state(self):
+        self.write_elsewhere(self.video_keys[0], {'saved_video_position': '00:01:00'})
+        self.set_position(self.video_keys[0], '00:00:05')
+
+        self.assertEqual(flush_write_behind(), 1)
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'saved_video_position': '00:00:05'})
+
+    def test_written_through_with_other_fields(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.client.set_many(self.user.username, {self.video_keys[0]: {'speed': 1.5}})
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'speed': 1.5, 'saved_video_position': '00:00:05'})
+        self.assertEqual(flush_write_behind(), 0)
+
+    def test_max_batch_size_in_transaction(self):
+        for usage_key in self.video_keys:
+            self.set_position(usage_key, '00:00:05')
+
+        # the test's transaction defers the write to the end of the request
+        self.assertFalse(StudentModule.objects.filter(student=self.user).exists())
+        stop_write_behind()
+        self.assertEqual(StudentModule.objects.filter(student=self.user).count(), 3)
+
+    def test_history_types_written_through(self):
+        problem_key = course_id.make_usage_key('problem', 'problem')
+        self.client.set_many(self.user.username, {problem_key: {'attempts': 1}})
+        self.assertEqual(self.stored_state(problem_key), {'attempts': 1})
+
+    def test_not_buffered_when_stopped(self):
+        stop_write_behind()
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.assertEqual(self.stored_state(self.video_keys[0]), {'saved_video_position': '00:00:05'})
+
+    def test_delete_after_buffered_update(self):
+        self.set_position(self.video_keys[0], '00:00:05')
+        self.client.delete(self.user.username, self.video_keys[0], fields=['saved_video_position'])
+        self.assertEqual(self.stored_state(self.video_keys[0]), {})
+        self.assertEqual(flush_write_behind(), 0)
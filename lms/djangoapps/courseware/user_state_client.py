@@ -1,16 +1,34 @@
 """
 An implementation of :class:`XBlockUserStateClient`, which stores XBlock Scope.user_state
 data in a Django ORM model.
+
+Updates of the fields listed for their block type in USER_STATE_WRITE_BEHIND_FIELDS
+(such as the positions saved by videos, which are updated every few seconds) can be
+written behind: between :func:`start_write_behind` and :func:`stop_write_behind`,
+which ``courseware.middleware.UserStateWriteBehindMiddleware`` calls around each
+request, they are buffered by the thread serving the request, and then written
+together by :func:`flush_write_behind`.
+
+The end of the request is the flush boundary: the buffered updates are written before
+its response is returned, and if they can't be written, the request fails.  A buffered
+update is only written if the StudentModule wasn't written since the update was made,
+so that it never overwrites a newer write by another process.
 """
 
 import itertools
 import logging
+import threading
+from collections import OrderedDict
 from operator import attrgetter
 from time import time
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.signals import request_finished
 from django.db import transaction
-from django.db.utils import IntegrityError
+from django.db.utils import DatabaseError, IntegrityError
+from django.dispatch import receiver
+from django.utils import timezone
 from edx_user_state_client.interface import XBlockUserState, XBlockUserStateClient
 from xblock.fields import Scope
 
@@ -27,6 +45,20 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
+class _WriteBehindBuffer(threading.local):
+    """
+    The user state updates buffered by the current thread, if it writes them behind.
+    """
+    def __init__(self):
+        super(_WriteBehindBuffer, self).__init__()
+        self.enabled = False
+        # (username, usage_key) -> (user, state, modified), in the order of their first update.
+        self.updates = OrderedDict()
+
+
+_WRITE_BEHIND = _WriteBehindBuffer()
+
+
 class DjangoXBlockUserStateClient(XBlockUserStateClient):
     """
     An interface that uses the Django ORM StudentModule as a backend.
@@ -196,8 +228,23 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         self._ddog_histogram(evt_time, 'get_many.blks_requested', len(block_keys))
         self._nr_stat_accumulate('get_many', 'blocks_requested', len(block_keys))
 
-        modules = self._get_student_modules(username, block_keys)
+        # Updates which are still buffered are overlaid over the stored state.
+        pending = _pending_updates(username, block_keys)
+        modules = itertools.chain(
+            self._get_student_modules(username, block_keys),
+            ((None, usage_key) for usage_key in pending.keys()),
+        )
         for module, usage_key in modules:
+            if module is not None and usage_key in pending:
+                _, pending_state, pending_modified = pending.pop(usage_key)
+                module.state = json.dumps(dict(json.loads(module.state or '{}'), **pending_state))
+                module.modified = pending_modified
+            elif module is None:
+                if usage_key not in pending:
+                    continue
+                _, pending_state, pending_modified = pending.pop(usage_key)
+                module = StudentModule(state=json.dumps(pending_state), modified=pending_modified)
+
             if module.state is None:
                 self._ddog_increment(evt_time, 'get_many.empty_state')
                 continue
@@ -268,6 +315,17 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             # what we have.
             return
 
+        if _WRITE_BEHIND.enabled:
+            block_keys_to_state = _buffer_updates(user, block_keys_to_state)
+            if not block_keys_to_state:
+                return
+
+        self._write_many(user, block_keys_to_state)
+
+    def _write_many(self, user, block_keys_to_state):
+        """
+        Write the fields of the given XBlocks for the given user to their StudentModules.
+        """
         evt_time = time()
 
         for usage_key, state in block_keys_to_state.items():
@@ -358,6 +416,10 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
         self._ddog_histogram(evt_time, 'delete_many.block_count', len(block_keys))
 
+        # Write buffered updates first, so that they don't restore the deleted fields.
+        if _pending_updates(username, block_keys):
+            flush_write_behind()
+
         student_modules = self._get_student_modules(username, block_keys)
         for student_module, _ in student_modules:
             if fields is None:
@@ -448,3 +510,226 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
         raise NotImplementedError()
+
+
+def _writes_behind(usage_key, state):
+    """
+    Return whether the given update of the given XBlock's fields can be written behind.
+
+    Only updates of the fields listed for the block type in USER_STATE_WRITE_BEHIND_FIELDS
+    are, and never for block types whose history is saved, since the batched writes don't
+    send the post_save signals which save it.
+    """
+    fields = settings.USER_STATE_WRITE_BEHIND_FIELDS.get(usage_key.block_type)
+    return (
+        bool(fields) and
+        usage_key.block_type not in BaseStudentModuleHistory.HISTORY_SAVING_TYPES and
+        set(state).issubset(fields)
+    )
+
+
+def _buffer_updates(user, block_keys_to_state):
+    """
+    Buffer the updates in block_keys_to_state which can be written behind, merging them with
+    the updates already buffered for the same XBlocks, and return the others, which include
+    the updates buffered for their XBlocks so that those don't overwrite them later.
+    """
+    remaining = {}
+    for usage_key, state in block_keys_to_state.items():
+        key = (user.username, usage_key)
+        if not _writes_behind(usage_key, state):
+            _, buffered_state, _ = _WRITE_BEHIND.updates.pop(key, (None, {}, None))
+            remaining[usage_key] = dict(buffered_state, **state)
+            continue
+        _, buffered_state, _ = _WRITE_BEHIND.updates.get(key, (None, {}, None))
+        _WRITE_BEHIND.updates[key] = (user, dict(buffered_state, **state), timezone.now())
+
+    num_buffered = len(block_keys_to_state) - len(remaining)
+    if num_buffered:
+        monitoring_utils.accumulate('xb_user_state.write_behind.blocks_buffered', num_buffered)
+    # Inside a transaction, such as the view's with ATOMIC_REQUESTS, the updates would be
+    # lost if it were rolled back, so they're written when the request ends instead.
+    is_full = len(_WRITE_BEHIND.updates) >= settings.USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE
+    if is_full and not transaction.get_connection().in_atomic_block:
+        flush_write_behind()
+    return remaining
+
+
+def _pending_updates(username, block_keys):
+    """
+    Return a dict of the given XBlocks with updates buffered for the given user to
+    tuples of the user, the buffered state, and the time of the last update.
+    """
+    if not _WRITE_BEHIND.updates:
+        return {}
+    return {
+        usage_key: _WRITE_BEHIND.updates[(username, usage_key)]
+        for usage_key in block_keys
+        if (username, usage_key) in _WRITE_BEHIND.updates
+    }
+
+
+def start_write_behind():
+    """
+    Start buffering the updates of the current thread which can be written behind.
+    """
+    _WRITE_BEHIND.enabled = True
+
+
+def stop_write_behind():
+    """
+    Write the updates buffered by the current thread, and stop buffering them.
+    """
+    try:
+        flush_write_behind()
+    finally:
+        _WRITE_BEHIND.enabled = False
+
+
+def flush_write_behind():
+    """
+    Write the updates buffered by the current thread, with one query to read the existing
+    StudentModules of each user and course, one to create the missing ones, and one update
+    of each existing one.  Return the number of StudentModules written.
+
+    If they can't be written together, they are written one by one, and if some of them
+    can't be written either, the first error is raised once the others are written.
+    """
+    updates = _WRITE_BEHIND.updates
+    if not updates:
+        return 0
+    _WRITE_BEHIND.updates = OrderedDict()
+
+    start_time = time()
+    try:
+        with transaction.atomic():
+            num_written = _write_updates(updates)
+    except DatabaseError:
+        log.warning(
+            "flush_write_behind: Couldn't write %d updates together, writing them one by one",
+            len(updates), exc_info=True,
+        )
+        num_written = _write_updates_one_by_one(updates)
+
+    duration = (time() - start_time) * 1000  # milliseconds
+    dog_stats_api.histogram('DjangoXBlockUserStateClient.write_behind.batch_size', len(updates))
+    dog_stats_api.histogram('DjangoXBlockUserStateClient.write_behind.flush_time', duration)
+    monitoring_utils.accumulate('xb_user_state.write_behind.flushes', 1)
+    monitoring_utils.accumulate('xb_user_state.write_behind.blocks_flushed', num_written)
+    monitoring_utils.accumulate('xb_user_state.write_behind.blocks_superseded', len(updates) - num_written)
+    monitoring_utils.accumulate('xb_user_state.write_behind.duration', duration)
+    return num_written
+
+
+def _updates_by_user(updates):
+    """
+    Return tuples of each user with buffered updates, and a dict of the UsageKeys
+    of the XBlocks updated for the user to tuples of their buffered state and the
+    time of its last update.
+    """
+    by_user = OrderedDict()
+    for (_, usage_key), (user, state, modified) in updates.items():
+        by_user.setdefault(user.id, (user, {}))[1][usage_key] = (state, modified)
+    return by_user.itervalues()
+
+
+def _update_student_module(student_module, state, modified):
+    """
+    Merge the given buffered state, last updated at `modified`, into the stored state of
+    the given StudentModule, unless it was written after that, such as by another process,
+    whose newer write is kept.  Return whether it was written.
+    """
+    while student_module.modified <= modified:
+        current_state = json.loads(student_module.state or '{}')
+        current_state.update(state)
+        # Only update the row as it was read, so that writes made since aren't overwritten.
+        num_updated = StudentModule.objects.filter(pk=student_module.pk, modified=student_module.modified).update(
+            state=json.dumps(current_state), modified=modified,
+        )
+        if num_updated:
+            return True
+        try:
+            student_module = StudentModule.objects.get(pk=student_module.pk)
+        except StudentModule.DoesNotExist:
+            return False
+    return False
+
+
+def _write_updates(updates):
+    """
+    Write the given buffered updates, merging their state with the stored state, and
+    return the number of StudentModules written.
+    """
+    num_written = 0
+    for user, usage_key_updates in _updates_by_user(updates):
+        for course_key, usage_keys in itertools.groupby(
+                sorted(usage_key_updates, key=attrgetter('course_key')), attrgetter('course_key')
+        ):
+            usage_keys = list(usage_keys)
+            existing = {
+                student_module.module_state_key.map_into_course(student_module.course_id): student_module
+                for student_module in StudentModule.objects.chunked_filter(
+                    'module_state_key__in', usage_keys, student_id=user.id, course_id=course_key,
+                )
+            }
+            missing = []
+            for usage_key in usage_keys:
+                state, modified = usage_key_updates[usage_key]
+                student_module = existing.get(usage_key)
+                if student_module is None:
+                    missing.append(StudentModule(
+                        student_id=user.id,
+                        course_id=course_key,
+                        module_state_key=usage_key,
+                        module_type=usage_key.block_type,
+                        state=json.dumps(state),
+                    ))
+                elif _update_student_module(student_module, state, modified):
+                    num_written += 1
+            if missing:
+                StudentModule.objects.bulk_create(missing)
+                num_written += len(missing)
+    return num_written
+
+
+def _write_updates_one_by_one(updates):
+    """
+    Write the given buffered updates one by one, and return the number of StudentModules
+    written.  If some of them can't be written, they are logged and the first error is
+    raised once the others are written.
+    """
+    num_written = 0
+    errors = []
+    for user, usage_key_updates in _updates_by_user(updates):
+        for usage_key, (state, modified) in usage_key_updates.items():
+            try:
+                with transaction.atomic():
+                    student_module, created = StudentModule.objects.get_or_create(
+                        student_id=user.id,
+                        course_id=usage_key.course_key,
+                        module_state_key=usage_key,
+                        defaults={'state': json.dumps(state), 'module_type': usage_key.block_type},
+                    )
+                    if created or _update_student_module(student_module, state, modified):
+                        num_written += 1
+            except DatabaseError as error:
+                log.exception("flush_write_behind: Couldn't write the update of %s for %s", usage_key, user)
+                errors.append(error)
+
+    if errors:
+        dog_stats_api.increment('DjangoXBlockUserStateClient.write_behind.failed', len(errors))
+        raise errors[0]
+    return num_written
+
+
+@receiver(request_finished)
+def _stop_write_behind_on_request_finished(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Write the updates still buffered when a request finishes, in case a middleware raised
+    before UserStateWriteBehindMiddleware could write them.  The response was already sent
+    by then, so errors are logged rather than raised.
+    """
+    try:
+        stop_write_behind()
+    except DatabaseError:
+        log.exception("flush_write_behind: Couldn't write the updates buffered by a failed request")
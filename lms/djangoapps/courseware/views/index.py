@@ -98,6 +98,7 @@ class CoursewareIndex(View):
         self.section_url_name = section
         self.position = position
         self.chapter, self.section = None, None
+        self.prefetched_section = None
         self.course = None
         self.url = request.path
 
@@ -274,13 +275,15 @@ class CoursewareIndex(View):
         Prefetches all descendant data for the requested section and
         sets up the runtime, which binds the request user to the section.
         """
-        self.field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+        self.field_data_cache = FieldDataCache(
+            [],
             self.course_key,
             self.effective_user,
-            self.course,
-            depth=CONTENT_DEPTH,
             read_only=CrawlersConfig.is_crawler(request),
         )
+        with self.field_data_cache.prefetch_plan():
+            self.field_data_cache.add_descriptor_descendents(self.course, depth=CONTENT_DEPTH)
+            self._prefetch_requested_section()
 
         self.course = get_module_for_descriptor(
             self.effective_user,
@@ -291,14 +294,39 @@ class CoursewareIndex(View):
             course=self.course,
         )
 
+    def _prefetch_requested_section(self):
+        """
+        Adds all descendant data for the section named in the URL to the
+        field data cache, so that it is read along with the course's data
+        rather than once the course is bound.
+        """
+        chapter = self._find_child_descriptor(self.course, self.chapter_url_name)
+        section = self._find_child_descriptor(chapter, self.section_url_name)
+        if section:
+            self.prefetched_section = modulestore().get_item(section.location, depth=None, lazy=False)
+            self.field_data_cache.add_descriptor_descendents(self.prefetched_section, depth=None)
+
+    def _find_child_descriptor(self, parent, url_name):
+        """
+        Finds the child descriptor of the (unbound) parent with the specified url_name.
+        """
+        if parent and url_name:
+            for child in parent.get_children():
+                if child.location.name == url_name:
+                    return child
+        return None
+
     def _prefetch_and_bind_section(self):
         """
         Prefetches all descendant data for the requested section and
         sets up the runtime, which binds the request user to the section.
         """
-        # Pre-fetch all descendant data
-        self.section = modulestore().get_item(self.section.location, depth=None, lazy=False)
-        self.field_data_cache.add_descriptor_descendents(self.section, depth=None)
+        # Pre-fetch all descendant data, unless it was prefetched with the course
+        if self.prefetched_section and self.prefetched_section.location == self.section.location:
+            self.section = self.prefetched_section
+        else:
+            self.section = modulestore().get_item(self.section.location, depth=None, lazy=False)
+            self.field_data_cache.add_descriptor_descendents(self.section, depth=None)
 
         # Bind section to user
         self.section = get_module_for_descriptor(
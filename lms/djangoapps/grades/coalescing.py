@@ -0,0 +1,121 @@
+"""
+Coalescing of recalculate_subsection_grade tasks.
+
+A learner who answers many problems of a subsection in quick
+succession would otherwise enqueue a recalculation of the same
+subsection grade for each answer.  When coalescing is enabled, each
+task is registered as the latest task for its (user, course,
+subsection) key and delayed by the coalescing window.  When a task
+runs, it exits early if a later task was registered for the same key,
+since that later task recalculates the subsection grade from the
+latest scores.
+"""
+from logging import getLogger
+
+import dogstats_wrapper as dog_stats_api
+from django.conf import settings
+from django.core.cache import cache
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+from openedx.core.djangoapps.monitoring_utils import set_custom_metric
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
+
+from .config.waffle import COALESCE_SUBSECTION_UPDATES, waffle
+
+log = getLogger(__name__)
+
+
+def is_enabled():
+    """
+    Returns whether recalculations of subsection grades are coalesced.
+    """
+    return waffle().is_enabled(COALESCE_SUBSECTION_UPDATES)
+
+
+def coalescing_window():
+    """
+    Returns the number of seconds by which coalesced tasks are delayed.
+    """
+    return settings.RECALCULATE_GRADES_COALESCING_WINDOW
+
+
+def get_coalescing_key(user_id, course_id, usage_id):
+    """
+    Returns the coalescing key of a recalculation of the subsection
+    grade for the given user and scored block, or None if the block is
+    not in a subsection.
+    """
+    usage_key = UsageKey.from_string(usage_id).replace(course_key=CourseKey.from_string(course_id))
+    store = modulestore()
+    try:
+        while usage_key is not None and usage_key.block_type != 'sequential':
+            usage_key = store.get_parent_location(usage_key)
+    except ItemNotFoundError:
+        return None
+    if usage_key is None:
+        return None
+    return u'{}.{}.{}'.format(user_id, course_id, usage_key)
+
+
+def register_task(coalescing_key, task_id):
+    """
+    Registers the given task as the latest task for the given key.
+    Returns whether it supersedes a pending task.
+    """
+    latest_task_key = _latest_task_cache_key(coalescing_key)
+    superseded_task_id = cache.get(latest_task_key)
+    cache.set(latest_task_key, task_id, _cache_timeout())
+    if superseded_task_id is None:
+        return False
+
+    merged_count_key = _merged_count_cache_key(coalescing_key)
+    cache.add(merged_count_key, 0, _cache_timeout())
+    try:
+        cache.incr(merged_count_key)
+    except ValueError:
+        # The count expired in the meantime.
+        cache.set(merged_count_key, 1, _cache_timeout())
+    dog_stats_api.increment('lms.grades.recalculate_subsection_grade.merged')
+    return True
+
+
+def is_superseded(coalescing_key, task_id):
+    """
+    Returns whether a later task was registered for the given key.
+    If the registration expired, the task is not considered superseded.
+    """
+    latest_task_id = cache.get(_latest_task_cache_key(coalescing_key))
+    if latest_task_id is not None and latest_task_id != task_id:
+        log.info(u'Grades: Task %s is superseded by task %s for %s', task_id, latest_task_id, coalescing_key)
+        return True
+    return False
+
+
+def task_completed(coalescing_key, task_id):
+    """
+    Records that the given task recalculated the subsection grade for
+    the given key, along with the number of tasks merged into it.
+    """
+    merged_count_key = _merged_count_cache_key(coalescing_key)
+    merged_count = cache.get(merged_count_key) or 0
+    cache.delete(merged_count_key)
+    if cache.get(_latest_task_cache_key(coalescing_key)) == task_id:
+        cache.delete(_latest_task_cache_key(coalescing_key))
+    set_custom_metric('merged_subsection_grade_tasks', merged_count)
+
+
+def _cache_timeout():
+    """
+    Returns the timeout of cache entries, which outlive the coalescing
+    window to account for queueing delays and retries.
+    """
+    return coalescing_window() * 10 + 600
+
+
+def _latest_task_cache_key(coalescing_key):
+    return u'grades.coalescing.latest_task.{}'.format(coalescing_key)
+
+
+def _merged_count_cache_key(coalescing_key):
+    return u'grades.coalescing.merged_count.{}'.format(coalescing_key)
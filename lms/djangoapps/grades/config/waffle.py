@@ -12,6 +12,9 @@ WRITE_ONLY_IF_ENGAGED = u'write_only_if_engaged'
 ASSUME_ZERO_GRADE_IF_ABSENT = u'assume_zero_grade_if_absent'
 ESTIMATE_FIRST_ATTEMPTED = u'estimate_first_attempted'
 DISABLE_REGRADE_ON_POLICY_CHANGE = u'disable_regrade_on_policy_change'
+BULK_GRADE_REPORTS = u'bulk_grade_reports'
+COALESCE_SUBSECTION_UPDATES = u'coalesce_subsection_updates'
+INCREMENTAL_COURSE_GRADE_UPDATES = u'incremental_course_grade_updates'
 
 # Course Flags
 REJECTED_EXAM_OVERRIDES_GRADE = u'rejected_exam_overrides_grade'
@@ -5,6 +5,7 @@ from collections import OrderedDict
 
 from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
 
+from .new.course_data import grades_collected_data_dependencies
 from .scores import possibly_scored
 
 
@@ -12,7 +13,7 @@ def grading_context_for_course(course_key):
     """
     Same as grading_context, but takes in a course key.
     """
-    course_structure = get_course_in_cache(course_key)
+    course_structure = get_course_in_cache(course_key, grades_collected_data_dependencies())
     return grading_context(course_structure)
 
 
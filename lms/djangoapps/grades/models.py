@@ -11,7 +11,7 @@ persisted, course grades are also immune to changes in course content.
 import json
 import logging
 from base64 import b64encode
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from hashlib import sha1
 
 from django.db import models
@@ -20,6 +20,7 @@ from lazy import lazy
 from model_utils.models import TimeStampedModel
 from opaque_keys.edx.keys import CourseKey, UsageKey
 
+from courseware.models import chunks
 from coursewarehistoryextended.fields import UnsignedBigIntAutoField, UnsignedBigIntOneToOneField
 from eventtracking import tracker
 from openedx.core.djangoapps.xmodule_django.models import CourseKeyField, UsageKeyField
@@ -34,6 +35,9 @@ log = logging.getLogger(__name__)
 
 BLOCK_RECORD_LIST_VERSION = 1
 
+# Maximum number of values in the IN clause of bulk read queries.
+BULK_READ_CHUNK_SIZE = 500
+
 # Used to serialize information about a block at the time it was used in
 # grade calculation.
 BlockRecord = namedtuple('BlockRecord', ['locator', 'weight', 'raw_possible', 'graded'])
@@ -197,7 +201,7 @@ class VisibleBlocks(models.Model):
         """
         return u"VisibleBlocks object - hash:{}, raw json:'{}'".format(self.hashed, self.blocks_json)
 
-    @property
+    @lazy
     def blocks(self):
         """
         Returns the blocks_json data stored on this model as a list of
@@ -221,6 +225,29 @@ class VisibleBlocks(models.Model):
             prefetched = cls._initialize_cache(course_key)
         return prefetched
 
+    @classmethod
+    def bulk_read_by_hash(cls, course_key, hashes):
+        """
+        Reads and returns a dictionary mapping the given hashes to their
+        visible block records for the given course.  Records already read
+        in this request are returned from the cache; the others are read
+        with chunked queries.
+
+        Arguments:
+            course_key: The course identifier for the desired records
+            hashes: An iterable of the hashes of the desired records
+        """
+        cache = get_cache(cls.CACHE_NAMESPACE)
+        prefetched = cache.get(cls._cache_key(course_key))
+        if prefetched:
+            return {hashed: prefetched[hashed] for hashed in hashes if hashed in prefetched}
+
+        read_by_hash = cache.setdefault(cls._read_by_hash_cache_key(course_key), {})
+        missing_hashes = {hashed for hashed in hashes if hashed not in read_by_hash}
+        for chunk in chunks(missing_hashes, BULK_READ_CHUNK_SIZE):
+            read_by_hash.update({record.hashed: record for record in cls.objects.filter(hashed__in=chunk)})
+        return {hashed: read_by_hash[hashed] for hashed in hashes if hashed in read_by_hash}
+
     @classmethod
     def bulk_create(cls, course_key, block_record_lists):
         """
@@ -279,11 +306,16 @@ class VisibleBlocks(models.Model):
         """
         cache = get_cache(cls.CACHE_NAMESPACE)
         cache.pop(cls._cache_key(course_key), None)
+        cache.pop(cls._read_by_hash_cache_key(course_key), None)
 
     @classmethod
     def _cache_key(cls, course_key):
         return u"visible_blocks_cache.{}".format(course_key)
 
+    @classmethod
+    def _read_by_hash_cache_key(cls, course_key):
+        return u"visible_blocks_cache.by_hash.{}".format(course_key)
+
 
 class PersistentSubsectionGrade(DeleteGradesMixin, TimeStampedModel):
     """
@@ -340,6 +372,8 @@ class PersistentSubsectionGrade(DeleteGradesMixin, TimeStampedModel):
     # track which blocks were visible at the time of grade calculation
     visible_blocks = models.ForeignKey(VisibleBlocks, db_column='visible_blocks_hash', to_field='hashed')
 
+    CACHE_NAMESPACE = u"grades.models.PersistentSubsectionGrade"
+
     @property
     def full_usage_key(self):
         """
@@ -386,20 +420,54 @@ class PersistentSubsectionGrade(DeleteGradesMixin, TimeStampedModel):
             usage_key=usage_key,
         )
 
+    @classmethod
+    def prefetch(cls, course_key, users):
+        """
+        Prefetches the grades of the given users for the given course,
+        along with their visible blocks, with chunked queries.
+        """
+        prefetched = {user.id: [] for user in users}
+        for chunk in chunks(prefetched.keys(), BULK_READ_CHUNK_SIZE):
+            for grade in cls.objects.filter(user_id__in=chunk, course_id=course_key):
+                prefetched[grade.user_id].append(grade)
+
+        grades = [grade for user_grades in prefetched.itervalues() for grade in user_grades]
+        visible_blocks = VisibleBlocks.bulk_read_by_hash(course_key, {grade.visible_blocks_id for grade in grades})
+        for grade in grades:
+            if grade.visible_blocks_id in visible_blocks:
+                grade.visible_blocks = visible_blocks[grade.visible_blocks_id]
+
+        get_cache(cls.CACHE_NAMESPACE)[cls._cache_key(course_key)] = prefetched
+
     @classmethod
     def bulk_read_grades(cls, user_id, course_key):
         """
-        Reads all grades for the given user and course.
+        Reads all grades for the given user and course, from the
+        prefetched grades if the user's grades were prefetched.
 
         Arguments:
             user_id: The user associated with the desired grades
             course_key: The course identifier for the desired grades
         """
+        prefetched = get_cache(cls.CACHE_NAMESPACE).get(cls._cache_key(course_key), {})
+        if user_id in prefetched:
+            return prefetched[user_id]
         return cls.objects.select_related('visible_blocks').filter(
             user_id=user_id,
             course_id=course_key,
         )
 
+    @classmethod
+    def clear_prefetched_data(cls, course_key):
+        """
+        Clears the prefetched grades of the given course.
+        """
+        get_cache(cls.CACHE_NAMESPACE).pop(cls._cache_key(course_key), None)
+
+    @classmethod
+    def _cache_key(cls, course_key):
+        return u"subsection_grades_cache.{}".format(course_key)
+
     @classmethod
     def update_or_create_grade(cls, **params):
         """
@@ -611,10 +679,17 @@ class PersistentCourseGrade(DeleteGradesMixin, TimeStampedModel):
         """
         get_cache(cls.CACHE_NAMESPACE)[cls._cache_key(course_id)] = {
             grade.user_id: grade
-            for grade in
-            cls.objects.filter(user_id__in=[user.id for user in users], course_id=course_id)
+            for chunk in chunks([user.id for user in users], BULK_READ_CHUNK_SIZE)
+            for grade in cls.objects.filter(user_id__in=chunk, course_id=course_id)
         }
 
+    @classmethod
+    def clear_prefetched_data(cls, course_id):
+        """
+        Clears the prefetched grades of the given course.
+        """
+        get_cache(cls.CACHE_NAMESPACE).pop(cls._cache_key(course_id), None)
+
     @classmethod
     def read(cls, user_id, course_id):
         """
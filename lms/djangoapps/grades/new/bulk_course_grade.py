@@ -0,0 +1,618 @@
+"""
+Bulk computation of course grades for a batch of users.
+
+Instead of building a SubsectionGradeFactory and a graph of
+SubsectionGrade and ProblemScore objects for each user, the
+BulkCourseGradeFactory reads the persisted grades and the raw scores
+of a whole batch of users in a few queries and computes their
+subsection totals and course grades with array operations over
+(users x scorable blocks) and (users x subsections) matrices.
+
+Users are grouped by their visibility signature, so the course blocks
+are transformed once per group rather than once per user.
+
+The computation is read-only: unlike CourseGradeFactory.create, it
+never persists grades nor sends grade-change signals.  Users whose
+persisted course grade was computed with a different grading policy
+are graded by CourseGradeFactory, so that their grade is updated.
+"""
+from collections import OrderedDict
+from logging import getLogger
+
+import numpy
+from django.conf import settings
+from lazy import lazy
+from opaque_keys.edx.keys import UsageKey
+
+from courseware.models import StudentModule
+from lms.djangoapps.course_blocks.api import get_course_blocks
+from lms.djangoapps.course_blocks.transformed_cache import get_visibility_signature
+from student.models import AnonymousUserId
+from submissions.models import ScoreSummary
+from xmodule.graders import AggregatedScore, AssignmentFormatGrader, WeightedSubsectionsGrader
+
+from ..config import assume_zero_if_absent, should_persist_grades
+from ..models import PersistentCourseGrade, PersistentSubsectionGrade
+from ..scores import _get_explicit_graded, possibly_scored
+from ..transformer import GradesTransformer
+from .course_data import CourseData
+from .course_grade import CourseGrade, uniqueify
+from .course_grade_factory import CourseGradeFactory
+
+log = getLogger(__name__)
+
+
+class BulkCourseGrade(object):
+    """
+    Course grade of a user, as computed by the BulkCourseGradeFactory.
+
+    Provides the same attributes as CourseGrade for reporting, except
+    that grader_result only includes the 'percent' of the course and of
+    each assignment type in its 'grade_breakdown'.
+    """
+    def __init__(self, user, percent, letter_grade, passed, graded_subsections_by_format, grader_result):
+        self.user = user
+        self.percent = percent
+        self.letter_grade = letter_grade or None
+        self.passed = passed
+        self.graded_subsections_by_format = graded_subsections_by_format
+        self.grader_result = grader_result
+
+    def __unicode__(self):
+        return u'Bulk Course Grade: percent: {}, letter_grade: {}, passed: {}'.format(
+            unicode(self.percent),
+            self.letter_grade,
+            self.passed,
+        )
+
+
+class BulkSubsectionGrade(object):
+    """
+    Graded total of a subsection for a user, as computed by the
+    BulkCourseGradeFactory.
+    """
+    def __init__(self, location, display_name, format, graded_total):  # pylint: disable=redefined-builtin
+        self.location = location
+        self.display_name = display_name
+        self.format = format
+        self.graded = True
+        self.graded_total = graded_total
+
+
+class BulkCourseGradeFactory(object):
+    """
+    Factory for computing the course grades of many users of a course
+    at once.  An instance caches data about the course and the
+    transformed course structures, so it should be reused for all
+    batches of users of the same course.
+    """
+    def __init__(self, course=None, collected_block_structure=None, course_key=None):
+        self.course_data = CourseData(
+            user=None, course=course, collected_block_structure=collected_block_structure, course_key=course_key,
+        )
+        self._course_matrices = None
+        self._structure_matrices = {}
+
+    def iter(self, users):
+        """
+        Given an iterable of users, yields a CourseGradeFactory.GradeResult
+        for each of them, in the same order.
+        """
+        users = list(users)
+        if not self._can_grade_in_bulk():
+            for result in self._iter_individually(users):
+                yield result
+            return
+
+        try:
+            grades_by_user_id = self._grade_users(users)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.exception(
+                u'Grades: Bulk grading failed for course %s, grading users individually: %s',
+                self.course_data.course_key,
+                exc.message,
+            )
+            grades_by_user_id = {}
+
+        individual_users = [user for user in users if user.id not in grades_by_user_id]
+        individual_results = {result.student.id: result for result in self._iter_individually(individual_users)}
+        for user in users:
+            if user.id in grades_by_user_id:
+                yield CourseGradeFactory.GradeResult(user, grades_by_user_id[user.id], None)
+            else:
+                yield individual_results[user.id]
+
+    def _iter_individually(self, users):
+        """
+        Yields the GradeResults of the given users from CourseGradeFactory.
+        """
+        return CourseGradeFactory().iter(
+            users,
+            course=self.course_data.course,
+            collected_block_structure=self.course_data.collected_structure,
+            course_key=self.course_data.course_key,
+        )
+
+    def _can_grade_in_bulk(self):
+        """
+        Returns whether the course's grader is supported by this factory.
+        """
+        if settings.GENERATE_PROFILE_SCORES:
+            return False
+        grader = self._course_grader
+        return isinstance(grader, WeightedSubsectionsGrader) and all(
+            isinstance(subgrader, AssignmentFormatGrader) for subgrader, _, _ in grader.subgraders
+        )
+
+    @property
+    def _course_grader(self):
+        """
+        Returns the grader of the course.
+        """
+        course = self.course_data.course
+        course.set_grading_policy(course.grading_policy)
+        return course.grader
+
+    def _grade_users(self, users):
+        """
+        Returns a dict of user id to BulkCourseGrade for the given users,
+        except for those who must be graded by CourseGradeFactory.
+        """
+        course_key = self.course_data.course_key
+        course = self._get_course_matrices()
+        persist_grades = should_persist_grades(course_key)
+        assume_zero = assume_zero_if_absent(course_key)
+
+        course_grades = {}
+        if persist_grades:
+            course_grades = {
+                grade.user_id: grade
+                for grade in PersistentCourseGrade.objects.filter(
+                    user_id__in=[user.id for user in users], course_id=course_key,
+                )
+            }
+        users = [
+            user for user in users
+            if user.id not in course_grades or
+            course_grades[user.id].grading_policy_hash == self.course_data.grading_policy_hash
+        ]
+        if not users:
+            return {}
+
+        subsection_grades = _SubsectionGradeMatrices(users, course)
+        if persist_grades:
+            subsection_grades.add_persisted(course_key)
+
+        # Users without a persisted course grade get a zero grade if
+        # grades are assumed to be zero when absent.
+        zero_grade_rows = numpy.array(
+            [assume_zero and user.id not in course_grades for user in users], dtype=bool,
+        )
+        subsection_grades.clear_rows(zero_grade_rows)
+
+        rows_by_structure = OrderedDict()
+        for row, user in enumerate(users):
+            rows_by_structure.setdefault(self._get_structure_matrices(user).id, []).append(row)
+
+        for structure_id, rows in rows_by_structure.iteritems():
+            structure = self._structure_matrices[structure_id]
+            rows = numpy.array(rows)
+            subsection_grades.add_visible(rows, structure)
+            if not assume_zero:
+                computed_rows = rows[(~subsection_grades.persisted[rows] & structure.visible).any(axis=1)]
+                if len(computed_rows):
+                    subsection_grades.add_computed(computed_rows, structure, course_key)
+            subsection_grades.add_latest(rows, structure)
+
+        return {
+            user.id: self._course_grade(user, row, subsection_grades, course_grades.get(user.id))
+            for row, user in enumerate(users)
+        }
+
+    def _course_grade(self, user, row, subsection_grades, persisted_course_grade):
+        """
+        Returns the BulkCourseGrade of the given user, whose grades are
+        in the given row of the given _SubsectionGradeMatrices.
+        """
+        course = self._get_course_matrices()
+        graded_subsections_by_format = OrderedDict()
+        for column in numpy.flatnonzero(subsection_grades.available[row]):
+            subsection = course.subsections[column]
+            graded_subsections_by_format.setdefault(subsection.format, OrderedDict())[subsection.location] = (
+                BulkSubsectionGrade(
+                    subsection.location,
+                    subsection.display_name,
+                    subsection.format,
+                    AggregatedScore(
+                        float(subsection_grades.earned[row, column]),
+                        float(subsection_grades.possible[row, column]),
+                        graded=True,
+                        first_attempted=subsection_grades.first_attempted.get((row, column)),
+                    ),
+                )
+            )
+
+        grader_result = {
+            'percent': float(subsection_grades.grader_percent[row]),
+            'grade_breakdown': OrderedDict(
+                (category, {'percent': float(percents[row]), 'category': category})
+                for category, percents in subsection_grades.grader_breakdown.iteritems()
+            ),
+        }
+
+        if persisted_course_grade:
+            percent = persisted_course_grade.percent_grade
+            letter_grade = persisted_course_grade.letter_grade
+            passed = persisted_course_grade.passed_timestamp is not None
+        elif subsection_grades.zero_grade_rows[row]:
+            percent, letter_grade, passed = 0, None, False
+        else:
+            grade_cutoffs = self.course_data.course.grade_cutoffs
+            percent = CourseGrade._compute_percent(grader_result)  # pylint: disable=protected-access
+            letter_grade = CourseGrade._compute_letter_grade(grade_cutoffs, percent)  # pylint: disable=protected-access
+            passed = CourseGrade._compute_passed(grade_cutoffs, percent)  # pylint: disable=protected-access
+
+        return BulkCourseGrade(user, percent, letter_grade, passed, graded_subsections_by_format, grader_result)
+
+    def _get_course_matrices(self):
+        """
+        Returns the _CourseMatrices of the course.
+        """
+        if self._course_matrices is None:
+            self._course_matrices = _CourseMatrices(self.course_data.collected_structure, self._course_grader)
+        return self._course_matrices
+
+    def _get_structure_matrices(self, user):
+        """
+        Returns the _StructureMatrices of the course blocks visible to
+        the given user, sharing them among users with the same
+        visibility signature.
+        """
+        collected_structure = self.course_data.collected_structure
+        signature = get_visibility_signature(user, collected_structure)
+        structure_id = signature if signature is not None else (u'user', user.id)
+        if structure_id not in self._structure_matrices:
+            structure = get_course_blocks(
+                user, self.course_data.location, collected_block_structure=collected_structure,
+            )
+            self._structure_matrices[structure_id] = _StructureMatrices(
+                structure_id, structure, self._get_course_matrices(),
+            )
+        return self._structure_matrices[structure_id]
+
+
+class _Subsection(object):
+    """
+    A graded subsection of the course.
+    """
+    def __init__(self, block):
+        self.location = block.location
+        self.display_name = block.display_name
+        self.format = getattr(block, 'format', '')
+
+
+class _CourseMatrices(object):
+    """
+    Data about the graded subsections and scorable blocks of a
+    course, common to all users.
+    """
+    def __init__(self, collected_structure, grader):
+        self.subsections = []
+        self.block_keys = []
+        block_indexes = {}
+        subsection_keys = set()
+        root_key = collected_structure.root_block_usage_key
+        for chapter_key in collected_structure.get_children(root_key):
+            for subsection_key in uniqueify(collected_structure.get_children(chapter_key)):
+                subsection = collected_structure[subsection_key]
+                if not getattr(subsection, 'graded', False) or subsection_key in subsection_keys:
+                    continue
+                subsection_keys.add(subsection_key)
+                self.subsections.append(_Subsection(subsection))
+                for block_key in collected_structure.post_order_traversal(
+                        filter_func=possibly_scored,
+                        start_node=subsection_key,
+                ):
+                    if block_key not in block_indexes and getattr(collected_structure[block_key], 'has_score', False):
+                        block_indexes[block_key] = len(self.block_keys)
+                        self.block_keys.append(block_key)
+        self.block_indexes = block_indexes
+
+        blocks = [collected_structure[block_key] for block_key in self.block_keys]
+        self.weights = [getattr(block, 'weight', None) for block in blocks]
+        max_scores = [block.transformer_data[GradesTransformer].max_score for block in blocks]
+        # Score of each block for users who haven't attempted it, per
+        # scores.get_score; blocks without a max_score are not scored.
+        self.has_max_score = numpy.array([max_score is not None for max_score in max_scores], dtype=bool)
+        self.latest_possible = numpy.array([
+            _weighted_score(0.0, max_score, weight)[1] if max_score is not None else 0.0
+            for max_score, weight in zip(max_scores, self.weights)
+        ], dtype=float)
+        self.explicitly_graded = numpy.array([_get_explicit_graded(block) for block in blocks], dtype=bool)
+
+        # Columns of the subsections of each assignment type, per the
+        # grader's (subgrader, category, weight) tuples.
+        self.subgraders = [
+            (
+                subgrader,
+                category,
+                weight,
+                numpy.array([
+                    column for column, subsection in enumerate(self.subsections)
+                    if subsection.format == subgrader.type
+                ], dtype=int),
+            )
+            for subgrader, category, weight in grader.subgraders
+        ]
+
+
+class _StructureMatrices(object):
+    """
+    Data about the course blocks that are visible in a transformed
+    course structure, shared by the users with that structure.
+    """
+    def __init__(self, structure_id, structure, course):
+        self.id = structure_id  # pylint: disable=invalid-name
+        num_subsections, num_blocks = len(course.subsections), len(course.block_keys)
+
+        visible_subsection_keys = set()
+        for chapter_key in structure.get_children(structure.root_block_usage_key):
+            visible_subsection_keys.update(structure.get_children(chapter_key))
+
+        # Whether each subsection is in the structure.
+        self.visible = numpy.zeros(num_subsections, dtype=bool)
+        # Whether each scorable block counts towards each subsection.
+        self.membership = numpy.zeros((num_blocks, num_subsections), dtype=float)
+        for column, subsection in enumerate(course.subsections):
+            if subsection.location not in visible_subsection_keys:
+                continue
+            self.visible[column] = True
+            for block_key in structure.post_order_traversal(
+                    filter_func=possibly_scored,
+                    start_node=subsection.location,
+            ):
+                index = course.block_indexes.get(block_key)
+                if index is not None:
+                    self.membership[index, column] = 1.0
+
+        # Graded totals of the subsections for users who haven't
+        # attempted any of their problems.
+        latest_graded = course.latest_possible * (course.explicitly_graded & (course.latest_possible > 0))
+        self.latest_possible = numpy.dot(latest_graded, self.membership)
+
+
+class _SubsectionGradeMatrices(object):
+    """
+    Graded totals of the graded subsections of a course for a batch of
+    users, with a row for each user and a column for each subsection.
+    """
+    def __init__(self, users, course):
+        self.users = users
+        self.course = course
+        shape = (len(users), len(course.subsections))
+        self.earned = numpy.zeros(shape, dtype=float)
+        self.possible = numpy.zeros(shape, dtype=float)
+        # Whether the subsection's grade was read from storage or computed.
+        self.persisted = numpy.zeros(shape, dtype=bool)
+        self.computed = numpy.zeros(shape, dtype=bool)
+        self.visible = numpy.zeros(shape, dtype=bool)
+        # {(row, column): datetime} for attempted subsections.
+        self.first_attempted = {}
+        self.zero_grade_rows = numpy.zeros(len(users), dtype=bool)
+
+    def add_persisted(self, course_key):
+        """
+        Reads the persisted subsection grades of the users.
+        """
+        rows = {user.id: row for row, user in enumerate(self.users)}
+        columns = {subsection.location: column for column, subsection in enumerate(self.course.subsections)}
+        grades = PersistentSubsectionGrade.objects.filter(
+            user_id__in=rows.keys(), course_id=course_key,
+        ).values_list('user_id', 'usage_key', 'earned_graded', 'possible_graded', 'first_attempted')
+        for user_id, usage_key, earned_graded, possible_graded, first_attempted in grades:
+            if usage_key.run is None:
+                usage_key = usage_key.replace(course_key=course_key)
+            column = columns.get(usage_key)
+            if column is None:
+                continue
+            row = rows[user_id]
+            self.earned[row, column] = earned_graded
+            self.possible[row, column] = possible_graded
+            self.persisted[row, column] = True
+            if first_attempted is not None:
+                self.first_attempted[row, column] = first_attempted
+
+    def clear_rows(self, rows):
+        """
+        Discards the persisted subsection grades of the given rows,
+        whose users get zero grades.
+        """
+        self.zero_grade_rows = rows
+        self.earned[rows] = 0.0
+        self.possible[rows] = 0.0
+        self.persisted[rows] = False
+        for row, column in self.first_attempted.keys():
+            if rows[row]:
+                del self.first_attempted[row, column]
+
+    def add_visible(self, rows, structure):
+        """
+        Records the subsections visible in the given structure for the
+        given rows.
+        """
+        self.visible[rows] = structure.visible
+
+    def add_computed(self, rows, structure, course_key):
+        """
+        Computes the grades of the subsections of the given rows that
+        have no persisted grade, from the users' scores.
+        """
+        course = self.course
+        users = [self.users[row] for row in rows]
+        shape = (len(rows), len(course.block_keys))
+        earned = numpy.zeros(shape, dtype=float)
+        possible = numpy.tile(course.latest_possible, (len(rows), 1))
+        scored = numpy.tile(course.has_max_score, (len(rows), 1))
+        first_attempted = {}
+
+        # Scores from the courseware student module.
+        user_rows = {user.id: user_row for user_row, user in enumerate(users)}
+        csm_scores = StudentModule.objects.filter(
+            student_id__in=user_rows.keys(),
+            course_id=course_key,
+            module_state_key__in=course.block_keys,
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade', 'created')
+        for user_id, location, correct, total, created in csm_scores:
+            index = course.block_indexes.get(UsageKey.from_string(location).map_into_course(course_key))
+            if index is None or total is None:
+                continue
+            user_row = user_rows[user_id]
+            if correct is not None:
+                first_attempted[user_row, index] = created
+            raw_earned = correct if correct is not None else 0.0
+            earned[user_row, index], possible[user_row, index] = _weighted_score(
+                raw_earned, total, course.weights[index],
+            )
+            scored[user_row, index] = True
+
+        # Scores from the submissions API take precedence.
+        for user_id, location, submission_score in _submissions_scores(user_rows.keys(), course_key):
+            index = course.block_indexes.get(UsageKey.from_string(location).map_into_course(course_key))
+            if index is None:
+                continue
+            user_row = user_rows[user_id]
+            earned[user_row, index] = submission_score.points_earned
+            possible[user_row, index] = submission_score.points_possible
+            scored[user_row, index] = True
+            first_attempted.pop((user_row, index), None)
+            if submission_score.created_at:
+                first_attempted[user_row, index] = submission_score.created_at
+
+        graded = scored & course.explicitly_graded & (possible > 0)
+        subsection_earned = numpy.dot(earned * graded, structure.membership)
+        subsection_possible = numpy.dot(possible * graded, structure.membership)
+
+        computed = ~self.persisted[rows] & structure.visible
+        for user_row, row in enumerate(rows):
+            columns = computed[user_row]
+            self.earned[row, columns] = subsection_earned[user_row, columns]
+            self.possible[row, columns] = subsection_possible[user_row, columns]
+            self.computed[row, columns] = True
+
+        for (user_row, index), attempted in first_attempted.iteritems():
+            if not graded[user_row, index]:
+                continue
+            row = rows[user_row]
+            for column in numpy.flatnonzero(structure.membership[index] * computed[user_row]):
+                previous = self.first_attempted.get((row, column))
+                if previous is None or attempted < previous:
+                    self.first_attempted[row, column] = attempted
+
+    def add_latest(self, rows, structure):
+        """
+        Fills in the grades of the remaining visible subsections of the
+        given rows, for which the users have no scores.
+        """
+        remaining = ~self.persisted[rows] & ~self.computed[rows] & structure.visible
+        latest_possible = numpy.tile(structure.latest_possible, (len(rows), 1))
+        for user_row, row in enumerate(rows):
+            columns = remaining[user_row]
+            self.earned[row, columns] = 0.0
+            self.possible[row, columns] = latest_possible[user_row, columns]
+
+    @property
+    def available(self):
+        """
+        Returns whether each subsection's grade is included in the
+        grade sheet given to the course grader.
+        """
+        return self.visible & (self.possible > 0)
+
+    @lazy
+    def grader_breakdown(self):
+        """
+        Returns an OrderedDict of each assignment type's category to an
+        array of the users' weighted percents for the assignment type,
+        per AssignmentFormatGrader and WeightedSubsectionsGrader.
+        """
+        return OrderedDict(
+            (category, _assignment_type_percents(self, subgrader, columns) * weight)
+            for subgrader, category, weight, columns in self.course.subgraders
+        )
+
+    @lazy
+    def grader_percent(self):
+        """
+        Returns an array of the users' percents per the course grader.
+        """
+        total = numpy.zeros(len(self.users), dtype=float)
+        for percents in self.grader_breakdown.itervalues():
+            total += percents
+        return total
+
+
+def _assignment_type_percents(subsection_grades, subgrader, columns):
+    """
+    Returns an array of the users' percents for the assignment type of
+    the given AssignmentFormatGrader, whose subsections are in the
+    given columns.
+    """
+    num_users = len(subsection_grades.users)
+    if not len(columns):
+        return numpy.zeros(num_users, dtype=float)
+
+    available = subsection_grades.available[:, columns]
+    possible = numpy.where(available, subsection_grades.possible[:, columns], 1.0)
+    percents = numpy.where(available, subsection_grades.earned[:, columns] / possible, numpy.inf)
+
+    # Each user's grade sheet has the percents of their available
+    # subsections, padded with zeros to the grader's min_count.
+    num_available = available.sum(axis=1)
+    num_entries = numpy.maximum(num_available, subgrader.min_count)
+    num_padded = num_entries - num_available
+
+    # The lowest drop_count entries are dropped, starting with the
+    # padded zeros.
+    sorted_percents = numpy.sort(percents, axis=1)
+    sorted_percents[numpy.isinf(sorted_percents)] = 0.0
+    cumulative_percents = numpy.hstack([numpy.zeros((num_users, 1)), numpy.cumsum(sorted_percents, axis=1)])
+    num_dropped = numpy.maximum(numpy.minimum(subgrader.drop_count, num_entries) - num_padded, 0)
+    total = cumulative_percents[:, -1] - cumulative_percents[numpy.arange(num_users), num_dropped]
+
+    num_kept = num_entries - subgrader.drop_count
+    return numpy.where(num_kept > 0, total / numpy.maximum(num_kept, 1), total)
+
+
+def _weighted_score(raw_earned, raw_possible, weight):
+    """
+    Returns the weighted (earned, possible) score, per scores.weighted_score.
+    """
+    if weight is None or raw_possible == 0:
+        return raw_earned, raw_possible
+    return float(raw_earned) * weight / raw_possible, float(weight)
+
+
+def _submissions_scores(user_ids, course_key):
+    """
+    Yields (user id, item location, latest Score) for the scores that
+    submissions_api.get_scores would return for each of the given users
+    in the course, in two queries for all of them: one for their
+    anonymous ids and one for the scores.
+    """
+    user_ids_by_anonymous_id = dict(
+        AnonymousUserId.objects.filter(
+            user_id__in=user_ids, course_id=course_key,
+        ).values_list('anonymous_user_id', 'user_id')
+    )
+    if not user_ids_by_anonymous_id:
+        return
+
+    score_summaries = ScoreSummary.objects.filter(
+        student_item__course_id=unicode(course_key),
+        student_item__student_id__in=user_ids_by_anonymous_id.keys(),
+    ).select_related('latest', 'student_item')
+    for score_summary in score_summaries:
+        if score_summary.latest.is_hidden():
+            continue
+        student_item = score_summary.student_item
+        yield user_ids_by_anonymous_id[student_item.student_id], student_item.item_id, score_summary.latest
@@ -1,10 +1,21 @@
-from lms.djangoapps.course_blocks.api import get_course_blocks
+from lms.djangoapps.course_blocks.api import COURSE_BLOCK_ACCESS_TRANSFORMERS, get_course_blocks
 from openedx.core.djangoapps.content.block_structure.api import get_block_structure_manager
+from openedx.core.djangoapps.content.block_structure.transformers import BlockStructureTransformers
 from xmodule.modulestore.django import modulestore
 
 from ..transformer import GradesTransformer
 
 
+def grades_collected_data_dependencies():
+    """
+    Returns the names of the transformers whose collected data grading
+    reads: those of the course block access transformers, which
+    get_course_blocks applies, and the GradesTransformer.
+    """
+    transformers = BlockStructureTransformers(COURSE_BLOCK_ACCESS_TRANSFORMERS)
+    return transformers.collected_data_dependencies() | {GradesTransformer.name()}
+
+
 class CourseData(object):
     """
     Utility access layer to intelligently get and cache the
@@ -61,7 +72,9 @@ class CourseData(object):
     @property
     def collected_structure(self):
         if self._collected_block_structure is None:
-            self._collected_block_structure = get_block_structure_manager(self.course_key).get_collected()
+            self._collected_block_structure = get_block_structure_manager(self.course_key).get_collected(
+                grades_collected_data_dependencies()
+            )
         return self._collected_block_structure
 
     @property
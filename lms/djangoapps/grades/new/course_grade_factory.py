@@ -1,5 +1,6 @@
 from collections import namedtuple
 from contextlib import contextmanager
+from itertools import islice
 from logging import getLogger
 
 import dogstats_wrapper as dog_stats_api
@@ -7,8 +8,9 @@ import dogstats_wrapper as dog_stats_api
 from openedx.core.djangoapps.signals.signals import COURSE_GRADE_CHANGED, COURSE_GRADE_NOW_PASSED
 
 from ..config import assume_zero_if_absent, should_persist_grades
-from ..config.waffle import WRITE_ONLY_IF_ENGAGED, waffle
-from ..models import PersistentCourseGrade, VisibleBlocks
+from ..config.waffle import INCREMENTAL_COURSE_GRADE_UPDATES, WRITE_ONLY_IF_ENGAGED, waffle
+from ..models import PersistentCourseGrade, PersistentSubsectionGrade, VisibleBlocks
+from . import grade_breakdown
 from .course_data import CourseData
 from .course_grade import CourseGrade, ZeroCourseGrade
 
@@ -21,6 +23,9 @@ class CourseGradeFactory(object):
     """
     GradeResult = namedtuple('GradeResult', ['student', 'course_grade', 'error'])
 
+    # Number of users whose persisted grades are prefetched together by iter.
+    USER_BATCH_SIZE = 100
+
     def create(self, user, course=None, collected_block_structure=None, course_structure=None, course_key=None):
         """
         Returns the CourseGrade for the given user in the course.
@@ -85,6 +90,28 @@ class CourseGradeFactory(object):
         course_data = CourseData(user, course, collected_block_structure, course_structure, course_key)
         return self._update(user, course_data, read_only=False, force_update_subsections=force_update_subsections)
 
+    def update_for_subsection(self, user, subsection_grade, course=None, course_structure=None, course_key=None):
+        """
+        Updates and returns the CourseGrade for the given user in the
+        course after the given subsection grade changed.
+
+        If INCREMENTAL_COURSE_GRADE_UPDATES is enabled, the persisted
+        course grade is updated from the changed subsection grade and
+        the cached weighted percents of the course's assignment types.
+        Otherwise, or if the grading policy or the course version
+        changed since the grade was persisted, the course grade is
+        computed in full.
+
+        At least one of course, course_structure, or course_key should
+        be provided.
+        """
+        course_data = CourseData(user, course, structure=course_structure, course_key=course_key)
+        if waffle().is_enabled(INCREMENTAL_COURSE_GRADE_UPDATES):
+            course_grade = self._update_incrementally(user, course_data, subsection_grade)
+            if course_grade is not None:
+                return course_grade
+        return self._update(user, course_data, read_only=False)
+
     @contextmanager
     def _course_transaction(self, course_key):
         """
@@ -92,6 +119,29 @@ class CourseGradeFactory(object):
         """
         yield
         VisibleBlocks.clear_cache(course_key)
+        PersistentSubsectionGrade.clear_prefetched_data(course_key)
+        PersistentCourseGrade.clear_prefetched_data(course_key)
+
+    def _batch_users(self, users):
+        """
+        Yields lists of up to USER_BATCH_SIZE of the given users.
+        """
+        users = iter(users)
+        while True:
+            user_batch = list(islice(users, self.USER_BATCH_SIZE))
+            if not user_batch:
+                return
+            yield user_batch
+
+    @staticmethod
+    def _prefetch(course_key, users):
+        """
+        Prefetches the persisted course and subsection grades of the
+        given users, along with their visible blocks.
+        """
+        if should_persist_grades(course_key):
+            PersistentCourseGrade.prefetch(course_key, users)
+            PersistentSubsectionGrade.prefetch(course_key, users)
 
     def iter(
             self,
@@ -120,9 +170,12 @@ class CourseGradeFactory(object):
         )
         stats_tags = [u'action:{}'.format(course_data.course_key)]
         with self._course_transaction(course_data.course_key):
-            for user in users:
-                with dog_stats_api.timer('lms.grades.CourseGradeFactory.iter', tags=stats_tags):
-                    yield self._iter_grade_result(user, course_data, force_update)
+            for user_batch in self._batch_users(users):
+                if not force_update:
+                    self._prefetch(course_data.course_key, user_batch)
+                for user in user_batch:
+                    with dog_stats_api.timer('lms.grades.CourseGradeFactory.iter', tags=stats_tags):
+                        yield self._iter_grade_result(user, course_data, force_update)
 
     def _iter_grade_result(self, user, course_data, force_update):
         try:
@@ -197,17 +250,93 @@ class CourseGradeFactory(object):
         )
         if should_persist:
             course_grade._subsection_grade_factory.bulk_create_unsaved()
-            PersistentCourseGrade.update_or_create(
-                user_id=user.id,
-                course_id=course_data.course_key,
-                course_version=course_data.version,
-                course_edited_timestamp=course_data.edited_on,
-                grading_policy_hash=course_data.grading_policy_hash,
-                percent_grade=course_grade.percent,
-                letter_grade=course_grade.letter_grade or "",
-                passed=course_grade.passed,
+            CourseGradeFactory._persist(
+                user,
+                course_data,
+                course_grade,
+                grade_breakdown.weighted_percents_from_grader_result(course_grade.grader_result),
             )
 
+        CourseGradeFactory._send_signals(user, course_data, course_grade)
+
+        log.info(
+            u'Grades: Update, %s, User: %s, %s, persisted: %s',
+            course_data.full_string(), user.id, course_grade, should_persist,
+        )
+
+        return course_grade
+
+    @staticmethod
+    def _update_incrementally(user, course_data, subsection_grade):
+        """
+        Updates the persisted course grade of the given user from the
+        given changed subsection grade, and returns the updated
+        CourseGrade object.  Returns None if the course grade can't be
+        updated incrementally.
+        """
+        if not should_persist_grades(course_data.course_key):
+            return None
+        try:
+            persistent_grade = PersistentCourseGrade.read(user.id, course_data.course_key)
+        except PersistentCourseGrade.DoesNotExist:
+            return None
+        if (
+                persistent_grade.grading_policy_hash != course_data.grading_policy_hash or
+                persistent_grade.course_version != unicode(course_data.version or u'')
+        ):
+            return None
+
+        weighted_percents = grade_breakdown.get_weighted_percents(user.id, course_data.course_key, persistent_grade)
+        if weighted_percents is None:
+            return None
+        weighted_percents, total_percent = grade_breakdown.update_weighted_percents(
+            course_data, weighted_percents, subsection_grade,
+        )
+        if weighted_percents is None:
+            return None
+
+        grade_cutoffs = course_data.course.grade_cutoffs
+        percent = CourseGrade._compute_percent({'percent': total_percent})  # pylint: disable=protected-access
+        course_grade = CourseGrade(
+            user,
+            course_data,
+            percent,
+            CourseGrade._compute_letter_grade(grade_cutoffs, percent),  # pylint: disable=protected-access
+            CourseGrade._compute_passed(grade_cutoffs, percent),  # pylint: disable=protected-access
+        )
+        CourseGradeFactory._persist(user, course_data, course_grade, weighted_percents)
+        CourseGradeFactory._send_signals(user, course_data, course_grade)
+
+        log.info(
+            u'Grades: Incremental update, %s, User: %s, %s, subsection: %s',
+            course_data.full_string(), user.id, course_grade, subsection_grade.location,
+        )
+        return course_grade
+
+    @staticmethod
+    def _persist(user, course_data, course_grade, weighted_percents):
+        """
+        Saves the given CourseGrade, and caches the given weighted
+        percents of its assignment types for incremental updates.
+        """
+        persistent_grade = PersistentCourseGrade.update_or_create(
+            user_id=user.id,
+            course_id=course_data.course_key,
+            course_version=course_data.version,
+            course_edited_timestamp=course_data.edited_on,
+            grading_policy_hash=course_data.grading_policy_hash,
+            percent_grade=course_grade.percent,
+            letter_grade=course_grade.letter_grade or "",
+            passed=course_grade.passed,
+        )
+        grade_breakdown.set_weighted_percents(user.id, course_data.course_key, persistent_grade, weighted_percents)
+
+    @staticmethod
+    def _send_signals(user, course_data, course_grade):
+        """
+        Sends a COURSE_GRADE_CHANGED signal to listeners and a
+        COURSE_GRADE_NOW_PASSED if learner has passed course.
+        """
         COURSE_GRADE_CHANGED.send_robust(
             sender=None,
             user=user,
@@ -221,10 +350,3 @@ class CourseGradeFactory(object):
                 user=user,
                 course_id=course_data.course_key,
             )
-
-        log.info(
-            u'Grades: Update, %s, User: %s, %s, persisted: %s',
-            course_data.full_string(), user.id, course_grade, should_persist,
-        )
-
-        return course_grade
@@ -0,0 +1,164 @@
+"""
+Incremental updates of course grades from a changed subsection grade.
+
+When a course grade is computed in full, the weighted percent of each
+of its assignment types is cached along with the resulting persisted
+grade.  When a single subsection grade later changes, the course grade
+is recomputed from the cached percents of the other assignment types
+and the persisted subsection grades of the changed subsection's
+assignment type only, without computing any problem scores.
+"""
+from collections import OrderedDict
+from logging import getLogger
+
+from django.core.cache import cache
+from xmodule.graders import AggregatedScore, AssignmentFormatGrader, WeightedSubsectionsGrader
+
+from ..config import assume_zero_if_absent
+from ..models import PersistentSubsectionGrade
+from .course_grade import uniqueify
+from .subsection_grade import ZeroSubsectionGrade
+
+log = getLogger(__name__)
+
+# Cached breakdowns outlive the grades they belong to only until the
+# grade is persisted again, since they are validated against it.
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class _SubsectionGradeTotal(object):
+    """
+    Graded total of a persisted subsection grade, as read by an
+    AssignmentFormatGrader from its grade sheet.
+    """
+    def __init__(self, display_name, graded_total):
+        self.display_name = display_name
+        self.graded_total = graded_total
+
+
+def get_weighted_percents(user_id, course_key, persistent_grade):
+    """
+    Returns an OrderedDict of each assignment type's category to its
+    weighted percent in the given persisted course grade, or None if
+    they are not cached for that grade.
+    """
+    cached = cache.get(_cache_key(user_id, course_key))
+    if cached is None or cached['grade'] != _grade_signature(persistent_grade):
+        return None
+    return OrderedDict(cached['weighted_percents'])
+
+
+def set_weighted_percents(user_id, course_key, persistent_grade, weighted_percents):
+    """
+    Caches the given weighted percents of each assignment type's
+    category for the given persisted course grade.
+    """
+    cache.set(
+        _cache_key(user_id, course_key),
+        {'grade': _grade_signature(persistent_grade), 'weighted_percents': weighted_percents.items()},
+        CACHE_TIMEOUT,
+    )
+
+
+def weighted_percents_from_grader_result(grader_result):
+    """
+    Returns an OrderedDict of each assignment type's category to its
+    weighted percent in the given result from the course grader.
+    """
+    return OrderedDict(
+        (category, breakdown['percent'])
+        for category, breakdown in grader_result['grade_breakdown'].iteritems()
+    )
+
+
+def update_weighted_percents(course_data, weighted_percents, subsection_grade):
+    """
+    Returns the given weighted percents, updated for the given changed
+    subsection grade, and the resulting total percent, or (None, None)
+    if they can't be updated incrementally.
+    """
+    course = course_data.course
+    course.set_grading_policy(course.grading_policy)
+    grader = course.grader
+    if not isinstance(grader, WeightedSubsectionsGrader):
+        return None, None
+    if set(weighted_percents) != {category for _, category, _ in grader.subgraders}:
+        return None, None
+
+    weighted_percents = OrderedDict(weighted_percents)
+    if subsection_grade.graded:
+        for subgrader, category, weight in grader.subgraders:
+            if not isinstance(subgrader, AssignmentFormatGrader):
+                return None, None
+            if subgrader.type != subsection_grade.format:
+                continue
+            grade_sheet = _grade_sheet(course_data, subsection_grade)
+            if grade_sheet is None:
+                return None, None
+            weighted_percents[category] = subgrader.grade(grade_sheet)['percent'] * weight
+
+    total_percent = sum(weighted_percents[category] for _, category, _ in grader.subgraders)
+    return weighted_percents, total_percent
+
+
+def _grade_sheet(course_data, changed_subsection_grade):
+    """
+    Returns the grade sheet of the changed subsection's assignment type,
+    with the persisted subsection grades of the other subsections of
+    that type, or None if any of them isn't persisted.
+    """
+    structure = course_data.structure
+    subsections = OrderedDict()
+    for chapter_key in structure.get_children(course_data.location):
+        for subsection_key in uniqueify(structure.get_children(chapter_key)):
+            subsection = structure[subsection_key]
+            is_graded = getattr(subsection, 'graded', False)
+            if is_graded and getattr(subsection, 'format', '') == changed_subsection_grade.format:
+                subsections[subsection_key] = subsection
+
+    persisted_totals = {
+        grade.full_usage_key: grade
+        for grade in PersistentSubsectionGrade.objects.filter(
+            user_id=course_data.user.id,
+            course_id=course_data.course_key,
+            usage_key__in=[key for key in subsections if key != changed_subsection_grade.location],
+        ).only('usage_key', 'course_id', 'earned_graded', 'possible_graded', 'first_attempted')
+    }
+
+    graded_subsections = OrderedDict()
+    for subsection_key, subsection in subsections.iteritems():
+        if subsection_key == changed_subsection_grade.location:
+            graded_total = changed_subsection_grade.graded_total
+        elif subsection_key in persisted_totals:
+            grade = persisted_totals[subsection_key]
+            graded_total = AggregatedScore(
+                grade.earned_graded, grade.possible_graded, graded=True, first_attempted=grade.first_attempted,
+            )
+        elif assume_zero_if_absent(course_data.course_key):
+            graded_total = ZeroSubsectionGrade(subsection, course_data).graded_total
+        else:
+            log.info(
+                u'Grades: Incremental update not possible, %s, User: %s, missing subsection grade: %s',
+                unicode(course_data), course_data.user.id, subsection_key,
+            )
+            return None
+        if graded_total.possible > 0:
+            graded_subsections[subsection_key] = _SubsectionGradeTotal(subsection.display_name, graded_total)
+    return {changed_subsection_grade.format: graded_subsections}
+
+
+def _grade_signature(persistent_grade):
+    """
+    Returns the values of the given persisted course grade that its
+    cached weighted percents are validated against.
+    """
+    return (
+        persistent_grade.grading_policy_hash,
+        persistent_grade.course_version,
+        persistent_grade.percent_grade,
+        persistent_grade.modified,
+    )
+
+
+def _cache_key(user_id, course_key):
+    return u'grades.weighted_percents.{}.{}'.format(user_id, course_key)
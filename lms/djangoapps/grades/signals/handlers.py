@@ -3,6 +3,7 @@ Grades related signals.
 """
 from contextlib import contextmanager
 from logging import getLogger
+from uuid import uuid4
 
 from crum import get_current_user
 from django.dispatch import receiver
@@ -22,6 +23,7 @@ from track.event_transaction_utils import (
 )
 from util.date_utils import to_timestamp
 
+from .. import coalescing
 from ..constants import ScoreDatabaseTableEnum
 from ..new.course_grade_factory import CourseGradeFactory
 from ..scores import weighted_score
@@ -219,29 +221,44 @@ def enqueue_subsection_update(sender, **kwargs):  # pylint: disable=unused-argum
     enqueueing a subsection update operation to occur asynchronously.
     """
     _emit_event(kwargs)
-    result = recalculate_subsection_grade_v3.apply_async(
-        kwargs=dict(
-            user_id=kwargs['user_id'],
-            anonymous_user_id=kwargs.get('anonymous_user_id'),
-            course_id=kwargs['course_id'],
-            usage_id=kwargs['usage_id'],
-            only_if_higher=kwargs.get('only_if_higher'),
-            expected_modified_time=to_timestamp(kwargs['modified']),
-            score_deleted=kwargs.get('score_deleted', False),
-            event_transaction_id=unicode(get_event_transaction_id()),
-            event_transaction_type=unicode(get_event_transaction_type()),
-            score_db_table=kwargs['score_db_table'],
-        ),
-        countdown=RECALCULATE_GRADE_DELAY,
+    task_kwargs = dict(
+        user_id=kwargs['user_id'],
+        anonymous_user_id=kwargs.get('anonymous_user_id'),
+        course_id=kwargs['course_id'],
+        usage_id=kwargs['usage_id'],
+        only_if_higher=kwargs.get('only_if_higher'),
+        expected_modified_time=to_timestamp(kwargs['modified']),
+        score_deleted=kwargs.get('score_deleted', False),
+        event_transaction_id=unicode(get_event_transaction_id()),
+        event_transaction_type=unicode(get_event_transaction_type()),
+        score_db_table=kwargs['score_db_table'],
     )
+    task_options = dict(countdown=RECALCULATE_GRADE_DELAY)
+
+    # Recalculations that may lower a grade or that follow a deleted
+    # score are not coalesced, since a later task wouldn't apply them.
+    coalescing_key = None
+    if coalescing.is_enabled() and not task_kwargs['only_if_higher'] and not task_kwargs['score_deleted']:
+        coalescing_key = coalescing.get_coalescing_key(
+            task_kwargs['user_id'], task_kwargs['course_id'], task_kwargs['usage_id'],
+        )
+    if coalescing_key:
+        task_kwargs['coalescing_key'] = coalescing_key
+        task_options['task_id'] = unicode(uuid4())
+        task_options['countdown'] = max(RECALCULATE_GRADE_DELAY, coalescing.coalescing_window())
+        coalescing.register_task(coalescing_key, task_options['task_id'])
+
+    recalculate_subsection_grade_v3.apply_async(kwargs=task_kwargs, **task_options)
 
 
 @receiver(SUBSECTION_SCORE_CHANGED)
 def recalculate_course_grade(sender, course, course_structure, user, **kwargs):  # pylint: disable=unused-argument
     """
-    Updates a saved course grade.
+    Updates a saved course grade from the changed subsection grade.
     """
-    CourseGradeFactory().update(user, course=course, course_structure=course_structure)
+    CourseGradeFactory().update_for_subsection(
+        user, kwargs['subsection_grade'], course=course, course_structure=course_structure,
+    )
 
 
 def _emit_event(kwargs):
@@ -26,6 +26,7 @@ from track.event_transaction_utils import set_event_transaction_id, set_event_tr
 from util.date_utils import from_timestamp
 from xmodule.modulestore.django import modulestore
 
+from . import coalescing
 from .config.waffle import ESTIMATE_FIRST_ATTEMPTED, DISABLE_REGRADE_ON_POLICY_CHANGE, waffle
 from .constants import ScoreDatabaseTableEnum
 from .exceptions import DatabaseNotReadyError
@@ -157,6 +158,8 @@ def _recalculate_subsection_grade(self, **kwargs):
             event at the root of the current event transaction.
         score_db_table (ScoreDatabaseTableEnum): database table that houses
             the changed score. Used in conjunction with expected_modified_time.
+        coalescing_key (string, OPTIONAL): key of the coalesced
+            recalculations of the subsection grade, if coalesced.
     """
     try:
         course_key = CourseLocator.from_string(kwargs['course_id'])
@@ -165,6 +168,13 @@ def _recalculate_subsection_grade(self, **kwargs):
         set_custom_metrics_for_course_key(course_key)
         set_custom_metric('usage_id', unicode(scored_block_usage_key))
 
+        # A later task for the same subsection recalculates its grade
+        # from the latest scores.
+        coalescing_key = kwargs.get('coalescing_key')
+        if coalescing_key and coalescing.is_superseded(coalescing_key, self.request.id):
+            set_custom_metric('superseded', True)
+            return
+
         # The request cache is not maintained on celery workers,
         # where this code runs. So we take the values from the
         # main request cache and store them in the local request
@@ -189,6 +199,8 @@ def _recalculate_subsection_grade(self, **kwargs):
             kwargs['user_id'],
             kwargs['score_deleted'],
         )
+        if coalescing_key:
+            coalescing.task_completed(coalescing_key, self.request.id)
     except Exception as exc:   # pylint: disable=broad-except
         if not isinstance(exc, KNOWN_RETRY_ERRORS):
             log.info("tnl-6244 grades unexpected failure: {}. task id: {}. kwargs={}".format(
@@ -0,0 +1,145 @@
+"""
+Tests for the BulkCourseGradeFactory.
+"""
+import ddt
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from nose.plugins.attrib import attr
+
+from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
+from lms.djangoapps.grades.config.tests.utils import persistent_grades_feature_flags
+from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.djangolib.testing.utils import get_mock_request
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from ..new.bulk_course_grade import BulkCourseGradeFactory
+from ..new.course_grade_factory import CourseGradeFactory
+from .utils import answer_problem
+
+
+@attr(shard=1)
+@ddt.ddt
+class BulkCourseGradeFactoryTest(SharedModuleStoreTestCase):
+    """
+    Tests that the BulkCourseGradeFactory computes the same grades as
+    the CourseGradeFactory.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(BulkCourseGradeFactoryTest, cls).setUpClass()
+        cls.course = CourseFactory.create(
+            grading_policy={
+                "GRADER": [
+                    {"type": "Homework", "min_count": 3, "drop_count": 1, "short_label": "HW", "weight": 0.6},
+                    {"type": "Exam", "min_count": 1, "drop_count": 0, "short_label": "Exam", "weight": 0.4},
+                ],
+                "GRADE_CUTOFFS": {"Pass": 0.5},
+            },
+        )
+        problem_xml = MultipleChoiceResponseXMLFactory().build_xml(
+            question_text='The correct answer is Choice 3',
+            choices=[False, False, True, False],
+            choice_names=['choice_0', 'choice_1', 'choice_2', 'choice_3']
+        )
+        cls.problems = []
+        with cls.store.bulk_operations(cls.course.id):
+            chapter = ItemFactory.create(parent=cls.course, category='chapter')
+            for assignment_type, weight in (('Homework', None), ('Homework', 2), ('Exam', None)):
+                sequential = ItemFactory.create(
+                    parent=chapter, category='sequential', graded=True, format=assignment_type,
+                )
+                vertical = ItemFactory.create(parent=sequential, category='vertical')
+                for _ in range(2):
+                    cls.problems.append(ItemFactory.create(
+                        parent=vertical, category='problem', data=problem_xml, weight=weight,
+                    ))
+            ItemFactory.create(
+                parent=chapter, category='sequential', graded=True, format='Homework', visible_to_staff_only=True,
+            )
+
+    def setUp(self):
+        super(BulkCourseGradeFactoryTest, self).setUp()
+        self.users = [UserFactory.create() for _ in range(4)]
+        for user in self.users:
+            CourseEnrollmentFactory.create(user=user, course_id=self.course.id)
+
+    def _answer_problems(self):
+        """
+        Records different scores for the problems of each user.
+        """
+        for index, user in enumerate(self.users):
+            request = get_mock_request(user)
+            for problem in self.problems[index:index + 3]:
+                answer_problem(self.course, request, problem, score=index % 2, max_value=1)
+
+    def _assert_grades_equal(self, bulk_grade, course_grade):
+        """
+        Asserts that the given bulk grade matches the given course grade.
+        """
+        self.assertEqual(bulk_grade.percent, course_grade.percent)
+        self.assertEqual(bulk_grade.letter_grade, course_grade.letter_grade)
+        self.assertEqual(bulk_grade.passed, course_grade.passed)
+        self.assertEqual(
+            self._graded_totals(bulk_grade.graded_subsections_by_format),
+            self._graded_totals(course_grade.graded_subsections_by_format),
+        )
+        for category, breakdown in course_grade.grader_result['grade_breakdown'].iteritems():
+            bulk_breakdown = bulk_grade.grader_result['grade_breakdown'][category]
+            self.assertAlmostEqual(bulk_breakdown['percent'], breakdown['percent'])
+
+    def _graded_totals(self, graded_subsections_by_format):
+        """
+        Returns a dict of (assignment type, subsection location) to
+        graded total for the given graded_subsections_by_format.
+        """
+        return {
+            (assignment_type, location): subsection_grade.graded_total
+            for assignment_type, subsection_grades in graded_subsections_by_format.iteritems()
+            for location, subsection_grade in subsection_grades.iteritems()
+        }
+
+    @ddt.data(True, False)
+    def test_same_as_course_grade_factory(self, persist_grades):
+        with persistent_grades_feature_flags(global_flag=persist_grades, enabled_for_all_courses=persist_grades):
+            self._answer_problems()
+            results = list(BulkCourseGradeFactory(course=self.course).iter(self.users))
+
+            self.assertEqual([result.student for result in results], self.users)
+            for user, bulk_grade, error in results:
+                self.assertIsNone(error)
+                self._assert_grades_equal(bulk_grade, CourseGradeFactory().create(user, self.course))
+
+    def test_reused_across_batches(self):
+        self._answer_problems()
+        bulk_factory = BulkCourseGradeFactory(
+            course=self.course, collected_block_structure=get_course_in_cache(self.course.id),
+        )
+        first_batch = list(bulk_factory.iter(self.users[:2]))
+        second_batch = list(bulk_factory.iter(self.users[2:]))
+        self.assertEqual(len(bulk_factory._structure_matrices), 1)  # pylint: disable=protected-access
+        for user, bulk_grade, _ in first_batch + second_batch:
+            self._assert_grades_equal(bulk_grade, CourseGradeFactory().create(user, self.course))
+
+    def _count_score_queries(self, users):
+        """
+        Returns the number of queries of the users' scores and anonymous
+        ids made by a new BulkCourseGradeFactory to grade the given users.
+        """
+        bulk_factory = BulkCourseGradeFactory(
+            course=self.course, collected_block_structure=get_course_in_cache(self.course.id),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            list(bulk_factory.iter(users))
+        tables = ('courseware_studentmodule', 'student_anonymoususerid', 'submissions_')
+        return len([
+            query for query in queries.captured_queries
+            if any(table in query['sql'] for table in tables)
+        ])
+
+    def test_score_queries_per_batch(self):
+        self._answer_problems()
+        num_queries = self._count_score_queries(self.users[:1])
+        self.assertGreater(num_queries, 0)
+        self.assertEqual(self._count_score_queries(self.users), num_queries)
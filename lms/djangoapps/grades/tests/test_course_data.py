@@ -4,13 +4,15 @@ Tests for CourseData utility class.
 from mock import patch
 
 from lms.djangoapps.course_blocks.api import get_course_blocks
-from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.djangoapps.content.block_structure.api import clear_course_from_cache, get_course_in_cache
+from openedx.core.djangoapps.content.block_structure.config import COMPACT_SERIALIZATION, waffle
+from openedx.core.djangoapps.content.block_structure.store import BlockStructureStore
 from student.tests.factories import UserFactory
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
-from ..new.course_data import CourseData
+from ..new.course_data import CourseData, grades_collected_data_dependencies
 
 
 class CourseDataTest(ModuleStoreTestCase):
@@ -95,3 +97,25 @@ class CourseDataTest(ModuleStoreTestCase):
         # full_string returns minimal value when structures aren't readily available.
         course_data = CourseData(self.user, course_key=self.course.id)
         self.assertIn(u'empty course structure', course_data.full_string())
+
+    def test_reads_only_grades_transformer_data(self):
+        with waffle().override(COMPACT_SERIALIZATION, active=True):
+            clear_course_from_cache(self.course.id)
+            get_course_in_cache(self.course.id)
+
+            with patch.object(
+                BlockStructureStore,
+                '_get_segments_from_cache',
+                autospec=True,
+                side_effect=BlockStructureStore._get_segments_from_cache,
+            ) as mock_get_segments:
+                course_data = CourseData(self.user, course_key=self.course.id)
+                self.assertIsNotNone(course_data.collected_structure)
+                self.assertEqual(course_data.structure.root_block_usage_key, self.course.location)
+                self.assertIsNotNone(course_data.grading_policy_hash)
+
+        # the segments are read once, up front, and only those that grading needs
+        self.assertEqual(mock_get_segments.call_count, 1)
+        read_transformer_names = mock_get_segments.call_args[0][3]
+        self.assertTrue(read_transformer_names)
+        self.assertLessEqual(set(read_transformer_names), grades_collected_data_dependencies())
@@ -13,7 +13,7 @@ from django.db.utils import IntegrityError
 from django.test import TestCase
 from django.utils.timezone import now
 from freezegun import freeze_time
-from mock import patch
+from mock import Mock, patch
 from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
 
 from lms.djangoapps.grades.config import waffle
@@ -230,6 +230,28 @@ class PersistentSubsectionGradeTest(GradesModelTestCase):
         with self.assertRaises(IntegrityError):
             PersistentSubsectionGrade.create_grade(**self.params)
 
+    def test_prefetch(self):
+        PersistentSubsectionGrade.create_grade(**self.params)
+        self.params['user_id'] = 54321
+        PersistentSubsectionGrade.create_grade(**self.params)
+        self.addCleanup(PersistentSubsectionGrade.clear_prefetched_data, self.course_key)
+        self.addCleanup(VisibleBlocks.clear_cache, self.course_key)
+
+        VisibleBlocks.clear_cache(self.course_key)
+        users = [Mock(id=user_id) for user_id in (12345, 54321, 11111)]
+        with self.assertNumQueries(2):
+            PersistentSubsectionGrade.prefetch(self.course_key, users)
+
+        with self.assertNumQueries(0):
+            grades = [PersistentSubsectionGrade.bulk_read_grades(user.id, self.course_key) for user in users]
+            self.assertEqual([len(user_grades) for user_grades in grades], [1, 1, 0])
+            self.assertEqual(grades[0][0].visible_blocks.blocks, self.block_records)
+            self.assertIs(grades[0][0].visible_blocks, grades[1][0].visible_blocks)
+
+        PersistentSubsectionGrade.clear_prefetched_data(self.course_key)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(PersistentSubsectionGrade.bulk_read_grades(12345, self.course_key)), 1)
+
     @ddt.data('course_version', 'subtree_edited_timestamp')
     def test_optional_fields(self, field):
         del self.params[field]
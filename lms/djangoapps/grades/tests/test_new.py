@@ -24,7 +24,12 @@ from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.utils import TEST_DATA_DIR
 from xmodule.modulestore.xml_importer import import_course_from_xml
 
-from ..config.waffle import ASSUME_ZERO_GRADE_IF_ABSENT, WRITE_ONLY_IF_ENGAGED, waffle
+from ..config.waffle import (
+    ASSUME_ZERO_GRADE_IF_ABSENT,
+    INCREMENTAL_COURSE_GRADE_UPDATES,
+    WRITE_ONLY_IF_ENGAGED,
+    waffle
+)
 from ..models import PersistentSubsectionGrade
 from ..new.course_data import CourseData
 from ..new.course_grade import CourseGrade, ZeroCourseGrade
@@ -260,6 +265,30 @@ class TestCourseGradeFactory(GradeTestBase):
         self.assertTrue(desired_call.called)
         self.assertFalse(undesired_call.called)
 
+    @ddt.data(True, False)
+    def test_update_for_subsection(self, policy_changed):
+        grade_factory = CourseGradeFactory()
+        with mock_get_score(1, 2):
+            grade_factory.update(self.request.user, self.course)
+
+        if policy_changed:
+            self._update_grading_policy(passing=0.9)
+        subsection = self.course_structure[self.sequence.location]
+        with mock_get_score(2, 2):
+            subsection_grade = self.subsection_grade_factory.update(subsection)
+
+        with waffle().override(INCREMENTAL_COURSE_GRADE_UPDATES):
+            with patch.object(CourseGradeFactory, '_update', wraps=CourseGradeFactory._update) as mock_update:
+                with mock_get_score(2, 2):
+                    course_grade = grade_factory.update_for_subsection(
+                        self.request.user, subsection_grade, course=self.course,
+                    )
+            self.assertEqual(mock_update.called, policy_changed)
+
+        self.assertEqual(course_grade.percent, 0.75)
+        self.assertEqual(course_grade.letter_grade, None if policy_changed else u'Pass')
+        self.assertEqual(grade_factory.read(self.request.user, self.course).percent, 0.75)
+
 
 @ddt.ddt
 class TestSubsectionGradeFactory(ProblemSubmissionTestMixin, GradeTestBase):
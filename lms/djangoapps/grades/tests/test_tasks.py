@@ -12,9 +12,11 @@ import pytz
 import six
 from django.conf import settings
 from django.db.utils import IntegrityError
-from mock import MagicMock, patch
+from mock import ANY, MagicMock, patch
 
+from lms.djangoapps.grades import coalescing
 from lms.djangoapps.grades.config.models import PersistentGradesEnabledFlag
+from lms.djangoapps.grades.config.waffle import COALESCE_SUBSECTION_UPDATES, waffle
 from lms.djangoapps.grades.constants import ScoreDatabaseTableEnum
 from lms.djangoapps.grades.models import PersistentCourseGrade, PersistentSubsectionGrade
 from lms.djangoapps.grades.services import GradesService
@@ -143,6 +145,42 @@ class RecalculateSubsectionGradeTest(HasCourseWithProblemsMixin, ModuleStoreTest
             PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **send_args)
             mock_task_apply.assert_called_once_with(countdown=RECALCULATE_GRADE_DELAY, kwargs=local_task_args)
 
+    def test_coalesced_by_subsection(self):
+        self.set_up_course()
+        local_task_args = self.recalculate_subsection_grade_kwargs.copy()
+        local_task_args['coalescing_key'] = u'{}.{}.{}'.format(self.user.id, self.course.id, self.sequential.location)
+        with waffle().override(COALESCE_SUBSECTION_UPDATES, active=True), self.mock_get_score(), patch(
+            'lms.djangoapps.grades.tasks.recalculate_subsection_grade_v3.apply_async',
+            return_value=None
+        ) as mock_task_apply:
+            PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **self.problem_weighted_score_changed_kwargs)
+            mock_task_apply.assert_called_once_with(
+                countdown=settings.RECALCULATE_GRADES_COALESCING_WINDOW, kwargs=local_task_args, task_id=ANY,
+            )
+
+    @patch('lms.djangoapps.grades.tasks.set_custom_metric')
+    @patch('lms.djangoapps.grades.coalescing.set_custom_metric')
+    @patch('lms.djangoapps.grades.tasks._update_subsection_grades')
+    def test_superseded_task_skipped(self, mock_update, mock_coalescing_metric, mock_task_metric):
+        self.set_up_course()
+        coalescing_key = u'{}.{}.{}'.format(self.user.id, self.course.id, self.sequential.location)
+        self.recalculate_subsection_grade_kwargs['coalescing_key'] = coalescing_key
+        self.assertFalse(coalescing.register_task(coalescing_key, 'first_task'))
+        self.assertTrue(coalescing.register_task(coalescing_key, 'second_task'))
+
+        task_kwargs = self.recalculate_subsection_grade_kwargs
+        score = MagicMock(modified=datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1))
+        with self.mock_get_score(score):
+            recalculate_subsection_grade_v3.apply(kwargs=task_kwargs, task_id='first_task')
+            self.assertFalse(mock_update.called)
+            mock_task_metric.assert_any_call('superseded', True)
+
+            recalculate_subsection_grade_v3.apply(kwargs=task_kwargs, task_id='second_task')
+            self.assertTrue(mock_update.called)
+            mock_coalescing_metric.assert_called_once_with('merged_subsection_grade_tasks', 1)
+
+        self.assertFalse(coalescing.register_task(coalescing_key, 'third_task'))
+
     @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
     def test_triggers_subsection_score_signal(self, mock_subsection_signal):
         """
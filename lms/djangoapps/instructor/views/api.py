@@ -969,7 +969,9 @@ def list_course_role_members(request, course_id):
 def get_problem_responses(request, course_id):
     """
     Initiate generation of a CSV file containing all student answers
-    to a given problem.
+    to a given problem.  The `problem_location` may be a comma-separated
+    list of locations of problems, or of blocks (such as subsections)
+    containing problems.
 
     Responds with JSON
         {"status": "... status message ..."}
@@ -983,13 +985,14 @@ def get_problem_responses(request, course_id):
     report_type = _('problem responses')
 
     try:
-        problem_key = UsageKey.from_string(problem_location)
-        # Are we dealing with an "old-style" problem location?
-        run = problem_key.run
-        if not run:
-            problem_key = UsageKey.from_string(problem_location).map_into_course(course_key)
-        if problem_key.course_key != course_key:
-            raise InvalidKeyError(type(problem_key), problem_key)
+        for location in problem_location.split(','):
+            problem_key = UsageKey.from_string(location.strip())
+            # Are we dealing with an "old-style" problem location?
+            run = problem_key.run
+            if not run:
+                problem_key = problem_key.map_into_course(course_key)
+            if problem_key.course_key != course_key:
+                raise InvalidKeyError(type(problem_key), problem_key)
     except InvalidKeyError:
         return JsonResponseBadRequest(_("Could not find problem with this location."))
 
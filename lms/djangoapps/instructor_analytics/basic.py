@@ -440,6 +440,38 @@ def list_problem_responses(course_key, problem_location):
     ]
 
 
+def iter_problem_responses(course_key, problem_keys, chunk_size=1000):
+    """
+    Yield the responses to the given problems in chunks (lists) of at most
+    `chunk_size` dicts, e.g.
+
+        [
+            {'username': u'user1', 'state': u'...', 'location': u'block-v1:...'},
+            {'username': u'user2', 'state': u'...', 'location': u'block-v1:...'},
+        ]
+
+    The responses to each problem are read by ranges of their ids, one
+    chunk per query, so that the responses to a problem are never loaded all
+    at once, and no query has to skip over the responses already read.
+    """
+    for problem_key in problem_keys:
+        last_id = 0
+        while True:
+            responses = StudentModule.objects.filter(
+                course_id=course_key,
+                module_state_key=problem_key,
+                id__gt=last_id,
+            ).order_by('id').values_list('id', 'student__username', 'state')[:chunk_size]
+
+            chunk = []
+            for last_id, username, state in responses.iterator():
+                chunk.append({'username': username, 'state': state, 'location': unicode(problem_key)})
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                break
+
+
 def course_registration_features(features, registration_codes, csv_type):
     """
     Return list of Course Registration Codes as dictionaries.
@@ -16,7 +16,7 @@ from opaque_keys.edx.locator import UsageKey
 
 from course_modes.models import CourseMode
 from course_modes.tests.factories import CourseModeFactory
-from courseware.tests.factories import InstructorFactory
+from courseware.tests.factories import InstructorFactory, StudentModuleFactory
 from instructor_analytics.basic import (
     AVAILABLE_FEATURES,
     PROFILE_FEATURES,
@@ -26,6 +26,7 @@ from instructor_analytics.basic import (
     course_registration_features,
     enrolled_students_features,
     get_proctored_exam_results,
+    iter_problem_responses,
     list_may_enroll,
     list_problem_responses,
     sale_order_record_features,
@@ -114,6 +115,27 @@ class TestAnalyticsBasic(ModuleStoreTestCase):
                         problem_responses
                     )
 
+    def test_iter_problem_responses(self):
+        problem_keys = [self.course_key.make_usage_key('problem', name) for name in ('p1', 'p2')]
+        for problem_key in problem_keys:
+            for user in self.users[:3]:
+                StudentModuleFactory.create(
+                    course_id=self.course_key, module_state_key=problem_key, student=user, state=u'state'
+                )
+
+        with self.assertNumQueries(4):
+            chunks = list(iter_problem_responses(self.course_key, problem_keys, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1, 2, 1])
+        self.assertEqual(
+            [response['username'] for chunk in chunks for response in chunk],
+            [user.username for user in self.users[:3]] * 2,
+        )
+        self.assertEqual(
+            chunks[2][0],
+            {'username': self.users[0].username, 'state': u'state', 'location': unicode(problem_keys[1])},
+        )
+
     def test_enrolled_students_features_username(self):
         self.assertIn('username', AVAILABLE_FEATURES)
         userreports = enrolled_students_features(self.course_key, ['username'])
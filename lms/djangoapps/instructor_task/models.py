@@ -16,16 +16,22 @@ import csv
 import hashlib
 import json
 import os.path
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
 from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.db import models, transaction
+from storages.backends.s3boto import S3BotoStorage, S3BotoStorageFile
 
 from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
 from openedx.core.storage import get_storage
 
+# Size in bytes beyond which reports being written are spooled to disk.
+REPORT_SPOOL_SIZE = 5 * 1024 * 1024
+
 # define custom states used by InstructorTask
 QUEUING = 'QUEUING'
 PROGRESS = 'PROGRESS'
@@ -177,9 +183,9 @@ class InstructorTask(models.Model):
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download.  Reports are written incrementally, from rows which can be
+    generated as they are written, so that reports never have to be held in
+    memory.
     """
     @classmethod
     def from_config(cls, config_name):
@@ -211,15 +217,6 @@ class ReportStore(object):
             )
         return DjangoStorageReportStore.from_config(config_name)
 
-    def _get_utf8_encoded_rows(self, rows):
-        """
-        Given a list of `rows` containing unicode strings, return a
-        new list of rows with those strings encoded as utf-8 for CSV
-        compatibility.
-        """
-        for row in rows:
-            yield [unicode(item).encode('utf-8') for item in row]
-
 
 class DjangoStorageReportStore(ReportStore):
     """
@@ -263,12 +260,41 @@ class DjangoStorageReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of
         strings), write the rows to the storage backend in csv format.
+        `rows` may be any iterable, such as a generator, which is consumed as
+        the rows are written.
+        """
+        with self.open_csv(course_id, filename) as csvwriter:
+            csvwriter.writerows(rows)
+
+    @contextmanager
+    def open_csv(self, course_id, filename):
+        """
+        Yields a ReportCSVWriter for the given course_id and filename, to
+        which rows can be written one at a time.  The report is stored once
+        the with block exits, unless it raises.
+
+        Storages which can upload a file in parts (S3) get the rows as they
+        are written, in parts of the size of the storage's write buffer.  For
+        other storages, rows are written to a temporary file, which is kept in
+        memory up to REPORT_SPOOL_SIZE, and then copied to the storage.
         """
-        output_buffer = ContentFile('')
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        output_buffer.seek(0)
-        self.store(course_id, filename, output_buffer)
+        if isinstance(self.storage, S3BotoStorage):
+            output = S3ReportFile.open(self.storage, self.path_to(course_id, filename))
+            try:
+                csvwriter = ReportCSVWriter(output)
+                yield csvwriter
+            except Exception:
+                output.abort()
+                raise
+            output.close()
+            if not csvwriter.rows_written:
+                # Nothing was uploaded, so store the empty report.
+                self.store(course_id, filename, ContentFile(''))
+        else:
+            with SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE) as output:
+                yield ReportCSVWriter(output)
+                output.seek(0)
+                self.store(course_id, filename, File(output))
 
     def links_for(self, course_id):
         """
@@ -296,3 +322,50 @@ class DjangoStorageReportStore(ReportStore):
         """
         hashed_course_id = hashlib.sha1(course_id.to_deprecated_string()).hexdigest()
         return os.path.join(hashed_course_id, filename)
+
+
+class S3ReportFile(S3BotoStorageFile):
+    """
+    An S3 file to which a report is uploaded in parts as it is written, and
+    whose upload can be aborted rather than completed with the parts written
+    so far.
+    """
+    @classmethod
+    def open(cls, storage, name):
+        """
+        Opens the file with the given name in the given S3BotoStorage for
+        writing, naming its key as the storage does.
+        """
+        return cls(os.path.join(storage.location, name).lstrip('/'), 'wb', storage)
+
+    def abort(self):
+        """
+        Cancels the upload of the parts written so far, and closes the file.
+        """
+        # Closing a file which wasn't written cancels its multipart upload.
+        self._is_dirty = False
+        self.close()
+
+
+class ReportCSVWriter(object):
+    """
+    Writes rows of unicode strings to a report in csv format, encoded as
+    utf-8, and counts them.
+    """
+    def __init__(self, output):
+        self._csvwriter = csv.writer(output)
+        self.rows_written = 0
+
+    def writerow(self, row):
+        """
+        Writes the given row.
+        """
+        self._csvwriter.writerow([unicode(item).encode('utf-8') for item in row])
+        self.rows_written += 1
+
+    def writerows(self, rows):
+        """
+        Writes the given rows, as they are iterated.
+        """
+        for row in rows:
+            self.writerow(row)
@@ -45,6 +45,8 @@ from lms.djangoapps.instructor_task.tasks_helper.misc import (
 from lms.djangoapps.instructor_task.tasks_helper.module_state import (
     delete_problem_module_state,
     perform_module_state_update,
+    perform_module_state_update_subtask,
+    perform_sharded_module_state_update,
     override_score_module_state,
     rescore_problem_module_state,
     reset_attempts_module_state
@@ -77,10 +79,34 @@ def rescore_problem(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('rescored')
     update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    def _create_rescore_subtask(module_id_range, initial_subtask_status):
+        """Creates a subtask to rescore the StudentModules in a range of ids."""
+        return rescore_problem_subtask.subtask(
+            (entry_id, xmodule_instance_args, module_id_range, initial_subtask_status.to_dict()),
+            task_id=initial_subtask_status.task_id,
+        )
+
+    visit_fcn = partial(perform_sharded_module_state_update, update_fcn, _create_rescore_subtask, None)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
+@task  # pylint: disable=not-callable
+def rescore_problem_subtask(entry_id, xmodule_instance_args, module_id_range, subtask_status_dict):
+    """
+    Rescores the StudentModules whose ids are in the given (first, last) range,
+    as a subtask of a rescore_problem task which has more StudentModules to
+    rescore than settings.RESCORE_STUDENT_MODULES_PER_TASK.
+
+    `subtask_status_dict` is the dict of the SubtaskStatus of this subtask.
+    """
+    # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
+    action_name = ugettext_noop('rescored')
+    update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
+    return perform_module_state_update_subtask(
+        update_fcn, None, entry_id, action_name, module_id_range, subtask_status_dict,
+    )
+
+
 @task(base=BaseInstructorTask)  # pylint: disable=not-callable
 def override_problem_score(entry_id, xmodule_instance_args):
     """
@@ -43,7 +43,6 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     """
     start_time = time()
     start_date = datetime.now(UTC)
-    status_interval = 100
     students_in_course = CourseEnrollment.objects.enrolled_and_dropped_out_users(course_id)
     task_progress = TaskProgress(action_name, students_in_course.count(), start_time)
 
@@ -56,13 +55,8 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
-    # Loop over all our students and build our CSV lists in memory
-    rows = []
-    header = None
-    current_step = {'step': 'Gathering Profile Information'}
-    enrollment_report_provider = PaidCourseEnrollmentReportProvider()
-    total_students = students_in_course.count()
-    student_counter = 0
+    current_step = {'step': 'Gathering Profile Information and Uploading CSV'}
+    total_students = task_progress.total
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, generating detailed enrollment report for total students: %s',
         task_info_string,
@@ -71,6 +65,67 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         total_students
     )
 
+    # The rows are uploaded as they are gathered, rather than built in memory.
+    rows = _enrollment_report_rows(
+        students_in_course, course_id, task_progress, task_info_string, action_name, current_step
+    )
+    upload_csv_to_report_store(rows, 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
+
+    TASK_LOG.info(
+        u'%s, Task type: %s, Current step: %s, Detailed enrollment report generated for students: %s/%s',
+        task_info_string,
+        action_name,
+        current_step,
+        task_progress.attempted,
+        total_students
+    )
+
+    # One last update before we close out...
+    TASK_LOG.info(u'%s, Task type: %s, Finalizing detailed enrollment task', task_info_string, action_name)
+    return task_progress.update_task_state(extra_meta=current_step)
+
+
+def _enrollment_report_rows(students_in_course, course_id, task_progress, task_info_string, action_name, current_step):
+    """
+    A generator of the rows of the detailed enrollment report of the given
+    students, starting with its header if there are any students, which
+    periodically updates the task status.
+    """
+    status_interval = 100
+    header = None
+    enrollment_report_provider = PaidCourseEnrollmentReportProvider()
+    total_students = task_progress.total
+
+    # display name map for the column headers
+    enrollment_report_headers = {
+        'User ID': _('User ID'),
+        'Username': _('Username'),
+        'Full Name': _('Full Name'),
+        'First Name': _('First Name'),
+        'Last Name': _('Last Name'),
+        'Company Name': _('Company Name'),
+        'Title': _('Title'),
+        'Language': _('Language'),
+        'Year of Birth': _('Year of Birth'),
+        'Gender': _('Gender'),
+        'Level of Education': _('Level of Education'),
+        'Mailing Address': _('Mailing Address'),
+        'Goals': _('Goals'),
+        'City': _('City'),
+        'Country': _('Country'),
+        'Enrollment Date': _('Enrollment Date'),
+        'Currently Enrolled': _('Currently Enrolled'),
+        'Enrollment Source': _('Enrollment Source'),
+        'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
+        'Enrollment Role': _('Enrollment Role'),
+        'List Price': _('List Price'),
+        'Payment Amount': _('Payment Amount'),
+        'Coupon Codes Used': _('Coupon Codes Used'),
+        'Registration Code Used': _('Registration Code Used'),
+        'Payment Status': _('Payment Status'),
+        'Transaction Reference Number': _('Transaction Reference Number')
+    }
+
     for student in students_in_course:
         # Periodically update task status (this is a cache write)
         if task_progress.attempted % status_interval == 0:
@@ -78,14 +133,13 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         task_progress.attempted += 1
 
         # Now add a log entry after certain intervals to get a hint that task is in progress
-        student_counter += 1
-        if student_counter % 100 == 0:
+        if task_progress.attempted % 100 == 0:
             TASK_LOG.info(
                 u'%s, Task type: %s, Current step: %s, gathering enrollment profile for students in progress: %s/%s',
                 task_info_string,
                 action_name,
                 current_step,
-                student_counter,
+                task_progress.attempted,
                 total_students
             )
 
@@ -93,68 +147,14 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
         payment_data = enrollment_report_provider.get_payment_info(student, course_id)
 
-        # display name map for the column headers
-        enrollment_report_headers = {
-            'User ID': _('User ID'),
-            'Username': _('Username'),
-            'Full Name': _('Full Name'),
-            'First Name': _('First Name'),
-            'Last Name': _('Last Name'),
-            'Company Name': _('Company Name'),
-            'Title': _('Title'),
-            'Language': _('Language'),
-            'Year of Birth': _('Year of Birth'),
-            'Gender': _('Gender'),
-            'Level of Education': _('Level of Education'),
-            'Mailing Address': _('Mailing Address'),
-            'Goals': _('Goals'),
-            'City': _('City'),
-            'Country': _('Country'),
-            'Enrollment Date': _('Enrollment Date'),
-            'Currently Enrolled': _('Currently Enrolled'),
-            'Enrollment Source': _('Enrollment Source'),
-            'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
-            'Enrollment Role': _('Enrollment Role'),
-            'List Price': _('List Price'),
-            'Payment Amount': _('Payment Amount'),
-            'Coupon Codes Used': _('Coupon Codes Used'),
-            'Registration Code Used': _('Registration Code Used'),
-            'Payment Status': _('Payment Status'),
-            'Transaction Reference Number': _('Transaction Reference Number')
-        }
-
         if not header:
             header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
-            display_headers = []
-            for header_element in header:
-                # translate header into a localizable display string
-                display_headers.append(enrollment_report_headers.get(header_element, header_element))
-            rows.append(display_headers)
+            # translate header into a localizable display string
+            yield [enrollment_report_headers.get(header_element, header_element) for header_element in header]
 
-        rows.append(user_data.values() + course_enrollment_data.values() + payment_data.values())
+        yield user_data.values() + course_enrollment_data.values() + payment_data.values()
         task_progress.succeeded += 1
 
-    TASK_LOG.info(
-        u'%s, Task type: %s, Current step: %s, Detailed enrollment report generated for students: %s/%s',
-        task_info_string,
-        action_name,
-        current_step,
-        student_counter,
-        total_students
-    )
-
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    current_step = {'step': 'Uploading CSVs'}
-    task_progress.update_task_state(extra_meta=current_step)
-    TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
-
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
-
-    # One last update before we close out...
-    TASK_LOG.info(u'%s, Task type: %s, Finalizing detailed enrollment task', task_info_string, action_name)
-    return task_progress.update_task_state(extra_meta=current_step)
-
 
 def upload_may_enroll_csv(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
     """
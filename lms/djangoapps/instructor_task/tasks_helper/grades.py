@@ -5,18 +5,21 @@ import logging
 import re
 from collections import OrderedDict
 from datetime import datetime
-from itertools import chain, izip, izip_longest
+from itertools import chain, izip_longest
 from time import time
 
 from lazy import lazy
+from opaque_keys.edx.keys import UsageKey
 from pytz import UTC
 
 from certificates.models import CertificateWhitelist, GeneratedCertificate, certificate_info_for_user
 from courseware.courses import get_course_by_id
-from instructor_analytics.basic import list_problem_responses
-from instructor_analytics.csvs import format_dictlist
+from courseware.models import StudentModule
+from instructor_analytics.basic import iter_problem_responses
+from lms.djangoapps.grades.config.waffle import BULK_GRADE_REPORTS, waffle
 from lms.djangoapps.grades.context import grading_context, grading_context_for_course
-from lms.djangoapps.grades.models import PersistentCourseGrade
+from lms.djangoapps.grades.new.bulk_course_grade import BulkCourseGradeFactory
+from lms.djangoapps.grades.new.course_data import grades_collected_data_dependencies
 from lms.djangoapps.grades.new.course_grade_factory import CourseGradeFactory
 from lms.djangoapps.teams.models import CourseTeamMembership
 from lms.djangoapps.verify_student.models import SoftwareSecurePhotoVerification
@@ -26,6 +29,7 @@ from openedx.core.djangoapps.user_api.course_tag.api import BulkCourseTags
 from student.models import CourseEnrollment
 from student.roles import BulkRoleCache
 from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.partitions.partitions_service import PartitionService
 from xmodule.split_test_module import get_split_user_partitions
 
@@ -83,7 +87,15 @@ class _CourseGradeReportContext(object):
 
     @lazy
     def course_structure(self):
-        return get_course_in_cache(self.course_id)
+        return get_course_in_cache(self.course_id, grades_collected_data_dependencies())
+
+    @lazy
+    def bulk_grade_factory(self):
+        return BulkCourseGradeFactory(
+            course=self.course,
+            collected_block_structure=self.course_structure,
+            course_key=self.course_id,
+        )
 
     @lazy
     def course_experiments(self):
@@ -180,7 +192,6 @@ class _CourseGradeBulkContext(object):
         self.enrollments = _EnrollmentBulkContext(context, users)
         bulk_cache_cohorts(context.course_id, users)
         BulkRoleCache.prefetch(users)
-        PersistentCourseGrade.prefetch(context.course_id, users)
         BulkCourseTags.prefetch(context.course_id, users)
 
 
@@ -209,10 +220,9 @@ class CourseGradeReport(object):
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status(u'Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-
-        context.update_status(u'Uploading grades')
+        context.update_status(u'Compiling and uploading grades')
+        error_rows = []
+        success_rows = self._compile(context, batched_rows, error_rows)
         self._upload(context, success_headers, success_rows, error_headers, error_rows)
 
         return context.update_status(u'Completed grades')
@@ -246,29 +256,37 @@ class CourseGradeReport(object):
             users = filter(lambda u: u is not None, users)
             yield self._rows_for_users(context, users)
 
-    def _compile(self, context, batched_rows):
+    def _compile(self, context, batched_rows, error_rows):
         """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
+        A generator of the success rows of the given batched_rows, which
+        appends their error rows to error_rows, and updates the metrics on
+        task status, as the batches are computed.
         """
-        # partition and chain successes and errors
-        success_rows, error_rows = izip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
-
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
+        task_progress = context.task_progress
+        task_progress.total = task_progress.attempted = task_progress.succeeded = task_progress.failed = 0
+        for success_rows, batch_error_rows in batched_rows:
+            error_rows.extend(batch_error_rows)
+            task_progress.succeeded += len(success_rows)
+            task_progress.failed += len(batch_error_rows)
+            task_progress.attempted = task_progress.total = task_progress.succeeded + task_progress.failed
+            for row in success_rows:
+                yield row
 
     def _upload(self, context, success_headers, success_rows, error_headers, error_rows):
         """
-        Creates and uploads a CSV for the given headers and rows.
+        Creates and uploads a CSV for the given headers and rows.  The
+        success_rows are written as they are iterated, after which the
+        error_rows are complete.
         """
         date = datetime.now(UTC)
-        upload_csv_to_report_store([success_headers] + success_rows, 'grade_report', context.course_id, date)
+        upload_csv_to_report_store(
+            chain([success_headers], success_rows),
+            'grade_report',
+            context.course_id,
+            date,
+            task_progress=context.task_progress,
+            extra_meta={'step': u'Compiling and uploading grades'},
+        )
         if len(error_rows) > 0:
             error_rows = [error_headers] + error_rows
             upload_csv_to_report_store(error_rows, 'grade_report_err', context.course_id, date)
@@ -393,6 +411,20 @@ class CourseGradeReport(object):
         )
         return certificate_info
 
+    def _iter_grade_results(self, context, users):
+        """
+        Yields the GradeResults of the given users, computed in bulk
+        if BULK_GRADE_REPORTS is enabled.
+        """
+        if waffle().is_enabled(BULK_GRADE_REPORTS):
+            return context.bulk_grade_factory.iter(users)
+        return CourseGradeFactory().iter(
+            users,
+            course=context.course,
+            collected_block_structure=context.course_structure,
+            course_key=context.course_id,
+        )
+
     def _rows_for_users(self, context, users):
         """
         Returns a list of rows for the given users for this report.
@@ -401,12 +433,7 @@ class CourseGradeReport(object):
             bulk_context = _CourseGradeBulkContext(context, users)
 
             success_rows, error_rows = [], []
-            for user, course_grade, error in CourseGradeFactory().iter(
-                users,
-                course=context.course,
-                collected_block_structure=context.course_structure,
-                course_key=context.course_id,
-            ):
+            for user, course_grade, error in self._iter_grade_results(context, users):
                 if not course_grade:
                     # An empty gradeset means we failed to grade a student.
                     error_rows.append([user.id, user.username, error.message])
@@ -433,7 +460,6 @@ class ProblemGradeReport(object):
         """
         start_time = time()
         start_date = datetime.now(UTC)
-        status_interval = 100
         enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id, include_inactive=True)
         task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
 
@@ -445,14 +471,35 @@ class ProblemGradeReport(object):
         graded_scorable_blocks = cls._graded_scorable_blocks_to_header(course_id)
 
         # Just generate the static fields for now.
-        rows = [list(header_row.values()) + ['Enrollment Status', 'Grade'] + _flatten(graded_scorable_blocks.values())]
+        header = list(header_row.values()) + ['Enrollment Status', 'Grade'] + _flatten(graded_scorable_blocks.values())
         error_rows = [list(header_row.values()) + ['error_msg']]
-        current_step = {'step': 'Calculating Grades'}
 
         # Bulk fetch and cache enrollment states so we can efficiently determine
         # whether each user is currently enrolled in the course.
         CourseEnrollment.bulk_fetch_enrollment_states(enrolled_students, course_id)
 
+        # The rows are graded as they are uploaded, so that they don't have to
+        # be held in memory, but the report is only uploaded if any students
+        # have been successfully graded.
+        rows = cls._rows(course_id, enrolled_students, header_row, graded_scorable_blocks, task_progress, error_rows)
+        first_row = next(rows, None)
+        if first_row is not None:
+            upload_csv_to_report_store(chain([header, first_row], rows), 'problem_grade_report', course_id, start_date)
+        # If there are any error rows, write them out as well
+        if len(error_rows) > 1:
+            upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
+
+        return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
+
+    @classmethod
+    def _rows(cls, course_id, enrolled_students, header_row, graded_scorable_blocks, task_progress, error_rows):
+        """
+        A generator of the rows of the students who are successfully graded,
+        which appends the rows of the students who couldn't be graded to
+        error_rows, and periodically updates the task status.
+        """
+        status_interval = 100
+        current_step = {'step': 'Calculating Grades'}
         course = get_course_by_id(course_id)
         for student, course_grade, error in CourseGradeFactory().iter(enrolled_students, course):
             student_fields = [getattr(student, field_name) for field_name in header_row]
@@ -481,21 +528,12 @@ class ProblemGradeReport(object):
                     else:
                         earned_possible_values.append([u'Not Attempted', problem_score.possible])
 
-            rows.append(student_fields + [enrollment_status, course_grade.percent] + _flatten(earned_possible_values))
+            yield student_fields + [enrollment_status, course_grade.percent] + _flatten(earned_possible_values)
 
             task_progress.succeeded += 1
             if task_progress.attempted % status_interval == 0:
                 task_progress.update_task_state(extra_meta=current_step)
 
-        # Perform the upload if any students have been successfully graded
-        if len(rows) > 1:
-            upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
-        # If there are any error rows, write them out as well
-        if len(error_rows) > 1:
-            upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
-
-        return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
-
     @classmethod
     def _graded_scorable_blocks_to_header(cls, course_key):
         """
@@ -522,36 +560,97 @@ class ProblemGradeReport(object):
 
 
 class ProblemResponses(object):
+    """
+    Class to encapsulate functionality related to generating reports of the
+    responses of students to problems.
+    """
+    # Number of responses read per query.
+    CHUNK_SIZE = 1000
+
     @classmethod
     def generate(cls, _xmodule_instance_args, _entry_id, course_id, task_input, action_name):
         """
         For a given `course_id`, generate a CSV file containing
         all student answers to a given problem, and store using a `ReportStore`.
+
+        The `problem_location` of the task_input may be a comma-separated list
+        of locations, and the location of a block with children, such as a
+        subsection, stands for all the problems within it.  The report has
+        a column of the location of each response if there is more than one
+        problem.
         """
         start_time = time()
         start_date = datetime.now(UTC)
-        num_reports = 1
-        task_progress = TaskProgress(action_name, num_reports, start_time)
+        problem_location = task_input.get('problem_location')
+        problem_keys = cls._problem_keys(course_id, problem_location.split(','))
+        num_responses = StudentModule.objects.filter(course_id=course_id, module_state_key__in=problem_keys).count()
+        task_progress = TaskProgress(action_name, num_responses, start_time)
         current_step = {'step': 'Calculating students answers to problem'}
         task_progress.update_task_state(extra_meta=current_step)
 
-        # Compute result table and format it
-        problem_location = task_input.get('problem_location')
-        student_data = list_problem_responses(course_id, problem_location)
         features = ['username', 'state']
-        header, rows = format_dictlist(student_data, features)
+        if len(problem_keys) > 1:
+            features.append('location')
+        rows = cls._rows(course_id, problem_keys, features, task_progress, current_step)
 
-        task_progress.attempted = task_progress.succeeded = len(rows)
-        task_progress.skipped = task_progress.total - task_progress.attempted
+        # Perform the upload, as the responses are read
+        problem_location = re.sub(r'[:/]', '_', problem_location.split(',')[0])
+        csv_name = 'student_state_from_{}'.format(problem_location)
+        upload_csv_to_report_store(chain([features], rows), csv_name, course_id, start_date)
 
-        rows.insert(0, header)
+        return task_progress.update_task_state(extra_meta=current_step)
 
-        current_step = {'step': 'Uploading CSV'}
-        task_progress.update_task_state(extra_meta=current_step)
+    @classmethod
+    def _problem_keys(cls, course_id, problem_locations):
+        """
+        Returns the usage keys of the problems at, or within the blocks at,
+        the given locations.
+        """
+        store = modulestore()
+        problem_keys = []
+        for problem_location in problem_locations:
+            problem_key = UsageKey.from_string(problem_location.strip())
+            # Are we dealing with an "old-style" problem location?
+            if not problem_key.run:
+                problem_key = problem_key.map_into_course(course_id)
+            if problem_key.course_key != course_id:
+                continue
 
-        # Perform the upload
-        problem_location = re.sub(r'[:/]', '_', problem_location)
-        csv_name = 'student_state_from_{}'.format(problem_location)
-        upload_csv_to_report_store(rows, csv_name, course_id, start_date)
+            try:
+                block = store.get_item(problem_key, depth=None)
+            except ItemNotFoundError:
+                # The problem was deleted, but its responses weren't.
+                problem_keys.append(problem_key)
+                continue
+            if block.has_children:
+                problem_keys.extend(cls._scored_descendant_keys(block))
+            else:
+                problem_keys.append(problem_key)
+        return problem_keys
 
-        return task_progress.update_task_state(extra_meta=current_step)
+    @classmethod
+    def _scored_descendant_keys(cls, block):
+        """
+        Returns the usage keys of the scored blocks within the given block, in
+        the order of the course.
+        """
+        keys = []
+        for child in block.get_children():
+            if child.has_children:
+                keys.extend(cls._scored_descendant_keys(child))
+            elif getattr(child, 'has_score', False):
+                keys.append(child.location)
+        return keys
+
+    @classmethod
+    def _rows(cls, course_id, problem_keys, features, task_progress, current_step):
+        """
+        A generator of the rows of the responses to the given problems, which
+        updates the task status after each chunk of responses.
+        """
+        for responses in iter_problem_responses(course_id, problem_keys, chunk_size=cls.CHUNK_SIZE):
+            for response in responses:
+                yield [response[feature] for feature in features]
+            task_progress.attempted += len(responses)
+            task_progress.succeeded += len(responses)
+            task_progress.update_task_state(extra_meta=current_step)
@@ -5,6 +5,8 @@ import json
 import logging
 from time import time
 
+from celery.states import FAILURE, SUCCESS
+from django.conf import settings
 from django.contrib.auth.models import User
 from opaque_keys.edx.keys import UsageKey
 from xblock.runtime import KvsFieldData
@@ -27,6 +29,8 @@ from xblock.runtime import KvsFieldData
 from xblock.scorable import Score, ScorableXBlockMixin
 from xmodule.modulestore.django import modulestore
 from ..exceptions import UpdateProblemModuleStateError
+from ..models import InstructorTask
+from ..subtasks import SubtaskStatus, check_subtask_is_valid, queue_subtasks_for_query, update_subtask_status
 from .runner import TaskProgress
 from .utils import UNKNOWN_TASK_ID, UPDATE_STATUS_FAILED, UPDATE_STATUS_SKIPPED, UPDATE_STATUS_SUCCEEDED
 
@@ -73,16 +77,152 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
 
     """
     start_time = time()
-    usage_keys = []
+    problems = _get_problem_descriptors(course_id, task_input)
+    modules_to_update = _get_modules_to_update(course_id, problems, task_input, filter_fcn)
+
+    task_progress = TaskProgress(action_name, modules_to_update.count(), start_time)
+    task_progress.update_task_state()
+
+    for module_to_update in modules_to_update:
+        task_progress.attempted += 1
+        module_descriptor = problems[unicode(module_to_update.module_state_key)]
+        # There is no try here:  if there's an error, we let it throw, and the task will
+        # be marked as FAILED, with a stack trace.
+        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
+            update_status = update_fcn(module_descriptor, module_to_update, task_input)
+            _count_update_status(task_progress, update_status)
+
+    return task_progress.update_task_state()
+
+
+def perform_sharded_module_state_update(
+        update_fcn, create_subtask_fcn, filter_fcn, entry_id, course_id, task_input, action_name,
+):
+    """
+    Performs the same update as perform_module_state_update, but in parallel
+    subtasks, each of which updates the StudentModules in a range of their ids.
+
+    The StudentModules to update are split into chunks of
+    settings.RESCORE_STUDENT_MODULES_PER_TASK, and `create_subtask_fcn` is
+    called with the (first, last) ids of each chunk, and the SubtaskStatus of
+    the subtask, to construct the subtask.  Subtasks should call
+    perform_module_state_update_subtask.  As with bulk email, the progress of
+    the subtasks is accumulated in the InstructorTask, and a subtask which
+    has completed isn't run again if it is requeued.
+
+    Updates of a single student, and updates of no more StudentModules than
+    fit in one subtask, are performed in this task by perform_module_state_update.
+    """
+    items_per_task = settings.RESCORE_STUDENT_MODULES_PER_TASK
+    problems = _get_problem_descriptors(course_id, task_input)
+    modules_to_update = _get_modules_to_update(course_id, problems, task_input, filter_fcn).order_by('id')
+    total_num_modules = modules_to_update.count()
+    if task_input.get('student') is not None or not items_per_task or total_num_modules <= items_per_task:
+        return perform_module_state_update(update_fcn, filter_fcn, entry_id, course_id, task_input, action_name)
+
+    def _create_subtask(module_list, subtask_status):
+        """
+        Creates a subtask to update the StudentModules in the id range of the given list.
+        """
+        module_id_range = (module_list[0]['pk'], module_list[-1]['pk'])
+        return create_subtask_fcn(module_id_range, subtask_status)
+
+    return queue_subtasks_for_query(
+        InstructorTask.objects.get(pk=entry_id),
+        action_name,
+        _create_subtask,
+        [modules_to_update],
+        [],
+        items_per_task,
+        total_num_modules,
+    )
+
+
+def perform_module_state_update_subtask(
+        update_fcn, filter_fcn, entry_id, action_name, module_id_range, subtask_status_dict,
+):
+    """
+    Performs the update of perform_sharded_module_state_update on the
+    StudentModules whose ids are in the given (first, last) range, and records
+    the results in the parent InstructorTask.
+
+    The course and the problem descriptors are loaded once, and the
+    StudentModules are updated in one bulk operation, with the course passed to
+    `update_fcn` as its `course` keyword argument.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    task_input = json.loads(entry.task_input)
+    TASK_LOG.info(
+        u"Task %s: %s StudentModules %s to %s, as subtask of instructor task %d",
+        current_task_id, action_name, module_id_range[0], module_id_range[1], entry_id,
+    )
+
+    # Raises DuplicateTaskException if this subtask was already run, or is running.
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    try:
+        problems = _get_problem_descriptors(course_id, task_input)
+        modules_to_update = _get_modules_to_update(course_id, problems, task_input, filter_fcn).filter(
+            id__range=module_id_range,
+        )
+        with modulestore().bulk_operations(course_id):
+            course = get_course_by_id(course_id)
+            for module_to_update in modules_to_update.iterator():
+                subtask_status.attempted += 1
+                module_descriptor = problems[unicode(module_to_update.module_state_key)]
+                with dog_stats_api.timer(
+                    'instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)],
+                ):
+                    update_status = update_fcn(module_descriptor, module_to_update, task_input, course=course)
+                    _count_update_status(subtask_status, update_status)
+    except Exception:
+        TASK_LOG.exception(u"Task %s: failed unexpectedly!", current_task_id)
+        # The StudentModule being updated, if any, is counted as having failed.
+        counted = subtask_status.succeeded + subtask_status.failed + subtask_status.skipped
+        if subtask_status.attempted > counted:
+            subtask_status.failed += 1
+        subtask_status.state = FAILURE
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        raise
+
+    subtask_status.increment(state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
+
+
+def _count_update_status(progress, update_status):
+    """
+    Counts the given status returned by an update function in the given
+    TaskProgress or SubtaskStatus.
+    """
+    if update_status == UPDATE_STATUS_SUCCEEDED:
+        # If the update_fcn returns true, then it performed some kind of work.
+        # Logging of failures is left to the update_fcn itself.
+        progress.succeeded += 1
+    elif update_status == UPDATE_STATUS_FAILED:
+        progress.failed += 1
+    elif update_status == UPDATE_STATUS_SKIPPED:
+        progress.skipped += 1
+    else:
+        raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+
+
+def _get_problem_descriptors(course_id, task_input):
+    """
+    Returns a dict of the descriptors of the problems to update, keyed by the
+    unicode of their usage keys, given the `problem_url` or the
+    `entrance_exam_url` of the task_input.
+    """
+    problems = {}
     problem_url = task_input.get('problem_url')
     entrance_exam_url = task_input.get('entrance_exam_url')
-    student_identifier = task_input.get('student')
-    problems = {}
 
     # if problem_url is present make a usage key from it
     if problem_url:
         usage_key = UsageKey.from_string(problem_url).map_into_course(course_id)
-        usage_keys.append(usage_key)
 
         # find the problem descriptor:
         problem_descriptor = modulestore().get_item(usage_key)
@@ -91,7 +231,16 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     # if entrance_exam is present grab all problems in it
     if entrance_exam_url:
         problems = get_problems_in_section(entrance_exam_url)
-        usage_keys = [UsageKey.from_string(location) for location in problems.keys()]
+    return problems
+
+
+def _get_modules_to_update(course_id, problems, task_input, filter_fcn):
+    """
+    Returns the query of the StudentModules of the given problems to update,
+    of the `student` of the task_input, if any, filtered by `filter_fcn`.
+    """
+    usage_keys = [UsageKey.from_string(location) for location in problems.keys()]
+    student_identifier = task_input.get('student')
 
     # find the modules in question
     modules_to_update = StudentModule.objects.filter(course_id=course_id, module_state_key__in=usage_keys)
@@ -112,33 +261,11 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
 
     if filter_fcn is not None:
         modules_to_update = filter_fcn(modules_to_update)
-
-    task_progress = TaskProgress(action_name, modules_to_update.count(), start_time)
-    task_progress.update_task_state()
-
-    for module_to_update in modules_to_update:
-        task_progress.attempted += 1
-        module_descriptor = problems[unicode(module_to_update.module_state_key)]
-        # There is no try here:  if there's an error, we let it throw, and the task will
-        # be marked as FAILED, with a stack trace.
-        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update, task_input)
-            if update_status == UPDATE_STATUS_SUCCEEDED:
-                # If the update_fcn returns true, then it performed some kind of work.
-                # Logging of failures is left to the update_fcn itself.
-                task_progress.succeeded += 1
-            elif update_status == UPDATE_STATUS_FAILED:
-                task_progress.failed += 1
-            elif update_status == UPDATE_STATUS_SKIPPED:
-                task_progress.skipped += 1
-            else:
-                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
-
-    return task_progress.update_task_state()
+    return modules_to_update
 
 
 @outer_atomic
-def rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module, task_input):
+def rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module, task_input, course=None):
     '''
     Takes an XModule descriptor and a corresponding StudentModule object, and
     performs rescoring on the student's problem submission.
@@ -149,6 +276,8 @@ def rescore_problem_module_state(xmodule_instance_args, module_descriptor, stude
 
     Returns True if problem was successfully rescored for the given student, and False
     if problem encountered some kind of error in rescoring.
+
+    `course` is the course of the problem, which is loaded if it isn't given.
     '''
     # unpack the StudentModule:
     course_id = student_module.course_id
@@ -156,10 +285,8 @@ def rescore_problem_module_state(xmodule_instance_args, module_descriptor, stude
     usage_key = student_module.module_state_key
 
     with modulestore().bulk_operations(course_id):
-        course = get_course_by_id(course_id)
-        # TODO: Here is a call site where we could pass in a loaded course.  I
-        # think we certainly need it since grading is happening here, and field
-        # overrides would be important in handling that correctly
+        if course is None:
+            course = get_course_by_id(course_id)
         instance = _get_module_instance_for_task(
             course_id,
             student,
@@ -12,8 +12,13 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# Number of rows written to a report between updates of the progress of its task.
+REPORT_PROGRESS_INTERVAL = 1000
 
-def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name='GRADES_DOWNLOAD'):
+
+def upload_csv_to_report_store(
+        rows, csv_name, course_id, timestamp, config_name='GRADES_DOWNLOAD', task_progress=None, extra_meta=None,
+):
     """
     Upload data as a CSV using ReportStore.
 
@@ -24,9 +29,18 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
                 [row1_colum1, row1_colum2, ...],
                 ...
             ]
+            This may be any iterable, such as a generator: the rows are
+            written as they are iterated, so they don't have to be held in
+            memory.
         csv_name: Name of the resulting CSV
         course_id: ID of the course
+        task_progress: TaskProgress to update with the number of rows
+            written so far, as 'rows_written', every REPORT_PROGRESS_INTERVAL
+            rows, along with `extra_meta`.
     """
+    if task_progress is not None:
+        rows = _report_rows_written(rows, task_progress, extra_meta)
+
     report_store = ReportStore.from_config(config_name)
     report_store.store_rows(
         course_id,
@@ -40,6 +54,19 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
     tracker_emit(csv_name)
 
 
+def _report_rows_written(rows, task_progress, extra_meta=None):
+    """
+    Yields the given rows, updating the state of the given TaskProgress with
+    the number of rows written every REPORT_PROGRESS_INTERVAL rows.
+    """
+    meta = dict(extra_meta or {})
+    for rows_written, row in enumerate(rows, start=1):
+        yield row
+        if rows_written % REPORT_PROGRESS_INTERVAL == 0:
+            meta['rows_written'] = rows_written
+            task_progress.update_task_state(extra_meta=meta)
+
+
 def tracker_emit(report_name):
     """
     Emits a 'report.requested' event for the given report.
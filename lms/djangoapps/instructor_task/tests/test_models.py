@@ -49,6 +49,42 @@ class ReportStoreTestMixin(object):
             ['new_file', 'middle_file', 'old_file']
         )
 
+    def test_store_rows_from_generator(self):
+        report_store = self.create_report_store()
+        rows = ([u'row {}'.format(index), u'caf\xe9'] for index in range(3))
+        report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        path = report_store.path_to(self.course_id, 'report.csv')
+        with report_store.storage.open(path) as report_file:
+            self.assertEqual(
+                report_file.read().splitlines(),
+                ['row 0,caf\xc3\xa9', 'row 1,caf\xc3\xa9', 'row 2,caf\xc3\xa9'],
+            )
+
+    def test_open_csv(self):
+        report_store = self.create_report_store()
+        with report_store.open_csv(self.course_id, 'report.csv') as csvwriter:
+            csvwriter.writerow(['header'])
+            csvwriter.writerows([['row'], ['row']])
+        self.assertEqual(csvwriter.rows_written, 3)
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+
+    def test_open_csv_empty(self):
+        report_store = self.create_report_store()
+        with report_store.open_csv(self.course_id, 'report.csv'):
+            pass
+        path = report_store.path_to(self.course_id, 'report.csv')
+        with report_store.storage.open(path) as report_file:
+            self.assertEqual(report_file.read(), '')
+
+    def test_open_csv_not_stored_on_error(self):
+        report_store = self.create_report_store()
+        with self.assertRaises(ValueError):
+            with report_store.open_csv(self.course_id, 'report.csv') as csvwriter:
+                csvwriter.writerow(['row'])
+                raise ValueError()
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
 
 class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, SimpleTestCase):
     """
@@ -30,7 +30,7 @@ from certificates.models import CertificateStatuses, GeneratedCertificate
 from certificates.tests.factories import CertificateWhitelistFactory, GeneratedCertificateFactory
 from course_modes.models import CourseMode
 from course_modes.tests.factories import CourseModeFactory
-from courseware.tests.factories import InstructorFactory
+from courseware.tests.factories import InstructorFactory, StudentModuleFactory
 from instructor_analytics.basic import UNAVAILABLE
 from lms.djangoapps.grades.models import PersistentCourseGrade
 from lms.djangoapps.grades.transformer import GradesTransformer
@@ -395,7 +395,7 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
 
         RequestCache.clear_request_cache()
 
-        expected_query_count = 41
+        expected_query_count = 37
         with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
             with check_mongo_calls(mongo_count):
                 with self.assertNumQueries(expected_query_count):
@@ -469,22 +469,87 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskCourseTestCase):
     def setUp(self):
         super(TestProblemResponsesReport, self).setUp()
         self.course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=self.course, category='chapter')
+        self.subsection = ItemFactory.create(parent=chapter, category='sequential')
+        vertical = ItemFactory.create(parent=self.subsection, category='vertical')
+        self.problems = [ItemFactory.create(parent=vertical, category='problem') for _ in range(2)]
+        ItemFactory.create(parent=vertical, category='html')
+        self.students = [UserFactory.create(username='user{}'.format(index)) for index in range(3)]
 
-    def test_success(self):
-        task_input = {'problem_location': ''}
+    def _create_responses(self, problem):
+        """
+        Creates the responses of the students to the given problem.
+        """
+        for student in self.students:
+            StudentModuleFactory.create(
+                course_id=self.course.id,
+                module_state_key=problem.location,
+                student=student,
+                state=u'{} state'.format(student.username),
+            )
+
+    def _generate(self, problem_location):
+        """
+        Generates the report of the responses to the problems at problem_location.
+        """
+        task_input = {'problem_location': problem_location}
         with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
-            with patch('lms.djangoapps.instructor_task.tasks_helper.grades.list_problem_responses') as patched_data_source:
-                patched_data_source.return_value = [
-                    {'username': 'user0', 'state': u'state0'},
-                    {'username': 'user1', 'state': u'state1'},
-                    {'username': 'user2', 'state': u'state2'},
-                ]
-                result = ProblemResponses.generate(None, None, self.course.id, task_input, 'calculated')
+            return ProblemResponses.generate(None, None, self.course.id, task_input, 'calculated')
+
+    def test_success(self):
+        self._create_responses(self.problems[0])
+        result = self._generate(unicode(self.problems[0].location))
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
         links = report_store.links_for(self.course.id)
 
         self.assertEquals(len(links), 1)
-        self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0}, result)
+        self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0, 'total': 3}, result)
+        self.verify_rows_in_csv([
+            {'username': student.username, 'state': u'{} state'.format(student.username)}
+            for student in self.students
+        ])
+
+    @patch.object(ProblemResponses, 'CHUNK_SIZE', 2)
+    def test_chunks(self):
+        self._create_responses(self.problems[0])
+        with patch('lms.djangoapps.instructor_task.tasks_helper.grades.TaskProgress.update_task_state') as mock_update:
+            self._generate(unicode(self.problems[0].location))
+        # once at the start, once per chunk, and once at the end
+        self.assertEqual(
+            [call[1]['extra_meta'] for call in mock_update.call_args_list],
+            [{'step': 'Calculating students answers to problem'}] * 4,
+        )
+        self.assertEqual(len(self.get_csv_row_with_headers()), 2)
+
+    def test_subsection(self):
+        for problem in self.problems:
+            self._create_responses(problem)
+        result = self._generate(unicode(self.subsection.location))
+
+        self.assertDictContainsSubset({'attempted': 6, 'succeeded': 6, 'total': 6}, result)
+        self.verify_rows_in_csv([
+            {
+                'username': student.username,
+                'state': u'{} state'.format(student.username),
+                'location': unicode(problem.location),
+            }
+            for problem in self.problems for student in self.students
+        ])
+
+    def test_multiple_problems(self):
+        for problem in self.problems:
+            self._create_responses(problem)
+        result = self._generate(u','.join(unicode(problem.location) for problem in reversed(self.problems)))
+
+        self.assertDictContainsSubset({'attempted': 6, 'succeeded': 6, 'total': 6}, result)
+        self.verify_rows_in_csv([
+            {
+                'username': student.username,
+                'state': u'{} state'.format(student.username),
+                'location': unicode(problem.location),
+            }
+            for problem in reversed(self.problems) for student in self.students
+        ])
 
 
 @ddt.ddt
@@ -223,6 +223,17 @@ if 'loc_cache' not in CACHES:
         'LOCATION': 'edx_location_mem_cache',
     }
 
+COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES', COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES
+)
+COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED', COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED
+)
+COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES = ENV_TOKENS.get(
+    'COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES', COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES
+)
+CAPA_PROBLEM_CONTEXT_CACHE_SIZE = ENV_TOKENS.get('CAPA_PROBLEM_CONTEXT_CACHE_SIZE', CAPA_PROBLEM_CONTEXT_CACHE_SIZE)
+
 # Email overrides
 DEFAULT_FROM_EMAIL = ENV_TOKENS.get('DEFAULT_FROM_EMAIL', DEFAULT_FROM_EMAIL)
 DEFAULT_FEEDBACK_EMAIL = ENV_TOKENS.get('DEFAULT_FEEDBACK_EMAIL', DEFAULT_FEEDBACK_EMAIL)
@@ -270,10 +281,22 @@ BULK_EMAIL_ROUTING_KEY_SMALL_JOBS = ENV_TOKENS.get('BULK_EMAIL_ROUTING_KEY_SMALL
 
 # Queue to use for updating persistent grades
 RECALCULATE_GRADES_ROUTING_KEY = ENV_TOKENS.get('RECALCULATE_GRADES_ROUTING_KEY', LOW_PRIORITY_QUEUE)
+RECALCULATE_GRADES_COALESCING_WINDOW = ENV_TOKENS.get(
+    'RECALCULATE_GRADES_COALESCING_WINDOW', RECALCULATE_GRADES_COALESCING_WINDOW
+)
 
 # Queue to use for updating grades due to grading policy change
 POLICY_CHANGE_GRADES_ROUTING_KEY = ENV_TOKENS.get('POLICY_CHANGE_GRADES_ROUTING_KEY', LOW_PRIORITY_QUEUE)
 
+# Problem rescoring overrides
+RESCORE_STUDENT_MODULES_PER_TASK = ENV_TOKENS.get('RESCORE_STUDENT_MODULES_PER_TASK', RESCORE_STUDENT_MODULES_PER_TASK)
+
+# User state write-behind overrides
+USER_STATE_WRITE_BEHIND_FIELDS = ENV_TOKENS.get('USER_STATE_WRITE_BEHIND_FIELDS', USER_STATE_WRITE_BEHIND_FIELDS)
+USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE = ENV_TOKENS.get(
+    'USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE', USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE
+)
+
 # Message expiry time in seconds
 CELERY_EVENT_QUEUE_TTL = ENV_TOKENS.get('CELERY_EVENT_QUEUE_TTL', None)
 
@@ -379,6 +402,8 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
     else:
         CODE_JAIL[name] = value
 
+CODE_JAIL_POOL.update(ENV_TOKENS.get('CODE_JAIL_POOL', {}))
+
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
 
 ASSET_IGNORE_REGEX = ENV_TOKENS.get('ASSET_IGNORE_REGEX', ASSET_IGNORE_REGEX)
@@ -822,6 +822,20 @@ MODULESTORE = {
     }
 }
 
+# Size, in bytes of pickled data, of the process-local cache of split
+# course structures in front of the 'course_structure_cache'.  0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_MAX_BYTES = 0
+# Whether the process-local cache shares decoded course structures
+# across callers instead of unpickling them for each caller.
+COURSE_STRUCTURE_LOCAL_CACHE_SHARE_DECODED = False
+# Size, in bytes of pickled data, of the process-local cache of split
+# definitions, which are immutable.  0 disables it.
+COURSE_DEFINITION_LOCAL_CACHE_MAX_BYTES = 0
+
+# Number of contexts of capa problems (the results of their scripts) cached
+# per process, and shared by the learners who have the same seed.  0 disables it.
+CAPA_PROBLEM_CONTEXT_CACHE_SIZE = 0
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -837,6 +851,20 @@ CODE_JAIL = {
     },
 }
 
+# A pool of warm sandboxed Pythons which execute the code of problems, instead
+# of starting a new one for each execution (see capa/safe_exec/pool.py).  It
+# uses the python_bin, user and limits of CODE_JAIL.
+CODE_JAIL_POOL = {
+    # How many workers can each process start?  0 disables the pool.
+    'size': 0,
+    # How many executions does a worker run before it is replaced?
+    'max_runs': 1000,
+    # How many MB can an execution in a worker use before the worker is replaced?
+    'max_rss_mb': 512,
+    # How many seconds to wait for a busy worker, before starting a new sandbox instead?
+    'wait_timeout': 1,
+}
+
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
 # of them must match the course id for that course to run unsafe code.
 #
@@ -1237,6 +1265,9 @@ MIDDLEWARE_CLASSES = (
     # to redirected unenrolled students to the course info page
     'courseware.middleware.RedirectMiddleware',
 
+    # to write user state updates behind, at the end of each request
+    'courseware.middleware.UserStateWriteBehindMiddleware',
+
     'course_wiki.middleware.WikiAccessMiddleware',
 
     'openedx.core.djangoapps.theming.middleware.CurrentSiteThemeMiddleware',
@@ -1927,9 +1958,31 @@ BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 # Queue to use for updating persistent grades
 RECALCULATE_GRADES_ROUTING_KEY = LOW_PRIORITY_QUEUE
 
+# Seconds within which recalculations of a learner's subsection grade are
+# coalesced into a single task, if the grades.coalesce_subsection_updates
+# waffle switch is enabled
+RECALCULATE_GRADES_COALESCING_WINDOW = 10
+
 # Queue to use for updating grades due to grading policy change
 POLICY_CHANGE_GRADES_ROUTING_KEY = LOW_PRIORITY_QUEUE
 
+############################# Problem Rescoring ################################
+
+# Number of StudentModules rescored by each subtask of a task which rescores a
+# problem for all learners.  None rescores them all in the task itself.
+RESCORE_STUDENT_MODULES_PER_TASK = None
+
+############################# User State Write-Behind ##########################
+
+# Fields of XBlocks whose updates are buffered during each request and written
+# together when it ends, rather than one by one, by block type.  For instance,
+# {'video': ['saved_video_position']}.  Block types whose history is saved (see
+# StudentModuleHistory.HISTORY_SAVING_TYPES) are always written one by one.
+USER_STATE_WRITE_BEHIND_FIELDS = {}
+
+# Number of buffered updates which are written before the request ends.
+USER_STATE_WRITE_BEHIND_MAX_BATCH_SIZE = 100
+
 ############################# Email Opt In ####################################
 
 # Minimum age for organization-wide email opt in
@@ -2162,7 +2215,7 @@ INSTALLED_APPS = [
     'openedx.core.djangoapps.content.course_overviews',
     'openedx.core.djangoapps.content.course_structures.apps.CourseStructuresConfig',
     'openedx.core.djangoapps.content.block_structure.apps.BlockStructureConfig',
-    'lms.djangoapps.course_blocks',
+    'lms.djangoapps.course_blocks.apps.CourseBlocksConfig',
 
 
     # Coursegraph
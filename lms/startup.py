@@ -19,6 +19,7 @@ from openedx.core.djangoapps.monkey_patch import django_db_models_options
 
 import xmodule.x_module
 import lms_xblock.runtime
+from capa.safe_exec import pool as safe_exec_pool
 
 from startup_configurations.validate_config import validate_lms_config
 from openedx.core.djangoapps.theming.core import enable_theming
@@ -55,6 +56,8 @@ def run():
 
     add_mimetypes()
 
+    configure_safe_exec_pool()
+
     # Mako requires the directories to be added after the django setup.
     microsite.enable_microsites(log)
 
@@ -94,6 +97,21 @@ def run():
     validate_lms_config(settings)
 
 
+def configure_safe_exec_pool():
+    """
+    Configure the pool of warm sandboxes which execute the code of problems.
+
+    If you change this, be sure to also change it in cms/startup.py.
+    """
+    if settings.CODE_JAIL['python_bin']:
+        safe_exec_pool.configure(
+            python_bin=settings.CODE_JAIL['python_bin'],
+            user=settings.CODE_JAIL['user'],
+            limits=settings.CODE_JAIL['limits'],
+            **settings.CODE_JAIL_POOL
+        )
+
+
 def add_mimetypes():
     """
     Add extra mimetypes. Used in xblock_resource.
@@ -7,17 +7,22 @@ from xmodule.modulestore.django import modulestore
 from .manager import BlockStructureManager
 
 
-def get_course_in_cache(course_key):
+def get_course_in_cache(course_key, transformer_names=None):
     """
     A higher order function implemented on top of the
     block_structure.get_collected function that returns the block
     structure in the cache for the given course_key.
 
+    Arguments:
+        transformer_names (iterable(string)) - Names of the
+            transformers whose collected data is to be read up front,
+            as in BlockStructureManager.get_collected.
+
     Returns:
         BlockStructureBlockData - The collected block structure,
             starting at root_block_usage_key.
     """
-    return get_block_structure_manager(course_key).get_collected()
+    return get_block_structure_manager(course_key).get_collected(transformer_names)
 
 
 def update_course_in_cache(course_key):
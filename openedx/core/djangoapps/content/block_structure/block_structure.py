@@ -3,13 +3,17 @@ Module with family of classes for block structures.
     BlockStructure - responsible for block existence and relations.
     BlockStructureBlockData - responsible for block & transformer data.
     BlockStructureModulestoreData - responsible for xBlock data.
+    IndexedBlockStructureBlockData - alternative to BlockStructureBlockData
+        that keeps block relations in integer arrays.
 
 The following internal data structures are implemented:
     _BlockRelations - Data structure for a single block's relations.
+    _IndexedBlockRelations - Data structure for the relations of all
+        blocks, indexed by integers.
     _BlockData - Data structure for a single block's data.
 """
+from array import array
 from copy import deepcopy
-from functools import partial
 from logging import getLogger
 
 from openedx.core.lib.graph_traversals import traverse_topologically, traverse_post_order
@@ -40,6 +44,264 @@ class _BlockRelations(object):
         self.children = []
 
 
+def universal_filter(block_key):  # pylint: disable=unused-argument
+    """
+    A filter function that always returns True for all blocks.
+    """
+    return True
+
+
+class BlockRemovalFilter(object):
+    """
+    A filter function that removes blocks that satisfy its
+    removal_condition from its block structure.  Returns True if the
+    given block was retained, and False if the block was removed.
+
+    The removal_condition and keep_descendants are exposed so the
+    removal conditions of multiple transformers can be evaluated
+    together in a single traversal.
+    """
+    def __init__(self, block_structure, removal_condition, keep_descendants=False):
+        self.block_structure = block_structure
+        self.removal_condition = removal_condition
+        self.keep_descendants = keep_descendants
+
+    def __call__(self, block_key):
+        return self.block_structure.retain_or_remove(block_key, self.removal_condition, self.keep_descendants)
+
+
+class _IndexedBlockRelations(object):
+    """
+    Data structure to encapsulate the relationships of all blocks in a
+    block structure.  Usage keys are mapped to dense integer indexes and
+    the children and parents of all blocks are stored in CSR-style
+    integer arrays: the related indexes of the block at index i are at
+    positions offsets[i] to offsets[i + 1] of the indexes array.
+
+    The arrays are never modified, so they can be shared between copies.
+    Changes to a block's relations are recorded as overrides of its
+    relations and removed blocks are recorded by index.
+    """
+    INDEX_TYPECODE = 'i'
+
+    def __init__(self, keys, children, parents):
+        """
+        Arguments:
+            keys ([UsageKey]) - The usage keys of the blocks, in index
+                order.
+
+            children ((array, array)) - The offsets and indexes arrays
+                of the blocks' children.
+
+            parents ((array, array)) - The offsets and indexes arrays
+                of the blocks' parents.
+        """
+        # list [UsageKey]
+        self.keys = keys
+
+        # dict {UsageKey: int}
+        self.indexes = {key: index for index, key in enumerate(keys)}
+
+        self._children_offsets, self._children_indexes = children
+        self._parents_offsets, self._parents_indexes = parents
+
+        # Map of a block's index to the list of indexes of its
+        # children or parents, for blocks whose relations have changed.
+        # dict {int: [int]}
+        self._children_overrides = {}
+        self._parents_overrides = {}
+
+        # set(int)
+        self._removed = set()
+
+    @classmethod
+    def from_block_relations(cls, block_relations):
+        """
+        Returns a new _IndexedBlockRelations for the given map of
+        usage key to _BlockRelations.
+        """
+        keys = list(block_relations)
+        indexes = {key: index for index, key in enumerate(keys)}
+        arrays = []
+        for relation_name in ('children', 'parents'):
+            offsets, related_indexes = array(cls.INDEX_TYPECODE, [0]), array(cls.INDEX_TYPECODE)
+            for key in keys:
+                related_keys = getattr(block_relations[key], relation_name)
+                related_indexes.extend(indexes[related_key] for related_key in related_keys)
+                offsets.append(len(related_indexes))
+            arrays.append((offsets, related_indexes))
+        return cls(keys, *arrays)
+
+    def __contains__(self, usage_key):
+        index = self.indexes.get(usage_key)
+        return index is not None and index not in self._removed
+
+    def __len__(self):
+        return len(self.keys) - len(self._removed)
+
+    def __iter__(self):
+        return (key for index, key in enumerate(self.keys) if index not in self._removed)
+
+    def __deepcopy__(self, memo):
+        """
+        Returns a copy that shares the immutable keys and arrays of
+        this instance.
+        """
+        new_copy = _IndexedBlockRelations.__new__(_IndexedBlockRelations)
+        new_copy.__dict__.update(self.__dict__)
+        new_copy._children_overrides = {index: list(related) for index, related in self._children_overrides.iteritems()}
+        new_copy._parents_overrides = {index: list(related) for index, related in self._parents_overrides.iteritems()}
+        new_copy._removed = set(self._removed)
+        return new_copy
+
+    def index(self, usage_key):
+        """
+        Returns the index of the given usage_key.
+
+        Raises KeyError if the block is not in the structure.
+        """
+        if usage_key not in self:
+            raise KeyError(usage_key)
+        return self.indexes[usage_key]
+
+    def key(self, index):
+        """
+        Returns the usage key at the given index.
+        """
+        return self.keys[index]
+
+    def children_of(self, index):
+        """
+        Returns the indexes of the children of the block at the given
+        index.
+        """
+        return self._related_indexes(index, self._children_overrides, self._children_offsets, self._children_indexes)
+
+    def parents_of(self, index):
+        """
+        Returns the indexes of the parents of the block at the given
+        index.
+        """
+        return self._related_indexes(index, self._parents_overrides, self._parents_offsets, self._parents_indexes)
+
+    def add_relation(self, parent_key, child_key):
+        """
+        Adds a parent to child relationship, adding either block if
+        it is not yet present.
+        """
+        parent, child = self.add_block(parent_key), self.add_block(child_key)
+        self._overridden(child, self._parents_overrides, self.parents_of).append(parent)
+        self._overridden(parent, self._children_overrides, self.children_of).append(child)
+
+    def add_block(self, usage_key):
+        """
+        Adds the given usage_key, if not yet present, and returns its
+        index.
+        """
+        index = self.indexes.get(usage_key)
+        if index is None:
+            # Copy on write, since keys and indexes are shared by copies.
+            index = len(self.keys)
+            self.keys = self.keys + [usage_key]
+            self.indexes = dict(self.indexes)
+            self.indexes[usage_key] = index
+        elif index in self._removed:
+            self._removed.discard(index)
+            self._children_overrides[index] = []
+            self._parents_overrides[index] = []
+        return index
+
+    def remove_block(self, usage_key, keep_descendants):
+        """
+        Removes the given block, see BlockStructureBlockData.remove_block.
+
+        Raises KeyError if the block is not in the structure.
+        """
+        index = self.index(usage_key)
+        children = list(self.children_of(index))
+        parents = list(self.parents_of(index))
+
+        # Remove block from its children.
+        for child in children:
+            self._overridden(child, self._parents_overrides, self.parents_of).remove(index)
+
+        # Remove block from its parents.
+        for parent in parents:
+            self._overridden(parent, self._children_overrides, self.children_of).remove(index)
+
+        # Remove block.
+        self._removed.add(index)
+        self._children_overrides.pop(index, None)
+        self._parents_overrides.pop(index, None)
+
+        # Recreate the graph connections if descendants are to be kept.
+        if keep_descendants:
+            for child in children:
+                for parent in parents:
+                    self.add_relation(self.keys[parent], self.keys[child])
+
+    def set_root(self, usage_key):
+        """
+        Removes the parents of the given block.
+        """
+        self._parents_overrides[self.index(usage_key)] = []
+
+    def pruned(self, post_order):
+        """
+        Returns a new _IndexedBlockRelations with only the blocks that
+        are yielded by the given post-order traversal of indexes.
+        """
+        post_ordered = list(post_order)
+        new_indexes = {index: new_index for new_index, index in enumerate(post_ordered)}
+
+        children_offsets, children_indexes = array(self.INDEX_TYPECODE, [0]), array(self.INDEX_TYPECODE)
+        parents = [[] for _ in post_ordered]
+        for new_index, index in enumerate(post_ordered):
+            for child in self.children_of(index):
+                new_child = new_indexes.get(child)
+                if new_child is not None and new_child < new_index:
+                    children_indexes.append(new_child)
+                    parents[new_child].append(new_index)
+            children_offsets.append(len(children_indexes))
+
+        parents_offsets, parents_indexes = array(self.INDEX_TYPECODE, [0]), array(self.INDEX_TYPECODE)
+        for new_parents in parents:
+            parents_indexes.extend(new_parents)
+            parents_offsets.append(len(parents_indexes))
+
+        return _IndexedBlockRelations(
+            [self.keys[index] for index in post_ordered],
+            (children_offsets, children_indexes),
+            (parents_offsets, parents_indexes),
+        )
+
+    def _related_indexes(self, index, overrides, offsets, indexes):
+        """
+        Returns the indexes related to the block at the given index
+        from the given overrides, or else from the given arrays.
+        """
+        if index in self._removed:
+            return ()
+        try:
+            return overrides[index]
+        except KeyError:
+            if index + 1 < len(offsets):
+                return indexes[offsets[index]:offsets[index + 1]]
+            return ()
+
+    def _overridden(self, index, overrides, get_related):
+        """
+        Returns the list of related indexes for the block at the given
+        index in the given overrides, creating it from the block's
+        current relations if needed.
+        """
+        try:
+            return overrides[index]
+        except KeyError:
+            related = overrides[index] = list(get_related(index))
+            return related
+
+
 class BlockStructure(object):
     """
     Base class for a block structure.  BlockStructures are constructed
@@ -627,7 +889,7 @@ class BlockStructureBlockData(BlockStructure):
         """
         Returns a filter function that always returns True for all blocks.
         """
-        return lambda block_key: True
+        return universal_filter
 
     def create_removal_filter(self, removal_condition, keep_descendants=False):
         """
@@ -642,11 +904,7 @@ class BlockStructureBlockData(BlockStructure):
             keep_descendants (bool) - See the description in
                 remove_block.
         """
-        return partial(
-            self.retain_or_remove,
-            removal_condition=removal_condition,
-            keep_descendants=keep_descendants,
-        )
+        return BlockRemovalFilter(self, removal_condition, keep_descendants)
 
     def retain_or_remove(self, block_key, removal_condition, keep_descendants=False):
         """
@@ -748,6 +1006,100 @@ class BlockStructureBlockData(BlockStructure):
             return block_data
 
 
+class IndexedBlockStructureBlockData(BlockStructureBlockData):
+    """
+    Subclass of BlockStructureBlockData that keeps its block relations
+    in an _IndexedBlockRelations instead of a map of _BlockRelations.
+    Traversals run on integer indexes, which avoids hashing usage keys
+    and the memory overhead of a relations object per block.
+    """
+    def __init__(self, root_block_usage_key):
+        super(IndexedBlockStructureBlockData, self).__init__(root_block_usage_key)
+        self._block_relations = _IndexedBlockRelations.from_block_relations(self._block_relations)
+
+    def get_parents(self, usage_key):
+        if usage_key not in self:
+            return []
+        relations = self._block_relations
+        return [relations.key(parent) for parent in relations.parents_of(relations.index(usage_key))]
+
+    def get_children(self, usage_key):
+        if usage_key not in self:
+            return []
+        relations = self._block_relations
+        return [relations.key(child) for child in relations.children_of(relations.index(usage_key))]
+
+    def set_root_block(self, usage_key):
+        self.root_block_usage_key = usage_key
+        self._block_relations.set_root(usage_key)
+
+    def get_block_keys(self):
+        return iter(self._block_relations)
+
+    def topological_traversal(
+            self,
+            filter_func=None,
+            yield_descendants_of_unyielded=False,
+            start_node=None,
+    ):
+        relations = self._block_relations
+        return (
+            relations.key(index)
+            for index in traverse_topologically(
+                start_node=relations.index(start_node or self.root_block_usage_key),
+                get_parents=relations.parents_of,
+                get_children=relations.children_of,
+                filter_func=(lambda index: filter_func(relations.key(index))) if filter_func else None,
+                yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+            )
+        )
+
+    def post_order_traversal(
+            self,
+            filter_func=None,
+            start_node=None,
+    ):
+        relations = self._block_relations
+        return (
+            relations.key(index)
+            for index in self._post_order_indexes(
+                relations,
+                relations.index(start_node or self.root_block_usage_key),
+                filter_func,
+            )
+        )
+
+    def remove_block(self, usage_key, keep_descendants):
+        self._block_relations.remove_block(usage_key, keep_descendants)
+        self._block_data_map.pop(usage_key, None)
+
+    #--- Internal methods ---#
+    # To be used within the block_structure framework or by tests.
+
+    def _prune_unreachable(self):
+        relations = self._block_relations
+        if self.root_block_usage_key in relations:
+            post_order = self._post_order_indexes(relations, relations.index(self.root_block_usage_key))
+        else:
+            post_order = []
+        self._block_relations = relations.pruned(post_order)
+
+    def _add_relation(self, parent_key, child_key):
+        self._block_relations.add_relation(parent_key, child_key)
+
+    @staticmethod
+    def _post_order_indexes(relations, start_index, filter_func=None):
+        """
+        Returns a post-order traversal of the indexes of the given
+        relations, starting at start_index.
+        """
+        return traverse_post_order(
+            start_node=start_index,
+            get_children=relations.children_of,
+            filter_func=(lambda index: filter_func(relations.key(index))) if filter_func else None,
+        )
+
+
 class BlockStructureModulestoreData(BlockStructureBlockData):
     """
     Subclass of BlockStructureBlockData that is responsible for managing
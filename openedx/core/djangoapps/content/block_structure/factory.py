@@ -1,7 +1,12 @@
 """
 Module for factory class for BlockStructure objects.
 """
-from .block_structure import BlockStructureModulestoreData, BlockStructureBlockData
+from .block_structure import (
+    BlockStructureModulestoreData,
+    BlockStructureBlockData,
+    IndexedBlockStructureBlockData,
+    _IndexedBlockRelations,
+)
 
 
 class BlockStructureFactory(object):
@@ -58,7 +63,7 @@ class BlockStructureFactory(object):
         return block_structure
 
     @classmethod
-    def create_from_store(cls, root_block_usage_key, block_structure_store):
+    def create_from_store(cls, root_block_usage_key, block_structure_store, transformer_names=None):
         """
         Deserializes and returns the block structure starting at
         root_block_usage_key from the given store, if it's found in the store.
@@ -75,6 +80,10 @@ class BlockStructureFactory(object):
                 store from which the block structure is to be
                 deserialized.
 
+            transformer_names (iterable(string)) - Names of the
+                transformers whose collected data is to be read up
+                front.  See BlockStructureStore.get.
+
         Returns:
             BlockStructure - The deserialized block structure starting
                 at root_block_usage_key, if found in the cache.
@@ -83,14 +92,19 @@ class BlockStructureFactory(object):
             BlockStructureNotFound - If the root_block_usage_key is not found
                 in the store.
         """
-        return block_structure_store.get(root_block_usage_key)
+        return block_structure_store.get(root_block_usage_key, transformer_names)
 
     @classmethod
     def create_new(cls, root_block_usage_key, block_relations, transformer_data, block_data_map):
         """
-        Returns a new block structure for given the arguments.
+        Returns a new block structure for given the arguments.  An
+        IndexedBlockStructureBlockData is returned if the given
+        block_relations are indexed.
         """
-        block_structure = BlockStructureBlockData(root_block_usage_key)
+        if isinstance(block_relations, _IndexedBlockRelations):
+            block_structure = IndexedBlockStructureBlockData(root_block_usage_key)
+        else:
+            block_structure = BlockStructureBlockData(root_block_usage_key)
         block_structure._block_relations = block_relations  # pylint: disable=protected-access
         block_structure.transformer_data = transformer_data
         block_structure._block_data_map = block_data_map  # pylint: disable=protected-access
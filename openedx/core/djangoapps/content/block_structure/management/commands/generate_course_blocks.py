@@ -2,13 +2,19 @@
 Command to load course blocks.
 """
 import logging
+import os
+from collections import deque
+from time import sleep, time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from student.models import CourseEnrollment
 from xmodule.modulestore.django import modulestore
 
 import openedx.core.djangoapps.content.block_structure.api as api
 from openedx.core.djangoapps.content.block_structure.config import STORAGE_BACKING_FOR_CACHE, waffle
 import openedx.core.djangoapps.content.block_structure.tasks as tasks
+from openedx.core.djangoapps.content.block_structure.tasks import course_generation_stats
 import openedx.core.djangoapps.content.block_structure.store as store
 from openedx.core.lib.command_utils import (
     get_mutually_exclusive_required_option,
@@ -25,7 +31,11 @@ class Command(BaseCommand):
     Example usage:
         $ ./manage.py lms generate_course_blocks --all_courses --settings=devstack
         $ ./manage.py lms generate_course_blocks 'edX/DemoX/Demo_Course' --settings=devstack
+        $ ./manage.py lms generate_course_blocks --all_courses --enqueue_task --concurrency 8 \
+            --checkpoint_file /tmp/course_blocks.done --prioritize_by_enrollment --settings=devstack
     """
+    # Seconds to wait between polls of the results of enqueued tasks.
+    POLL_INTERVAL = 1
     args = u'<course_id course_id ...>'
     help = u'Generates and stores course blocks for one or more courses.'
 
@@ -80,6 +90,29 @@ class Command(BaseCommand):
             action='store_true',
             default=False,
         )
+        parser.add_argument(
+            '--concurrency',
+            help=(
+                u'Maximum number of enqueued tasks to run at a time.  The command waits for the tasks to finish, '
+                u'so it can record their results.'
+            ),
+            default=0,
+            type=int,
+        )
+        parser.add_argument(
+            '--checkpoint_file',
+            dest='checkpoint_file',
+            help=(
+                u'File in which to record the courses whose blocks have been generated.  Courses already recorded '
+                u'in it are skipped, so an interrupted run can be resumed.'
+            ),
+        )
+        parser.add_argument(
+            '--prioritize_by_enrollment',
+            help=u'Generate course blocks for the courses with the most active enrollments first.',
+            action='store_true',
+            default=False,
+        )
 
     def handle(self, *args, **options):
 
@@ -87,6 +120,9 @@ class Command(BaseCommand):
         validate_dependent_option(options, 'routing_key', 'enqueue_task')
         validate_dependent_option(options, 'start_index', 'all_courses')
         validate_dependent_option(options, 'end_index', 'all_courses')
+        validate_dependent_option(options, 'concurrency', 'enqueue_task')
+        if options.get('checkpoint_file') and options.get('enqueue_task') and not options.get('concurrency'):
+            raise CommandError(u'Option --checkpoint_file requires option --concurrency when enqueuing tasks.')
 
         if courses_mode == 'all_courses':
             course_keys = [course.id for course in modulestore().get_course_summaries()]
@@ -96,11 +132,22 @@ class Command(BaseCommand):
         else:
             course_keys = parse_course_keys(options['courses'])
 
+        checkpoint = _Checkpoint(options.get('checkpoint_file'))
+        if checkpoint.completed:
+            course_keys = [course_key for course_key in course_keys if course_key not in checkpoint.completed]
+        if options.get('prioritize_by_enrollment'):
+            course_keys = self._prioritize_by_enrollment(course_keys)
+
         self._set_log_levels(options)
 
         log.critical(u'BlockStructure: STARTED generating Course Blocks for %d courses.', len(course_keys))
-        self._generate_course_blocks(options, course_keys)
-        log.critical(u'BlockStructure: FINISHED generating Course Blocks for %d courses.', len(course_keys))
+        stats = _GenerationStats()
+        self._generate_course_blocks(options, course_keys, checkpoint, stats)
+        log.critical(
+            u'BlockStructure: FINISHED generating Course Blocks for %d courses. %s',
+            len(course_keys),
+            stats.summary(),
+        )
 
     def _set_log_levels(self, options):
         """
@@ -122,37 +169,180 @@ class Command(BaseCommand):
         log.setLevel(log_level)
         store.logger.setLevel(cache_log_level)
 
-    def _generate_course_blocks(self, options, course_keys):
+    def _prioritize_by_enrollment(self, course_keys):
+        """
+        Returns the given course_keys ordered by their number of active
+        enrollments, highest first.
+        """
+        enrollment_counts = dict(
+            CourseEnrollment.objects.filter(is_active=True).values_list('course_id').annotate(Count('id'))
+        )
+        return sorted(course_keys, key=lambda course_key: enrollment_counts.get(course_key, 0), reverse=True)
+
+    def _generate_course_blocks(self, options, course_keys, checkpoint, stats):
         """
         Generates course blocks for the given course_keys per the given options.
         """
         if options.get('with_storage'):
             waffle().override_for_request(STORAGE_BACKING_FOR_CACHE)
 
+        if options.get('concurrency'):
+            self._generate_with_concurrency(options, course_keys, checkpoint, stats)
+            return
+
         for course_key in course_keys:
             try:
-                self._generate_for_course(options, course_key)
+                self._generate_for_course(options, course_key, checkpoint, stats)
             except Exception as ex:  # pylint: disable=broad-except
+                stats.add_failure()
                 log.exception(
                     u'BlockStructure: An error occurred while generating course blocks for %s: %s',
                     unicode(course_key),
                     ex.message,
                 )
 
-    def _generate_for_course(self, options, course_key):
+    def _generate_for_course(self, options, course_key, checkpoint, stats):
         """
         Generates course blocks for the given course_key per the given options.
         """
         if options.get('enqueue_task'):
-            action = tasks.update_course_in_cache_v2 if options.get('force_update') else tasks.get_course_in_cache_v2
-            task_options = {'routing_key': options['routing_key']} if options.get('routing_key') else {}
-            result = action.apply_async(
-                kwargs=dict(course_id=unicode(course_key), with_storage=options.get('with_storage')),
-                **task_options
-            )
-            log.info(u'BlockStructure: ENQUEUED generating for course: %s, task_id: %s.', course_key, result.id)
+            self._enqueue_for_course(options, course_key)
         else:
             log.info(u'BlockStructure: STARTED generating for course: %s.', course_key)
             action = api.update_course_in_cache if options.get('force_update') else api.get_course_in_cache
-            action(course_key)
-            log.info(u'BlockStructure: FINISHED generating for course: %s.', course_key)
+            start_time = time()
+            block_structure = action(course_key)
+            self._record_success(
+                course_generation_stats(course_key, block_structure, time() - start_time), checkpoint, stats,
+            )
+
+    def _enqueue_for_course(self, options, course_key):
+        """
+        Enqueues the task that generates course blocks for the given
+        course_key per the given options, and returns its AsyncResult.
+        """
+        action = tasks.update_course_in_cache_v2 if options.get('force_update') else tasks.get_course_in_cache_v2
+        task_options = {'routing_key': options['routing_key']} if options.get('routing_key') else {}
+        result = action.apply_async(
+            kwargs=dict(course_id=unicode(course_key), with_storage=options.get('with_storage')),
+            **task_options
+        )
+        log.info(u'BlockStructure: ENQUEUED generating for course: %s, task_id: %s.', course_key, result.id)
+        return result
+
+    def _generate_with_concurrency(self, options, course_keys, checkpoint, stats):
+        """
+        Enqueues tasks that generate course blocks for the given
+        course_keys, keeping at most options['concurrency'] of them
+        running at a time, and records their results as they finish.
+        """
+        pending_course_keys = deque(course_keys)
+        running_tasks = {}
+        while pending_course_keys or running_tasks:
+            while pending_course_keys and len(running_tasks) < options['concurrency']:
+                course_key = pending_course_keys.popleft()
+                try:
+                    running_tasks[course_key] = self._enqueue_for_course(options, course_key)
+                except Exception as ex:  # pylint: disable=broad-except
+                    stats.add_failure()
+                    log.exception(
+                        u'BlockStructure: An error occurred while enqueuing course blocks generation for %s: %s',
+                        unicode(course_key),
+                        ex.message,
+                    )
+
+            finished_course_keys = [course_key for course_key, result in running_tasks.iteritems() if result.ready()]
+            for course_key in finished_course_keys:
+                result = running_tasks.pop(course_key)
+                if result.successful():
+                    self._record_success(result.result, checkpoint, stats)
+                else:
+                    stats.add_failure()
+                    log.error(
+                        u'BlockStructure: An error occurred while generating course blocks for %s, task_id: %s: %s',
+                        unicode(course_key),
+                        result.id,
+                        result.result,
+                    )
+
+            if running_tasks and not finished_course_keys:
+                sleep(self.POLL_INTERVAL)
+
+    def _record_success(self, course_stats, checkpoint, stats):
+        """
+        Records the successful generation of course blocks with the
+        given course_stats, as returned by the generation tasks.
+        """
+        checkpoint.add(course_stats['course_id'])
+        stats.add_success(course_stats)
+        log.info(
+            u'BlockStructure: FINISHED generating for course: %s, duration: %.3fs, blocks: %s.',
+            course_stats['course_id'],
+            course_stats['duration'],
+            course_stats['num_blocks'],
+        )
+
+
+class _Checkpoint(object):
+    """
+    Record of the courses whose blocks have been generated, kept in a
+    file with one course id per line.  Without a file, nothing is
+    recorded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.completed = set(parse_course_keys([line.strip() for line in checkpoint_file if line.strip()]))
+
+    def add(self, course_id):
+        """
+        Records that the blocks of the course with the given course_id
+        have been generated.
+        """
+        if self.path:
+            with open(self.path, 'a') as checkpoint_file:
+                checkpoint_file.write(course_id.encode('utf-8') + '\n')
+
+
+class _GenerationStats(object):
+    """
+    Aggregate statistics of generating course blocks for many courses.
+    """
+    def __init__(self):
+        self.num_succeeded = 0
+        self.num_failed = 0
+        self.total_duration = 0.0
+        self.total_blocks = 0
+        self.slowest = None
+
+    def add_success(self, course_stats):
+        """
+        Adds the given statistics of a single course, as returned by
+        course_generation_stats.
+        """
+        self.num_succeeded += 1
+        self.total_duration += course_stats['duration']
+        self.total_blocks += course_stats['num_blocks'] or 0
+        if self.slowest is None or course_stats['duration'] > self.slowest['duration']:
+            self.slowest = course_stats
+
+    def add_failure(self):
+        """
+        Adds a failed course.
+        """
+        self.num_failed += 1
+
+    def summary(self):
+        """
+        Returns a summary of the statistics, for logging.
+        """
+        summary = u'Succeeded: {}, failed: {}, total duration: {:.3f}s, total blocks: {}.'.format(
+            self.num_succeeded, self.num_failed, self.total_duration, self.total_blocks,
+        )
+        if self.slowest:
+            summary += u' Slowest course: {}, duration: {:.3f}s.'.format(
+                self.slowest['course_id'], self.slowest['duration'],
+            )
+        return summary
@@ -4,8 +4,12 @@ Tests for generate_course_blocks management command.
 import ddt
 from django.core.management.base import CommandError
 import itertools
+import os
+import shutil
+import tempfile
 from mock import patch
 
+from student.tests.factories import CourseEnrollmentFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 from .. import generate_course_blocks
@@ -144,6 +148,50 @@ class TestGenerateCourseBlocks(ModuleStoreTestCase):
                     else:
                         self.assertNotIn('routing_key', task_options)
 
+    def _checkpoint_file_path(self):
+        """
+        Returns the path of a checkpoint file in a new temporary directory.
+        """
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        return os.path.join(temp_dir, 'checkpoint')
+
+    def test_checkpoint(self):
+        checkpoint_file_path = self._checkpoint_file_path()
+        self.command.handle(courses=[unicode(self.course_keys[0])], checkpoint_file=checkpoint_file_path)
+        with open(checkpoint_file_path) as checkpoint_file:
+            self.assertEquals(checkpoint_file.read().split(), [unicode(self.course_keys[0])])
+
+        with patch(
+            'openedx.core.djangoapps.content.block_structure.management.commands.generate_course_blocks.api'
+        ) as mock_api:
+            self.command.handle(all_courses=True, checkpoint_file=checkpoint_file_path)
+            self.assertEquals(
+                [call_args[0][0] for call_args in mock_api.get_course_in_cache.call_args_list],
+                self.course_keys[1:],
+            )
+
+    def test_enqueue_with_concurrency(self):
+        checkpoint_file_path = self._checkpoint_file_path()
+        self.command.handle(
+            all_courses=True, enqueue_task=True, concurrency=1, checkpoint_file=checkpoint_file_path,
+        )
+        self._assert_courses_in_block_cache(*self.course_keys)
+        with open(checkpoint_file_path) as checkpoint_file:
+            self.assertItemsEqual(checkpoint_file.read().split(), [unicode(key) for key in self.course_keys])
+
+    def test_checkpoint_requires_concurrency(self):
+        with self.assertRaises(CommandError):
+            self.command.handle(all_courses=True, enqueue_task=True, checkpoint_file=self._checkpoint_file_path())
+
+    def test_prioritize_by_enrollment(self):
+        CourseEnrollmentFactory.create(course_id=self.course_keys[-1])
+        with patch(
+            'openedx.core.djangoapps.content.block_structure.management.commands.generate_course_blocks.api'
+        ) as mock_api:
+            self.command.handle(all_courses=True, prioritize_by_enrollment=True)
+            self.assertEquals(mock_api.get_course_in_cache.call_args_list[0][0][0], self.course_keys[-1])
+
     @patch('openedx.core.djangoapps.content.block_structure.management.commands.generate_course_blocks.log')
     def test_not_found_key(self, mock_log):
         self.command.handle(courses=['fake/course/id'])
@@ -169,6 +217,7 @@ class TestGenerateCourseBlocks(ModuleStoreTestCase):
         ('routing_key', 'enqueue_task'),
         ('start_index', 'all_courses'),
         ('end_index', 'all_courses'),
+        ('concurrency', 'enqueue_task'),
     )
     @ddt.unpack
     def test_dependent_options_error(self, dependent_option, depending_on_option):
@@ -60,7 +60,10 @@ class BlockStructureManager(object):
             BlockStructureBlockData - A transformed block structure,
                 starting at starting_block_usage_key.
         """
-        block_structure = collected_block_structure.copy() if collected_block_structure else self.get_collected()
+        if collected_block_structure:
+            block_structure = collected_block_structure.copy()
+        else:
+            block_structure = self.get_collected(transformers.collected_data_dependencies())
 
         if starting_block_usage_key:
             # Override the root_block_usage_key so traversals start at the
@@ -76,7 +79,7 @@ class BlockStructureManager(object):
         transformers.transform(block_structure)
         return block_structure
 
-    def get_collected(self):
+    def get_collected(self, transformer_names=None):
         """
         Returns the collected Block Structure for the root_block_usage_key,
         getting block data from the cache and modulestore, as needed.
@@ -85,6 +88,13 @@ class BlockStructureManager(object):
         the modulestore is accessed if needed (at cache miss), and the
         transformers data is collected if needed.
 
+        Arguments:
+            transformer_names (iterable(string)) - Names of the
+                transformers whose collected data is to be read from
+                the store up front.  Data of other transformers is read
+                when first accessed.  If None, data of all transformers
+                is read.
+
         Returns:
             BlockStructureBlockData - A collected block structure,
                 starting at root_block_usage_key, with collected data
@@ -94,6 +104,7 @@ class BlockStructureManager(object):
             block_structure = BlockStructureFactory.create_from_store(
                 self.root_block_usage_key,
                 self.store,
+                transformer_names,
             )
             BlockStructureTransformers.verify_versions(block_structure)
 
@@ -109,10 +120,15 @@ class BlockStructureManager(object):
         """
         The store is updated with newly collected transformers data from
         the modulestore, only if the data in the store is outdated.
+
+        Returns:
+            BlockStructureBlockData - The newly collected block
+                structure, or None if the data in the store was
+                already up-to-date.
         """
         with self._bulk_operations():
             if not self.store.is_up_to_date(self.root_block_usage_key, self.modulestore):
-                self._update_collected()
+                return self._update_collected()
 
     def _update_collected(self):
         """
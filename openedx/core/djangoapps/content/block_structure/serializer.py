@@ -0,0 +1,670 @@
+"""
+Module for the serialization formats of BlockStructure objects.
+
+Two formats are supported:
+
+    ZpickleSerializer - The original format, which pickles the block
+        structure's internal data structures as a whole and compresses
+        the result.
+
+    CompactSerializer - A versioned, schema-aware binary format that
+        maps usage keys to integer indexes, stores block relations as
+        integer arrays, stores collected fields as per-field columns
+        with interned field names, and keeps each transformer's block
+        data in its own segment so it is decoded only when accessed.
+        Block structures are read back as IndexedBlockStructureBlockData,
+        directly from the stored arrays.
+
+The format of serialized data is detected when deserializing, so data
+written in either format can always be read back.
+"""
+# pylint: disable=protected-access
+import cPickle as pickle
+import struct
+from array import array
+from copy import deepcopy
+from hashlib import sha1
+
+from opaque_keys.edx.locator import BlockUsageLocator
+
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+
+from . import config
+from .block_structure import BlockData, TransformerData, TransformerDataMap, _IndexedBlockRelations
+from .exceptions import BlockStructureException
+from .factory import BlockStructureFactory
+
+
+class BlockStructureSerializer(object):
+    """
+    Base class for the serialization formats of block structures.
+    """
+    def serialize(self, block_structure):
+        """
+        Returns a string with the serialized data of the given
+        block_structure.
+        """
+        raise NotImplementedError
+
+    def deserialize(self, serialized_data, root_block_usage_key):
+        """
+        Returns a new block structure from the given serialized_data.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def can_deserialize(cls, serialized_data):
+        """
+        Returns whether the given serialized_data was written in
+        this serializer's format.
+        """
+        raise NotImplementedError
+
+
+class ZpickleSerializer(BlockStructureSerializer):
+    """
+    Serializes the block structure's relations, transformer data and
+    block data map as a single zlib compressed pickle.
+    """
+    def serialize(self, block_structure):
+        data_to_cache = (
+            block_structure._block_relations,
+            block_structure.transformer_data,
+            block_structure._block_data_map,
+        )
+        return zpickle(data_to_cache)
+
+    def deserialize(self, serialized_data, root_block_usage_key):
+        block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
+        return BlockStructureFactory.create_new(
+            root_block_usage_key,
+            block_relations,
+            transformer_data,
+            block_data_map,
+        )
+
+    @classmethod
+    def can_deserialize(cls, serialized_data):
+        return not CompactSerializer.can_deserialize(serialized_data)
+
+
+class CompactSerializer(BlockStructureSerializer):
+    """
+    Serializes block structures into a segmented binary container.
+
+    Layout:
+        MAGIC (4 bytes) | FORMAT_VERSION (1 byte) | length of the
+        segment table (4 bytes) | pickled segment table | segments
+
+    The segment table maps each segment's name to its (offset, length)
+    within the segments area.  Each segment is an independently zlib
+    compressed pickle of primitive values (ints, strings, lists and
+    packed integer arrays), which is much cheaper to decode than the
+    object graph of the block structure itself.
+
+    Segments:
+        keys - The usage keys of all blocks, in index order.
+        relations - CSR-style arrays of the children and parents
+            indexes of each block.
+        block_fields - Collected xBlock fields, one column per field.
+        transformer_data - The non-block-specific transformer data.
+        transformer:<name> - The block-specific data of a single
+            transformer, one column per field.  Decoded lazily.
+
+    A container can also be split into a core container and its
+    transformer segments, so each transformer's data can be stored
+    separately and read only when needed.  In the core container, the
+    table entries of the transformer segments are None and the
+    external_segments_id segment identifies the split.
+    """
+    MAGIC = '\x00BSC'
+    FORMAT_VERSION = 1
+
+    _HEADER = struct.Struct('!4sBI')
+    _INDEX_TYPECODE = _IndexedBlockRelations.INDEX_TYPECODE
+
+    KEYS_SEGMENT = 'keys'
+    RELATIONS_SEGMENT = 'relations'
+    BLOCK_FIELDS_SEGMENT = 'block_fields'
+    TRANSFORMER_DATA_SEGMENT = 'transformer_data'
+    TRANSFORMER_SEGMENT_PREFIX = 'transformer:'
+    EXTERNAL_SEGMENTS_ID_SEGMENT = 'external_segments_id'
+
+    #--- Serialization ---#
+
+    def serialize(self, block_structure):
+        segments = self.serialize_segments(block_structure)
+        return self.pack(segments)
+
+    def serialize_segments(self, block_structure):
+        """
+        Returns a dict of segment name to the encoded segment for the
+        given block_structure.
+        """
+        block_data_map = block_structure._block_data_map
+
+        # Blocks with relations come first so their count is enough
+        # to tell them apart from blocks that only have data.
+        keys = list(block_structure.get_block_keys())
+        num_blocks_with_relations = len(keys)
+        keys.extend(key for key in block_data_map if key not in block_structure)
+        key_indexes = {key: index for index, key in enumerate(keys)}
+
+        data_indexes = [key_indexes[key] for key in block_data_map]
+        block_datas = [block_data_map[keys[index]] for index in data_indexes]
+
+        segments = {
+            self.KEYS_SEGMENT: self._encode_segment(self._encode_keys(keys)),
+            self.RELATIONS_SEGMENT: self._encode_segment(
+                self._encode_relations(keys[:num_blocks_with_relations], block_structure, key_indexes)
+            ),
+            self.BLOCK_FIELDS_SEGMENT: self._encode_segment(
+                (self._pack_indexes(data_indexes), self._encode_columns(data_indexes, block_datas))
+            ),
+            self.TRANSFORMER_DATA_SEGMENT: self._encode_segment({
+                transformer_name: transformer_data.fields
+                for transformer_name, transformer_data in block_structure.transformer_data.iteritems()
+            }),
+        }
+
+        transformer_names = set()
+        for block_data in block_datas:
+            transformer_names.update(block_data.transformer_data.iterkeys())
+
+        for transformer_name in transformer_names:
+            present_indexes, present_datas = [], []
+            for index, block_data in zip(data_indexes, block_datas):
+                transformer_block_data = block_data.transformer_data.get(transformer_name)
+                if transformer_block_data is not None:
+                    present_indexes.append(index)
+                    present_datas.append(transformer_block_data)
+            segments[self.transformer_segment_name(transformer_name)] = self._encode_segment(
+                (self._pack_indexes(present_indexes), self._encode_columns(present_indexes, present_datas))
+            )
+
+        return segments
+
+    def pack(self, segments):
+        """
+        Returns the binary container for the given dict of encoded
+        segments.  Segments whose value is None are recorded in the
+        segment table as stored externally.
+        """
+        segment_table = {}
+        packed_segments = []
+        offset = 0
+        for name, segment in segments.iteritems():
+            if segment is None:
+                segment_table[name] = None
+            else:
+                segment_table[name] = (offset, len(segment))
+                packed_segments.append(segment)
+                offset += len(segment)
+
+        packed_table = pickle.dumps(segment_table, pickle.HIGHEST_PROTOCOL)
+        return ''.join(
+            [self._HEADER.pack(self.MAGIC, self.FORMAT_VERSION, len(packed_table)), packed_table] + packed_segments
+        )
+
+    def split(self, serialized_data):
+        """
+        Splits the given container into a core container, without the
+        segments of the transformers, and the transformer segments.
+
+        Returns:
+            (core_data, external_segments_id, {transformer_name: segment})
+            - The external_segments_id is a digest of the given
+            container; it is recorded in the core container so readers
+            can tell which transformer segments belong to it.
+        """
+        segments = self.unpack(serialized_data)
+        transformer_segments = {}
+        for name in segments.keys():
+            if self.is_transformer_segment_name(name):
+                transformer_segments[self.transformer_name(name)] = segments[name]
+                segments[name] = None
+
+        external_segments_id = sha1(serialized_data).hexdigest()
+        segments[self.EXTERNAL_SEGMENTS_ID_SEGMENT] = external_segments_id
+        return self.pack(segments), external_segments_id, transformer_segments
+
+    #--- Deserialization ---#
+
+    def deserialize(self, serialized_data, root_block_usage_key):
+        return self.deserialize_segments(self.unpack(serialized_data), root_block_usage_key)
+
+    def deserialize_segments(self, segments, root_block_usage_key, fetch_segments=None):
+        """
+        Returns a new block structure from the given dict of segment
+        name to encoded segment.  Segments of transformers are decoded
+        only when their data is first accessed.
+
+        Arguments:
+            segments (dict {string: string}) - The encoded segments.
+                The value of a transformer's segment is None if it is
+                stored externally.
+
+            fetch_segments (([string]) -> {string: string}) - A function
+                that takes a list of transformer names and returns a
+                dict of transformer name to its externally stored
+                segment.  It is called the first time the data of such
+                a transformer is accessed.
+        """
+        keys = self._decode_keys(self._decode_segment(segments[self.KEYS_SEGMENT]))
+        block_relations = self._decode_relations(keys, self._decode_segment(segments[self.RELATIONS_SEGMENT]))
+
+        packed_data_indexes, block_field_columns = self._decode_segment(segments[self.BLOCK_FIELDS_SEGMENT])
+        data_indexes = self._unpack_indexes(packed_data_indexes)
+
+        loader = _TransformerSegmentsLoader(self, fetch_segments, {
+            self.transformer_name(name): segment
+            for name, segment in segments.iteritems()
+            if self.is_transformer_segment_name(name)
+        })
+        block_data_map = {}
+        block_datas_by_index = {}
+        for index in data_indexes:
+            key = keys[index]
+            block_data = BlockData(key)
+            block_data.transformer_data = _LazyTransformerDataMap(loader, index)
+            block_data_map[key] = block_data
+            block_datas_by_index[index] = block_data
+
+        self._decode_columns(block_field_columns, block_datas_by_index)
+
+        transformer_data = TransformerDataMap()
+        for transformer_name, fields in self._decode_segment(segments[self.TRANSFORMER_DATA_SEGMENT]).iteritems():
+            transformer_data[transformer_name] = TransformerData()
+            transformer_data[transformer_name].fields = fields
+
+        return BlockStructureFactory.create_new(
+            root_block_usage_key,
+            block_relations,
+            transformer_data,
+            block_data_map,
+        )
+
+    def unpack(self, serialized_data):
+        """
+        Returns the dict of segment name to encoded segment from the
+        given binary container.
+
+        Raises:
+            BlockStructureException if the data is not in a supported
+            version of this format.
+        """
+        segment_table, segments_start = self._unpack_segment_table(serialized_data)
+        return {
+            name: serialized_data[segments_start + entry[0]:segments_start + entry[0] + entry[1]] if entry else None
+            for name, entry in segment_table.iteritems()
+        }
+
+    @classmethod
+    def can_deserialize(cls, serialized_data):
+        return serialized_data[:len(cls.MAGIC)] == cls.MAGIC
+
+    @classmethod
+    def is_split(cls, serialized_data):
+        """
+        Returns whether the given data is a core container created by
+        split.
+        """
+        return (
+            cls.can_deserialize(serialized_data) and
+            cls.EXTERNAL_SEGMENTS_ID_SEGMENT in cls._unpack_segment_table(serialized_data)[0]
+        )
+
+    @classmethod
+    def _unpack_segment_table(cls, serialized_data):
+        """
+        Returns the segment table of the given container and the
+        offset at which its segments start.
+
+        Raises:
+            BlockStructureException if the data is not in a supported
+            version of this format.
+        """
+        magic, version, table_length = cls._HEADER.unpack_from(serialized_data)
+        if magic != cls.MAGIC or version != cls.FORMAT_VERSION:
+            raise BlockStructureException(
+                'Unsupported block structure serialization format: {!r}, version {}.'.format(magic, version)
+            )
+        table_start = cls._HEADER.size
+        segments_start = table_start + table_length
+        return pickle.loads(serialized_data[table_start:segments_start]), segments_start
+
+    #--- Segment names ---#
+
+    @classmethod
+    def transformer_segment_name(cls, transformer_name):
+        """
+        Returns the name of the segment for the given transformer's
+        block data.
+        """
+        return cls.TRANSFORMER_SEGMENT_PREFIX + transformer_name
+
+    @classmethod
+    def is_transformer_segment_name(cls, segment_name):
+        """
+        Returns whether the given segment holds a transformer's block
+        data.
+        """
+        return segment_name.startswith(cls.TRANSFORMER_SEGMENT_PREFIX)
+
+    @classmethod
+    def transformer_name(cls, segment_name):
+        """
+        Returns the name of the transformer whose block data is held
+        in the given segment.
+        """
+        return segment_name[len(cls.TRANSFORMER_SEGMENT_PREFIX):]
+
+    #--- Internal methods ---#
+
+    @staticmethod
+    def _encode_segment(value):
+        """
+        Returns the compressed pickle of the given value.
+        """
+        return zpickle(value)
+
+    @staticmethod
+    def _decode_segment(segment):
+        """
+        Returns the value of the given compressed pickle.
+        """
+        return zunpickle(segment)
+
+    @classmethod
+    def _pack_indexes(cls, indexes):
+        """
+        Returns the given list of ints as a packed byte string.
+        """
+        return array(cls._INDEX_TYPECODE, indexes).tostring()
+
+    @classmethod
+    def _unpack_indexes(cls, packed_indexes):
+        """
+        Returns the array of ints packed by _pack_indexes.
+        """
+        indexes = array(cls._INDEX_TYPECODE)
+        indexes.fromstring(packed_indexes)
+        return indexes
+
+    @staticmethod
+    def _encode_keys(keys):
+        """
+        Returns an encoding of the given usage keys.  Locators of a
+        single course are reduced to their block types and ids, with
+        interned block types, so the course key is only stored once.
+        Any other keys are stored as they are.
+        """
+        if keys and all(type(key) is BlockUsageLocator for key in keys):  # pylint: disable=unidiomatic-typecheck
+            course_key = keys[0].course_key
+            if all(course_key.make_usage_key(key.block_type, key.block_id) == key for key in keys):
+                block_types = sorted(set(key.block_type for key in keys))
+                block_type_indexes = {block_type: index for index, block_type in enumerate(block_types)}
+                return (
+                    'locators',
+                    course_key,
+                    block_types,
+                    CompactSerializer._pack_indexes([block_type_indexes[key.block_type] for key in keys]),
+                    [key.block_id for key in keys],
+                )
+        return ('keys', keys)
+
+    @staticmethod
+    def _decode_keys(encoded_keys):
+        """
+        Returns the list of usage keys encoded by _encode_keys.
+        """
+        if encoded_keys[0] == 'locators':
+            _, course_key, block_types, packed_block_type_indexes, block_ids = encoded_keys
+            block_type_indexes = CompactSerializer._unpack_indexes(packed_block_type_indexes)
+            return [
+                course_key.make_usage_key(block_types[block_type_index], block_id)
+                for block_type_index, block_id in zip(block_type_indexes, block_ids)
+            ]
+        return encoded_keys[1]
+
+    @classmethod
+    def _encode_relations(cls, keys, block_structure, key_indexes):
+        """
+        Returns CSR-style arrays of the children and parents of the
+        given keys.
+        """
+        encoded = []
+        for get_related in (block_structure.get_children, block_structure.get_parents):
+            offsets, indexes = [0], []
+            for key in keys:
+                indexes.extend(key_indexes[related_key] for related_key in get_related(key))
+                offsets.append(len(indexes))
+            encoded.append((cls._pack_indexes(offsets), cls._pack_indexes(indexes)))
+        return encoded
+
+    @classmethod
+    def _decode_relations(cls, keys, encoded_relations):
+        """
+        Returns the indexed block relations encoded by
+        _encode_relations.
+        """
+        (children_offsets, children_indexes), (parents_offsets, parents_indexes) = [
+            (cls._unpack_indexes(offsets), cls._unpack_indexes(indexes))
+            for offsets, indexes in encoded_relations
+        ]
+        return _IndexedBlockRelations(
+            keys[:len(children_offsets) - 1],
+            (children_offsets, children_indexes),
+            (parents_offsets, parents_indexes),
+        )
+
+    @classmethod
+    def _encode_columns(cls, indexes, field_datas):
+        """
+        Returns the fields of the given FieldData objects as a list of
+        (field name, packed block indexes, values) columns.
+        """
+        columns = {}
+        for index, field_data in zip(indexes, field_datas):
+            for field_name, value in field_data.fields.iteritems():
+                column_indexes, values = columns.setdefault(field_name, ([], []))
+                column_indexes.append(index)
+                values.append(value)
+        return [
+            (field_name, cls._pack_indexes(column_indexes), values)
+            for field_name, (column_indexes, values) in columns.iteritems()
+        ]
+
+    @classmethod
+    def _decode_columns(cls, columns, field_datas_by_index):
+        """
+        Sets the field values of the given columns on the FieldData
+        objects in the given map of block index to FieldData.
+        """
+        for field_name, packed_indexes, values in columns:
+            field_name = intern(field_name)
+            for index, value in zip(cls._unpack_indexes(packed_indexes), values):
+                field_datas_by_index[index].fields[field_name] = value
+
+
+class _TransformerSegmentsLoader(object):
+    """
+    Decodes the block data of a transformer into the BlockData
+    objects of a deserialized block structure the first time that
+    transformer's data is accessed.
+    """
+    def __init__(self, serializer, fetch_segments, pending_segments):
+        self.serializer = serializer
+        self.fetch_segments = fetch_segments
+
+        # Map of transformer name to its not-yet-decoded segment, or
+        # to None if the segment is stored externally and not yet
+        # fetched.
+        # dict {string: string}
+        self.pending_segments = pending_segments
+
+        # Map of block index to the TransformerDataMap of the block,
+        # which register themselves when created.
+        # dict {int: _LazyTransformerDataMap}
+        self.transformer_data_by_index = {}
+
+    def load(self, transformer_name):
+        """
+        Decodes the segment of the given transformer, if not already
+        decoded.
+        """
+        if transformer_name not in self.pending_segments:
+            return
+
+        if self.pending_segments[transformer_name] is None:
+            self._fetch([transformer_name])
+        segment = self.pending_segments.pop(transformer_name)
+
+        packed_indexes, columns = self.serializer._decode_segment(segment)
+        transformer_datas_by_index = {}
+        for index in self.serializer._unpack_indexes(packed_indexes):
+            transformer_block_data = TransformerData()
+            transformer_data_map = self.transformer_data_by_index.get(index)
+            if transformer_data_map is not None:
+                dict.__setitem__(transformer_data_map, transformer_name, transformer_block_data)
+            transformer_datas_by_index[index] = transformer_block_data
+        self.serializer._decode_columns(columns, transformer_datas_by_index)
+
+    def load_all(self):
+        """
+        Decodes the segments of all transformers.
+        """
+        self._fetch([name for name, segment in self.pending_segments.iteritems() if segment is None])
+        for transformer_name in self.pending_segments.keys():
+            self.load(transformer_name)
+
+    def copy(self):
+        """
+        Returns a new loader of the segments not yet decoded by this
+        one, for the TransformerDataMaps of a copied block structure.
+        """
+        return _TransformerSegmentsLoader(self.serializer, self.fetch_segments, dict(self.pending_segments))
+
+    def _fetch(self, transformer_names):
+        """
+        Fetches the externally stored segments of the given
+        transformers.
+        """
+        if transformer_names:
+            self.pending_segments.update(self.fetch_segments(transformer_names))
+
+
+class _LazyTransformerDataMap(TransformerDataMap):
+    """
+    A TransformerDataMap of a single block whose contents are decoded
+    by the given loader on first access.
+    """
+    def __init__(self, loader, index):
+        super(_LazyTransformerDataMap, self).__init__()
+        self._loader = loader
+        self._index = index
+        loader.transformer_data_by_index[index] = self
+
+    def _load(self, key=None):
+        """
+        Decodes the data for the given transformer key, or for all
+        transformers if no key is given.
+        """
+        if self._loader.pending_segments:
+            if key is None:
+                self._loader.load_all()
+            else:
+                self._loader.load(self._translate_key(key))
+
+    def __getitem__(self, key):
+        self._load(key)
+        return super(_LazyTransformerDataMap, self).__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._load(key)
+        super(_LazyTransformerDataMap, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._load(key)
+        super(_LazyTransformerDataMap, self).__delitem__(key)
+
+    def __contains__(self, key):
+        self._load(key)
+        return dict.__contains__(self, self._translate_key(key))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        self._load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+        self._load()
+        return dict.items(self)
+
+    def iterkeys(self):
+        self._load()
+        return dict.iterkeys(self)
+
+    def itervalues(self):
+        self._load()
+        return dict.itervalues(self)
+
+    def iteritems(self):
+        self._load()
+        return dict.iteritems(self)
+
+    def __deepcopy__(self, memo):
+        """
+        Deep copies of this map are lazy too.  The maps copied by the
+        same deepcopy call share a copy of the loader, which decodes
+        the segments that aren't decoded yet into the copies only.
+        """
+        loader = memo.get(id(self._loader))
+        if loader is None:
+            loader = memo[id(self._loader)] = self._loader.copy()
+        copied = memo[id(self)] = _LazyTransformerDataMap(loader, self._index)
+        for transformer_name, transformer_block_data in dict.iteritems(self):
+            dict.__setitem__(copied, transformer_name, deepcopy(transformer_block_data, memo))
+        return copied
+
+    def __reduce__(self):
+        """
+        Pickles of this map are plain, fully decoded TransformerDataMaps.
+        """
+        self._load()
+        return (TransformerDataMap, (), None, None, dict.iteritems(self))
+
+
+def serializer_for_writes():
+    """
+    Returns the serializer to use for writing block structures.
+    """
+    if config.waffle().is_enabled(config.COMPACT_SERIALIZATION):
+        return CompactSerializer()
+    return ZpickleSerializer()
+
+
+def serializer_for_data(serialized_data):
+    """
+    Returns the serializer that can read the given serialized_data.
+    """
+    for serializer_class in (CompactSerializer, ZpickleSerializer):
+        if serializer_class.can_deserialize(serialized_data):
+            return serializer_class()
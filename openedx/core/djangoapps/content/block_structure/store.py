@@ -2,15 +2,14 @@
 Module for the Storage of BlockStructure objects.
 """
 # pylint: disable=protected-access
+from functools import partial
 from logging import getLogger
 
-from openedx.core.lib.cache_utils import zpickle, zunpickle
-
 from . import config
 from .block_structure import BlockStructureBlockData
 from .exceptions import BlockStructureNotFound
-from .factory import BlockStructureFactory
 from .models import BlockStructureModel
+from .serializer import CompactSerializer, serializer_for_data, serializer_for_writes
 from .transformer_registry import TransformerRegistry
 
 
@@ -66,7 +65,7 @@ class BlockStructureStore(object):
         bs_model = self._update_or_create_model(block_structure, serialized_data)
         self._add_to_cache(serialized_data, bs_model)
 
-    def get(self, root_block_usage_key):
+    def get(self, root_block_usage_key, transformer_names=None):
         """
         Deserializes and returns the block structure starting at
         root_block_usage_key, if found in the cache or storage.
@@ -79,6 +78,14 @@ class BlockStructureStore(object):
                 root of the block structure that is to be retrieved
                 from the store.
 
+            transformer_names (iterable(string)) - Names of the
+                transformers whose collected block data is to be read
+                from the cache up front.  Only applies to block
+                structures cached in the compact serialization format,
+                which caches each transformer's data separately.  Data
+                of any other transformer is fetched the first time it
+                is accessed.  If None, data of all transformers is read.
+
         Returns:
             BlockStructure - The deserialized block structure starting
             at root_block_usage_key, if found.
@@ -91,6 +98,8 @@ class BlockStructureStore(object):
 
         try:
             serialized_data = self._get_from_cache(bs_model)
+            if CompactSerializer.is_split(serialized_data):
+                return self._deserialize_split(serialized_data, bs_model, root_block_usage_key, transformer_names)
         except BlockStructureNotFound:
             serialized_data = self._get_from_store(bs_model)
             self._add_to_cache(serialized_data, bs_model)
@@ -155,11 +164,73 @@ class BlockStructureStore(object):
         """
         Adds the given serialized_data for the given BlockStructureModel
         to the cache.
+
+        Data in the compact serialization format is cached as a core
+        entry plus a separate entry for each transformer's segment.
         """
         cache_key = self._encode_root_cache_key(bs_model)
-        self._cache.set(cache_key, serialized_data, timeout=config.cache_timeout_in_seconds())
+        if CompactSerializer.can_deserialize(serialized_data):
+            core_data, segments_id, transformer_segments = CompactSerializer().split(serialized_data)
+            data_to_cache = {
+                self._encode_segment_cache_key(bs_model, segments_id, transformer_name): segment
+                for transformer_name, segment in transformer_segments.iteritems()
+            }
+            data_to_cache[cache_key] = core_data
+            self._cache.set_many(data_to_cache, timeout=config.cache_timeout_in_seconds())
+        else:
+            self._cache.set(cache_key, serialized_data, timeout=config.cache_timeout_in_seconds())
         logger.info("BlockStructure: Added to cache; %s, size: %d", bs_model, len(serialized_data))
 
+    def _get_segments_from_cache(self, bs_model, segments_id, transformer_names):
+        """
+        Returns a dict of transformer name to its separately cached
+        segment for the given transformer_names.
+        Raises:
+             BlockStructureNotFound if any segment is not found.
+        """
+        if not transformer_names:
+            return {}
+
+        cache_keys = {
+            self._encode_segment_cache_key(bs_model, segments_id, transformer_name): transformer_name
+            for transformer_name in transformer_names
+        }
+        cached_segments = self._cache.get_many(cache_keys.keys())
+        if len(cached_segments) != len(cache_keys):
+            logger.info("BlockStructure: Transformer segments not found in cache; %s.", bs_model)
+            raise BlockStructureNotFound(bs_model.data_usage_key)
+
+        logger.info(
+            "BlockStructure: Read transformer segments from cache; %s, transformers: %s, size: %d",
+            bs_model,
+            sorted(transformer_names),
+            sum(len(segment) for segment in cached_segments.itervalues()),
+        )
+        return {cache_keys[cache_key]: segment for cache_key, segment in cached_segments.iteritems()}
+
+    def _fetch_segments(self, bs_model, segments_id, transformer_names):
+        """
+        Returns a dict of transformer name to its segment for the given
+        transformer_names, reading from the cache and falling back to
+        storage.  Used to fetch transformer data that was not read up
+        front by get.
+        Raises:
+             BlockStructureNotFound if the segments are not found.
+        """
+        try:
+            return self._get_segments_from_cache(bs_model, segments_id, transformer_names)
+        except BlockStructureNotFound:
+            serialized_data = self._get_from_store(bs_model)
+            if not CompactSerializer.can_deserialize(serialized_data):
+                # The stored block structure has since been replaced.
+                raise BlockStructureNotFound(bs_model.data_usage_key)
+            self._add_to_cache(serialized_data, bs_model)
+            _, stored_segments_id, transformer_segments = CompactSerializer().split(serialized_data)
+            if stored_segments_id != segments_id:
+                # The stored block structure has since been replaced.
+                raise BlockStructureNotFound(bs_model.data_usage_key)
+            return {transformer_name: transformer_segments[transformer_name] for transformer_name in transformer_names}
+
     def _get_from_cache(self, bs_model):
         """
         Returns the serialized data for the given BlockStructureModel
@@ -191,26 +262,50 @@ class BlockStructureStore(object):
 
     def _serialize(self, block_structure):
         """
-        Serializes the data for the given block_structure.
+        Serializes the data for the given block_structure, using the
+        currently configured serialization format.
+        """
+        return serializer_for_writes().serialize(block_structure)
+
+    def _deserialize_split(self, core_data, bs_model, root_block_usage_key, transformer_names):
         """
-        data_to_cache = (
-            block_structure._block_relations,
-            block_structure.transformer_data,
-            block_structure._block_data_map,
+        Deserializes the given core data of a block structure that is
+        cached in separate segments, reading the segments of the given
+        transformer_names up front.
+        Raises:
+             BlockStructureNotFound if any of those segments is not
+             found in the cache.
+        """
+        serializer = CompactSerializer()
+        segments = serializer.unpack(core_data)
+        segments_id = segments.pop(serializer.EXTERNAL_SEGMENTS_ID_SEGMENT)
+
+        cached_transformer_names = set(
+            serializer.transformer_name(segment_name)
+            for segment_name, segment in segments.iteritems()
+            if segment is None
+        )
+        if transformer_names is not None:
+            cached_transformer_names &= set(transformer_names)
+
+        for transformer_name, segment in self._get_segments_from_cache(
+                bs_model, segments_id, cached_transformer_names,
+        ).iteritems():
+            segments[serializer.transformer_segment_name(transformer_name)] = segment
+
+        return serializer.deserialize_segments(
+            segments,
+            root_block_usage_key,
+            fetch_segments=partial(self._fetch_segments, bs_model, segments_id),
         )
-        return zpickle(data_to_cache)
 
     def _deserialize(self, serialized_data, root_block_usage_key):
         """
         Deserializes the given data and returns the parsed block_structure.
+        The format of the data is detected, so data written in any
+        supported format can be read.
         """
-        block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
-        return BlockStructureFactory.create_new(
-            root_block_usage_key,
-            block_relations,
-            transformer_data,
-            block_data_map,
-        )
+        return serializer_for_data(serialized_data).deserialize(serialized_data, root_block_usage_key)
 
     @staticmethod
     def _encode_root_cache_key(bs_model):
@@ -227,6 +322,19 @@ class BlockStructureStore(object):
                 root_usage_key=unicode(bs_model.data_usage_key),
             )
 
+    @classmethod
+    def _encode_segment_cache_key(cls, bs_model, segments_id, transformer_name):
+        """
+        Returns the cache key to use for the given transformer's
+        separately cached segment of the given BlockStructureModel or
+        StubModel.
+        """
+        return u"{root_cache_key}.segments.{segments_id}.{transformer_name}".format(
+            root_cache_key=cls._encode_root_cache_key(bs_model),
+            segments_id=segments_id,
+            transformer_name=transformer_name,
+        )
+
     @staticmethod
     def _version_data_of_block(root_block):
         """
@@ -2,6 +2,7 @@
 Asynchronous tasks related to the Course Blocks sub-application.
 """
 import logging
+from time import time
 
 from capa.responsetypes import LoncapaProblemError
 from celery.task import task
@@ -42,8 +43,10 @@ def update_course_in_cache_v2(self, **kwargs):
         course_id (string) - The string serialized value of the course key.
         with_storage (boolean) - Whether or not storage backing should be
             enabled for the generated block structure(s).
+    Returns:
+        dict - Statistics of the generation, per course_generation_stats.
     """
-    _update_course_in_cache(self, **kwargs)
+    return _update_course_in_cache(self, **kwargs)
 
 
 @block_structure_task()
@@ -60,7 +63,7 @@ def _update_course_in_cache(self, **kwargs):
     """
     if kwargs.get('with_storage'):
         waffle().override_for_request(STORAGE_BACKING_FOR_CACHE)
-    _call_and_retry_if_needed(self, api.update_course_in_cache, **kwargs)
+    return _call_and_retry_if_needed(self, api.update_course_in_cache, **kwargs)
 
 
 @block_structure_task()
@@ -71,8 +74,10 @@ def get_course_in_cache_v2(self, **kwargs):
         course_id (string) - The string serialized value of the course key.
         with_storage (boolean) - Whether or not storage backing should be
             enabled for any generated block structure(s).
+    Returns:
+        dict - Statistics of the generation, per course_generation_stats.
     """
-    _get_course_in_cache(self, **kwargs)
+    return _get_course_in_cache(self, **kwargs)
 
 
 @block_structure_task()
@@ -89,16 +94,19 @@ def _get_course_in_cache(self, **kwargs):
     """
     if kwargs.get('with_storage'):
         waffle().override_for_request(STORAGE_BACKING_FOR_CACHE)
-    _call_and_retry_if_needed(self, api.get_course_in_cache, **kwargs)
+    return _call_and_retry_if_needed(self, api.get_course_in_cache, **kwargs)
 
 
 def _call_and_retry_if_needed(self, api_method, **kwargs):
     """
     Calls the given api_method with the given course_id, retrying task_method upon failure.
+    Returns the statistics of the call, per course_generation_stats.
     """
     try:
         course_key = CourseKey.from_string(kwargs['course_id'])
-        api_method(course_key)
+        start_time = time()
+        block_structure = api_method(course_key)
+        return course_generation_stats(course_key, block_structure, time() - start_time)
     except NO_RETRY_TASKS:
         # Known unrecoverable errors
         log.exception(
@@ -120,3 +128,21 @@ def _call_and_retry_if_needed(self, api_method, **kwargs):
             self.request.retries,
         )
         raise self.retry(kwargs=kwargs, exc=exc)
+
+
+def course_generation_stats(course_key, block_structure, duration):
+    """
+    Returns a dict of statistics of generating the course blocks for the
+    given course_key.
+
+    Arguments:
+        course_key (CourseKey) - The course whose blocks were generated.
+        block_structure (BlockStructure) - The resulting block structure,
+            or None if the stored block structure was already up-to-date.
+        duration (float) - The time taken, in seconds.
+    """
+    return dict(
+        course_id=unicode(course_key),
+        duration=duration,
+        num_blocks=len(block_structure) if block_structure is not None else None,
+    )
@@ -117,6 +117,7 @@ class MockCache(object):
         # An in-memory map of cache keys to cache values.
         self.map = {}
         self.set_call_count = 0
+        self.get_many_call_count = 0
         self.timeout_from_last_call = 0
 
     def set(self, key, val, timeout):
@@ -127,6 +128,14 @@ class MockCache(object):
         self.map[key] = val
         self.timeout_from_last_call = timeout
 
+    def set_many(self, data, timeout):
+        """
+        Associates each of the given keys with its value in the cache.
+        """
+        self.set_call_count += 1
+        self.map.update(data)
+        self.timeout_from_last_call = timeout
+
     def get(self, key, default=None):
         """
         Returns the value associated with the given key in the cache;
@@ -140,6 +149,14 @@ class MockCache(object):
         """
         del self.map[key]
 
+    def get_many(self, keys):
+        """
+        Returns a dict of the given keys that are found in the cache
+        to their values.
+        """
+        self.get_many_call_count += 1
+        return {key: self.map[key] for key in keys if key in self.map}
+
 
 class MockModulestoreFactory(object):
     """
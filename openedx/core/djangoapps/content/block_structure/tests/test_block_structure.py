@@ -11,7 +11,12 @@ from unittest import TestCase
 
 from openedx.core.lib.graph_traversals import traverse_post_order
 
-from ..block_structure import BlockStructure, BlockStructureModulestoreData
+from ..block_structure import (
+    BlockStructure,
+    BlockStructureBlockData,
+    BlockStructureModulestoreData,
+    IndexedBlockStructureBlockData,
+)
 from ..exceptions import TransformerException
 from .helpers import MockXBlock, MockTransformer, ChildrenMapTestMixin
 
@@ -268,3 +273,60 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
         _set_value(new_copy, 'edit2')
         self.assertEquals(_get_value(block_structure), 'edit1')
         self.assertEquals(_get_value(new_copy), 'edit2')
+
+
+@attr(shard=2)
+@ddt.ddt
+class TestIndexedBlockStructureData(TestBlockStructureData):
+    """
+    Runs the tests for BlockStructureBlockData on
+    IndexedBlockStructureBlockData, and compares the two.
+    """
+    def create_block_structure(self, children_map, block_structure_cls=BlockStructureBlockData):
+        if block_structure_cls is BlockStructureBlockData:
+            block_structure_cls = IndexedBlockStructureBlockData
+        return super(TestIndexedBlockStructureData, self).create_block_structure(children_map, block_structure_cls)
+
+    @ddt.data(
+        *itertools.product(
+            [
+                ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+                ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+                ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+            ],
+            [True, False],
+        )
+    )
+    @ddt.unpack
+    def test_same_as_block_relations(self, children_map, keep_descendants):
+        block_structures = [
+            super(TestIndexedBlockStructureData, self).create_block_structure(children_map),
+            self.create_block_structure(children_map),
+        ]
+        self.assertIsInstance(block_structures[1], IndexedBlockStructureBlockData)
+
+        # Remove block 1 during the traversal, then prune.
+        traversals = [
+            list(block_structure.topological_traversal(
+                filter_func=block_structure.create_removal_filter(lambda block: block == 1, keep_descendants),
+            ))
+            for block_structure in block_structures
+        ]
+        self.assertEquals(traversals[0], traversals[1])
+        for block_structure in block_structures:
+            block_structure._prune_unreachable()
+
+        expected, indexed = block_structures
+        self.assertEquals(len(expected), len(indexed))
+        self.assertSetEqual(set(expected), set(indexed))
+        self.assertEquals(list(expected.post_order_traversal()), list(indexed.post_order_traversal()))
+        self.assertEquals(list(expected.topological_traversal()), list(indexed.topological_traversal()))
+        for block in expected:
+            self.assertEquals(expected.get_children(block), indexed.get_children(block))
+            self.assertEquals(expected.get_parents(block), indexed.get_parents(block))
+
+    def test_set_root_block(self):
+        block_structure = self.create_block_structure(ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+        block_structure.set_root_block(1)
+        block_structure._prune_unreachable()
+        self.assert_block_structure(block_structure, [[], [3, 4], [], [], []], missing_blocks=[0, 2])
@@ -0,0 +1,201 @@
+"""
+Tests for serializer.py
+"""
+# pylint: disable=protected-access
+from logging import getLogger
+from timeit import default_timer
+from unittest import TestCase
+
+import ddt
+from nose.plugins.attrib import attr
+
+from ..block_structure import BlockStructureBlockData
+from ..exceptions import BlockStructureException
+from ..serializer import CompactSerializer, ZpickleSerializer, serializer_for_data
+from .helpers import ChildrenMapTestMixin, MockTransformer, UsageKeyFactoryMixin
+
+
+log = getLogger(__name__)
+
+
+class OtherMockTransformer(MockTransformer):
+    """
+    A second mock transformer, with its own block data.
+    """
+    pass
+
+
+class SerializerTestMixin(ChildrenMapTestMixin):
+    """
+    Utilities for creating block structures with collected data.
+    """
+    def create_collected_block_structure(self, children_map):
+        """
+        Returns a block structure for the given children_map with
+        xBlock fields and block data for two transformers.
+        """
+        block_structure = self.create_block_structure(children_map, BlockStructureBlockData)
+        block_structure._add_transformer(MockTransformer)
+        block_structure._add_transformer(OtherMockTransformer)
+        for block_id in range(len(children_map)):
+            block_key = self.block_key_factory(block_id)
+            block_data = block_structure._get_or_create_block(block_key)
+            block_data.display_name = u'Block {}'.format(block_id)
+            block_data.graded = block_id % 2 == 0
+            block_structure.set_transformer_block_field(block_key, MockTransformer, 'value', block_id)
+            if block_id % 3 == 0:
+                block_structure.set_transformer_block_field(block_key, OtherMockTransformer, 'value', [block_id])
+        return block_structure
+
+    def assert_same_data(self, block_structure, expected_block_structure, children_map):
+        """
+        Verifies that the given block structures have the same
+        relations and collected data.
+        """
+        self.assert_block_structure(block_structure, children_map)
+        self.assertEquals(
+            block_structure._get_transformer_data_version(MockTransformer),
+            expected_block_structure._get_transformer_data_version(MockTransformer),
+        )
+        for block_key in expected_block_structure:
+            self.assertEquals(block_structure.get_children(block_key), expected_block_structure.get_children(block_key))
+            self.assertEquals(block_structure.get_parents(block_key), expected_block_structure.get_parents(block_key))
+            for field_name in ('display_name', 'graded'):
+                self.assertEquals(
+                    block_structure.get_xblock_field(block_key, field_name),
+                    expected_block_structure.get_xblock_field(block_key, field_name),
+                )
+            for transformer in (MockTransformer, OtherMockTransformer):
+                self.assertEquals(
+                    block_structure.get_transformer_block_field(block_key, transformer, 'value'),
+                    expected_block_structure.get_transformer_block_field(block_key, transformer, 'value'),
+                )
+
+
+@attr(shard=2)
+@ddt.ddt
+class TestSerializers(UsageKeyFactoryMixin, SerializerTestMixin, TestCase):
+    """
+    Tests for the block structure serializers.
+    """
+    @ddt.data(
+        *[
+            (serializer_class, children_map)
+            for serializer_class in (ZpickleSerializer, CompactSerializer)
+            for children_map in (
+                ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+                ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+                ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+            )
+        ]
+    )
+    @ddt.unpack
+    def test_round_trip(self, serializer_class, children_map):
+        block_structure = self.create_collected_block_structure(children_map)
+        serialized_data = serializer_class().serialize(block_structure)
+
+        self.assertIsInstance(serializer_for_data(serialized_data), serializer_class)
+        deserialized = serializer_for_data(serialized_data).deserialize(
+            serialized_data, block_structure.root_block_usage_key,
+        )
+        self.assert_same_data(deserialized, block_structure, children_map)
+
+    def test_non_locator_keys(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        block_structure._block_relations[u'non-locator key'] = block_structure._block_relations.pop(
+            self.block_key_factory(4)
+        )
+        block_structure._block_relations[self.block_key_factory(1)].children[1] = u'non-locator key'
+        serializer = CompactSerializer()
+
+        deserialized = serializer.deserialize(serializer.serialize(block_structure), self.block_key_factory(0))
+        self.assertEquals(
+            deserialized.get_children(self.block_key_factory(1)),
+            [self.block_key_factory(3), u'non-locator key'],
+        )
+
+    def test_lazy_transformer_data(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        serializer = CompactSerializer()
+        deserialized = serializer.deserialize(serializer.serialize(block_structure), self.block_key_factory(0))
+
+        block_data = deserialized[self.block_key_factory(0)]
+        loader = block_data.transformer_data._loader
+        self.assertSetEqual(set(loader.pending_segments), {MockTransformer.name(), OtherMockTransformer.name()})
+
+        self.assertEquals(
+            deserialized.get_transformer_block_field(self.block_key_factory(3), MockTransformer, 'value'),
+            3,
+        )
+        self.assertSetEqual(set(loader.pending_segments), {OtherMockTransformer.name()})
+
+        self.assertSetEqual(set(block_data.transformer_data), {MockTransformer.name(), OtherMockTransformer.name()})
+        self.assertFalse(loader.pending_segments)
+
+    def test_copy_of_lazy_structure(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        serializer = CompactSerializer()
+        deserialized = serializer.deserialize(serializer.serialize(block_structure), self.block_key_factory(0))
+
+        deserialized.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'value')
+
+        copied = deserialized.copy()
+        copied_loader = copied[self.block_key_factory(0)].transformer_data._loader
+        self.assertIsNot(copied_loader, deserialized[self.block_key_factory(0)].transformer_data._loader)
+        self.assertSetEqual(set(copied_loader.pending_segments), {OtherMockTransformer.name()})
+        self.assert_same_data(copied, block_structure, self.SIMPLE_CHILDREN_MAP)
+        self.assertFalse(copied_loader.pending_segments)
+
+        # the original decodes its own segments
+        self.assertSetEqual(
+            set(deserialized[self.block_key_factory(0)].transformer_data._loader.pending_segments),
+            {OtherMockTransformer.name()},
+        )
+        self.assertIsNot(
+            copied.get_transformer_block_field(self.block_key_factory(3), OtherMockTransformer, 'value'),
+            deserialized.get_transformer_block_field(self.block_key_factory(3), OtherMockTransformer, 'value'),
+        )
+
+    def test_unsupported_version(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        serialized_data = CompactSerializer().serialize(block_structure)
+        serialized_data = serialized_data[:4] + chr(CompactSerializer.FORMAT_VERSION + 1) + serialized_data[5:]
+        with self.assertRaises(BlockStructureException):
+            CompactSerializer().deserialize(serialized_data, self.block_key_factory(0))
+
+
+@attr(shard=2)
+class TestSerializersBenchmark(UsageKeyFactoryMixin, SerializerTestMixin, TestCase):
+    """
+    Compares the serializers on a block structure the size of a large
+    course.  Timings are logged; only the relative size is asserted.
+    """
+    NUM_BLOCKS = 3000
+    NUM_ITERATIONS = 3
+
+    def test_benchmark(self):
+        children_map = [
+            [child for child in range(4 * block_id + 1, 4 * block_id + 5) if child < self.NUM_BLOCKS]
+            for block_id in range(self.NUM_BLOCKS)
+        ]
+        block_structure = self.create_collected_block_structure(children_map)
+        root_block_usage_key = block_structure.root_block_usage_key
+
+        sizes = {}
+        for serializer in (ZpickleSerializer(), CompactSerializer()):
+            start = default_timer()
+            serialized_data = serializer.serialize(block_structure)
+            serialize_time = default_timer() - start
+
+            start = default_timer()
+            for _ in range(self.NUM_ITERATIONS):
+                serializer.deserialize(serialized_data, root_block_usage_key)
+            deserialize_time = (default_timer() - start) / self.NUM_ITERATIONS
+
+            sizes[type(serializer)] = len(serialized_data)
+            log.info(
+                u'BlockStructure serializer benchmark: %s, blocks: %d, size: %d, serialize: %.3fs, deserialize: %.3fs',
+                type(serializer).__name__, self.NUM_BLOCKS, len(serialized_data), serialize_time, deserialize_time,
+            )
+
+        self.assertLess(sizes[CompactSerializer], sizes[ZpickleSerializer])
@@ -1,12 +1,15 @@
 """
 Tests for block_structure/cache.py
 """
+# pylint: disable=protected-access
+import itertools
+
 import ddt
 from nose.plugins.attrib import attr
 
 from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
 
-from ..config import STORAGE_BACKING_FOR_CACHE, waffle
+from ..config import COMPACT_SERIALIZATION, STORAGE_BACKING_FOR_CACHE, waffle
 from ..config.models import BlockStructureConfiguration
 from ..exceptions import BlockStructureNotFound
 from ..store import BlockStructureStore
@@ -67,6 +70,53 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
             with self.assertRaises(BlockStructureNotFound):
                 self.store.get(self.block_structure.root_block_usage_key)
 
+    @ddt.data(*itertools.product((True, False), repeat=2))
+    @ddt.unpack
+    def test_serialization_formats(self, compact_on_write, compact_on_read):
+        with waffle().override(COMPACT_SERIALIZATION, active=compact_on_write):
+            self.store.add(self.block_structure)
+        with waffle().override(COMPACT_SERIALIZATION, active=compact_on_read):
+            stored_value = self.store.get(self.block_structure.root_block_usage_key)
+            self.assert_block_structure(stored_value, self.children_map)
+            self.assertEquals(
+                stored_value.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'test'),
+                '{} val'.format(MockTransformer.name()),
+            )
+
+    def test_partial_read_of_transformer_data(self):
+        with waffle().override(COMPACT_SERIALIZATION, active=True):
+            self.store.add(self.block_structure)
+            stored_value = self.store.get(self.block_structure.root_block_usage_key, transformer_names=[])
+            self.assertEquals(self.mock_cache.get_many_call_count, 0)
+
+            self.assertEquals(
+                stored_value.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'test'),
+                '{} val'.format(MockTransformer.name()),
+            )
+            self.assertEquals(self.mock_cache.get_many_call_count, 1)
+
+            self.store.get(self.block_structure.root_block_usage_key, transformer_names=[MockTransformer.name()])
+            self.assertEquals(self.mock_cache.get_many_call_count, 2)
+
+    @ddt.data(True, False)
+    def test_transformer_segment_evicted(self, with_storage_backing):
+        with waffle().override(COMPACT_SERIALIZATION, active=True):
+            with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
+                self.store.add(self.block_structure)
+                root_cache_key = self.store._encode_root_cache_key(
+                    self.store._get_model(self.block_structure.root_block_usage_key)
+                )
+                for cache_key in self.mock_cache.map.keys():
+                    if cache_key != root_cache_key:
+                        del self.mock_cache.map[cache_key]
+
+                if with_storage_backing:
+                    stored_value = self.store.get(self.block_structure.root_block_usage_key)
+                    self.assert_block_structure(stored_value, self.children_map)
+                else:
+                    with self.assertRaises(BlockStructureNotFound):
+                        self.store.get(self.block_structure.root_block_usage_key)
+
     def test_uncached_without_storage(self):
         self.store.add(self.block_structure)
         self.mock_cache.map.clear()
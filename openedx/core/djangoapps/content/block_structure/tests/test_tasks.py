@@ -5,6 +5,7 @@ Unit tests for the Course Blocks tasks
 from mock import patch
 
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
 
 from ..tasks import update_course_in_cache_v2
 
@@ -22,3 +23,10 @@ class UpdateCourseInCacheTaskTest(ModuleStoreTestCase):
         mock_update.side_effect = Exception("WHAMMY")
         update_course_in_cache_v2.apply(kwargs=dict(course_id="invalid_course_key raises exception 12345 meow"))
         self.assertTrue(mock_retry.called)
+
+    def test_generation_stats(self):
+        course = CourseFactory.create()
+        result = update_course_in_cache_v2.apply(kwargs=dict(course_id=unicode(course.id)))
+        self.assertEquals(result.result['course_id'], unicode(course.id))
+        self.assertEquals(result.result['num_blocks'], 1)
+        self.assertGreaterEqual(result.result['duration'], 0)
@@ -5,7 +5,7 @@ from mock import MagicMock, patch
 from nose.plugins.attrib import attr
 from unittest import TestCase
 
-from ..block_structure import BlockStructureModulestoreData
+from ..block_structure import BlockStructureBlockData, BlockStructureModulestoreData
 from ..exceptions import TransformerException, TransformerDataIncompatible
 from ..transformers import BlockStructureTransformers
 from .helpers import (
@@ -71,6 +71,41 @@ class TestBlockStructureTransformers(ChildrenMapTestMixin, TestCase):
             self.transformers.transform(block_structure=MagicMock())
             self.assertTrue(mock_transform_call.called)
 
+    def test_transform_with_filters(self):
+        block_structure = self.create_block_structure(self.DAG_CHILDREN_MAP, BlockStructureBlockData)
+        evaluated_blocks = []
+
+        def removal_condition(block_key):
+            """
+            Removes block 2 and records the evaluated blocks.
+            """
+            evaluated_blocks.append(block_key)
+            return block_key == 2
+
+        removal_filter = block_structure.create_removal_filter(removal_condition)
+        other_removal_filter = block_structure.create_removal_filter(lambda block_key: block_key == 5)
+        with patch.object(MockFilteringTransformer, 'transform_block_filters') as mock_filters:
+            mock_filters.return_value = [
+                block_structure.create_universal_filter(), removal_filter, other_removal_filter,
+            ]
+            with mock_registered_transformers(self.registered_transformers):
+                self.transformers += [MockFilteringTransformer()]
+            self.transformers.transform(block_structure)
+
+        # Block 4 is only reachable through the removed block 2, so it
+        # is never evaluated.
+        self.assertEquals(sorted(evaluated_blocks), [0, 1, 2, 3, 5, 6])
+        self.assert_block_structure(block_structure, [[1], [3], [], [6], [], [], []], missing_blocks=[2, 4, 5])
+
+    def test_transform_with_universal_filters(self):
+        block_structure = MagicMock()
+        with mock_registered_transformers(self.registered_transformers):
+            self.transformers += [MockFilteringTransformer()]
+        with patch.object(MockFilteringTransformer, 'transform_block_filters') as mock_filters:
+            mock_filters.return_value = [BlockStructureBlockData(0).create_universal_filter()]
+            self.transformers.transform(block_structure)
+        self.assertFalse(block_structure.filter_topological_traversal.called)
+
     def test_verify_versions(self):
         block_structure = self.create_block_structure(
             self.SIMPLE_CHILDREN_MAP,
@@ -70,6 +70,22 @@ class BlockStructureTransformer(object):
         """
         raise NotImplementedError
 
+    @classmethod
+    def collected_data_dependencies(cls):
+        """
+        Returns the names of the transformers whose collected block
+        data is accessed by this transformer's transform method.  The
+        block structure framework uses this to read only the needed
+        transformers' data from the store.  Data of any other
+        transformer is still available, but is read separately when
+        first accessed.
+
+        Transformers that access the collected data of other
+        transformers, such as those that contain other transformers,
+        should override this method.
+        """
+        return [cls.name()]
+
     @classmethod
     def collect(cls, block_structure):
         """
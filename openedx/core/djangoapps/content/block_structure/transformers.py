@@ -1,9 +1,9 @@
 """
 Module for a collection of BlockStructureTransformers.
 """
-import functools
 from logging import getLogger
 
+from .block_structure import BlockRemovalFilter, universal_filter
 from .exceptions import TransformerException, TransformerDataIncompatible
 from .transformer import FilteringTransformerMixin
 from .transformer_registry import TransformerRegistry
@@ -105,6 +105,17 @@ class BlockStructureTransformers(object):
             )
         return True
 
+    def collected_data_dependencies(self):
+        """
+        Returns the set of names of the transformers whose collected
+        block data is accessed by the transformers in this collection.
+        """
+        return {
+            transformer_name
+            for transformer in self._transformers['supports_filter'] + self._transformers['no_filter']
+            for transformer_name in transformer.collected_data_dependencies()
+        }
+
     def transform(self, block_structure):
         """
         The given block structure is transformed by each transformer in the
@@ -122,27 +133,58 @@ class BlockStructureTransformers(object):
         """
         Transforms the given block_structure using the transform_block_filters
         method from the given transformers.
+
+        The filters of all transformers are combined and evaluated in a
+        single topological traversal.  Universal filters are left out,
+        and the traversal is skipped entirely if no other filters remain
+        (for example, for staff users).
         """
         if not self._transformers['supports_filter']:
             return
 
         filters = []
         for transformer in self._transformers['supports_filter']:
-            filters.extend(transformer.transform_block_filters(self.usage_info, block_structure))
-
-        combined_filters = functools.reduce(
-            self._filter_chain,
-            filters,
-            block_structure.create_universal_filter()
-        )
-        block_structure.filter_topological_traversal(combined_filters)
+            filters.extend(
+                block_filter
+                for block_filter in transformer.transform_block_filters(self.usage_info, block_structure)
+                if block_filter is not universal_filter
+            )
 
-    def _filter_chain(self, accumulated, additional):
-        """
-        Given two functions that take a block_key and return a boolean, yield
-        a function that takes a block key, and 'ands' the functions together
-        """
-        return lambda block_key: accumulated(block_key) and additional(block_key)
+        if filters:
+            block_structure.filter_topological_traversal(self._combine_filters(filters))
+
+    @staticmethod
+    def _combine_filters(filters):
+        """
+        Returns a filter function that evaluates the given filters, in
+        order, for each block and 'ands' their results.
+
+        Removal filters are evaluated through their removal conditions,
+        so a block is removed just once, by the first removal condition
+        it satisfies, and no later condition is evaluated for it.
+        Descendants of a removed block are then pruned by the traversal
+        without being evaluated, unless they have other retained parents.
+        """
+        predicates = [
+            (block_filter.removal_condition, block_filter)
+            if isinstance(block_filter, BlockRemovalFilter) else (block_filter, None)
+            for block_filter in filters
+        ]
+
+        def combined_filter(block_key):
+            """
+            Returns whether the given block is retained by all filters.
+            """
+            for predicate, removal_filter in predicates:
+                if removal_filter is None:
+                    if not predicate(block_key):
+                        return False
+                elif predicate(block_key):
+                    removal_filter.block_structure.remove_block(block_key, removal_filter.keep_descendants)
+                    return False
+            return True
+
+        return combined_filter
 
     def _transform_without_filters(self, block_structure):
         """